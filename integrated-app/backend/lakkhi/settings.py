@@ -67,6 +67,20 @@ DATABASES = {
     }
 }
 
+# Cache - nonce locks and counters, published gas prices and the other cross-process
+# coordination live here, so any deployment with more than one process (gunicorn
+# workers, run_outbox, run_scheduler) needs a shared backend: set REDIS_URL, or
+# CACHE_BACKEND=database (run `manage.py createcachetable`). The local-memory
+# default is per process and only safe for a single-process dev server.
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis' if REDIS_URL else 'locmem')
+if CACHE_BACKEND == 'redis':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': REDIS_URL}}
+elif CACHE_BACKEND == 'database':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'lakkhi_cache'}}
+else:
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 AUTH_PASSWORD_VALIDATORS = [
@@ -137,6 +151,164 @@ BSC_RPC_URL = os.environ.get('BSC_RPC_URL', 'https://bsc-dataseed.binance.org/')
 ETHEREUM_RPC_URL = os.environ.get('ETHEREUM_RPC_URL', 'https://mainnet.infura.io/v3/9aa3d95b3bc440fa88ea12eaa4456161')
 BASE_RPC_URL = os.environ.get('BASE_RPC_URL', 'https://mainnet.base.org')
 
+# RPC connection pooling - one keep-alive session per chain, shared by the whole process
+WEB3_POOL_CONNECTIONS = int(os.environ.get('WEB3_POOL_CONNECTIONS', '4'))  # Pools kept per session
+WEB3_POOL_MAXSIZE = int(os.environ.get('WEB3_POOL_MAXSIZE', '20'))  # Max open connections per pool
+WEB3_REQUEST_TIMEOUT = float(os.environ.get('WEB3_REQUEST_TIMEOUT', '15'))  # Read timeout (seconds)
+WEB3_CONNECT_TIMEOUT = float(os.environ.get('WEB3_CONNECT_TIMEOUT', '5'))  # Connect timeout (seconds)
+
+# Multicall3 is deployed at the same address on BSC, Ethereum and Base
+MULTICALL3_ADDRESS = os.environ.get('MULTICALL3_ADDRESS', '0xcA11bde05977b3631167028862bE2a173976CA11')
+MULTICALL_CHUNK_SIZE = int(os.environ.get('MULTICALL_CHUNK_SIZE', '200'))  # Calls per aggregate3 request
+
+# Token metadata cache (in-process LRU in front of the TokenMetadata table)
+TOKEN_METADATA_LRU_SIZE = int(os.environ.get('TOKEN_METADATA_LRU_SIZE', '2048'))
+TOKEN_METADATA_NEGATIVE_TTL = int(os.environ.get('TOKEN_METADATA_NEGATIVE_TTL', '300'))  # Seconds to remember invalid tokens
+
+# Contract instance cache - per-address web3 contract objects kept per process
+CONTRACT_CACHE_SIZE = int(os.environ.get('CONTRACT_CACHE_SIZE', '1024'))
+
+# Swap quote cache - getAmountsOut results kept for one block
+SWAP_QUOTE_CACHE_SIZE = int(os.environ.get('SWAP_QUOTE_CACHE_SIZE', '4096'))
+QUOTE_AMOUNT_SIGNIFICANT_DIGITS = int(os.environ.get('QUOTE_AMOUNT_SIGNIFICANT_DIGITS', '4'))  # Amount bucket precision
+RESERVE_MIRROR_MAX_LOG_RANGE = int(os.environ.get('RESERVE_MIRROR_MAX_LOG_RANGE', '500'))  # Blocks behind before reseeding instead of replaying Sync logs
+
+# Multi-hop routing - intermediate tokens tried between the wrapped native token and a project token
+ROUTE_BASE_TOKENS = {
+    'BSC': [
+        '0x55d398326f99059fF775485246999027B3197955',  # USDT
+        '0xe9e7CEA3DedcA5984780Bafc599bD69ADd087D56',  # BUSD
+        '0x8AC76a51cc950d9822D68b83fE1Ad97B32Cd580d',  # USDC
+    ],
+    'Ethereum': [
+        '0xdAC17F958D2ee523a2206206994597C13D831ec7',  # USDT
+        '0x6B175474E89094C44Da98b954EedeAC495271d0F',  # DAI
+    ],
+    'Base': [
+        '0x833589fCD6eDb6E08f4c7C32D4f71b54bdA02913',  # USDC
+        '0x50c5725949A6F0c72E6C4a641F24049A917DB0Cb',  # DAI
+    ],
+}
+ROUTE_CACHE_SIZE = int(os.environ.get('ROUTE_CACHE_SIZE', '2048'))  # Memoized routes per (token, amount bucket, block)
+
+# ContributionRouter deployments (contracts/ContributionRouter.sol) - swap and deposit in one transaction.
+# Chains without a router fall back to the swap -> approve -> stake sequence.
+CONTRIBUTION_ROUTER_ADDRESSES = {
+    'BSC': os.environ.get('BSC_CONTRIBUTION_ROUTER', ''),
+    'Ethereum': os.environ.get('ETHEREUM_CONTRIBUTION_ROUTER', ''),
+    'Base': os.environ.get('BASE_CONTRIBUTION_ROUTER', ''),
+}
+
+# Gas oracle - approximate block times (seconds) used as the per-chain refresh interval
+GAS_ORACLE_POLL_INTERVALS = {
+    'Ethereum': 12,
+    'BSC': 3,
+    'Base': 2
+}
+GAS_ORACLE_FEE_HISTORY_BLOCKS = int(os.environ.get('GAS_ORACLE_FEE_HISTORY_BLOCKS', '10'))
+
+# Transaction confirmation tracker
+# Set TX_TRACKER_IN_PROCESS=False when running `manage.py track_transactions` as a separate process
+TX_TRACKER_IN_PROCESS = os.environ.get('TX_TRACKER_IN_PROCESS', 'True') == 'True'
+TX_TRACKER_BATCH_SIZE = int(os.environ.get('TX_TRACKER_BATCH_SIZE', '100'))  # Receipts per batch request
+TX_TRACKER_DROP_AFTER = int(os.environ.get('TX_TRACKER_DROP_AFTER', '1800'))  # Seconds before checking for dropped txs
+
+# Transaction outbox - chain writes are queued and sent by `manage.py run_outbox --chain <chain>`
+OUTBOX_CONCURRENCY = int(os.environ.get('OUTBOX_CONCURRENCY', '4'))  # Senders handled in parallel per worker
+OUTBOX_MAX_SENDS_PER_SECOND = {
+    'Ethereum': 5,
+    'BSC': 10,
+    'Base': 10
+}
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', '8'))  # Send attempts before dead-lettering
+OUTBOX_RETRY_BASE_DELAY = int(os.environ.get('OUTBOX_RETRY_BASE_DELAY', '2'))  # Seconds, doubled per failed attempt
+OUTBOX_RETRY_MAX_DELAY = int(os.environ.get('OUTBOX_RETRY_MAX_DELAY', '300'))
+OUTBOX_CLAIM_TIMEOUT = int(os.environ.get('OUTBOX_CLAIM_TIMEOUT', '120'))  # Seconds before a claimed, unsent tx is dead-lettered
+OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', '1'))
+
+# Payment webhook consumers - set WEBHOOK_CONSUMER_IN_PROCESS=False when running `manage.py consume_webhooks`
+WEBHOOK_CONSUMER_IN_PROCESS = os.environ.get('WEBHOOK_CONSUMER_IN_PROCESS', 'True') == 'True'
+WEBHOOK_CONSUMERS = int(os.environ.get('WEBHOOK_CONSUMERS', '4'))  # Events processed in parallel
+WEBHOOK_CLAIM_TIMEOUT = int(os.environ.get('WEBHOOK_CLAIM_TIMEOUT', '900'))  # Seconds before an unfinished event is failed
+WEBHOOK_POLL_INTERVAL = float(os.environ.get('WEBHOOK_POLL_INTERVAL', '1'))
+
+# Seconds before a payment claimed for processing (but never finished) may be claimed again
+PAYMENT_PROCESSING_TIMEOUT = int(os.environ.get('PAYMENT_PROCESSING_TIMEOUT', '900'))
+
+# Card payment pipelines - resumed from their last confirmed step by `manage.py resume_payments`
+PAYMENT_RECEIPT_TIMEOUT = int(os.environ.get('PAYMENT_RECEIPT_TIMEOUT', '300'))  # Seconds to wait for each step's receipt
+PAYMENT_PIPELINE_RETRY_DELAY = int(os.environ.get('PAYMENT_PIPELINE_RETRY_DELAY', '60'))  # Seconds between resume attempts
+PAYMENT_PIPELINE_MAX_ATTEMPTS = int(os.environ.get('PAYMENT_PIPELINE_MAX_ATTEMPTS', '5'))
+
+# Batched staking - card payments are bought into a pool wallet per chain and staked per project
+# once a batch reaches the threshold or its window closes (`manage.py flush_stake_batches`)
+PAYMENT_AGGREGATION_ENABLED = os.environ.get('PAYMENT_AGGREGATION_ENABLED', 'False') == 'True'
+PAYMENT_AGGREGATION_WINDOW = int(os.environ.get('PAYMENT_AGGREGATION_WINDOW', '900'))  # Seconds a batch stays open
+PAYMENT_AGGREGATION_THRESHOLD_USD = int(os.environ.get('PAYMENT_AGGREGATION_THRESHOLD_USD', '500'))  # Stake as soon as a batch reaches this
+
+# Token USD price oracle - sources are tried in order; cached prices past their TTL are served
+# for up to PRICE_ORACLE_STALE_TTL more seconds while a fresh one is fetched in the background
+PRICE_ORACLE_SOURCES = [
+    'lakkhi_app.price_oracle.DexReserveSource',
+    'lakkhi_app.price_oracle.CoinGeckoSource',
+]
+PRICE_ORACLE_TTL = int(os.environ.get('PRICE_ORACLE_TTL', '60'))  # Seconds a price is fresh
+PRICE_ORACLE_TOKEN_TTLS = {}  # Per-token TTL overrides, {address: seconds}
+PRICE_ORACLE_STALE_TTL = int(os.environ.get('PRICE_ORACLE_STALE_TTL', '600'))
+PRICE_ORACLE_MAX_WAIT = float(os.environ.get('PRICE_ORACLE_MAX_WAIT', '2'))  # Seconds a request waits on a token's first lookup
+PRICE_ORACLE_RETRY_DELAY = int(os.environ.get('PRICE_ORACLE_RETRY_DELAY', '30'))  # Seconds before retrying a token no source could price
+PRICE_ORACLE_WORKERS = int(os.environ.get('PRICE_ORACLE_WORKERS', '4'))
+PRICE_ORACLE_CACHE_SIZE = int(os.environ.get('PRICE_ORACLE_CACHE_SIZE', '2048'))
+PRICE_ORACLE_STABLECOINS = ROUTE_BASE_TOKENS  # Counted as $1 by the DEX source
+PRICE_ORACLE_MIN_LIQUIDITY_USD = int(os.environ.get('PRICE_ORACLE_MIN_LIQUIDITY_USD', '1000'))  # Thinner pairs are ignored
+PRICE_ORACLE_STATIC_PRICES = {}  # {chain: {address: price}} for lakkhi_app.price_oracle.StaticPriceSource
+PRICE_ORACLE_HTTP_TIMEOUT = int(os.environ.get('PRICE_ORACLE_HTTP_TIMEOUT', '5'))
+COINGECKO_API_URL = os.environ.get('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3')
+COINGECKO_API_KEY = os.environ.get('COINGECKO_API_KEY', '')
+
+# Token price history - samples are rolled up into 1m/1h/1d buckets by the scheduler's price_rollups job
+PRICE_HISTORY_SAMPLE_INTERVAL = int(os.environ.get('PRICE_HISTORY_SAMPLE_INTERVAL', '60'))  # Min seconds between samples per token
+PRICE_HISTORY_RETENTION = {  # Seconds each tier is kept, None = forever
+    'raw': 2 * 86400,
+    '1m': 14 * 86400,
+    '1h': 400 * 86400,
+    '1d': None,
+}
+PRICE_HISTORY_MAX_STALENESS = int(os.environ.get('PRICE_HISTORY_MAX_STALENESS', str(2 * 86400)))  # Oldest price an as-of lookup uses
+
+# Periodic job scheduler - one process at a time holds the lease and runs the jobs, each once per
+# interval cluster-wide. Set SCHEDULER_IN_PROCESS=False when running `manage.py run_scheduler` instead
+SCHEDULER_IN_PROCESS = os.environ.get('SCHEDULER_IN_PROCESS', 'True') == 'True'
+SCHEDULER_LEASE_SECONDS = int(os.environ.get('SCHEDULER_LEASE_SECONDS', '30'))  # Unrenewed seconds before another process takes over
+SCHEDULER_TICK = float(os.environ.get('SCHEDULER_TICK', '1'))
+SCHEDULER_WORKERS = int(os.environ.get('SCHEDULER_WORKERS', '4'))  # Jobs run in parallel
+SCHEDULER_JITTER = 0.1  # Default jitter, as a fraction of the interval
+SCHEDULER_JOBS = {  # Intervals and timeouts in seconds
+    'token_prices': {'func': 'lakkhi_app.jobs.refresh_token_prices', 'interval': 60, 'timeout': 50},
+    'gas_oracle': {'func': 'lakkhi_app.jobs.refresh_gas_oracles', 'interval': 5, 'timeout': 4, 'jitter': 0},
+    'price_rollups': {'func': 'lakkhi_app.jobs.rollup_price_history', 'interval': 60, 'timeout': 55},
+    'session_cleanup': {'func': 'lakkhi_app.jobs.clear_expired_sessions', 'interval': 3600, 'timeout': 60},
+    'stake_batches': {'func': 'lakkhi_app.jobs.flush_stake_batches', 'interval': 60, 'timeout': 240},
+    'cache_warming': {'func': 'lakkhi_app.jobs.warm_caches', 'interval': 900, 'timeout': 300},
+}
+# Seconds published gas suggestions are used; past that a process polls the chain itself
+GAS_ORACLE_SHARED_TTL = int(os.environ.get('GAS_ORACLE_SHARED_TTL', '15'))
+GAS_ORACLE_READ_TTL = float(os.environ.get('GAS_ORACLE_READ_TTL', '1'))  # Seconds each process reuses a read of them
+
+# Local nonce allocation - needs a shared cache backend (CACHES) to coordinate several workers
+NONCE_CACHE_TIMEOUT = int(os.environ.get('NONCE_CACHE_TIMEOUT', '300'))  # Idle seconds before resyncing from the node
+NONCE_LOCK_TIMEOUT = int(os.environ.get('NONCE_LOCK_TIMEOUT', '40'))  # Seconds to wait for / hold an address lock (at least 2x WEB3_REQUEST_TIMEOUT)
+
+# On-chain event indexer - blocks to stay behind the head so ordinary reorgs never reach indexed rows
+EVENT_INDEXER_CONFIRMATIONS = {
+    'Ethereum': 12,
+    'BSC': 15,
+    'Base': 10
+}
+EVENT_INDEXER_MAX_BLOCK_RANGE = int(os.environ.get('EVENT_INDEXER_MAX_BLOCK_RANGE', '2000'))  # Largest eth_getLogs window
+EVENT_INDEXER_ADDRESS_CHUNK = int(os.environ.get('EVENT_INDEXER_ADDRESS_CHUNK', '500'))  # Contracts per eth_getLogs filter
+EVENT_INDEXER_START_BLOCKS = {}  # Optional first block per chain; defaults to the current safe head
+
 # Chain IDs for mainnet
 CHAIN_IDS = {
     'Ethereum': 1,
@@ -155,6 +327,14 @@ ADMIN_ADDRESS = os.environ.get('ADMIN_ADDRESS', '')
 LAKKHI_TOKEN = os.environ.get('LAKKHI_TOKEN', '0x264387ad73d19408e34b5d5e13a93174a35cea33')  # Default to RareFnd for testing
 TOKEN_ADDRESS = LAKKHI_TOKEN  # Set to LAKKHI_TOKEN for production
 
+# CampaignCloneFactory deployments (contracts/CampaignCloneFactory.sol) - campaigns are deployed as
+# EIP-1167 clones at CREATE2 addresses. Chains without a factory deploy the full staking bytecode.
+CAMPAIGN_CLONE_FACTORY_ADDRESSES = {
+    'BSC': os.environ.get('BSC_CAMPAIGN_FACTORY', ''),
+    'Ethereum': os.environ.get('ETHEREUM_CAMPAIGN_FACTORY', ''),
+    'Base': os.environ.get('BASE_CAMPAIGN_FACTORY', ''),
+}
+
 # PancakeSwap Factory Settings
 STAKING_FACTORY_ADDRESS = os.environ.get('STAKING_FACTORY_ADDRESS', '0x10ED43C718714eb63d5aA57B78B54704E256024E')  # PancakeSwap Router
 
@@ -170,6 +350,9 @@ AWS_STORAGE_BUCKET_NAME = 'your-bucket-name'
 # Custom Wallet settings - Replace these before testing
 WALLET_API_KEY = os.environ.get('WALLET_API_KEY', 'your-wallet-api-key')
 WALLET_SECRET = os.environ.get('WALLET_SECRET', 'your-wallet-secret')
+# Custodial wallet keys are stored as keystores encrypted with this (CustodialWallet)
+WALLET_ENCRYPTION_KEY = os.environ.get('WALLET_ENCRYPTION_KEY', SECRET_KEY)
+WALLET_KEYSTORE_ITERATIONS = int(os.environ.get('WALLET_KEYSTORE_ITERATIONS', '100000'))  # PBKDF2 rounds
 
 # REST Framework settings
 REST_FRAMEWORK = {
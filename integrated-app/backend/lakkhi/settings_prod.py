@@ -19,6 +19,11 @@ if os.environ.get('DATABASE_URL'):
     import dj_database_url
     DATABASES = {'default': dj_database_url.config(default=os.environ.get('DATABASE_URL'))}
 
+# Shared cache - several processes allocate nonces and read published gas prices
+# through it, so production never falls back to the per-process local-memory cache
+if os.environ.get('CACHE_BACKEND', 'redis' if REDIS_URL else 'database') == 'database':
+    CACHES = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'lakkhi_cache'}}
+
 # Security settings
 SECURE_SSL_REDIRECT = True
 SESSION_COOKIE_SECURE = True
@@ -30,6 +35,8 @@ X_FRAME_OPTIONS = 'DENY'
 # Custom Wallet settings
 WALLET_API_KEY = os.environ.get('WALLET_API_KEY')
 WALLET_SECRET = os.environ.get('WALLET_SECRET')
+# Encrypts custodial wallet keystores - changing it makes existing wallets unreadable
+WALLET_ENCRYPTION_KEY = os.environ.get('WALLET_ENCRYPTION_KEY') or SECRET_KEY
 
 # Blockchain Settings
 BSC_RPC_URL = os.environ.get('BSC_RPC_URL', 'https://bsc-dataseed.binance.org/')
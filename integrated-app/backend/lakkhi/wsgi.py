@@ -13,4 +13,11 @@ from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lakkhi.settings')
 
-application = get_wsgi_application() 
\ No newline at end of file
+application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402
+
+if settings.SCHEDULER_IN_PROCESS:
+    # Every worker competes for the scheduler lease; only the holder runs jobs
+    from lakkhi_app.scheduler import ensure_scheduler  # noqa: E402
+    ensure_scheduler()
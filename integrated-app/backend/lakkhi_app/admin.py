@@ -1,11 +1,14 @@
 from django.contrib import admin
-from .models import Campaign, Release, Contribution, Payment
+from .models import Campaign, Release, Contribution, Payment, OutboxTransaction
 from django.utils.html import format_html
 from django.urls import path
 from django.shortcuts import redirect
 from django.contrib import messages
+from django.conf import settings
+from eth_account import Account
 from web3 import Web3
 from .web3_helper_functions import get_staking_contract
+from .tx_outbox import enqueue_call, requeue
 
 @admin.register(Release)
 class ReleaseAdmin(admin.ModelAdmin):
@@ -58,6 +61,8 @@ class ReleaseAdmin(admin.ModelAdmin):
                 continue
                 
             try:
+                blockchain = release.campaign.blockchain or 'BSC'
+                
                 # Get the campaign contract
                 contract = get_staking_contract(release.campaign.contract_address)
                 
@@ -67,29 +72,27 @@ class ReleaseAdmin(admin.ModelAdmin):
                     self.message_user(request, f'Campaign owner {release.campaign.owner.username} has no wallet address.', level=messages.ERROR)
                     continue
                 
-                # Build and send the transaction
-                tx = contract.functions.withdraw(
-                    Web3.to_wei(release.release_amount, 'ether')
-                ).build_transaction({
-                    'from': Web3.to_checksum_address(campaign_owner),
-                    'nonce': Web3.eth.get_transaction_count(Web3.to_checksum_address(campaign_owner)),
-                    'gas': 200000,
-                    'gasPrice': Web3.eth.gas_price
-                })
-                
-                # Sign and send transaction
-                signed_tx = Web3.eth.account.sign_transaction(tx, settings.ADMIN_WALLET_PRIVATE_KEY)
-                tx_hash = Web3.eth.send_raw_transaction(signed_tx.rawTransaction)
-                
-                # Wait for receipt
-                receipt = Web3.eth.wait_for_transaction_receipt(tx_hash)
+                # An outbox worker signs with the admin key and sends the withdrawal;
+                # the tracker then marks the release RELEASED (or back to APPROVED) once mined
+                admin_key = getattr(settings, 'ADMIN_WALLET_PRIVATE_KEY', '') or settings.ADMIN_PRIVATE_KEY
+                queued = enqueue_call(
+                    contract,
+                    'withdraw',
+                    [Web3.to_wei(release.release_amount, 'ether')],
+                    Account.from_key(admin_key).address,
+                    blockchain,
+                    gas=200000,
+                    kind='release',
+                    signer='admin',
+                    callback='lakkhi_app.tx_tracker.on_release_processed',
+                    callback_kwargs={'release_id': release.id}
+                )
                 
-                # Update release status
-                release.transaction_hash = receipt['transactionHash'].hex()
-                release.status = 'RELEASED'
+                # Update release status - the tx hash is known once the worker broadcasts it
+                release.status = 'PROCESSING'
                 release.save()
                 
-                self.message_user(request, f'Successfully processed release {release.title}')
+                self.message_user(request, f'Release {release.title} queued for sending (outbox #{queued.id})')
                 
             except Exception as e:
                 self.message_user(request, f'Error processing release {release.title}: {str(e)}', level=messages.ERROR)
@@ -160,4 +163,20 @@ class CampaignAdmin(admin.ModelAdmin):
         if obj.contract_owner:
             return f"{obj.contract_owner[:6]}...{obj.contract_owner[-4:]}"
         return "-"
-    contract_owner_display.short_description = "Contract Owner" 
\ No newline at end of file
+    contract_owner_display.short_description = "Contract Owner" 
+
+
+@admin.register(OutboxTransaction)
+class OutboxTransactionAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'blockchain', 'sender', 'status', 'attempts', 'tx_hash', 'created_at')
+    list_filter = ('status', 'blockchain', 'kind')
+    search_fields = ('sender', 'to_address', 'tx_hash')
+    readonly_fields = ('nonce', 'tx_hash', 'last_error', 'created_at', 'claimed_at', 'sent_at')
+    
+    actions = ['requeue_transactions']
+    
+    def requeue_transactions(self, request, queryset):
+        """Give dead-lettered transactions a fresh set of send attempts"""
+        requeued = requeue(queryset.values_list('id', flat=True))
+        self.message_user(request, f'{requeued} dead-lettered transaction(s) requeued.')
+    requeue_transactions.short_description = "Requeue selected dead-lettered transactions"
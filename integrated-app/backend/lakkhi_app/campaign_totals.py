@@ -0,0 +1,142 @@
+"""
+Denormalized campaign funding totals.
+
+Campaign.raised_total, contributor_count and last_contribution_at are kept
+up to date as contributions are written, so reading a campaign's progress
+is O(1) however many donors it has:
+
+- post_save (new rows) and post_delete signal receivers in models.py
+  adjust the totals in the writing transaction, with F() increments, under
+  a lock on the campaign row so concurrent first contributions from one
+  donor count once. post_delete is also sent for QuerySet.delete(), admin
+  bulk deletes and cascades (e.g. deleting a user), so those stay counted.
+- Bulk writes that send no signals - the event indexer's bulk_create
+  upserts - call reconcile() for the campaigns they touched.
+
+A contributor is the contribution's user, or its wallet address when there
+is no user; contributions with neither count as one anonymous contributor.
+Edits to an existing contribution's amount aren't tracked -
+`manage.py reconcile_campaign_totals` rebuilds the totals from scratch.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Lower
+
+
+def _same_contributor(contribution):
+    """Q matching contributions made by the same contributor"""
+    if contribution.user_id:
+        return Q(user_id=contribution.user_id)
+    if contribution.wallet_address:
+        return Q(user__isnull=True, wallet_address__iexact=contribution.wallet_address)
+    return Q(user__isnull=True) & (Q(wallet_address__isnull=True) | Q(wallet_address=''))
+
+
+def _lock_campaign(campaign_id):
+    from .models import Campaign
+
+    return Campaign.objects.select_for_update().only('id', 'last_contribution_at').filter(pk=campaign_id).first()
+
+
+def contribution_added(contribution):
+    """Count a newly inserted contribution - call inside the inserting transaction"""
+    from .models import Campaign, Contribution
+
+    with transaction.atomic():
+        campaign = _lock_campaign(contribution.campaign_id)
+        if campaign is None:
+            return
+
+        updates = {'raised_total': F('raised_total') + Decimal(str(contribution.amount))}
+        returning = Contribution.objects.filter(campaign_id=contribution.campaign_id).filter(
+            _same_contributor(contribution)
+        ).exclude(pk=contribution.pk).exists()
+        if not returning:
+            updates['contributor_count'] = F('contributor_count') + 1
+        if campaign.last_contribution_at is None or contribution.created_at > campaign.last_contribution_at:
+            updates['last_contribution_at'] = contribution.created_at
+        Campaign.objects.filter(pk=campaign.pk).update(**updates)
+
+
+def contribution_removed(contribution):
+    """Uncount a deleted contribution - call inside the deleting transaction, after the delete"""
+    from .models import Campaign, Contribution
+
+    with transaction.atomic():
+        campaign = _lock_campaign(contribution.campaign_id)
+        if campaign is None:
+            return
+
+        remaining = Contribution.objects.filter(campaign_id=contribution.campaign_id)
+        updates = {'raised_total': F('raised_total') - Decimal(str(contribution.amount))}
+        if not remaining.filter(_same_contributor(contribution)).exists():
+            # Recounted rather than decremented: a batch delete removes all of a donor's
+            # rows before the first post_delete, so each of them would decrement once
+            updates['contributor_count'] = _contributor_counts(remaining).get(campaign.pk, 0)
+        if campaign.last_contribution_at == contribution.created_at:
+            updates['last_contribution_at'] = remaining.aggregate(latest=Max('created_at'))['latest']
+        Campaign.objects.filter(pk=campaign.pk).update(**updates)
+
+
+def _contributor_counts(contributions):
+    """{campaign_id: distinct contributors} over a Contribution queryset, one grouped query per kind"""
+    counts = dict(
+        contributions.filter(user__isnull=False).values('campaign_id')
+        .annotate(count=Count('user', distinct=True)).values_list('campaign_id', 'count')
+    )
+    wallets = contributions.filter(user__isnull=True).exclude(wallet_address__isnull=True).exclude(wallet_address='')
+    for campaign_id, count in wallets.values('campaign_id').annotate(
+        count=Count(Lower('wallet_address'), distinct=True)
+    ).values_list('campaign_id', 'count'):
+        counts[campaign_id] = counts.get(campaign_id, 0) + count
+    anonymous = contributions.filter(
+        Q(user__isnull=True) & (Q(wallet_address__isnull=True) | Q(wallet_address=''))
+    ).values_list('campaign_id', flat=True).distinct()
+    for campaign_id in anonymous:
+        counts[campaign_id] = counts.get(campaign_id, 0) + 1
+    return counts
+
+
+def reconcile(campaign_ids=None):
+    """
+    Rebuild the totals from the contributions table
+
+    Args:
+        campaign_ids: Campaigns to rebuild, or None for every campaign
+
+    Returns:
+        int: Number of campaigns whose stored totals were wrong
+    """
+    from .models import Campaign, Contribution
+
+    campaigns = Campaign.objects.all()
+    contributions = Contribution.objects.all()
+    if campaign_ids is not None:
+        campaigns = campaigns.filter(pk__in=list(campaign_ids))
+        contributions = contributions.filter(campaign_id__in=list(campaign_ids))
+
+    with transaction.atomic():
+        # Locked first, so a contribution inserted meanwhile adds itself after the rebuild
+        locked = list(campaigns.select_for_update().only('id', 'raised_total', 'contributor_count', 'last_contribution_at'))
+
+        # One grouped query per figure rather than one set of queries per campaign
+        totals = {
+            row['campaign_id']: row
+            for row in contributions.values('campaign_id').annotate(total=Sum('amount'), latest=Max('created_at'))
+        }
+        contributors = _contributor_counts(contributions)
+
+        fixed = 0
+        for campaign in locked:
+            row = totals.get(campaign.pk, {})
+            expected = {
+                'raised_total': row.get('total') or Decimal(0),
+                'contributor_count': contributors.get(campaign.pk, 0),
+                'last_contribution_at': row.get('latest'),
+            }
+            if any(getattr(campaign, name) != value for name, value in expected.items()):
+                Campaign.objects.filter(pk=campaign.pk).update(**expected)
+                fixed += 1
+        return fixed
@@ -0,0 +1,122 @@
+"""
+Memoized web3 contract objects.
+
+w3.eth.contract(address=..., abi=...) parses the ABI and builds new
+function and event classes on every call. Here each ABI is registered
+once under a short id, its contract factory is built once per chain, and
+per-address contract instances are kept in a bounded LRU keyed by
+(chain, address, abi id).
+
+Factories are built on first use rather than at import, so no provider
+is created before the web server forks its workers.
+"""
+import hashlib
+import json
+import threading
+
+from django.conf import settings
+from web3 import Web3
+
+from .cache_utils import LRUCache, MISSING
+from .web3_provider import get_web3
+
+# abi id -> ABI list
+_abis = {}
+# id(ABI list) -> abi id, so registered lists passed directly skip fingerprinting
+_abi_ids_by_object = {}
+# (chain, abi id) -> (w3, contract factory)
+_factories = {}
+_factories_lock = threading.Lock()
+
+_instances = LRUCache(maxsize=getattr(settings, 'CONTRACT_CACHE_SIZE', 1024))
+
+
+def register_abi(abi_id, abi):
+    """
+    Register an ABI under a short id so contracts can be looked up by name
+
+    Returns:
+        str: The abi id
+    """
+    _abis[abi_id] = abi
+    _abi_ids_by_object[id(abi)] = abi_id
+    return abi_id
+
+
+def _resolve_abi(abi):
+    """(abi id, ABI list) for a registered id or a raw ABI list"""
+    if isinstance(abi, str):
+        if abi not in _abis:
+            raise ValueError(f"ABI {abi} is not registered")
+        return abi, _abis[abi]
+
+    abi_id = _abi_ids_by_object.get(id(abi))
+    if abi_id is not None and _abis.get(abi_id) is abi:
+        return abi_id, abi
+
+    # Unregistered ABI (e.g. a literal built inside a function) - key it by content
+    abi_id = 'sha1:' + hashlib.sha1(json.dumps(abi, sort_keys=True).encode()).hexdigest()
+    if abi_id not in _abis:
+        register_abi(abi_id, abi)
+    return abi_id, _abis[abi_id]
+
+
+def get_contract_factory(abi, blockchain='BSC'):
+    """
+    Contract class for an ABI on a chain, built once per process
+
+    Args:
+        abi: Registered abi id or an ABI list
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+    """
+    abi_id, abi_list = _resolve_abi(abi)
+    w3 = get_web3(blockchain)
+    key = (blockchain, abi_id)
+
+    entry = _factories.get(key)
+    # Rebuild if the provider was reset since the factory was created
+    if entry is None or entry[0] is not w3:
+        with _factories_lock:
+            entry = _factories.get(key)
+            if entry is None or entry[0] is not w3:
+                entry = (w3, w3.eth.contract(abi=abi_list))
+                _factories[key] = entry
+    return entry[1]
+
+
+def get_contract(address, abi, blockchain='BSC'):
+    """
+    Cached contract instance - drop-in for w3.eth.contract(address=address, abi=abi)
+
+    Args:
+        address: Contract address (any case)
+        abi: Registered abi id or an ABI list
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+    """
+    abi_id, _ = _resolve_abi(abi)
+    key = (blockchain, address.lower(), abi_id)
+
+    factory = get_contract_factory(abi_id, blockchain)
+    contract = _instances.get(key)
+    if contract is not MISSING and contract.w3 is factory.w3:
+        return contract
+
+    contract = factory(address=Web3.to_checksum_address(address))
+    _instances.set(key, contract)
+    return contract
+
+
+def preload_contract_factories(blockchains=('BSC', 'Ethereum', 'Base')):
+    """Build the factory for every registered ABI up front (e.g. from a worker's post_fork hook)"""
+    for blockchain in blockchains:
+        for abi_id in list(_abis):
+            get_contract_factory(abi_id, blockchain)
+
+
+def contract_cache_stats():
+    """Factory count and instance LRU statistics, for monitoring"""
+    return {
+        'abis': len(_abis),
+        'factories': len(_factories),
+        'instances': _instances.stats(),
+    }
@@ -0,0 +1,61 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+import "./CloneableStaking.sol";
+
+// Deploys each campaign's staking contract as an EIP-1167 minimal proxy of one
+// shared CloneableStaking implementation. Clones are created with CREATE2, so
+// a campaign's address is known before its deployment is mined:
+//
+//   keccak256(0xff ++ factory ++ keccak256(abi.encode(creator, salt)) ++ keccak256(proxy init code))[12:]
+//
+// The creator is mixed into the salt so nobody else can take a predicted address.
+contract CampaignCloneFactory {
+    address public immutable implementation;
+
+    event CampaignCreated(address indexed campaign, address indexed creator, address indexed token, bytes32 salt);
+
+    constructor() {
+        implementation = address(new CloneableStaking());
+    }
+
+    function createCampaign(
+        bytes32 salt,
+        string calldata name,
+        address token,
+        address beneficiary,
+        uint256 targetAmount
+    ) external returns (address campaign) {
+        campaign = _clone(_creatorSalt(msg.sender, salt));
+        CloneableStaking(campaign).initialize(name, token, beneficiary, targetAmount, msg.sender);
+        emit CampaignCreated(campaign, msg.sender, token, salt);
+    }
+
+    function predictAddress(address creator, bytes32 salt) external view returns (address) {
+        bytes32 initCodeHash = keccak256(abi.encodePacked(
+            hex"3d602d80600a3d3981f3363d3d373d3d3d363d73",
+            implementation,
+            hex"5af43d82803e903d91602b57fd5bf3"
+        ));
+        return address(uint160(uint256(keccak256(abi.encodePacked(
+            bytes1(0xff), address(this), _creatorSalt(creator, salt), initCodeHash
+        )))));
+    }
+
+    function _creatorSalt(address creator, bytes32 salt) private pure returns (bytes32) {
+        return keccak256(abi.encode(creator, salt));
+    }
+
+    // EIP-1167 minimal proxy deployed with CREATE2
+    function _clone(bytes32 salt) private returns (address instance) {
+        address target = implementation;
+        assembly {
+            let ptr := mload(0x40)
+            mstore(ptr, 0x3d602d80600a3d3981f3363d3d373d3d3d363d73000000000000000000000000)
+            mstore(add(ptr, 0x14), shl(0x60, target))
+            mstore(add(ptr, 0x28), 0x5af43d82803e903d91602b57fd5bf30000000000000000000000000000000000)
+            instance := create2(0, ptr, 0x37, salt)
+        }
+        require(instance != address(0), "Campaign already exists");
+    }
+}
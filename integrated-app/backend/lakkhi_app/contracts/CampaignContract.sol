@@ -76,6 +76,16 @@ contract CampaignContract is Ownable, Pausable {
     }
     
     function deposit(uint256 amount) external whenNotPaused notEmergencyPaused withinTimeframe {
+        _deposit(msg.sender, amount);
+    }
+    
+    // Pulls the tokens from the caller but records contributor as the depositor
+    function depositFor(address contributor, uint256 amount) external whenNotPaused notEmergencyPaused withinTimeframe {
+        require(contributor != address(0), "Invalid contributor");
+        _deposit(contributor, amount);
+    }
+    
+    function _deposit(address contributor, uint256 amount) private {
         require(isActive, "Campaign is not active");
         require(amount > 0, "Amount must be greater than 0");
         require(amount >= minContribution, "Amount below minimum contribution");
@@ -84,7 +94,7 @@ contract CampaignContract is Ownable, Pausable {
         require(token.transferFrom(msg.sender, address(this), amount), "Transfer failed");
         totalDeposits += amount;
         
-        emit DepositReceived(msg.sender, amount);
+        emit DepositReceived(contributor, amount);
     }
     
     function withdraw(uint256 amount) external onlyOwner {
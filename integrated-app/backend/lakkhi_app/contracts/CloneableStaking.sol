@@ -0,0 +1,142 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+interface IERC20 {
+    function transfer(address to, uint256 amount) external returns (bool);
+    function transferFrom(address from, address to, uint256 amount) external returns (bool);
+    function balanceOf(address account) external view returns (uint256);
+}
+
+// Staking contract implementation behind CampaignCloneFactory's EIP-1167 clones.
+// Same interface as static/staking_abi.json, but configured with initialize()
+// instead of a constructor so each campaign only deploys a 45-byte proxy.
+contract CloneableStaking {
+    string public name;
+    IERC20 public token;
+    address public beneficiary;
+    uint256 public targetAmount;
+    uint256 public currentAmount;
+    bool public isCompleted;
+    address public owner;
+    mapping(address => uint256) public stakes;
+    uint256 public releasedAmount;
+
+    struct Milestone {
+        string title;
+        uint256 targetAmount;
+        uint256 releasedAmount;
+        bool completed;
+    }
+    mapping(uint256 => Milestone) public milestones;
+    uint256 public milestoneCount;
+
+    bool private initialized;
+
+    event OwnershipTransferred(address indexed previousOwner, address indexed newOwner);
+    event Staked(address indexed staker, uint256 amount);
+    event TokensReleased(address indexed beneficiary, uint256 amount);
+    event MilestoneCompleted(uint256 indexed milestoneId, uint256 amount);
+
+    modifier onlyOwner() {
+        require(msg.sender == owner, "Ownable: caller is not the owner");
+        _;
+    }
+
+    constructor() {
+        // Lock the implementation itself - only clones are initialized
+        initialized = true;
+    }
+
+    function initialize(
+        string calldata _name,
+        address _token,
+        address _beneficiary,
+        uint256 _targetAmount,
+        address _owner
+    ) external {
+        require(!initialized, "Already initialized");
+        initialized = true;
+
+        name = _name;
+        token = IERC20(_token);
+        beneficiary = _beneficiary;
+        targetAmount = _targetAmount;
+        owner = _owner;
+        emit OwnershipTransferred(address(0), _owner);
+    }
+
+    function stake(uint256 amount) external {
+        _stake(msg.sender, amount);
+    }
+
+    // Pulls the tokens from the caller but credits staker - lets ContributionRouter
+    // deposit on a donor's behalf without becoming the staker itself
+    function stakeFor(address staker, uint256 amount) external {
+        require(staker != address(0), "Invalid staker");
+        _stake(staker, amount);
+    }
+
+    function _stake(address staker, uint256 amount) private {
+        require(!isCompleted, "Campaign completed");
+        require(amount > 0, "Amount must be greater than 0");
+        require(token.transferFrom(msg.sender, address(this), amount), "Transfer failed");
+
+        stakes[staker] += amount;
+        currentAmount += amount;
+        if (currentAmount >= targetAmount) {
+            isCompleted = true;
+        }
+        emit Staked(staker, amount);
+    }
+
+    // Releases everything staked and not yet released, once the target is reached.
+    // Only staked tokens count - tokens sent straight to the contract are never swept.
+    function release() external {
+        require(msg.sender == beneficiary, "Only beneficiary can release");
+        require(isCompleted, "Target not reached");
+        uint256 amount = currentAmount - releasedAmount;
+        require(amount > 0, "Nothing to release");
+
+        releasedAmount += amount;
+        require(token.transfer(beneficiary, amount), "Transfer failed");
+        emit TokensReleased(beneficiary, amount);
+    }
+
+    function addMilestone(string calldata title, uint256 milestoneTarget) external onlyOwner {
+        milestones[milestoneCount] = Milestone(title, milestoneTarget, 0, false);
+        milestoneCount++;
+    }
+
+    // Same guards as CampaignContract.releaseMilestoneFunds: owner only, per milestone,
+    // and never more than the staked tokens still held
+    function releaseMilestoneFunds(uint256 milestoneId, uint256 amount) external onlyOwner {
+        require(milestoneId < milestoneCount, "Invalid milestone");
+        require(amount > 0, "Amount must be greater than 0");
+        require(amount <= currentAmount - releasedAmount, "Insufficient funds");
+
+        Milestone storage milestone = milestones[milestoneId];
+        require(!milestone.completed, "Milestone already completed");
+
+        milestone.releasedAmount += amount;
+        releasedAmount += amount;
+
+        require(token.transfer(beneficiary, amount), "Transfer failed");
+        emit TokensReleased(beneficiary, amount);
+
+        if (milestone.releasedAmount >= milestone.targetAmount) {
+            milestone.completed = true;
+            emit MilestoneCompleted(milestoneId, amount);
+        }
+    }
+
+    function transferOwnership(address newOwner) external onlyOwner {
+        require(newOwner != address(0), "Ownable: new owner is the zero address");
+        emit OwnershipTransferred(owner, newOwner);
+        owner = newOwner;
+    }
+
+    function renounceOwnership() external onlyOwner {
+        emit OwnershipTransferred(owner, address(0));
+        owner = address(0);
+    }
+}
@@ -0,0 +1,155 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.0;
+
+interface IERC20Minimal {
+    function balanceOf(address account) external view returns (uint256);
+    function allowance(address owner, address spender) external view returns (uint256);
+}
+
+interface IERC20Permit {
+    function permit(
+        address owner,
+        address spender,
+        uint256 value,
+        uint256 deadline,
+        uint8 v,
+        bytes32 r,
+        bytes32 s
+    ) external;
+}
+
+interface IUniswapV2Router {
+    function swapExactETHForTokens(
+        uint256 amountOutMin,
+        address[] calldata path,
+        address to,
+        uint256 deadline
+    ) external payable returns (uint256[] memory amounts);
+}
+
+// Swaps native coin to a campaign's token and deposits it in a single call,
+// replacing the separate swap -> approve -> stake transactions sent from
+// custodial wallets. Works with any target that has a deposit-for function
+// taking (address contributor, uint256 amount) and pulling the amount with
+// transferFrom (CloneableStaking.stakeFor, CampaignContract.depositFor), so
+// the target credits the caller of this router, not the router itself.
+// Targets with only a single-amount deposit would credit the router - send
+// those an approve and a direct deposit instead.
+//
+// depositWithPermit() deposits tokens the caller already holds using an
+// EIP-2612 permit signed off-chain, so no separate approve transaction is needed.
+//
+// The router never holds tokens between calls.
+contract ContributionRouter {
+    IUniswapV2Router public immutable dexRouter;
+
+    event Contributed(
+        address indexed contributor,
+        address indexed target,
+        address indexed token,
+        uint256 nativeAmount,
+        uint256 tokenAmount
+    );
+
+    constructor(address _dexRouter) {
+        dexRouter = IUniswapV2Router(_dexRouter);
+    }
+
+    function contribute(
+        address target,
+        bytes4 depositForSelector,
+        address[] calldata path,
+        uint256 amountOutMin,
+        uint256 deadline
+    ) external payable returns (uint256 tokenAmount) {
+        require(msg.value > 0, "No value sent");
+        require(path.length >= 2, "Invalid path");
+        address token = path[path.length - 1];
+
+        // Measure the balance change so fee-on-transfer tokens deposit what actually arrived
+        uint256 balanceBefore = IERC20Minimal(token).balanceOf(address(this));
+        dexRouter.swapExactETHForTokens{value: msg.value}(amountOutMin, path, address(this), deadline);
+        tokenAmount = IERC20Minimal(token).balanceOf(address(this)) - balanceBefore;
+
+        _deposit(token, target, depositForSelector, tokenAmount, balanceBefore);
+        emit Contributed(msg.sender, target, token, msg.value, tokenAmount);
+    }
+
+    function depositWithPermit(
+        address token,
+        address target,
+        bytes4 depositForSelector,
+        uint256 amount,
+        uint256 deadline,
+        uint8 v,
+        bytes32 r,
+        bytes32 s
+    ) external returns (uint256 tokenAmount) {
+        require(amount > 0, "Amount must be greater than 0");
+        _permit(token, amount, deadline, v, r, s);
+        tokenAmount = _pullAndDeposit(token, target, depositForSelector, amount);
+        emit Contributed(msg.sender, target, token, 0, tokenAmount);
+    }
+
+    function _permit(address token, uint256 amount, uint256 deadline, uint8 v, bytes32 r, bytes32 s) private {
+        // If the permit was front-run the allowance is already set - carry on with it,
+        // but a bad or expired permit without an allowance fails here, not in the transfer
+        try IERC20Permit(token).permit(msg.sender, address(this), amount, deadline, v, r, s) {} catch {
+            require(IERC20Minimal(token).allowance(msg.sender, address(this)) >= amount, "Permit failed");
+        }
+    }
+
+    function _pullAndDeposit(
+        address token,
+        address target,
+        bytes4 depositForSelector,
+        uint256 amount
+    ) private returns (uint256 tokenAmount) {
+        uint256 balanceBefore = IERC20Minimal(token).balanceOf(address(this));
+        _transferFrom(token, msg.sender, amount);
+        tokenAmount = IERC20Minimal(token).balanceOf(address(this)) - balanceBefore;
+        _deposit(token, target, depositForSelector, tokenAmount, balanceBefore);
+    }
+
+    // Approve the target and call its deposit-for function on behalf of msg.sender;
+    // the target must pull everything
+    function _deposit(
+        address token,
+        address target,
+        bytes4 depositForSelector,
+        uint256 amount,
+        uint256 balanceBefore
+    ) private {
+        _approve(token, target, amount);
+        (bool success, bytes memory result) = target.call(
+            abi.encodeWithSelector(depositForSelector, msg.sender, amount)
+        );
+        if (!success) {
+            // Bubble up the target's revert reason
+            assembly {
+                revert(add(result, 32), mload(result))
+            }
+        }
+        require(IERC20Minimal(token).balanceOf(address(this)) == balanceBefore, "Deposit incomplete");
+    }
+
+    // transferFrom(from, this) that also accepts tokens which don't return a bool
+    function _transferFrom(address token, address from, uint256 amount) private {
+        (bool success, bytes memory result) = token.call(
+            abi.encodeWithSelector(0x23b872dd, from, address(this), amount)
+        );
+        require(success && (result.length == 0 || abi.decode(result, (bool))), "Transfer failed");
+    }
+
+    // approve() that also accepts tokens which don't return a bool (e.g. USDT)
+    function _approve(address token, address spender, uint256 amount) private {
+        (bool success, bytes memory result) = token.call(
+            abi.encodeWithSelector(0x095ea7b3, spender, amount)
+        );
+        require(success && (result.length == 0 || abi.decode(result, (bool))), "Approve failed");
+    }
+
+    receive() external payable {
+        revert("Use contribute()");
+    }
+}
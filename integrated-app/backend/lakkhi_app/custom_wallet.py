@@ -3,9 +3,21 @@ import json
 import secrets
 import hashlib
 from eth_account import Account
+from hexbytes import HexBytes
 from web3 import Web3
 from django.conf import settings
 from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from .web3_provider import get_web3
+from .gas_oracle import get_gas_price
+from .nonce_manager import allocate_nonce, send_transaction
+from .contract_cache import register_abi, get_contract
+from .route_finder import find_best_route
+from .token_metadata_cache import get_cached_token_info
+from .cache_utils import LRUCache, MISSING
+from .token_allowance import allowance_covers, sign_permit
+from .tx_outbox import enqueue_call, queued_result
 
 # Load token configuration
 try:
@@ -47,13 +59,6 @@ NATIVE_TOKEN_SYMBOL = {
     'Base': "ETH"
 }
 
-# RPC URLs for different chains
-RPC_URLS = {
-    'BSC': settings.BSC_RPC_URL,
-    'Ethereum': getattr(settings, 'ETH_RPC_URL', 'https://eth.llamarpc.com'),
-    'Base': getattr(settings, 'BASE_RPC_URL', 'https://mainnet.base.org')
-}
-
 # Load PancakeSwap Router ABI
 try:
     with open(os.path.join(settings.STATIC_ROOT, "pancake_swap_abi.json")) as f:
@@ -88,19 +93,99 @@ UNISWAP_ROUTER_ABI = [
     }
 ]
 
-# Create web3 instances for different chains (lazily initialized)
-w3_instances = {}
+# Minimal ERC20 ABI for approving a spender
+ERC20_APPROVE_ABI = [{
+    "constant": False,
+    "inputs": [
+        {"name": "_spender", "type": "address"},
+        {"name": "_value", "type": "uint256"}
+    ],
+    "name": "approve",
+    "outputs": [{"name": "", "type": "bool"}],
+    "payable": False,
+    "stateMutability": "nonpayable",
+    "type": "function"
+}]
 
-def get_web3(blockchain='BSC'):
-    """Get Web3 instance for the specified blockchain"""
-    if blockchain not in w3_instances:
-        rpc_url = RPC_URLS.get(blockchain, RPC_URLS['BSC'])
-        w3_instances[blockchain] = Web3(Web3.HTTPProvider(rpc_url))
-    return w3_instances[blockchain]
+# Staking contract ABI used for contributions
+try:
+    with open(os.path.join(settings.STATIC_ROOT, "staking_abi.json")) as f:
+        WALLET_STAKING_ABI = json.load(f)
+except Exception as e:
+    print(f"Error loading staking ABI: {e}")
+    WALLET_STAKING_ABI = []
+
+# Swap-and-deposit router (contracts/ContributionRouter.sol)
+try:
+    with open(os.path.join(settings.STATIC_ROOT, "contribution_router_abi.json")) as f:
+        CONTRIBUTION_ROUTER_ABI = json.load(f)
+except Exception as e:
+    print(f"Error loading contribution router ABI: {e}")
+    CONTRIBUTION_ROUTER_ABI = []
+
+# Parse every ABI once - contracts are then looked up by abi id
+register_abi('lakkhi_token', LAKKHI_TOKEN_ABI)
+register_abi('erc20_approve', ERC20_APPROVE_ABI)
+register_abi('pancakeswap_router', PANCAKESWAP_ROUTER_ABI)
+register_abi('uniswap_router', UNISWAP_ROUTER_ABI)
+register_abi('wallet_staking', WALLET_STAKING_ABI)
+register_abi('contribution_router', CONTRIBUTION_ROUTER_ABI)
 
 # Default to BSC for backward compatibility
 w3 = get_web3('BSC')
 
+def _encryption_key():
+    """Passphrase for custodial wallet keystores - never silently empty"""
+    key = getattr(settings, 'WALLET_ENCRYPTION_KEY', None) or settings.SECRET_KEY
+    if not key:
+        raise ImproperlyConfigured("WALLET_ENCRYPTION_KEY (or SECRET_KEY) must be set to store custodial wallets")
+    return key
+
+
+# Decrypted custodial keys by address, so multi-step flows decrypt each keystore once per process
+_unlocked_keys = LRUCache(maxsize=getattr(settings, 'WALLET_KEY_CACHE_SIZE', 256))
+
+def _receipt_status(receipt):
+    """SUCCESS/FAILED from a receipt, or PENDING if we didn't wait for one"""
+    if receipt is None:
+        return "PENDING"
+    return "SUCCESS" if receipt["status"] == 1 else "FAILED"
+
+
+# topic0 of the ERC-20 Transfer(address,address,uint256) event
+TRANSFER_TOPIC = bytes(Web3.keccak(text="Transfer(address,address,uint256)"))
+
+
+def transferred_amount(receipt, token_address, recipient):
+    """
+    Raw amount of a token the receipt's Transfer logs moved to recipient
+
+    This is what a swap actually delivered (fee-on-transfer tokens included),
+    as opposed to the quote or the slippage minimum.
+    """
+    recipient = bytes(HexBytes(recipient)).rjust(32, b'\0')
+    total = 0
+    for log in receipt.get('logs', []):
+        topics = [bytes(HexBytes(topic)) for topic in log['topics']]
+        if len(topics) != 3 or topics[0] != TRANSFER_TOPIC or topics[2] != recipient:
+            continue
+        if log['address'].lower() != token_address.lower():
+            continue
+        total += int.from_bytes(bytes(HexBytes(log['data'])), 'big')
+    return total
+
+
+def token_unit(token_address, blockchain='BSC'):
+    """Raw units per whole token (10 ** decimals), falling back to the default decimals"""
+    if token_address == LAKKHI_TOKEN_ADDRESS:
+        return LAKKHI_TOKEN_DECIMALS
+    token_info = get_cached_token_info(token_address, blockchain)
+    if token_info.get('success') and token_info.get('decimals') is not None:
+        return 10 ** token_info['decimals']
+    print(f"Error getting token decimals: {token_info.get('message')}")
+    return LAKKHI_TOKEN_DECIMALS
+
+
 class WalletManager:
     """
     Manages wallet creation and operations for the Lakkhi platform.
@@ -125,12 +210,14 @@ class WalletManager:
     def get_wallet_by_identifier(identifier):
         """
         Retrieve wallet by its email identifier
-        In a real implementation, this would query a database
-        For now, using cache as a temporary solution
+        Wallets are stored in the CustodialWallet table, so any process can sign for them
         """
-        wallet_key = f"wallet_{identifier}"
-        wallet = cache.get(wallet_key)
-        return wallet
+        from .models import CustodialWallet
+        
+        custodial_wallet = CustodialWallet.objects.filter(identifier=identifier).first()
+        if custodial_wallet is None:
+            return WalletManager._import_cached_wallet(identifier)
+        return WalletManager._unlock(custodial_wallet)
     
     @staticmethod
     def get_wallet_by_address(address):
@@ -138,43 +225,45 @@ class WalletManager:
         Retrieve wallet by its address
         This is a new method to support direct address lookups
         """
+        from .models import CustodialWallet
+        
         # For security, normalize the address to checksum format
         if not w3.is_address(address):
             return None
             
         checksum_address = w3.to_checksum_address(address)
         
-        # This is inefficient in production - would need a database index
-        # Iterate through all wallets in cache that match our pattern
-        for key in cache._cache.keys():
-            if key.startswith('wallet_'):
-                wallet = cache.get(key)
-                if wallet and wallet.get('address') == checksum_address:
-                    return wallet
-        return None
+        custodial_wallet = CustodialWallet.objects.filter(address=checksum_address).first()
+        if custodial_wallet is None:
+            return None
+        return WalletManager._unlock(custodial_wallet)
     
     @staticmethod
     def create_wallet(identifier):
         """
         Create a new wallet for the given email identifier
-        In production, encrypt private keys and store in a secure database
+        The private key is stored encrypted (see CustodialWallet)
         """
         # Generate entropy for the account
         entropy = secrets.token_bytes(32)
         
         # Create a new account
         account = Account.create(extra_entropy=entropy)
-        address = account.address
-        private_key = account.key.hex()
-        
-        # Create a wallet ID based on identifier (non-reversible)
-        wallet_id = hashlib.sha256(identifier.encode()).hexdigest()[:16]
+        wallet = WalletManager._store(identifier, account.address, account.key.hex())
         
-        # Construct wallet object (similar structure to Venly's wallet response)
-        wallet = {
-            "id": wallet_id,
+        # Return wallet (without private key for security)
+        public_wallet = wallet.copy()
+        public_wallet.pop("private_key", None)
+        return public_wallet
+    
+    @staticmethod
+    def _wallet_dict(identifier, address, private_key):
+        """Wallet object in the shape callers expect (similar to Venly's wallet response)"""
+        return {
+            # Wallet ID based on identifier (non-reversible)
+            "id": hashlib.sha256(identifier.encode()).hexdigest()[:16],
             "address": address,
-            "private_key": private_key,  # In production, encrypt this before storage
+            "private_key": private_key,
             "identifier": identifier,
             "secretType": "BSC",
             "walletType": "WHITE_LABEL",
@@ -185,15 +274,50 @@ class WalletManager:
             "hasCustomPin": False,
             "balance": {"balance": "0", "gasBalance": "0"}
         }
+    
+    @staticmethod
+    def _store(identifier, address, private_key):
+        """Persist a wallet with its key encrypted; returns the stored wallet if another process won the race"""
+        from .models import CustodialWallet
         
-        # Store in cache (in production, store in a secure database)
-        wallet_key = f"wallet_{identifier}"
-        cache.set(wallet_key, wallet, timeout=None)  # No timeout
+        keystore = Account.encrypt(
+            private_key,
+            _encryption_key(),
+            kdf='pbkdf2',
+            iterations=getattr(settings, 'WALLET_KEYSTORE_ITERATIONS', 100000)
+        )
+        try:
+            with transaction.atomic():
+                CustodialWallet.objects.create(identifier=identifier, address=address, keystore=keystore)
+        except IntegrityError:
+            existing = CustodialWallet.objects.filter(identifier=identifier).first()
+            if existing is None:
+                raise
+            return WalletManager._unlock(existing)
         
-        # Return wallet (without private key for security)
-        public_wallet = wallet.copy()
-        public_wallet.pop("private_key", None)
-        return public_wallet
+        _unlocked_keys.set(address, private_key)
+        return WalletManager._wallet_dict(identifier, address, private_key)
+    
+    @staticmethod
+    def _unlock(custodial_wallet):
+        """Wallet dictionary with the decrypted private key"""
+        private_key = _unlocked_keys.get(custodial_wallet.address)
+        if private_key is MISSING:
+            private_key = Account.decrypt(
+                custodial_wallet.keystore, _encryption_key()
+            ).hex()
+            _unlocked_keys.set(custodial_wallet.address, private_key)
+        return WalletManager._wallet_dict(custodial_wallet.identifier, custodial_wallet.address, private_key)
+    
+    @staticmethod
+    def _import_cached_wallet(identifier):
+        """Move a wallet created before wallets were persisted out of the cache and into the table"""
+        wallet = cache.get(f"wallet_{identifier}")
+        if not wallet or not wallet.get('private_key'):
+            return None
+        wallet = WalletManager._store(identifier, wallet['address'], wallet['private_key'])
+        cache.delete(f"wallet_{identifier}")
+        return wallet
     
     @staticmethod
     def verify_wallet_ownership(address, signature, message="Lakkhi Auth"):
@@ -215,11 +339,13 @@ class WalletManager:
             return False
     
     @staticmethod
-    def approve_token_spending(wallet_identifier, spender_address, amount=None, token_address=None, blockchain='BSC'):
+    def approve_token_spending(wallet_identifier, spender_address, amount=None, token_address=None, blockchain='BSC', wait_for_receipt=True, enqueue=False):
         """
         Approve a contract to spend tokens from the wallet
         Replaces the Venly approve_smart_contract function
         Now supports multiple blockchains
+        Pass wait_for_receipt=False to return a PENDING status as soon as the tx is broadcast
+        Pass enqueue=True to hand the tx to the outbox workers and return a QUEUED status
         """
         # Handle both email identifiers and wallet addresses
         wallet = None
@@ -242,59 +368,58 @@ class WalletManager:
             # Use provided token address or default to LAKKHI token
             if not token_address:
                 token_address = LAKKHI_TOKEN_ADDRESS
-                token_abi = LAKKHI_TOKEN_ABI
+                token_abi = 'lakkhi_token'
             else:
                 # For non-LAKKHI tokens, we need to use a standard ERC20 ABI
-                token_abi = [
-                    {
-                        "constant": False,
-                        "inputs": [
-                            {"name": "_spender", "type": "address"},
-                            {"name": "_value", "type": "uint256"}
-                        ],
-                        "name": "approve",
-                        "outputs": [{"name": "", "type": "bool"}],
-                        "payable": False,
-                        "stateMutability": "nonpayable",
-                        "type": "function"
-                    }
-                ]
+                token_abi = 'erc20_approve'
             
-            # Create token contract instance
-            token_contract = web3.eth.contract(
-                address=token_address, 
-                abi=token_abi
-            )
+            # Cached token contract instance
+            token_contract = get_contract(token_address, token_abi, blockchain)
             
             # Set approval amount (max uint256 if not specified)
             if amount is None:
                 amount = 2**256 - 1
             
+            # Skip the transaction if the existing allowance already covers the amount
+            if allowance_covers(token_address, wallet_address, spender_address, amount, blockchain):
+                return {
+                    "success": True,
+                    "result": {
+                        "transactionHash": None,
+                        "status": "SUCCESS",
+                        "skipped": True
+                    }
+                }
+            
+            if enqueue:
+                queued = enqueue_call(
+                    token_contract, 'approve', [spender_address, amount], wallet_address, blockchain,
+                    gas=300000, kind='approve'
+                )
+                return {"success": True, "result": queued_result(queued)}
+            
             # Build the transaction
             approve_txn = token_contract.functions.approve(
                 spender_address, 
                 amount
             ).build_transaction({
                 'from': wallet_address,
-                'nonce': web3.eth.get_transaction_count(wallet_address),
+                'nonce': allocate_nonce(wallet_address, blockchain),
                 'gas': 300000,
-                'gasPrice': web3.eth.gas_price
+                'gasPrice': get_gas_price(blockchain)
             })
             
-            # Sign the transaction
-            signed_txn = web3.eth.account.sign_transaction(approve_txn, private_key)
-            
-            # Send the transaction
-            tx_hash = web3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            # Sign and send the transaction
+            tx_hash = send_transaction(approve_txn, private_key, wallet_address, blockchain)
             
-            # Wait for transaction receipt
-            receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
+            # Wait for transaction receipt unless the caller tracks it in the background
+            receipt = web3.eth.wait_for_transaction_receipt(tx_hash) if wait_for_receipt else None
             
             return {
                 "success": True,
                 "result": {
                     "transactionHash": tx_hash.hex(),
-                    "status": "SUCCESS" if receipt["status"] == 1 else "FAILED"
+                    "status": _receipt_status(receipt)
                 }
             }
         except Exception as e:
@@ -321,47 +446,30 @@ class WalletManager:
             wrapped_native = WRAPPED_NATIVE_TOKEN.get(blockchain, WRAPPED_NATIVE_TOKEN['BSC'])
             
             # Determine which router ABI to use
-            router_abi = UNISWAP_ROUTER_ABI
+            router_abi = 'uniswap_router'
             if blockchain == 'BSC':
-                router_abi = PANCAKESWAP_ROUTER_ABI
+                router_abi = 'pancakeswap_router'
             
             # Default to LAKKHI token if not specified
             if not token_address:
                 token_address = LAKKHI_TOKEN_ADDRESS
             
-            # Create router contract instance
-            router_contract = web3.eth.contract(
-                address=router_address,
-                abi=router_abi
-            )
-            
-            # Get the amount of tokens you will receive for the native token
-            amounts_out = router_contract.functions.getAmountsOut(
-                native_amount_wei,
-                [wrapped_native, token_address]
-            ).call()
-            
-            token_amount = amounts_out[1]
-            
-            # Try to get token decimals
-            token_decimals = LAKKHI_TOKEN_DECIMALS  # Default
+            # Best 1-3 hop route, priced from the reserve mirror or one batched router
+            # quote; decimals come from the token metadata cache
             try:
-                token_contract = web3.eth.contract(
-                    address=token_address,
-                    abi=[{
-                        "constant": True,
-                        "inputs": [],
-                        "name": "decimals",
-                        "outputs": [{"name": "", "type": "uint8"}],
-                        "payable": False,
-                        "stateMutability": "view",
-                        "type": "function"
-                    }]
-                )
-                decimals = token_contract.functions.decimals().call()
-                token_decimals = 10 ** decimals
+                route = find_best_route(token_address, native_amount_wei, router_address, router_abi, blockchain)
             except Exception as e:
-                print(f"Error getting token decimals: {e}")
+                print(f"Error getting swap quote on {blockchain}: {e}")
+                return {"success": False, "errors": ["Failed to get swap quote from router"]}
+            token_amount = route['amount_out']
+            
+            # Fall back to the default decimals if the token didn't answer
+            token_decimals = LAKKHI_TOKEN_DECIMALS  # Default
+            token_info = get_cached_token_info(token_address, blockchain)
+            if token_info.get('success') and token_info.get('decimals') is not None:
+                token_decimals = 10 ** token_info['decimals']
+            else:
+                print(f"Error getting token decimals for {token_address}")
             
             token_amount_decimal = token_amount / token_decimals
             
@@ -383,7 +491,8 @@ class WalletManager:
                     },
                     "inputAmount": native_amount,
                     "outputAmount": token_amount_decimal,
-                    "exchangeRate": token_amount_decimal / float(native_amount) if float(native_amount) > 0 else 0
+                    "exchangeRate": token_amount_decimal / float(native_amount) if float(native_amount) > 0 else 0,
+                    "path": route['path']
                 }
             }
         except Exception as e:
@@ -391,11 +500,13 @@ class WalletManager:
             return {"success": False, "errors": [str(e)]}
     
     @staticmethod
-    def swap_bnb_to_token(wallet_identifier, bnb_amount, token_address=None, blockchain='BSC'):
+    def swap_bnb_to_token(wallet_identifier, bnb_amount, token_address=None, blockchain='BSC', wait_for_receipt=True, enqueue=False):
         """
         Swap native token to project token using the appropriate DEX
         Now supports multiple blockchains (BSC, Ethereum, Base)
         The function name is kept as swap_bnb_to_token for backward compatibility
+        Pass wait_for_receipt=False to return a PENDING status as soon as the tx is broadcast
+        Pass enqueue=True to hand the tx to the outbox workers and return a QUEUED status
         """
         # Handle both email identifiers and wallet addresses
         wallet = None
@@ -425,85 +536,67 @@ class WalletManager:
             # Get router address for the blockchain
             router_address = ROUTER_ADDRESSES.get(blockchain, ROUTER_ADDRESSES['BSC'])
             
-            # Get wrapped native token address
-            wrapped_native = WRAPPED_NATIVE_TOKEN.get(blockchain, WRAPPED_NATIVE_TOKEN['BSC'])
-            
             # Determine which router ABI to use
-            router_abi = UNISWAP_ROUTER_ABI
+            router_abi = 'uniswap_router'
             if blockchain == 'BSC':
-                router_abi = PANCAKESWAP_ROUTER_ABI
+                router_abi = 'pancakeswap_router'
             
-            # Create DEX router contract instance
-            router_contract = web3.eth.contract(
-                address=router_address,
-                abi=router_abi
-            )
+            # Cached DEX router contract instance
+            router_contract = get_contract(router_address, router_abi, blockchain)
             
-            # Get the expected output amount
-            amounts_out = router_contract.functions.getAmountsOut(
-                native_amount_wei,
-                [wrapped_native, token_address]
-            ).call()
+            # Best route and expected output - memoized per block, so this is normally
+            # the same route get_swap_rates() just quoted
+            route = find_best_route(token_address, native_amount_wei, router_address, router_abi, blockchain)
+            expected_tokens = route['amount_out']
             
             # Apply 1% slippage tolerance
-            min_tokens = int(amounts_out[1] * 0.99)
+            min_tokens = int(expected_tokens * 0.99)
             
             # Set deadline to 20 minutes from now
             deadline = web3.eth.get_block('latest')['timestamp'] + 1200
             
-            # Build the swap transaction
-            swap_txn = router_contract.functions.swapExactETHForTokens(
-                min_tokens,
-                [wrapped_native, token_address],
-                wallet_address,
-                deadline
-            ).build_transaction({
-                'from': wallet_address,
-                'value': native_amount_wei,
-                'gas': 300000,
-                'gasPrice': web3.eth.gas_price,
-                'nonce': web3.eth.get_transaction_count(wallet_address),
-            })
-            
-            # Sign and send the transaction
-            signed_txn = web3.eth.account.sign_transaction(swap_txn, private_key)
-            tx_hash = web3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            
-            # Wait for the transaction receipt
-            receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
-            
-            # Get the token decimals - for non-LAKKHI tokens we need to query the contract
-            if token_address != LAKKHI_TOKEN_ADDRESS:
-                # Basic ERC20 ABI for decimals function
-                erc20_abi = [
-                    {
-                        "constant": True,
-                        "inputs": [],
-                        "name": "decimals",
-                        "outputs": [{"name": "", "type": "uint8"}],
-                        "payable": False,
-                        "stateMutability": "view",
-                        "type": "function"
-                    }
-                ]
-                token_contract = web3.eth.contract(address=token_address, abi=erc20_abi)
-                try:
-                    token_decimals = 10 ** token_contract.functions.decimals().call()
-                except Exception as e:
-                    print(f"Error getting token decimals: {e}")
-                    token_decimals = LAKKHI_TOKEN_DECIMALS  # Fallback to 18 decimals
+            if enqueue:
+                queued = enqueue_call(
+                    router_contract, 'swapExactETHForTokens', [min_tokens, route['path'], wallet_address, deadline],
+                    wallet_address, blockchain, value=native_amount_wei, gas=200000 + 100000 * route['hops'], kind='swap'
+                )
+                tx_result = queued_result(queued)
             else:
-                token_decimals = LAKKHI_TOKEN_DECIMALS
+                # Build the swap transaction
+                swap_txn = router_contract.functions.swapExactETHForTokens(
+                    min_tokens,
+                    route['path'],
+                    wallet_address,
+                    deadline
+                ).build_transaction({
+                    'from': wallet_address,
+                    'value': native_amount_wei,
+                    'gas': 200000 + 100000 * route['hops'],
+                    'gasPrice': get_gas_price(blockchain),
+                    'nonce': allocate_nonce(wallet_address, blockchain),
+                })
+                
+                # Sign and send the transaction
+                tx_hash = send_transaction(swap_txn, private_key, wallet_address, blockchain)
+                
+                # Wait for the transaction receipt unless the caller tracks it in the background
+                receipt = web3.eth.wait_for_transaction_receipt(tx_hash) if wait_for_receipt else None
+                tx_result = {"transactionHash": tx_hash.hex(), "status": _receipt_status(receipt)}
+                if receipt is not None:
+                    # Raw amount the swap actually delivered - stake this, not the minimum
+                    tx_result["receivedAmount"] = transferred_amount(receipt, token_address, wallet_address)
             
             # Return information about the swap including native token name
             return {
                 "success": True,
                 "result": {
-                    "transactionHash": tx_hash.hex(),
-                    "status": "SUCCESS" if receipt["status"] == 1 else "FAILED",
+                    **tx_result,
                     "fromAmount": bnb_amount,
                     "fromToken": NATIVE_TOKEN_SYMBOL.get(blockchain, "BNB"),
-                    "toAmount": amounts_out[1] / token_decimals,
+                    "toAmount": expected_tokens / token_unit(token_address, blockchain),
+                    # Raw minimum the swap reverts below; the received amount is only known once it's mined
+                    "minAmountOut": min_tokens,
+                    "path": route['path'],
                     "blockchain": blockchain
                 }
             }
@@ -512,18 +605,16 @@ class WalletManager:
             return {"success": False, "errors": [str(e)]}
 
     @staticmethod
-    def stake_tokens(wallet_identifier, contract_address, token_address, amount, blockchain='BSC'):
+    def stake_tokens(wallet_identifier, contract_address, token_address, amount, blockchain='BSC', wait_for_receipt=True, enqueue=False):
         """
         Stake tokens on a project's contract
         Now supports multiple blockchains
+        Pass wait_for_receipt=False to return a PENDING status as soon as the tx is broadcast
+        Pass enqueue=True to hand the tx to the outbox workers and return a QUEUED status
         """
-        # Load the staking contract ABI
-        try:
-            with open(os.path.join(settings.STATIC_ROOT, "staking_abi.json")) as f:
-                staking_abi = json.load(f)
-        except Exception as e:
-            print(f"Error loading staking ABI: {e}")
-            return {"success": False, "errors": [f"Error loading staking ABI: {e}"]}
+        # The staking contract ABI is loaded once at import
+        if not WALLET_STAKING_ABI:
+            return {"success": False, "errors": ["Error loading staking ABI: static/staking_abi.json not found"]}
         
         # Get web3 instance for the specified blockchain
         web3 = get_web3(blockchain)
@@ -543,37 +634,36 @@ class WalletManager:
             wallet_address = wallet["address"]
             private_key = wallet["private_key"]
             
-            # Create staking contract instance
-            staking_contract = web3.eth.contract(
-                address=contract_address, 
-                abi=staking_abi
-            )
+            # Cached staking contract instance
+            staking_contract = get_contract(contract_address, 'wallet_staking', blockchain)
+            
+            if enqueue:
+                queued = enqueue_call(
+                    staking_contract, 'stake', [amount], wallet_address, blockchain, gas=500000, kind='stake'
+                )
+                return {"success": True, "result": {**queued_result(queued), "amount": amount, "blockchain": blockchain}}
             
-            # Build the stake transaction
-            # The function name needs to match the actual staking function in the contract
-            stake_txn = staking_contract.functions.contribute(
+            # Build the stake transaction - stake(uint256) in static/staking_abi.json
+            stake_txn = staking_contract.functions.stake(
                 amount
             ).build_transaction({
                 'from': wallet_address,
-                'nonce': web3.eth.get_transaction_count(wallet_address),
+                'nonce': allocate_nonce(wallet_address, blockchain),
                 'gas': 500000,
-                'gasPrice': web3.eth.gas_price
+                'gasPrice': get_gas_price(blockchain)
             })
             
-            # Sign the transaction
-            signed_txn = web3.eth.account.sign_transaction(stake_txn, private_key)
-            
-            # Send the transaction
-            tx_hash = web3.eth.send_raw_transaction(signed_txn.rawTransaction)
+            # Sign and send the transaction
+            tx_hash = send_transaction(stake_txn, private_key, wallet_address, blockchain)
             
-            # Wait for transaction receipt
-            receipt = web3.eth.wait_for_transaction_receipt(tx_hash)
+            # Wait for transaction receipt unless the caller tracks it in the background
+            receipt = web3.eth.wait_for_transaction_receipt(tx_hash) if wait_for_receipt else None
             
             return {
                 "success": True,
                 "result": {
                     "transactionHash": tx_hash.hex(),
-                    "status": "SUCCESS" if receipt["status"] == 1 else "FAILED",
+                    "status": _receipt_status(receipt),
                     "amount": amount,
                     "blockchain": blockchain
                 }
@@ -581,6 +671,207 @@ class WalletManager:
         except Exception as e:
             print(f"Error staking tokens on {blockchain}: {e}")
             return {"success": False, "errors": [str(e)]}
+    
+    @staticmethod
+    def stake_with_permit(wallet_identifier, contract_address, token_address, amount, blockchain='BSC',
+                          deposit_function='stake', wait_for_receipt=True):
+        """
+        Stake tokens the wallet already holds in one transaction, using an EIP-2612
+        permit for the chain's ContributionRouter instead of an approve transaction
+        Returns {"success": False, "permitUnsupported": True} if there is no router, the contract
+        can't take deposits on the wallet's behalf or the token has no permit - approve and
+        stake directly instead
+        Pass wait_for_receipt=False to return a PENDING status as soon as the tx is broadcast
+        """
+        # Handle both email identifiers and wallet addresses
+        wallet = None
+        if wallet_identifier.startswith('0x'):
+            wallet = WalletManager.get_wallet_by_address(wallet_identifier)
+        else:
+            wallet = WalletManager.get_wallet_by_identifier(wallet_identifier)
+            
+        if not wallet:
+            return {"success": False, "errors": ["Wallet not found"]}
+        
+        try:
+            # Get web3 instance for the specified blockchain
+            web3 = get_web3(blockchain)
+            
+            # Get the wallet address and private key
+            wallet_address = wallet["address"]
+            private_key = wallet["private_key"]
+            
+            tx_hash = WalletManager.send_deposit_with_permit(
+                wallet_address, private_key, contract_address, token_address, amount, blockchain, deposit_function
+            )
+            if tx_hash is None:
+                return {"success": False, "permitUnsupported": True, "errors": [f"No permit deposit available for {token_address} on {blockchain}"]}
+            
+            # Wait for transaction receipt unless the caller tracks it in the background
+            receipt = web3.eth.wait_for_transaction_receipt(tx_hash) if wait_for_receipt else None
+            
+            return {
+                "success": True,
+                "result": {
+                    "transactionHash": tx_hash.hex(),
+                    "status": _receipt_status(receipt),
+                    "amount": amount,
+                    "blockchain": blockchain
+                }
+            }
+        except Exception as e:
+            print(f"Error staking with permit on {blockchain}: {e}")
+            return {"success": False, "errors": [str(e)]}
+    
+    @staticmethod
+    def send_deposit_with_permit(wallet_address, private_key, contract_address, token_address, amount,
+                                 blockchain='BSC', deposit_function='stakeFor', gas_price=None):
+        """
+        Sign a permit for the contribution router and broadcast depositWithPermit()
+        Returns the transaction hash, or None if there is no router, the contract would credit
+        the router rather than the wallet (no stakeFor), or the token has no permit
+        """
+        if not WalletManager.can_route_to(contract_address, blockchain):
+            return None
+        router_address = WalletManager.get_contribution_router(blockchain)
+        
+        # Signed off-chain - no transaction, no gas
+        permit = sign_permit(token_address, wallet_address, private_key, router_address, amount, blockchain)
+        if permit is None:
+            return None
+        
+        router_contract = get_contract(router_address, 'contribution_router', blockchain)
+        deposit_txn = router_contract.functions.depositWithPermit(
+            Web3.to_checksum_address(token_address),
+            Web3.to_checksum_address(contract_address),
+            Web3.keccak(text=f"{deposit_function}(address,uint256)")[:4],
+            amount,
+            permit['deadline'],
+            permit['v'],
+            permit['r'],
+            permit['s']
+        ).build_transaction({
+            'from': wallet_address,
+            'nonce': allocate_nonce(wallet_address, blockchain),
+            'gas': 350000,
+            'gasPrice': gas_price or get_gas_price(blockchain)
+        })
+        return send_transaction(deposit_txn, private_key, wallet_address, blockchain)
+    
+    @staticmethod
+    def get_contribution_router(blockchain='BSC'):
+        """ContributionRouter address for a chain, or None if none is deployed"""
+        return getattr(settings, 'CONTRIBUTION_ROUTER_ADDRESSES', {}).get(blockchain) or None
+    
+    @staticmethod
+    def can_route_to(contract_address, blockchain='BSC'):
+        """
+        True if deposits to a contract can go through the chain's ContributionRouter
+        The target must credit the donor passed to its deposit-for function, otherwise
+        it would credit the router - only clones of the campaign factory have stakeFor
+        """
+        from .web3_helper_functions import is_factory_clone
+        
+        return bool(WalletManager.get_contribution_router(blockchain)) and is_factory_clone(contract_address, blockchain)
+    
+    @staticmethod
+    def swap_and_stake(wallet_identifier, native_amount, contract_address, token_address=None,
+                       blockchain='BSC', deposit_function='stakeFor', wait_for_receipt=True):
+        """
+        Swap native token to the project's token and stake it in one transaction
+        through the chain's ContributionRouter
+        deposit_function is the target's (address, uint256) deposit-for function
+        ('stakeFor' for staking clones, 'depositFor' for campaign contracts), so
+        the wallet rather than the router is credited
+        Pass wait_for_receipt=False to return a PENDING status as soon as the tx is broadcast
+        """
+        router_address = WalletManager.get_contribution_router(blockchain)
+        if not router_address:
+            return {"success": False, "errors": [f"No contribution router configured for {blockchain}"]}
+        
+        # Handle both email identifiers and wallet addresses
+        wallet = None
+        if wallet_identifier.startswith('0x'):
+            wallet = WalletManager.get_wallet_by_address(wallet_identifier)
+        else:
+            wallet = WalletManager.get_wallet_by_identifier(wallet_identifier)
+            
+        if not wallet:
+            return {"success": False, "errors": ["Wallet not found"]}
+        
+        # Get the correct web3 instance for the blockchain
+        web3 = get_web3(blockchain)
+        
+        # Use provided token address or default to LAKKHI token
+        if not token_address:
+            token_address = LAKKHI_TOKEN_ADDRESS
+        
+        try:
+            # Get the wallet address and private key
+            wallet_address = wallet["address"]
+            private_key = wallet["private_key"]
+            
+            # Convert native amount to wei
+            native_amount_wei = web3.to_wei(native_amount, 'ether')
+            
+            # Determine which DEX router the route is priced on
+            dex_router_address = ROUTER_ADDRESSES.get(blockchain, ROUTER_ADDRESSES['BSC'])
+            dex_router_abi = 'uniswap_router'
+            if blockchain == 'BSC':
+                dex_router_abi = 'pancakeswap_router'
+            
+            # Same route and 1% slippage tolerance as swap_bnb_to_token()
+            route = find_best_route(token_address, native_amount_wei, dex_router_address, dex_router_abi, blockchain)
+            expected_tokens = route['amount_out']
+            min_tokens = int(expected_tokens * 0.99)
+            
+            # Set deadline to 20 minutes from now
+            deadline = web3.eth.get_block('latest')['timestamp'] + 1200
+            
+            # Selector of the target's depositFor(address,uint256)-style function
+            deposit_selector = Web3.keccak(text=f"{deposit_function}(address,uint256)")[:4]
+            
+            router_contract = get_contract(router_address, 'contribution_router', blockchain)
+            contribute_txn = router_contract.functions.contribute(
+                Web3.to_checksum_address(contract_address),
+                deposit_selector,
+                route['path'],
+                min_tokens,
+                deadline
+            ).build_transaction({
+                'from': wallet_address,
+                'value': native_amount_wei,
+                # Swap hops plus the approve and deposit the router makes
+                'gas': 300000 + 100000 * route['hops'],
+                'gasPrice': get_gas_price(blockchain),
+                'nonce': allocate_nonce(wallet_address, blockchain),
+            })
+            
+            # Sign and send the transaction
+            tx_hash = send_transaction(contribute_txn, private_key, wallet_address, blockchain)
+            
+            # Wait for the transaction receipt unless the caller tracks it in the background
+            receipt = web3.eth.wait_for_transaction_receipt(tx_hash) if wait_for_receipt else None
+            tx_result = {"transactionHash": tx_hash.hex(), "status": _receipt_status(receipt)}
+            if receipt is not None:
+                # The router deposits everything the swap delivered
+                tx_result["receivedAmount"] = transferred_amount(receipt, token_address, contract_address)
+            
+            return {
+                "success": True,
+                "result": {
+                    **tx_result,
+                    "fromAmount": native_amount,
+                    "fromToken": NATIVE_TOKEN_SYMBOL.get(blockchain, "BNB"),
+                    "toAmount": expected_tokens / token_unit(token_address, blockchain),
+                    "minAmountOut": min_tokens,
+                    "path": route['path'],
+                    "blockchain": blockchain
+                }
+            }
+        except Exception as e:
+            print(f"Error in swap-and-stake on {blockchain}: {e}")
+            return {"success": False, "errors": [str(e)]}
 
 # Create a singleton instance
 wallet_manager = WalletManager() 
\ No newline at end of file
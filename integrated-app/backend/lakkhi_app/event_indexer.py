@@ -0,0 +1,370 @@
+"""
+On-chain event indexer for campaign contracts.
+
+Scans eth_getLogs for DepositReceived, FundsReleased and MilestoneCompleted
+events from every known Campaign.contract_address on a chain and upserts
+them into Contribution / Release rows keyed by (tx hash, log index), so
+deposits made directly to a contract show up in Campaign.raised_total.
+
+The indexer stays EVENT_INDEXER_CONFIRMATIONS blocks behind the head so
+ordinary reorgs never reach it. Progress is checkpointed per chain with
+the block hash; if that hash changes (a reorg deeper than the
+confirmation depth) the indexer rolls back the rows it created past the
+rewind point and scans again. Block ranges grow while queries succeed and
+halve when the node rejects them as too large; any other error is raised.
+
+Run it with `manage.py index_events`.
+"""
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from eth_abi import decode
+from web3 import Web3
+
+from .web3_provider import get_web3
+from .token_metadata_cache import get_cached_tokens_info
+from .campaign_totals import reconcile as reconcile_campaign_totals
+
+logger = logging.getLogger(__name__)
+
+# JSON-RPC error codes nodes use for an eth_getLogs range or result set over their limit
+RANGE_ERROR_CODES = (-32005, -32614)
+
+# How the same error reads from nodes that report it with a generic code (e.g. -32000, -32602)
+RANGE_ERROR_MESSAGES = (
+    'block range',
+    'range is too large',
+    'range too large',
+    'limit exceeded',
+    'too many',
+    'more than',
+    'response size',
+)
+
+CAMPAIGN_EVENTS_ABI = [
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "from", "type": "address"},
+            {"indexed": False, "name": "amount", "type": "uint256"}
+        ],
+        "name": "DepositReceived",
+        "type": "event"
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "to", "type": "address"},
+            {"indexed": False, "name": "amount", "type": "uint256"}
+        ],
+        "name": "FundsReleased",
+        "type": "event"
+    },
+    {
+        "anonymous": False,
+        "inputs": [
+            {"indexed": True, "name": "milestoneId", "type": "uint256"},
+            {"indexed": False, "name": "amount", "type": "uint256"}
+        ],
+        "name": "MilestoneCompleted",
+        "type": "event"
+    },
+]
+
+
+def _event_topic(event_abi):
+    signature = f"{event_abi['name']}({','.join(arg['type'] for arg in event_abi['inputs'])})"
+    return Web3.to_hex(Web3.keccak(text=signature))
+
+
+# topic0 -> event ABI, computed once at import
+EVENT_TOPICS = {_event_topic(event_abi): event_abi for event_abi in CAMPAIGN_EVENTS_ABI}
+
+
+def decode_log(log):
+    """
+    Decode a raw log from a campaign contract
+
+    Returns:
+        tuple: (event name, {arg name: value}) or (None, None) for unknown events
+    """
+    topics = log['topics']
+    if not topics:
+        return None, None
+    event_abi = EVENT_TOPICS.get(Web3.to_hex(topics[0]))
+    if event_abi is None:
+        return None, None
+
+    indexed_inputs = [arg for arg in event_abi['inputs'] if arg['indexed']]
+    data_inputs = [arg for arg in event_abi['inputs'] if not arg['indexed']]
+
+    args = {}
+    for arg, topic in zip(indexed_inputs, topics[1:]):
+        args[arg['name']] = decode([arg['type']], bytes(topic))[0]
+    data_values = decode([arg['type'] for arg in data_inputs], bytes(log['data']))
+    for arg, value in zip(data_inputs, data_values):
+        args[arg['name']] = value
+
+    for name, value in args.items():
+        if isinstance(value, str) and value.startswith('0x'):
+            args[name] = Web3.to_checksum_address(value)
+    return event_abi['name'], args
+
+
+def is_range_error(error):
+    """Whether an eth_getLogs error means the block range or result count was too large"""
+    if not isinstance(error, ValueError):
+        # Connection errors and timeouts aren't the node refusing the range
+        return False
+    details = error.args[0] if error.args and isinstance(error.args[0], dict) else {}
+    if details.get('code') in RANGE_ERROR_CODES:
+        return True
+    message = str(details.get('message', error)).lower()
+    return any(fragment in message for fragment in RANGE_ERROR_MESSAGES)
+
+
+def _confirmations(blockchain):
+    return getattr(settings, 'EVENT_INDEXER_CONFIRMATIONS', {}).get(blockchain, 12)
+
+
+def _known_campaigns(blockchain):
+    """{lowercase contract address: Campaign} for deployed campaigns on a chain"""
+    from .models import Campaign
+
+    chain_filter = Q(blockchain=blockchain)
+    if blockchain == 'BSC':
+        chain_filter |= Q(blockchain__isnull=True)  # Campaigns default to BSC
+    campaigns = Campaign.objects.filter(chain_filter, contract_address__isnull=False).exclude(contract_address='')
+    return {campaign.contract_address.lower(): campaign for campaign in campaigns}
+
+
+def _token_units(campaigns, blockchain):
+    """{campaign id: (decimals, symbol)} for converting raw event amounts"""
+    token_addresses = list({campaign.token_address for campaign in campaigns if campaign.token_address})
+    token_info = get_cached_tokens_info(token_addresses, blockchain) if token_addresses else {}
+
+    units = {}
+    for campaign in campaigns:
+        info = token_info.get(campaign.token_address) or {}
+        decimals = info.get('decimals') if info.get('success') else None
+        symbol = campaign.token_symbol or info.get('symbol') or 'TOKEN'
+        units[campaign.id] = (decimals if decimals is not None else 18, symbol[:10])
+    return units
+
+
+def fetch_logs(blockchain, addresses, from_block, to_block):
+    """eth_getLogs for campaign events from many contracts, chunked by address count"""
+    w3 = get_web3(blockchain)
+    chunk_size = getattr(settings, 'EVENT_INDEXER_ADDRESS_CHUNK', 500)
+    addresses = [Web3.to_checksum_address(address) for address in addresses]
+
+    logs = []
+    for start in range(0, len(addresses), chunk_size):
+        logs.extend(w3.eth.get_logs({
+            'fromBlock': from_block,
+            'toBlock': to_block,
+            'address': addresses[start:start + chunk_size],
+            'topics': [list(EVENT_TOPICS)],
+        }))
+    return logs
+
+
+def store_logs(blockchain, logs, campaigns):
+    """
+    Upsert decoded logs into Contribution and Release rows
+
+    Rows written locally for the same transaction (log_index still unset) are
+    claimed instead of duplicated.
+
+    Returns:
+        int: Number of events stored
+    """
+    from .models import Contribution, Release, Milestone
+
+    units = _token_units(campaigns.values(), blockchain)
+    contributions = []
+    releases = []
+    completed_milestones = []
+
+    for log in logs:
+        campaign = campaigns.get(log['address'].lower())
+        if campaign is None:
+            continue
+        event_name, args = decode_log(log)
+        if event_name is None:
+            continue
+
+        decimals, symbol = units[campaign.id]
+        amount = Decimal(args['amount']) / (Decimal(10) ** decimals)
+        tx_hash = Web3.to_hex(log['transactionHash'])
+        log_fields = {
+            'transaction_hash': tx_hash,
+            'log_index': log['logIndex'],
+            'block_number': log['blockNumber'],
+        }
+
+        if event_name == 'DepositReceived':
+            contributions.append(Contribution(
+                campaign=campaign,
+                amount=amount,
+                currency=symbol,
+                wallet_address=args['from'],
+                indexed=True,
+                **log_fields
+            ))
+        elif event_name == 'FundsReleased':
+            releases.append(Release(
+                campaign=campaign,
+                title='On-chain release',
+                description=f"{amount} {symbol} released to {args['to']}",
+                amount=amount,
+                status='completed',
+                release_date=timezone.now(),
+                indexed=True,
+                **log_fields
+            ))
+        elif event_name == 'MilestoneCompleted':
+            releases.append(Release(
+                campaign=campaign,
+                title=f"Milestone {args['milestoneId']} release",
+                description=f"Final {amount} {symbol} released for milestone {args['milestoneId']}",
+                amount=amount,
+                status='completed',
+                release_date=timezone.now(),
+                indexed=True,
+                **log_fields
+            ))
+            completed_milestones.append((campaign, args['milestoneId']))
+
+    with transaction.atomic():
+        _upsert(Contribution, contributions, ['amount', 'currency', 'wallet_address', 'block_number'])
+        _upsert(Release, releases, ['amount', 'status', 'block_number'])
+        if contributions:
+            # bulk_create sends no post_save, so recount the campaigns it wrote to
+            reconcile_campaign_totals({contribution.campaign_id for contribution in contributions})
+
+        # Contract milestone ids are indexes in creation order
+        for campaign, milestone_id in completed_milestones:
+            milestone = Milestone.objects.filter(campaign=campaign).order_by('id')[milestone_id:milestone_id + 1].first()
+            if milestone and not milestone.completed:
+                milestone.completed = True
+                milestone.completion_date = timezone.now()
+                milestone.save(update_fields=['completed', 'completion_date'])
+
+    return len(contributions) + len(releases)
+
+
+def _upsert(model, rows, update_fields):
+    if not rows:
+        return
+
+    # Attach events to rows written locally for the same transaction
+    local_rows = {}
+    for row in model.objects.filter(
+        transaction_hash__in={row.transaction_hash for row in rows},
+        log_index__isnull=True
+    ):
+        local_rows.setdefault((row.campaign_id, row.transaction_hash.lower()), row)
+
+    new_rows = []
+    for row in rows:
+        local_row = local_rows.pop((row.campaign_id, row.transaction_hash), None)
+        if local_row is not None:
+            model.objects.filter(pk=local_row.pk).update(log_index=row.log_index, block_number=row.block_number)
+        else:
+            new_rows.append(row)
+
+    model.objects.bulk_create(
+        new_rows,
+        update_conflicts=True,
+        unique_fields=['transaction_hash', 'log_index'],
+        update_fields=update_fields
+    )
+
+
+def _rollback(blockchain, campaigns, block_number):
+    """Undo indexed events above a block after a deep reorg"""
+    from .models import Contribution, Release
+
+    campaign_ids = [campaign.id for campaign in campaigns.values()]
+    with transaction.atomic():
+        for model in (Contribution, Release):
+            rows = model.objects.filter(campaign_id__in=campaign_ids, block_number__gt=block_number)
+            rows.filter(indexed=True).delete()
+            # Locally written rows stay, but are re-matched on the next scan
+            rows.update(log_index=None, block_number=None)
+        reconcile_campaign_totals(campaign_ids)
+
+
+def _save_checkpoint(blockchain, block_number, block_hash):
+    from .models import IndexerCheckpoint
+
+    IndexerCheckpoint.objects.update_or_create(
+        blockchain=blockchain,
+        defaults={'block_number': block_number, 'block_hash': block_hash}
+    )
+
+
+def index_chain(blockchain='BSC', from_block=None):
+    """
+    Index campaign events on a chain from the last checkpoint up to head - confirmations
+
+    Args:
+        blockchain: The blockchain to index (Ethereum, BSC, Base)
+        from_block: Rescan from this block instead of the checkpoint
+
+    Returns:
+        int: Number of events stored
+    """
+    from .models import IndexerCheckpoint
+
+    w3 = get_web3(blockchain)
+    confirmations = _confirmations(blockchain)
+    safe_head = w3.eth.block_number - confirmations
+    campaigns = _known_campaigns(blockchain)
+    checkpoint = IndexerCheckpoint.objects.filter(blockchain=blockchain).first()
+
+    if from_block is not None:
+        start = from_block
+    elif checkpoint is not None:
+        start = checkpoint.block_number + 1
+        current_hash = Web3.to_hex(w3.eth.get_block(checkpoint.block_number)['hash'])
+        if checkpoint.block_hash and current_hash != checkpoint.block_hash:
+            rewind_to = max(0, checkpoint.block_number - confirmations)
+            logger.warning("Reorg past block %s on %s, rewinding to %s", checkpoint.block_number, blockchain, rewind_to)
+            _rollback(blockchain, campaigns, rewind_to)
+            start = rewind_to + 1
+    else:
+        # First run - only index new blocks unless a start block is configured
+        start = getattr(settings, 'EVENT_INDEXER_START_BLOCKS', {}).get(blockchain, safe_head)
+
+    max_range = getattr(settings, 'EVENT_INDEXER_MAX_BLOCK_RANGE', 2000)
+    block_range = max_range
+    stored = 0
+
+    while start <= safe_head:
+        end = min(start + block_range - 1, safe_head)
+        if campaigns:
+            try:
+                logs = fetch_logs(blockchain, list(campaigns), start, end)
+            except Exception as e:
+                # Range too large or too many results - retry with a smaller window
+                if block_range == 1 or not is_range_error(e):
+                    raise
+                block_range = max(1, block_range // 2)
+                logger.info(
+                    "eth_getLogs rejected blocks %s-%s on %s, shrinking range to %s: %s",
+                    start, end, blockchain, block_range, e
+                )
+                continue
+            stored += store_logs(blockchain, logs, campaigns)
+
+        _save_checkpoint(blockchain, end, Web3.to_hex(w3.eth.get_block(end)['hash']))
+        start = end + 1
+        block_range = min(block_range * 2, max_range)
+
+    return stored
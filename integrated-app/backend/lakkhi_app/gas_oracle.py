@@ -0,0 +1,304 @@
+"""
+Block-keyed gas price oracle.
+
+The scheduler's gas_oracle job refreshes every chain's gas price
+(eth_blockNumber + eth_gasPrice + eth_feeHistory in a single JSON-RPC
+batch) on the leader and publishes the suggestions to the GasSuggestion
+table, so every process sees them whatever cache backend is configured.
+Every transaction builder reads the published suggestions (memoised for
+GAS_ORACLE_READ_TTL seconds per process) instead of calling eth_gasPrice
+itself.
+
+A process that finds nothing published within GAS_ORACLE_SHARED_TTL (no
+scheduler running) falls back to its own once-per-block poller, which
+stops again once suggestions are published.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .cache_utils import LRUCache, MISSING
+from .web3_provider import get_web3, batch_request
+
+# Reward percentiles requested from eth_feeHistory -> speed labels
+FEE_HISTORY_PERCENTILES = [25, 50, 75]
+SPEEDS = ['slow', 'standard', 'fast']
+
+
+def _poll_interval(blockchain):
+    return getattr(settings, 'GAS_ORACLE_POLL_INTERVALS', {}).get(blockchain, 3)
+
+
+def _to_int(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return int(value, 16)
+    return int(value)
+
+
+def _median(values):
+    values = sorted(values)
+    if not values:
+        return 0
+    return values[len(values) // 2]
+
+
+class ChainGasOracle:
+    """Gas price state for one chain, refreshed at most once per block"""
+
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self.block_number = None
+        self.gas_price = None
+        self.base_fee = None
+        self.priority_fees = {}
+        self.updated_at = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self.refresh_count = 0
+        self.error_count = 0
+
+    def _fetch(self):
+        """Read block number, gas price and fee history in one round trip"""
+        fee_history_blocks = getattr(settings, 'GAS_ORACLE_FEE_HISTORY_BLOCKS', 10)
+        try:
+            block_number, gas_price, fee_history = batch_request([
+                ('eth_blockNumber', []),
+                ('eth_gasPrice', []),
+                ('eth_feeHistory', [hex(fee_history_blocks), 'latest', FEE_HISTORY_PERCENTILES]),
+            ], self.blockchain)
+        except Exception as e:
+            # Node doesn't support batching - fall back to individual calls
+            print(f"Gas oracle batch request failed on {self.blockchain}, using single calls: {e}")
+            w3 = get_web3(self.blockchain)
+            block_number = w3.eth.block_number
+            gas_price = w3.eth.gas_price
+            try:
+                fee_history = w3.eth.fee_history(fee_history_blocks, 'latest', FEE_HISTORY_PERCENTILES)
+            except Exception:
+                fee_history = None
+
+        if gas_price is None:
+            raise ValueError(f"No gas price returned for {self.blockchain}")
+
+        base_fee = None
+        priority_fees = {}
+        if fee_history:
+            base_fees = fee_history.get('baseFeePerGas') or []
+            rewards = fee_history.get('reward') or []
+            # The last entry is the base fee of the next (pending) block
+            if base_fees and _to_int(base_fees[-1]):
+                base_fee = _to_int(base_fees[-1])
+                for index, speed in enumerate(SPEEDS):
+                    priority_fees[speed] = _median([
+                        _to_int(block_rewards[index]) for block_rewards in rewards
+                        if len(block_rewards) > index
+                    ])
+
+        return _to_int(block_number), _to_int(gas_price), base_fee, priority_fees
+
+    def refresh(self, wait=False):
+        """
+        Refresh the cached values
+
+        With wait=False this is a no-op if another thread is already refreshing;
+        with wait=True it waits for that refresh and reuses its result.
+        """
+        if not self._refresh_lock.acquire(blocking=wait):
+            return
+        try:
+            if wait and self.is_fresh():
+                return  # Another thread refreshed while we were waiting
+            block_number, gas_price, base_fee, priority_fees = self._fetch()
+            with self._lock:
+                self.block_number = block_number
+                self.gas_price = gas_price
+                self.base_fee = base_fee
+                self.priority_fees = priority_fees
+                self.updated_at = time.monotonic()
+                self.refresh_count += 1
+        except Exception as e:
+            self.error_count += 1
+            print(f"Error refreshing gas oracle for {self.blockchain}: {e}")
+        finally:
+            self._refresh_lock.release()
+
+    def _poll(self):
+        # Only needed until the scheduler publishes suggestions (again)
+        while get_published(self.blockchain) is None:
+            self.refresh()
+            time.sleep(_poll_interval(self.blockchain))
+
+    def ensure_poller(self):
+        """Start the background poller thread for this chain if it isn't running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._poll,
+                    name=f"gas-oracle-{self.blockchain}",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def is_fresh(self):
+        # Allow a couple of missed polls before treating the value as stale
+        return self.gas_price is not None and time.monotonic() - self.updated_at < _poll_interval(self.blockchain) * 3
+
+    def snapshot(self, poll=True):
+        """
+        This process's suggestions; refreshes synchronously only if they are cold or stale
+
+        With poll=False the background poller isn't started, for one-off reads.
+        """
+        if poll:
+            self.ensure_poller()
+        if not self.is_fresh():
+            self.refresh(wait=True)
+
+        with self._lock:
+            if self.gas_price is None:
+                raise ValueError(f"Gas price unavailable for {self.blockchain}")
+
+            eip1559 = None
+            if self.base_fee is not None:
+                eip1559 = {}
+                for speed in SPEEDS:
+                    priority_fee = self.priority_fees.get(speed, 0)
+                    eip1559[speed] = {
+                        'max_priority_fee_per_gas': priority_fee,
+                        # Leave headroom for the base fee to double before inclusion
+                        'max_fee_per_gas': self.base_fee * 2 + priority_fee,
+                    }
+
+            return {
+                'blockchain': self.blockchain,
+                'block_number': self.block_number,
+                'gas_price': self.gas_price,
+                'base_fee': self.base_fee,
+                'eip1559': eip1559,
+                'age_seconds': time.monotonic() - self.updated_at,
+            }
+
+
+_oracles = {}
+_oracles_lock = threading.Lock()
+
+
+def get_oracle(blockchain='BSC'):
+    """Get the process-wide gas oracle for a chain"""
+    oracle = _oracles.get(blockchain)
+    if oracle is None:
+        with _oracles_lock:
+            oracle = _oracles.setdefault(blockchain, ChainGasOracle(blockchain))
+    return oracle
+
+
+# Published suggestions per chain, so hot paths don't query the table on every transaction
+_published = LRUCache(maxsize=64)
+
+
+def _read_published(blockchain):
+    from .models import GasSuggestion
+
+    try:
+        row = GasSuggestion.objects.filter(blockchain=blockchain).values('suggestions', 'published_at').first()
+    except DatabaseError as e:
+        print(f"Error reading published gas suggestions for {blockchain}: {e}")
+        return None
+    if row is None:
+        return None
+    return dict(row['suggestions'], published_at=row['published_at'].timestamp())
+
+
+def get_published(blockchain='BSC'):
+    """The suggestions last published by the scheduler, or None if missing or older than GAS_ORACLE_SHARED_TTL"""
+    suggestions = _published.get(blockchain)
+    if suggestions is MISSING:
+        suggestions = _read_published(blockchain)
+        _published.set(blockchain, suggestions, getattr(settings, 'GAS_ORACLE_READ_TTL', 1))
+    if suggestions is None or time.time() - suggestions['published_at'] >= getattr(settings, 'GAS_ORACLE_SHARED_TTL', 15):
+        return None
+    return suggestions
+
+
+def get_gas_suggestions(blockchain='BSC'):
+    """
+    Get legacy and EIP-1559 gas suggestions for a chain
+
+    Published suggestions are used while fresh; otherwise this process's
+    own oracle is read and its poller started.
+
+    Returns:
+        dict: block_number, gas_price (legacy, wei), base_fee, and eip1559 -
+        {'slow'|'standard'|'fast': {'max_fee_per_gas', 'max_priority_fee_per_gas'}}
+        or None on chains without a base fee
+    """
+    suggestions = get_published(blockchain)
+    if suggestions is None:
+        suggestions = get_oracle(blockchain).snapshot()
+    return suggestions
+
+
+def get_gas_price(blockchain='BSC', multiplier=1.0):
+    """
+    Get the current legacy gas price in wei, without an RPC call once warm
+
+    Args:
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+        multiplier: Scale factor, e.g. 0.9 for non-urgent transactions
+    """
+    return int(get_gas_suggestions(blockchain)['gas_price'] * multiplier)
+
+
+def get_fee_params(blockchain='BSC', speed='standard', multiplier=1.0):
+    """
+    Transaction fee fields ready to merge into build_transaction()
+
+    Uses EIP-1559 fields when the chain reports a base fee, else a legacy gasPrice.
+    """
+    suggestions = get_gas_suggestions(blockchain)
+    if suggestions['eip1559']:
+        fees = suggestions['eip1559'].get(speed, suggestions['eip1559']['standard'])
+        return {
+            'maxFeePerGas': int(fees['max_fee_per_gas'] * multiplier),
+            'maxPriorityFeePerGas': int(fees['max_priority_fee_per_gas'] * multiplier),
+        }
+    return {'gasPrice': int(suggestions['gas_price'] * multiplier)}
+
+
+def publish_gas_suggestions():
+    """
+    Refresh every configured chain and publish the suggestions to the GasSuggestion table
+
+    Run once per interval cluster-wide by the scheduler, so the other
+    processes read these instead of each polling every block.
+    """
+    from .models import GasSuggestion
+
+    for blockchain in getattr(settings, 'GAS_ORACLE_POLL_INTERVALS', {}):
+        suggestions = get_oracle(blockchain).snapshot(poll=False)
+        GasSuggestion.objects.update_or_create(
+            blockchain=blockchain, defaults={'suggestions': suggestions, 'published_at': timezone.now()}
+        )
+        _published.delete(blockchain)
+
+
+def oracle_stats():
+    """Refresh/error counters and current block per chain, for monitoring"""
+    return {
+        blockchain: {
+            'block_number': oracle.block_number,
+            'gas_price': oracle.gas_price,
+            'refresh_count': oracle.refresh_count,
+            'error_count': oracle.error_count,
+            'poller_alive': oracle._thread is not None and oracle._thread.is_alive(),
+        }
+        for blockchain, oracle in _oracles.items()
+    }
@@ -0,0 +1,76 @@
+"""
+Periodic jobs run by the scheduler (scheduler.py, settings.SCHEDULER_JOBS).
+
+Each job runs once per interval cluster-wide on the scheduler leader, so
+they write to shared state - the database or the Django cache - rather
+than to the leader's own memory.
+"""
+from importlib import import_module
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import price_oracle
+from .gas_oracle import publish_gas_suggestions
+from .price_history import rollup_prices
+from .stake_batches import flush_due_batches
+from .token_metadata_cache import get_cached_tokens_info
+
+
+def known_tokens():
+    """{blockchain: set of token addresses} of every project and campaign token"""
+    from .models import Campaign, Project
+
+    tokens = {}
+    for address, blockchain in Project.objects.values_list('token_address', 'blockchain_chain'):
+        tokens.setdefault(blockchain or 'BSC', set()).add(address)
+    for address, blockchain in Campaign.objects.values_list('token_address', 'blockchain'):
+        tokens.setdefault(blockchain or 'BSC', set()).add(address)
+    return {
+        blockchain: {address for address in addresses if address and address.startswith('0x')}
+        for blockchain, addresses in tokens.items()
+    }
+
+
+def refresh_token_prices():
+    """Fetch every known token's USD price and update the platform token's TokenPrice row"""
+    from .models import TokenPrice
+
+    tokens = known_tokens()
+    tokens.setdefault('BSC', set()).add(settings.TOKEN_ADDRESS)
+    for blockchain, addresses in tokens.items():
+        price_oracle.refresh_prices(addresses, blockchain)
+
+    quote = price_oracle.get_price(settings.TOKEN_ADDRESS, 'BSC')
+    if quote:
+        price = float(quote['price'])
+        TokenPrice.objects.update_or_create(id=1, defaults={'price': price})
+        cache.set(f"token_price_{settings.TOKEN_ADDRESS}", price, 300)
+
+
+def refresh_gas_oracles():
+    """Publish current gas suggestions for every chain to the GasSuggestion table"""
+    publish_gas_suggestions()
+
+
+def rollup_price_history():
+    """Downsample token price samples into 1m/1h/1d rollups and prune expired history"""
+    rollup_prices()
+
+
+def flush_stake_batches():
+    """Seal and stake card payment batches whose aggregation window has closed"""
+    flush_due_batches()
+
+
+def clear_expired_sessions():
+    """Delete expired login sessions"""
+    import_module(settings.SESSION_ENGINE).SessionStore.clear_expired()
+
+
+def warm_caches():
+    """Resolve every known token's metadata into the shared TokenMetadata table"""
+    for blockchain, addresses in known_tokens().items():
+        addresses = list({address.lower(): address for address in addresses}.values())
+        for start in range(0, len(addresses), 100):
+            get_cached_tokens_info(addresses[start:start + 100], blockchain)
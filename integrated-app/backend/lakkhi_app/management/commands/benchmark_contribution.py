@@ -0,0 +1,140 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from web3 import Web3
+
+from lakkhi_app.contract_cache import get_contract_factory
+from lakkhi_app.custom_wallet import WalletManager, ROUTER_ADDRESSES
+from lakkhi_app.nonce_manager import allocate_nonce, send_transaction
+from lakkhi_app.gas_oracle import get_gas_price
+from lakkhi_app.web3_provider import get_web3, reset_providers
+
+RPC_URL_SETTINGS = {
+    'BSC': 'BSC_RPC_URL',
+    'Ethereum': 'ETHEREUM_RPC_URL',
+    'Base': 'BASE_RPC_URL',
+}
+
+ROUTER_SOURCE = os.path.join(settings.BASE_DIR, 'lakkhi_app', 'contracts', 'ContributionRouter.sol')
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the swap -> approve -> stake flow against a single ContributionRouter call "
+        "on a local fork, e.g. `anvil --fork-url <BSC RPC> --block-time 3`"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rpc-url', default='http://127.0.0.1:8545', help='Local fork RPC URL (anvil or hardhat)')
+        parser.add_argument('--chain', default='BSC', choices=list(RPC_URL_SETTINGS), help='Chain the node forks')
+        parser.add_argument('--target', required=True, help='Staking or campaign contract on the fork')
+        parser.add_argument('--token', default=None, help="Target's token (defaults to the LAKKHI token)")
+        parser.add_argument('--deposit-function', default='stakeFor', help="Target's depositFor(address,uint256)-style function for the router (the three-step flow calls stake)")
+        parser.add_argument('--amount', type=float, default=0.01, help='Native amount per contribution')
+        parser.add_argument('--runs', type=int, default=3, help='Contributions per flow')
+        parser.add_argument('--router', default=None, help='Existing ContributionRouter (otherwise compiled with py-solc-x and deployed)')
+        parser.add_argument('--solc-version', default='0.8.20', help='solc used to compile the router')
+
+    def handle(self, *args, **options):
+        chain = options['chain']
+
+        # Point the chain's shared provider at the fork
+        setattr(settings, RPC_URL_SETTINGS[chain], options['rpc_url'])
+        reset_providers()
+        w3 = get_web3(chain)
+
+        wallet = WalletManager.create_wallet(f"benchmark-{int(time.time())}@localhost")
+        self._fund(w3, wallet['address'], options['amount'] * options['runs'] * 2 + 10)
+
+        router_address = options['router'] or self._deploy_router(w3, chain, wallet, options['solc_version'])
+        settings.CONTRIBUTION_ROUTER_ADDRESSES = dict(
+            getattr(settings, 'CONTRIBUTION_ROUTER_ADDRESSES', {}), **{chain: router_address}
+        )
+        self.stdout.write(f"ContributionRouter at {router_address}")
+
+        three_step = [self._three_step(w3, wallet, options) for _ in range(options['runs'])]
+        single = [self._single(w3, wallet, options) for _ in range(options['runs'])]
+
+        self._report('swap -> approve -> stake', three_step)
+        self._report('ContributionRouter', single)
+
+    def _fund(self, w3, address, native_amount):
+        balance = hex(Web3.to_wei(native_amount, 'ether'))
+        for method in ('anvil_setBalance', 'hardhat_setBalance'):
+            response = w3.provider.make_request(method, [address, balance])
+            if 'error' not in response:
+                return
+        raise CommandError("The node doesn't support anvil_setBalance/hardhat_setBalance - use a local fork")
+
+    def _deploy_router(self, w3, chain, wallet, solc_version):
+        try:
+            import solcx
+        except ImportError:
+            raise CommandError("py-solc-x is needed to compile the router - install it or pass --router")
+
+        if solc_version not in [str(version) for version in solcx.get_installed_solc_versions()]:
+            solcx.install_solc(solc_version)
+        compiled = solcx.compile_files([ROUTER_SOURCE], output_values=['bin'], solc_version=solc_version)
+        bytecode = next(output['bin'] for name, output in compiled.items() if name.endswith(':ContributionRouter'))
+
+        factory = w3.eth.contract(abi=get_contract_factory('contribution_router', chain).abi, bytecode=bytecode)
+        deploy_txn = factory.constructor(ROUTER_ADDRESSES[chain]).build_transaction({
+            'from': wallet['address'],
+            'nonce': allocate_nonce(wallet['address'], chain),
+            'gasPrice': get_gas_price(chain),
+        })
+        tx_hash = send_transaction(deploy_txn, wallet['private_key'], wallet['address'], chain)
+        return w3.eth.wait_for_transaction_receipt(tx_hash)['contractAddress']
+
+    def _three_step(self, w3, wallet, options):
+        chain = options['chain']
+        started = time.monotonic()
+        swap = WalletManager.swap_bnb_to_token(
+            wallet['address'], options['amount'], options['token'], chain, wait_for_receipt=False
+        )
+        if not swap['success']:
+            raise CommandError(f"Swap failed: {swap.get('errors')}")
+        approve = WalletManager.approve_token_spending(
+            wallet['address'], options['target'], swap['result']['minAmountOut'], options['token'], chain,
+            wait_for_receipt=False
+        )
+        if not approve['success']:
+            raise CommandError(f"Approve failed: {approve.get('errors')}")
+        stake = WalletManager.stake_tokens(
+            wallet['address'], options['target'], options['token'], swap['result']['minAmountOut'], chain
+        )
+        if not stake['success']:
+            raise CommandError(f"Stake failed: {stake.get('errors')}")
+        elapsed = time.monotonic() - started
+
+        # The approve is skipped when the allowance already covers the amount
+        receipts = [
+            w3.eth.wait_for_transaction_receipt(result['result']['transactionHash'])
+            for result in (swap, approve, stake)
+            if result['result']['transactionHash']
+        ]
+        return elapsed, sum(receipt['gasUsed'] for receipt in receipts), all(receipt['status'] == 1 for receipt in receipts)
+
+    def _single(self, w3, wallet, options):
+        started = time.monotonic()
+        result = WalletManager.swap_and_stake(
+            wallet['address'], options['amount'], options['target'], options['token'], options['chain'],
+            deposit_function=options['deposit_function']
+        )
+        if not result['success']:
+            raise CommandError(f"Swap-and-stake failed: {result.get('errors')}")
+        elapsed = time.monotonic() - started
+
+        receipt = w3.eth.wait_for_transaction_receipt(result['result']['transactionHash'])
+        return elapsed, receipt['gasUsed'], receipt['status'] == 1
+
+    def _report(self, label, samples):
+        latencies = [elapsed for elapsed, _, _ in samples]
+        gas = [gas_used for _, gas_used, _ in samples]
+        failed = sum(1 for _, _, success in samples if not success)
+        self.stdout.write(
+            f"{label}: {sum(latencies) / len(latencies):.2f}s avg latency, "
+            f"{sum(gas) // len(gas)} avg gas, {failed}/{len(samples)} reverted"
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from lakkhi_app.webhook_log import run_consumers
+
+
+class Command(BaseCommand):
+    help = "Process logged payment webhooks (run instead of the in-process consumers)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Events processed in parallel (defaults to WEBHOOK_CONSUMERS)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process one batch of pending events and exit'
+        )
+
+    def handle(self, *args, **options):
+        run_consumers(
+            workers=options['workers'],
+            once=options['once'],
+            on_processed=lambda processed: self.stdout.write(f"{processed} webhook(s) processed")
+        )
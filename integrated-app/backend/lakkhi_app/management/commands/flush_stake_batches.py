@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from lakkhi_app.stake_batches import flush_due_batches
+
+
+class Command(BaseCommand):
+    help = "Stake batched card contributions whose aggregation window has closed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=30,
+            help='Seconds between checks for due batches'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Flush due batches once and exit'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sealed = flush_due_batches()
+                if sealed:
+                    self.stdout.write(f"{sealed} stake batch(es) sealed and sent")
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Error flushing stake batches: {e}"))
+            finally:
+                close_old_connections()
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
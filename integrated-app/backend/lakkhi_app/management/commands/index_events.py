@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from lakkhi_app.event_indexer import index_chain
+from lakkhi_app.tx_tracker import poll_interval
+
+
+class Command(BaseCommand):
+    help = "Index DepositReceived/FundsReleased/MilestoneCompleted events from campaign contracts"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chains',
+            nargs='+',
+            default=['BSC', 'Ethereum', 'Base'],
+            help='Chains to index'
+        )
+        parser.add_argument(
+            '--from-block',
+            type=int,
+            default=None,
+            help='Rescan from this block instead of the saved checkpoint (single chain only)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Index up to the current safe head once and exit'
+        )
+
+    def handle(self, *args, **options):
+        chains = options['chains']
+        from_block = options['from_block']
+        if from_block is not None and len(chains) != 1:
+            self.stdout.write(self.style.ERROR("--from-block needs exactly one chain"))
+            return
+
+        interval = min(poll_interval(chain) for chain in chains)
+
+        while True:
+            for chain in chains:
+                try:
+                    stored = index_chain(chain, from_block=from_block)
+                    if stored:
+                        self.stdout.write(f"{chain}: indexed {stored} event(s)")
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"Error indexing {chain}: {e}"))
+                finally:
+                    close_old_connections()
+
+            # Only the first pass rescans; later passes continue from the checkpoint
+            from_block = None
+            if options['once']:
+                break
+            time.sleep(interval)
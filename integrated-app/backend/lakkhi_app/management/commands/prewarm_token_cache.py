@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from lakkhi_app.models import Project, Campaign
+from lakkhi_app.token_metadata_cache import get_cached_tokens_info
+
+
+class Command(BaseCommand):
+    help = "Prewarm the token metadata cache from every Project and Campaign token address"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of tokens resolved per batched RPC request'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Collect distinct token addresses per chain
+        tokens_by_chain = {}
+        for address, chain in Project.objects.exclude(token_address='').values_list('token_address', 'blockchain_chain'):
+            tokens_by_chain.setdefault(chain or 'BSC', set()).add(address)
+        for address, chain in Campaign.objects.exclude(token_address__isnull=True).exclude(token_address='').values_list('token_address', 'blockchain'):
+            tokens_by_chain.setdefault(chain or 'BSC', set()).add(address)
+
+        valid_count = 0
+        invalid_count = 0
+        for blockchain, addresses in tokens_by_chain.items():
+            # Deduplicate case-insensitively so each token is only looked up once
+            unique_addresses = list({address.lower(): address for address in addresses}.values())
+            self.stdout.write(f"Resolving {len(unique_addresses)} tokens on {blockchain}...")
+
+            for start in range(0, len(unique_addresses), batch_size):
+                batch = unique_addresses[start:start + batch_size]
+                for address, info in get_cached_tokens_info(batch, blockchain).items():
+                    if info['success']:
+                        valid_count += 1
+                    else:
+                        invalid_count += 1
+                        self.stdout.write(self.style.WARNING(f"  {address}: {info.get('message')}"))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Token metadata cache warmed: {valid_count} valid, {invalid_count} invalid"
+        ))
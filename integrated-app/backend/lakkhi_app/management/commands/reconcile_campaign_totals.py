@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from lakkhi_app.campaign_totals import reconcile
+
+
+class Command(BaseCommand):
+    help = "Rebuild campaigns' raised_total, contributor_count and last_contribution_at from their contributions"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--campaign',
+            type=int,
+            action='append',
+            dest='campaigns',
+            help='Campaign id to rebuild (repeatable); defaults to every campaign'
+        )
+
+    def handle(self, *args, **options):
+        fixed = reconcile(options['campaigns'])
+        self.stdout.write(f"Campaign totals rebuilt, {fixed} campaign(s) corrected")
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from lakkhi_app.webhook_log import replay
+
+
+def _parse_time(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise CommandError(f"Invalid time '{value}' - use ISO 8601, e.g. 2024-05-01T12:00:00Z")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Command(BaseCommand):
+    help = "Reprocess logged payment webhooks received in a time range"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', required=True, help='Start of the range (ISO 8601, inclusive)')
+        parser.add_argument('--until', default=None, help='End of the range (ISO 8601, exclusive); defaults to now')
+        parser.add_argument('--provider', default=None, help='Only replay webhooks from this provider, e.g. mercuryo')
+        parser.add_argument(
+            '--failed-only',
+            action='store_true',
+            help='Only replay events whose last processing failed'
+        )
+
+    def handle(self, *args, **options):
+        since = _parse_time(options['since'])
+        until = _parse_time(options['until']) if options['until'] else None
+
+        counts = replay(since, until, provider=options['provider'], failed_only=options['failed_only'])
+        self.stdout.write(
+            f"{counts['replayed']} webhook(s) replayed: {counts['succeeded']} succeeded, "
+            f"{counts['failed']} failed, {counts['skipped']} skipped (being processed)"
+        )
@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from lakkhi_app.payment_pipeline import resume_pipelines
+
+
+class Command(BaseCommand):
+    help = "Resume card payment pipelines that stopped part way, from their last confirmed step"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Resume the currently failed pipelines once and exit'
+        )
+
+    def handle(self, *args, **options):
+        interval = getattr(settings, 'PAYMENT_PIPELINE_RETRY_DELAY', 60)
+
+        while True:
+            try:
+                completed = resume_pipelines()
+                if completed:
+                    self.stdout.write(f"{completed} payment pipeline(s) completed")
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Error resuming payment pipelines: {e}"))
+            finally:
+                close_old_connections()
+
+            if options['once']:
+                break
+            time.sleep(interval)
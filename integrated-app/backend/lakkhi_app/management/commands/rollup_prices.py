@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from lakkhi_app.price_history import rollup_prices
+
+
+class Command(BaseCommand):
+    help = "Downsample token price samples into 1m/1h/1d rollups and prune expired history"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Seconds between rollup runs'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Roll up once and exit'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                result = rollup_prices()
+                written = ', '.join(f"{count} {resolution}" for resolution, count in result['written'].items())
+                self.stdout.write(f"Price rollups written: {written}")
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f"Error rolling up token prices: {e}"))
+            finally:
+                close_old_connections()
+
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from lakkhi_app.tx_outbox import run_worker
+
+
+class Command(BaseCommand):
+    help = "Sign and broadcast queued outbox transactions for one chain (run one process per chain)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chain',
+            default='BSC',
+            choices=['BSC', 'Ethereum', 'Base'],
+            help='Chain to send on'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=None,
+            help='Senders handled in parallel (defaults to OUTBOX_CONCURRENCY)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send what is ready once and exit'
+        )
+
+    def handle(self, *args, **options):
+        chain = options['chain']
+        self.stdout.write(f"Sending outbox transactions on {chain}")
+        run_worker(
+            chain,
+            concurrency=options['concurrency'],
+            once=options['once'],
+            on_sent=lambda sent: self.stdout.write(f"{chain}: {sent} transaction(s) sent")
+        )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+
+from lakkhi_app.scheduler import Scheduler, release_leadership, run_now
+
+
+class Command(BaseCommand):
+    help = "Run the periodic job scheduler - jobs only run while this process holds the scheduler lease"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Jobs run in parallel (default: settings.SCHEDULER_WORKERS)'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run the jobs that are due once, wait for them and exit'
+        )
+        parser.add_argument(
+            '--run',
+            action='append',
+            default=[],
+            help='Make a job due now (repeatable)'
+        )
+
+    def handle(self, *args, **options):
+        for name in options['run']:
+            if not run_now(name):
+                self.stdout.write(self.style.WARNING(f"Unknown job {name} (it has never been scheduled)"))
+
+        scheduler = Scheduler(workers=options['workers'])
+        if options['once']:
+            started = scheduler.tick()
+            if not scheduler.is_leader:
+                self.stdout.write(self.style.WARNING("Another process holds the scheduler lease"))
+                return
+            scheduler.wait()
+            release_leadership()
+            self.stdout.write(f"{started} job(s) run")
+            return
+
+        self.stdout.write(f"Scheduler running with jobs: {', '.join(scheduler.jobs)}")
+        scheduler.run()
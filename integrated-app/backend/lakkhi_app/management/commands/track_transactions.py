@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from lakkhi_app.tx_tracker import check_pending, poll_interval
+
+
+class Command(BaseCommand):
+    help = "Poll receipts for pending transactions on each chain (run instead of in-process pollers)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chains',
+            nargs='+',
+            default=['BSC', 'Ethereum', 'Base'],
+            help='Chains to poll'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Check pending transactions once and exit'
+        )
+
+    def handle(self, *args, **options):
+        chains = options['chains']
+        interval = min(poll_interval(chain) for chain in chains)
+
+        while True:
+            for chain in chains:
+                try:
+                    resolved = check_pending(chain)
+                    if resolved:
+                        self.stdout.write(f"{chain}: {resolved} transaction(s) resolved")
+                except Exception as e:
+                    self.stdout.write(self.style.ERROR(f"Error polling {chain}: {e}"))
+                finally:
+                    close_old_connections()
+
+            if options['once']:
+                break
+            time.sleep(interval)
@@ -1,4 +1,6 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from phonenumber_field.modelfields import PhoneNumberField
 from ckeditor.fields import RichTextField
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser
@@ -260,6 +262,91 @@ class TokenPrice(models.Model):
         return f"${self.price} ({self.last_updated})"
 
 
+class TokenPriceSample(models.Model):
+    """
+    One observed USD price of a token (price_history.py)
+    Kept for PRICE_HISTORY_RETENTION['raw'] seconds, then only the rollups remain
+    """
+    blockchain = models.CharField(max_length=20, default='BSC')
+    token_address = models.CharField(max_length=42)  # Stored lowercase
+    timestamp = models.DateTimeField()
+    price = models.FloatField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['blockchain', 'token_address', 'timestamp'], name='token_price_sample_ts')
+        ]
+
+    def __str__(self):
+        return f"{self.token_address} on {self.blockchain}: ${self.price} at {self.timestamp}"
+
+
+class TokenPriceRollup(models.Model):
+    """
+    Open/high/low/close of a token's USD price over one 1m, 1h or 1d bucket
+    `close_at` is when the closing price was observed
+    """
+    RESOLUTION_CHOICES = [
+        ('1m', '1 minute'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+
+    blockchain = models.CharField(max_length=20, default='BSC')
+    token_address = models.CharField(max_length=42)  # Stored lowercase
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES)
+    bucket_start = models.DateTimeField()
+    open = models.FloatField()
+    high = models.FloatField()
+    low = models.FloatField()
+    close = models.FloatField()
+    close_at = models.DateTimeField()
+    samples = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['blockchain', 'token_address', 'resolution', 'bucket_start'],
+                name='unique_token_price_rollup'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['blockchain', 'token_address', 'resolution', 'close_at'], name='token_price_rollup_close')
+        ]
+
+    def __str__(self):
+        return f"{self.token_address} on {self.blockchain} {self.resolution} from {self.bucket_start}: ${self.close}"
+
+
+class TokenMetadata(models.Model):
+    """
+    Persistent cache of ERC20 token metadata (name, symbol, decimals)
+    Valid tokens never expire; invalid addresses are cached with a short expiry
+    """
+    blockchain = models.CharField(max_length=20, default='BSC')
+    address = models.CharField(max_length=42)  # Stored lowercase
+    name = models.CharField(max_length=254, blank=True, default='')
+    symbol = models.CharField(max_length=50, blank=True, default='')
+    decimals = models.PositiveSmallIntegerField(null=True, blank=True)
+    is_valid = models.BooleanField(default=True)
+    error_message = models.CharField(max_length=500, blank=True, default='')
+    expires_at = models.DateTimeField(null=True, blank=True)  # Only set for invalid entries
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('blockchain', 'address')
+        verbose_name_plural = "Token metadata"
+
+    def __str__(self):
+        if self.is_valid:
+            return f"{self.symbol} ({self.address} on {self.blockchain})"
+        return f"Invalid token {self.address} on {self.blockchain}"
+
+    @property
+    def is_expired(self):
+        return self.expires_at is not None and timezone.now() > self.expires_at
+
+
 class ProjectFile(models.Model):
     owner = models.ForeignKey(Project, null=True, blank=False, on_delete=models.CASCADE)
     file = models.FileField(
@@ -347,17 +434,22 @@ class Campaign(models.Model):
     twitter = models.CharField(max_length=50, null=True, blank=True)
     telegram = models.CharField(max_length=50, null=True, blank=True)
     discord = models.CharField(max_length=50, null=True, blank=True)
+
+    # Funding totals, maintained as contributions are added and removed (campaign_totals.py)
+    raised_total = models.DecimalField(max_digits=24, decimal_places=8, default=0)
+    contributor_count = models.PositiveIntegerField(default=0)
+    last_contribution_at = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
         return self.title
     
     @property
     def total_raised(self):
-        return sum(contribution.amount for contribution in self.contributions.all())
+        return self.raised_total
     
     @property
     def total_contributors(self):
-        return self.contributions.values('user').distinct().count()
+        return self.contributor_count
     
     @property
     def is_funded(self):
@@ -402,6 +494,16 @@ class Release(models.Model):
     release_date = models.DateTimeField(blank=True, null=True)
     transaction_hash = models.CharField(max_length=66, blank=True, null=True)
 
+    # Set by the event indexer for releases seen on-chain
+    log_index = models.IntegerField(null=True, blank=True)
+    block_number = models.BigIntegerField(null=True, blank=True)
+    indexed = models.BooleanField(default=False)  # Created by the indexer rather than a local request
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_hash', 'log_index'], name='unique_release_log')
+        ]
+
     def __str__(self):
         return f"{self.campaign.title} - {self.title} ({self.status})"
 
@@ -463,15 +565,48 @@ class Comment(models.Model):
 
 class Contribution(models.Model):
     campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='contributions')
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='contributions')
+    # Null for deposits made directly to the contract, found by the event indexer
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='contributions', null=True, blank=True)
     amount = models.DecimalField(max_digits=18, decimal_places=8)
     currency = models.CharField(max_length=10, default='USD')
     transaction_hash = models.CharField(max_length=66, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     is_anonymous = models.BooleanField(default=False)
 
+    # Set by the event indexer for deposits seen on-chain
+    wallet_address = models.CharField(max_length=42, blank=True, null=True)
+    log_index = models.IntegerField(null=True, blank=True)
+    block_number = models.BigIntegerField(null=True, blank=True)
+    indexed = models.BooleanField(default=False)  # Created by the indexer rather than a local write
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['transaction_hash', 'log_index'], name='unique_contribution_log')
+        ]
+
     def __str__(self):
-        return f"{self.user.username} - {self.amount} {self.currency} to {self.campaign.title}"
+        contributor = self.user.username if self.user else self.wallet_address
+        return f"{contributor} - {self.amount} {self.currency} to {self.campaign.title}"
+
+    def save(self, *args, **kwargs):
+        # post_save is sent after save_base's own transaction, so hold one open
+        # for the campaign's totals to change together with the insert
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+
+@receiver(post_save, sender=Contribution)
+def _count_contribution(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        from .campaign_totals import contribution_added
+        contribution_added(instance)
+
+
+@receiver(post_delete, sender=Contribution)
+def _uncount_contribution(sender, instance, **kwargs):
+    # Also sent for QuerySet.delete() and cascades, inside the deleting transaction
+    from .campaign_totals import contribution_removed
+    contribution_removed(instance)
 
 
 class PaymentSession(models.Model):
@@ -495,4 +630,347 @@ class PaymentSession(models.Model):
     
     @property
     def is_expired(self):
-        return timezone.now() > self.expires_at 
\ No newline at end of file
+        return timezone.now() > self.expires_at
+
+
+class PendingTransaction(models.Model):
+    """
+    A broadcast transaction waiting for its receipt
+    Polled in batches by the confirmation tracker (tx_tracker.py)
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('confirmed', 'Confirmed'),
+        ('failed', 'Failed'),  # Mined but reverted
+        ('dropped', 'Dropped'),  # Never mined and no longer known to the node
+    ]
+
+    blockchain = models.CharField(max_length=20, default='BSC')
+    tx_hash = models.CharField(max_length=66, unique=True)
+    kind = models.CharField(max_length=50)  # e.g. deploy, stake, release
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending', db_index=True)
+
+    # Only this user (or staff) can read the status through the API
+    requested_by = models.ForeignKey(
+        User, null=True, blank=True, on_delete=models.SET_NULL, related_name='pending_transactions'
+    )
+
+    # What to do on confirmation - dotted path to a callable(pending_tx, receipt)
+    callback = models.CharField(max_length=254, blank=True, default='')
+    callback_kwargs = JSONField(default=dict, blank=True)
+    callback_error = models.TextField(blank=True, default='')
+
+    # Receipt details
+    block_number = models.BigIntegerField(null=True, blank=True)
+    gas_used = models.BigIntegerField(null=True, blank=True)
+    contract_address = models.CharField(max_length=42, blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    confirmed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['blockchain', 'status'])]
+
+    def __str__(self):
+        return f"{self.kind} {self.tx_hash} ({self.status})"
+
+
+class CustodialWallet(models.Model):
+    """
+    Platform-held wallet (custom_wallet.WalletManager), e.g. a card payer's or a stake pool's
+    The private key is stored as an eth_account keystore encrypted with WALLET_ENCRYPTION_KEY,
+    so every process (web workers, outbox workers) can sign for it
+    """
+    identifier = models.CharField(max_length=254, unique=True)  # e.g. the payer's email
+    address = models.CharField(max_length=42, unique=True)  # Checksum address
+    keystore = JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.identifier} ({self.address})"
+
+
+class OutboxTransaction(models.Model):
+    """
+    A chain write waiting to be signed and broadcast by an outbox worker (tx_outbox.py)
+    Once broadcast it is handed over to the confirmation tracker as a PendingTransaction
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),  # Claimed by a worker
+        ('sent', 'Sent'),
+        ('dead', 'Dead'),  # Gave up after OUTBOX_MAX_ATTEMPTS, or a worker died mid-send
+    ]
+
+    blockchain = models.CharField(max_length=20, default='BSC')
+    sender = models.CharField(max_length=42)  # Checksum address
+    signer = models.CharField(max_length=20, default='custodial')  # Where the worker finds the key: custodial, admin
+    kind = models.CharField(max_length=50)  # e.g. swap, approve, stake, release
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+
+    # The call itself - nonce and gas price are filled in when it is sent
+    to_address = models.CharField(max_length=42)
+    data = models.TextField(blank=True, default='0x')
+    value = models.CharField(max_length=78, default='0')  # Wei, as a string - may exceed a bigint
+    gas = models.BigIntegerField()
+
+    # Passed on to tx_tracker.track_transaction() once broadcast
+    callback = models.CharField(max_length=254, blank=True, default='')
+    callback_kwargs = JSONField(default=dict, blank=True)
+
+    # Retry state
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+
+    nonce = models.BigIntegerField(null=True, blank=True)
+    tx_hash = models.CharField(max_length=66, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['blockchain', 'status'])]
+
+    def __str__(self):
+        return f"{self.kind} from {self.sender} ({self.status})"
+
+
+class PaymentIdempotencyKey(models.Model):
+    """
+    Processing state and result of one provider payment, keyed by the provider's transaction ID
+    Repeated callbacks for the same payment get the stored result instead of a new stake flow
+    """
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    provider = models.CharField(max_length=50)  # e.g. mercuryo
+    transaction_id = models.CharField(max_length=254)  # Mercuryo's merchant_transaction_id
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing')
+    result = JSONField(default=dict, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'transaction_id'], name='unique_payment_idempotency_key')
+        ]
+
+    def __str__(self):
+        return f"{self.provider} payment {self.transaction_id} ({self.status})"
+
+
+class PaymentPipeline(models.Model):
+    """
+    Persisted swap -> approve -> stake pipeline for one card payment (payment_pipeline.py)
+    step is the last step confirmed on-chain, so a resumed pipeline never redoes finished work
+    """
+    STEP_CHOICES = [
+        ('pending', 'Pending'),  # Nothing confirmed yet
+        ('swapped', 'Swapped'),
+        ('approved', 'Approved'),
+        ('staked', 'Staked'),  # All on-chain work done
+        ('completed', 'Completed'),  # Contribution recorded
+    ]
+    STATUS_CHOICES = [
+        ('created', 'Created'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),  # Stopped at a step - resumable
+        ('completed', 'Completed'),
+    ]
+
+    idempotency_key = models.OneToOneField(
+        PaymentIdempotencyKey, null=True, blank=True, on_delete=models.SET_NULL, related_name='pipeline'
+    )
+    contribution = models.ForeignKey(
+        Contribution, null=True, blank=True, on_delete=models.SET_NULL, related_name='pipelines'
+    )
+
+    # Payment details
+    project_id = models.IntegerField()
+    wallet_address = models.CharField(max_length=42)
+    blockchain = models.CharField(max_length=20, default='BSC')
+    native_amount = models.DecimalField(max_digits=36, decimal_places=18)
+    usd_amount = models.DecimalField(max_digits=20, decimal_places=2)
+    contributor_email = models.CharField(max_length=254, blank=True, default='')
+    router = models.BooleanField(default=False)  # One ContributionRouter call instead of three transactions
+
+    step = models.CharField(max_length=20, choices=STEP_CHOICES, default='pending')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='created', db_index=True)
+
+    # Per-step transactions and amounts - a hash without a confirmed step is still pending
+    swap_tx_hash = models.CharField(max_length=66, blank=True, null=True)
+    approve_tx_hash = models.CharField(max_length=66, blank=True, null=True)
+    stake_tx_hash = models.CharField(max_length=66, blank=True, null=True)
+    token_amount = models.DecimalField(max_digits=36, decimal_places=18, null=True, blank=True)
+    stake_amount = models.CharField(max_length=78, blank=True, default='')  # Raw token units, as a string
+
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Payment pipeline #{self.pk} for project {self.project_id} ({self.step}, {self.status})"
+
+
+class StakeBatch(models.Model):
+    """
+    Card contributions to one project, bought into the chain's pool wallet and
+    staked together with a single swap and stake (stake_batches.py)
+    """
+    STATUS_CHOICES = [
+        ('open', 'Open'),  # Accepting contributions
+        ('sealed', 'Sealed'),  # Being swapped and staked by its pipeline
+        ('completed', 'Completed'),
+    ]
+
+    project_id = models.IntegerField()
+    blockchain = models.CharField(max_length=20, default='BSC')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='open')
+    total_native = models.DecimalField(max_digits=36, decimal_places=18, default=0)
+    total_usd = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    contribution_count = models.PositiveIntegerField(default=0)
+    pipeline = models.OneToOneField(
+        PaymentPipeline, null=True, blank=True, on_delete=models.SET_NULL, related_name='stake_batch'
+    )
+    opened_at = models.DateTimeField(auto_now_add=True)
+    sealed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['project_id', 'blockchain', 'status'])]
+
+    def __str__(self):
+        return f"Stake batch #{self.pk} for project {self.project_id} ({self.status})"
+
+
+class StakeAllocation(models.Model):
+    """One card payment's share of a stake batch"""
+    batch = models.ForeignKey(StakeBatch, on_delete=models.CASCADE, related_name='allocations')
+    contributor_email = models.EmailField(max_length=254, blank=True, default='')
+    # Recorded once the batch is staked
+    contribution = models.OneToOneField(
+        Contribution, null=True, blank=True, on_delete=models.SET_NULL, related_name='stake_allocation'
+    )
+    native_amount = models.DecimalField(max_digits=36, decimal_places=18)
+    usd_amount = models.DecimalField(max_digits=20, decimal_places=2)
+    token_amount = models.DecimalField(max_digits=36, decimal_places=18, null=True, blank=True)  # Set once the batch is staked
+
+    def __str__(self):
+        return f"{self.usd_amount} USD of stake batch #{self.batch_id}"
+
+
+class WebhookEvent(models.Model):
+    """
+    Raw payment provider callback, stored exactly as received before it is processed
+    Append-only - processing state lives on WebhookProcessing (webhook_log.py)
+    """
+    provider = models.CharField(max_length=50)  # e.g. mercuryo
+    session_id = models.CharField(max_length=100, blank=True, default='')  # From the callback URL, if any
+    body = models.TextField()  # Undecoded request body - kept even if it isn't valid JSON
+    headers = JSONField(default=dict, blank=True)
+    remote_addr = models.CharField(max_length=45, blank=True, default='')
+    received_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def save(self, *args, **kwargs):
+        if self.pk is not None:
+            raise ValueError("Webhook events are append-only")
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.provider} webhook #{self.pk} ({self.received_at})"
+
+
+class WebhookProcessing(models.Model):
+    """
+    A consumer's claim on a WebhookEvent and the outcome of processing it
+    Creating the row is the claim - the one-to-one key lets only one consumer win
+    """
+    STATUS_CHOICES = [
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    event = models.OneToOneField(WebhookEvent, on_delete=models.CASCADE, related_name='processing')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='processing', db_index=True)
+    result = JSONField(default=dict, blank=True)
+    error = models.TextField(blank=True, default='')
+    claimed_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Webhook #{self.event_id} {self.status}"
+
+
+class IndexerCheckpoint(models.Model):
+    """
+    Last block scanned by the on-chain event indexer (event_indexer.py), per chain
+    The block hash is kept to detect reorgs deeper than the confirmation depth
+    """
+    blockchain = models.CharField(max_length=20, unique=True)
+    block_number = models.BigIntegerField()
+    block_hash = models.CharField(max_length=66, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.blockchain} indexed to block {self.block_number}"
+
+
+class SchedulerLease(models.Model):
+    """
+    Leadership of the periodic job scheduler (scheduler.py)
+    Only the holder runs jobs; the lease is renewed while it lives and taken over once it expires
+    """
+    name = models.CharField(max_length=50, unique=True)
+    holder = models.CharField(max_length=200, blank=True, default='')  # host:pid:id of the leading process
+    expires_at = models.DateTimeField()
+    acquired_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} led by {self.holder or 'nobody'} until {self.expires_at}"
+
+
+class ScheduledJob(models.Model):
+    """
+    Schedule and run metrics of one periodic job (settings.SCHEDULER_JOBS)
+    A run is claimed by moving next_run_at forward, so each interval runs once cluster-wide
+    """
+    STATUS_CHOICES = [
+        ('ok', 'OK'),
+        ('failed', 'Failed'),
+        ('timeout', 'Timed out'),
+    ]
+
+    name = models.CharField(max_length=100, unique=True)
+    next_run_at = models.DateTimeField()
+    last_started_at = models.DateTimeField(null=True, blank=True)
+    last_finished_at = models.DateTimeField(null=True, blank=True)
+    last_duration = models.FloatField(null=True, blank=True)  # Seconds
+    last_status = models.CharField(max_length=20, choices=STATUS_CHOICES, blank=True, default='')
+    last_error = models.TextField(blank=True, default='')
+    last_run_by = models.CharField(max_length=200, blank=True, default='')
+    run_count = models.PositiveIntegerField(default=0)
+    failure_count = models.PositiveIntegerField(default=0)
+    timeout_count = models.PositiveIntegerField(default=0)
+    total_duration = models.FloatField(default=0)  # Seconds across finished runs, for the average
+
+    def __str__(self):
+        return f"{self.name} (next run {self.next_run_at})"
+
+
+class GasSuggestion(models.Model):
+    """
+    Gas suggestions for one chain, published by the scheduler's gas_oracle job (gas_oracle.py)
+    Kept in the database so every process reads the same snapshot whatever cache backend is configured
+    """
+    blockchain = models.CharField(max_length=20, unique=True)
+    suggestions = JSONField(default=dict)  # block_number, gas_price, base_fee, eip1559
+    published_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.blockchain} gas at block {self.suggestions.get('block_number')} ({self.published_at})"
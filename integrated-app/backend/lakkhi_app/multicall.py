@@ -0,0 +1,233 @@
+"""
+Batched contract reads.
+
+Packs many view-function calls into Multicall3 `aggregate3` requests so that
+reading N contracts x M functions costs one RPC round trip per chunk instead
+of N x M. Falls back to a JSON-RPC batch of eth_calls, and finally to
+individual calls, if the multicall itself fails.
+"""
+from eth_abi import decode
+from web3 import Web3
+from django.conf import settings
+
+from .web3_provider import get_web3, batch_request
+from .contract_cache import register_abi, get_contract, get_contract_factory
+
+MULTICALL3_ABI = [
+    {
+        "inputs": [
+            {
+                "components": [
+                    {"internalType": "address", "name": "target", "type": "address"},
+                    {"internalType": "bool", "name": "allowFailure", "type": "bool"},
+                    {"internalType": "bytes", "name": "callData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Call3[]",
+                "name": "calls",
+                "type": "tuple[]"
+            }
+        ],
+        "name": "aggregate3",
+        "outputs": [
+            {
+                "components": [
+                    {"internalType": "bool", "name": "success", "type": "bool"},
+                    {"internalType": "bytes", "name": "returnData", "type": "bytes"}
+                ],
+                "internalType": "struct Multicall3.Result[]",
+                "name": "returnData",
+                "type": "tuple[]"
+            }
+        ],
+        "stateMutability": "payable",
+        "type": "function"
+    }
+]
+register_abi('multicall3', MULTICALL3_ABI)
+
+
+def _abi_type(param):
+    """Canonical ABI type string for an ABI input/output entry (expands tuples)"""
+    if param['type'].startswith('tuple'):
+        inner = ','.join(_abi_type(component) for component in param['components'])
+        return f"({inner}){param['type'][len('tuple'):]}"
+    return param['type']
+
+
+def _find_function_abi(abi, fn_name):
+    """Find the ABI entry for a function by name"""
+    for entry in abi:
+        if entry.get('type') == 'function' and entry.get('name') == fn_name:
+            return entry
+    raise ValueError(f"Function {fn_name} not found in ABI")
+
+
+def _prepare_call(blockchain, address, abi, fn_name, args):
+    """Encode one call and remember how to decode its result"""
+    factory = get_contract_factory(abi, blockchain)
+    fn_abi = _find_function_abi(factory.abi, fn_name)
+    call_data = factory.encodeABI(fn_name=fn_name, args=list(args or []))
+    output_types = [_abi_type(output) for output in fn_abi.get('outputs', [])]
+    return {
+        'target': Web3.to_checksum_address(address),
+        'call_data': call_data,
+        'output_types': output_types,
+    }
+
+
+def _decode_result(output_types, return_data):
+    """Decode raw return data; single-value outputs are unwrapped like contract.call()"""
+    if isinstance(return_data, str):
+        return_data = bytes.fromhex(return_data[2:] if return_data.startswith('0x') else return_data)
+    if not return_data and output_types:
+        return None
+
+    values = decode(output_types, bytes(return_data))
+    values = [
+        Web3.to_checksum_address(value) if output_type == 'address' else value
+        for output_type, value in zip(output_types, values)
+    ]
+    if len(values) == 1:
+        return values[0]
+    return tuple(values)
+
+
+def _read_via_multicall(blockchain, prepared):
+    """Run one chunk through Multicall3.aggregate3"""
+    multicall = get_contract(settings.MULTICALL3_ADDRESS, 'multicall3', blockchain)
+    responses = multicall.functions.aggregate3([
+        (call['target'], True, call['call_data']) for call in prepared
+    ]).call()
+
+    results = []
+    for call, (success, return_data) in zip(prepared, responses):
+        try:
+            results.append(_decode_result(call['output_types'], return_data) if success else None)
+        except Exception as e:
+            print(f"Error decoding multicall result from {call['target']}: {e}")
+            results.append(None)
+    return results
+
+
+def _read_via_batch_rpc(prepared, blockchain):
+    """Run one chunk as a JSON-RPC batch of plain eth_calls"""
+    raw_results = batch_request([
+        ('eth_call', [{'to': call['target'], 'data': call['call_data']}, 'latest'])
+        for call in prepared
+    ], blockchain)
+
+    results = []
+    for call, return_data in zip(prepared, raw_results):
+        try:
+            results.append(_decode_result(call['output_types'], return_data) if return_data else None)
+        except Exception as e:
+            print(f"Error decoding batched eth_call result from {call['target']}: {e}")
+            results.append(None)
+    return results
+
+
+def _read_individually(w3, prepared):
+    """Last resort - one eth_call per read"""
+    results = []
+    for call in prepared:
+        try:
+            return_data = w3.eth.call({'to': call['target'], 'data': call['call_data']})
+            results.append(_decode_result(call['output_types'], return_data))
+        except Exception as e:
+            print(f"Error reading from {call['target']}: {e}")
+            results.append(None)
+    return results
+
+
+def batch_read(calls, blockchain='BSC', chunk_size=None):
+    """
+    Execute many contract view calls with as few RPC round trips as possible
+
+    Args:
+        calls: List of (contract_address, abi, function_name, args) tuples;
+            abi is an ABI list or an id registered with contract_cache.register_abi()
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+        chunk_size: Max calls per multicall request (defaults to settings.MULTICALL_CHUNK_SIZE)
+
+    Returns:
+        list: Decoded result for each call, in order. Failed calls return None.
+    """
+    if not calls:
+        return []
+
+    w3 = get_web3(blockchain)
+    chunk_size = chunk_size or getattr(settings, 'MULTICALL_CHUNK_SIZE', 200)
+    prepared = [_prepare_call(blockchain, address, abi, fn_name, args) for address, abi, fn_name, args in calls]
+
+    results = []
+    for start in range(0, len(prepared), chunk_size):
+        chunk = prepared[start:start + chunk_size]
+        try:
+            results.extend(_read_via_multicall(blockchain, chunk))
+            continue
+        except Exception as e:
+            print(f"Multicall failed on {blockchain}, falling back to batch RPC: {e}")
+
+        try:
+            results.extend(_read_via_batch_rpc(chunk, blockchain))
+            continue
+        except Exception as e:
+            print(f"Batch RPC failed on {blockchain}, falling back to individual calls: {e}")
+
+        results.extend(_read_individually(w3, chunk))
+    return results
+
+
+def batch_rpc_read(calls, blockchain='BSC'):
+    """
+    Execute contract view calls as a single JSON-RPC batch of eth_calls
+
+    Unlike batch_read() this does not depend on a Multicall3 deployment, so it
+    can mix calls to any contracts (e.g. a router quote plus token metadata).
+
+    Args:
+        calls: List of (contract_address, abi, function_name, args) tuples;
+            abi is an ABI list or an id registered with contract_cache.register_abi()
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+
+    Returns:
+        list: Decoded result for each call, in order. Failed calls return None.
+    """
+    if not calls:
+        return []
+
+    w3 = get_web3(blockchain)
+    prepared = [_prepare_call(blockchain, address, abi, fn_name, args) for address, abi, fn_name, args in calls]
+
+    try:
+        return _read_via_batch_rpc(prepared, blockchain)
+    except Exception as e:
+        print(f"Batch RPC failed on {blockchain}, falling back to individual calls: {e}")
+        return _read_individually(w3, prepared)
+
+
+def multicall_read(contract_addresses, function_names, abi, blockchain='BSC', chunk_size=None):
+    """
+    Read the same zero-argument view functions from many contracts at once
+
+    Args:
+        contract_addresses: List of contract addresses
+        function_names: List of view function names to call on every contract
+        abi: ABI (or registered abi id) shared by all the contracts
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+        chunk_size: Max calls per multicall request
+
+    Returns:
+        dict: {contract_address: {function_name: value or None}}
+    """
+    calls = [
+        (address, abi, fn_name, [])
+        for address in contract_addresses
+        for fn_name in function_names
+    ]
+    values = iter(batch_read(calls, blockchain, chunk_size))
+
+    results = {}
+    for address in contract_addresses:
+        results[address] = {fn_name: next(values) for fn_name in function_names}
+    return results
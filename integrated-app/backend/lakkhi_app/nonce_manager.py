@@ -0,0 +1,119 @@
+"""
+Per-address nonce allocator.
+
+Multi-step flows (swap -> approve -> stake) used to wait for each receipt
+and re-read get_transaction_count before sending the next step. Handing
+out nonces locally lets dependent transactions be signed and broadcast
+back-to-back, so the whole flow confirms in roughly one block.
+
+The next nonce for each (chain, address) is kept in the Django cache and
+allocated under a cache lock (cache.add), so with a shared cache backend
+(REDIS_URL or CACHE_BACKEND=database, see CACHES) every worker draws from
+the same sequence. The local-memory default only coordinates threads of a
+single process. The cached
+value expires after NONCE_CACHE_TIMEOUT seconds of inactivity and is
+resynced from the node's pending transaction count whenever a send fails.
+"""
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .web3_provider import get_web3
+
+# Node errors meaning our cached nonce is behind the chain
+NONCE_ERRORS = (
+    'nonce too low',
+    'replacement transaction underpriced',
+)
+
+
+def _cache_key(address, blockchain):
+    return f"nonce:{blockchain}:{address.lower()}"
+
+
+def _lock_timeout():
+    # The lock is held across get_transaction_count, so it has to outlive a slow RPC
+    return max(getattr(settings, 'NONCE_LOCK_TIMEOUT', 40), getattr(settings, 'WEB3_REQUEST_TIMEOUT', 15) * 2)
+
+
+@contextmanager
+def _address_lock(key):
+    """Cross-worker lock on one address, held only while a nonce is allocated"""
+    lock_key = f"{key}:lock"
+    lock_timeout = _lock_timeout()
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + lock_timeout
+    # cache.add only succeeds if the key doesn't exist yet; the timeout frees
+    # the lock if the holder dies
+    while not cache.add(lock_key, token, lock_timeout):
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Timed out waiting for nonce lock on {key}")
+        time.sleep(0.05)
+    try:
+        yield
+    finally:
+        # Only release our own lock - if it expired, another worker may hold it now
+        if cache.get(lock_key) == token:
+            cache.delete(lock_key)
+
+
+def allocate_nonce(address, blockchain='BSC'):
+    """
+    Reserve the next nonce for an address
+
+    Args:
+        address: Sending wallet address
+        blockchain: The blockchain the transaction will be sent on
+
+    Returns:
+        int: Nonce to use for the next transaction from this address
+    """
+    key = _cache_key(address, blockchain)
+    with _address_lock(key):
+        nonce = cache.get(key)
+        if nonce is None:
+            # Count transactions still in the mempool too, so we don't reuse their nonces
+            nonce = get_web3(blockchain).eth.get_transaction_count(address, 'pending')
+        cache.set(key, nonce + 1, getattr(settings, 'NONCE_CACHE_TIMEOUT', 300))
+    return nonce
+
+
+def reset_nonce(address, blockchain='BSC'):
+    """Forget the cached nonce so the next allocation resyncs from the node"""
+    key = _cache_key(address, blockchain)
+    with _address_lock(key):
+        cache.delete(key)
+
+
+def is_nonce_error(error):
+    message = str(error).lower()
+    return any(nonce_error in message for nonce_error in NONCE_ERRORS)
+
+
+def send_transaction(tx, private_key, address, blockchain='BSC', max_retries=2):
+    """
+    Sign and broadcast a transaction built with a nonce from allocate_nonce()
+
+    If the node rejects the nonce as already used, the cache is resynced and the
+    transaction is re-signed with a fresh nonce. Any other send error also resets
+    the cache, so the unused nonce is handed out again instead of leaving a gap.
+
+    Returns:
+        HexBytes: The transaction hash
+    """
+    w3 = get_web3(blockchain)
+    attempt = 0
+    while True:
+        try:
+            signed_tx = w3.eth.account.sign_transaction(tx, private_key)
+            return w3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        except Exception as e:
+            reset_nonce(address, blockchain)
+            if not is_nonce_error(e) or attempt >= max_retries:
+                raise
+            attempt += 1
+            print(f"Nonce {tx['nonce']} rejected for {address} on {blockchain}, resyncing: {e}")
+            tx['nonce'] = allocate_nonce(address, blockchain)
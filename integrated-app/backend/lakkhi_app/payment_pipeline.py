@@ -0,0 +1,340 @@
+"""
+Resumable swap -> approve -> stake pipeline for card payments.
+
+Each payment's progress is persisted on a PaymentPipeline row: the tx hash
+and amounts of every step are saved as soon as the step is broadcast, and
+`step` advances only once the step's receipt shows it succeeded. A run
+that stops part way (a revert, an RPC error, a crashed worker) marks the
+pipeline failed, and the next run carries on from the last confirmed step:
+
+- a step broadcast by an earlier run is awaited, never sent again
+- a reverted step is sent again, along with the steps after it
+- confirmed steps are skipped - swapped tokens are staked, not re-bought
+
+The swap is confirmed before anything else is sent: approve and stake use
+the amount its receipt shows was actually received (the slippage minimum
+would leave the rest in the wallet). Approve and stake are then signed with
+consecutive nonces and broadcast back-to-back. With a ContributionRouter
+the pipeline is a single swap-and-stake step, and the amount recorded is
+what its receipt shows was deposited.
+
+Failed pipelines are resumed by a repeated provider callback for the same
+payment, or by `manage.py resume_payments`.
+"""
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .custom_wallet import WalletManager, token_unit, transferred_amount
+from .token_metadata_cache import get_cached_token_info
+from .web3_provider import get_web3
+
+STEPS = ('swap', 'approve', 'stake')
+
+# The pipeline step reached once each on-chain step is confirmed
+CONFIRMED_STEP = {
+    'swap': 'swapped',
+    'approve': 'approved',
+    'stake': 'staked',
+}
+
+STEP_ORDER = ('pending', 'swapped', 'approved', 'staked', 'completed')
+
+# Stored as approve_tx_hash when the allowance already covered the amount
+SKIPPED = 'skipped'
+
+
+class PipelineError(Exception):
+    """A step failed - the pipeline stops and can be resumed from its last confirmed step"""
+
+
+def _save(pipeline, **fields):
+    from .models import PaymentPipeline
+
+    for name, value in fields.items():
+        setattr(pipeline, name, value)
+    PaymentPipeline.objects.filter(pk=pipeline.pk).update(updated_at=timezone.now(), **fields)
+
+
+def _remaining_steps(pipeline):
+    """On-chain steps not confirmed yet, in order"""
+    if pipeline.step in ('staked', 'completed'):
+        return []
+    if pipeline.router:
+        # The router's single call swaps and stakes
+        return ['stake']
+    return list(STEPS[STEP_ORDER.index(pipeline.step):])
+
+
+def _check(result, step):
+    if not result.get('success'):
+        raise PipelineError(f"{step} failed: {result.get('errors') or result.get('message')}")
+    return result['result']
+
+
+def _send_step(pipeline, step):
+    """Broadcast one step and record its tx hash and amounts straight away"""
+    from .models import Project
+
+    project = Project.objects.get(id=pipeline.project_id)
+    native_amount = float(pipeline.native_amount)
+
+    if pipeline.router:
+        result = _check(WalletManager.swap_and_stake(
+            wallet_identifier=pipeline.wallet_address,
+            native_amount=native_amount,
+            contract_address=project.contract_address,
+            token_address=project.token_address,
+            blockchain=pipeline.blockchain,
+            wait_for_receipt=False
+        ), 'swap-and-stake')
+        # The deposited amount is recorded from the receipt once it's mined
+        _save(pipeline, stake_tx_hash=result['transactionHash'], token_amount=result['toAmount'])
+    elif step == 'swap':
+        result = _check(WalletManager.swap_bnb_to_token(
+            wallet_identifier=pipeline.wallet_address,
+            bnb_amount=native_amount,
+            token_address=project.token_address,
+            blockchain=pipeline.blockchain,
+            wait_for_receipt=False
+        ), step)
+        # The quote until the swap is mined; the received amount replaces it on confirmation
+        _save(pipeline, swap_tx_hash=result['transactionHash'], token_amount=result['toAmount'])
+    elif step == 'approve':
+        result = _check(WalletManager.approve_token_spending(
+            wallet_identifier=pipeline.wallet_address,
+            spender_address=project.contract_address,
+            token_address=project.token_address,
+            amount=int(pipeline.stake_amount),
+            blockchain=pipeline.blockchain,
+            wait_for_receipt=False
+        ), step)
+        # No transaction if the allowance already covered the amount
+        _save(pipeline, approve_tx_hash=result['transactionHash'] or SKIPPED)
+    else:
+        result = _check(WalletManager.stake_tokens(
+            wallet_identifier=pipeline.wallet_address,
+            contract_address=project.contract_address,
+            token_address=project.token_address,
+            amount=int(pipeline.stake_amount),
+            blockchain=pipeline.blockchain,
+            wait_for_receipt=False
+        ), step)
+        _save(pipeline, stake_tx_hash=result['transactionHash'])
+
+
+def _record_received(pipeline, step, receipt):
+    """
+    Record the tokens a confirmed swap actually delivered
+
+    Without a router that's the wallet's share of the swap, which approve and
+    stake then spend in full; with one it's what the router deposited.
+    """
+    from .models import Project
+
+    if step != 'swap' and not (step == 'stake' and pipeline.router):
+        return
+
+    project = Project.objects.get(id=pipeline.project_id)
+    recipient = pipeline.wallet_address if step == 'swap' else project.contract_address
+    received = transferred_amount(receipt, project.token_address, recipient)
+    if not received:
+        raise PipelineError(f"{step} transaction {getattr(pipeline, f'{step}_tx_hash')} delivered no tokens")
+    _save(
+        pipeline,
+        stake_amount=str(received),
+        token_amount=Decimal(received) / token_unit(project.token_address, pipeline.blockchain)
+    )
+
+
+def _confirm_sent(pipeline):
+    """
+    Wait for the receipts of broadcast but unconfirmed steps, in order
+
+    A reverted step and every step after it lose their tx hashes (the later
+    ones revert too), so the next run sends them again.
+    """
+    web3 = get_web3(pipeline.blockchain)
+    timeout = getattr(settings, 'PAYMENT_RECEIPT_TIMEOUT', 300)
+
+    remaining = _remaining_steps(pipeline)
+    for index, step in enumerate(remaining):
+        tx_hash = getattr(pipeline, f"{step}_tx_hash")
+        if not tx_hash:
+            return
+        if tx_hash == SKIPPED:
+            _save(pipeline, step=CONFIRMED_STEP[step])
+            continue
+        try:
+            receipt = web3.eth.wait_for_transaction_receipt(tx_hash, timeout=timeout)
+        except Exception as e:
+            # Still pending (or the node is unreachable) - await it again on resume
+            raise PipelineError(f"{step} transaction {tx_hash} not confirmed yet: {e}")
+        if receipt['status'] != 1:
+            _save(pipeline, **{f"{later}_tx_hash": None for later in remaining[index:]})
+            raise PipelineError(f"{step} transaction {tx_hash} reverted")
+        _record_received(pipeline, step, receipt)
+        _save(pipeline, step=CONFIRMED_STEP[step])
+
+
+def record_contribution(pipeline, amount, contributor_email, wallet_address):
+    """
+    Record staked tokens as a Contribution to the project's campaign
+
+    Projects and campaigns are matched by contract address; a project with no
+    campaign has nothing to record. The row carries the stake tx hash, so the
+    event indexer attaches the on-chain deposit to it instead of adding another.
+
+    Returns:
+        Contribution or None
+    """
+    from .models import Campaign, Contribution, Project, User
+
+    project = Project.objects.get(id=pipeline.project_id)
+    if not project.contract_address:
+        return None
+    campaign = Campaign.objects.filter(contract_address__iexact=project.contract_address).first()
+    if campaign is None:
+        return None
+
+    symbol = campaign.token_symbol
+    if not symbol and project.token_address:
+        info = get_cached_token_info(project.token_address, pipeline.blockchain)
+        symbol = info.get('symbol') if info.get('success') else None
+    symbol = symbol or 'TOKEN'
+    return Contribution.objects.create(
+        campaign=campaign,
+        user=User.objects.filter(email=contributor_email.lower()).first() if contributor_email else None,
+        amount=amount,
+        currency=symbol[:10],
+        transaction_hash=pipeline.stake_tx_hash,
+        wallet_address=wallet_address
+    )
+
+
+def _complete(pipeline):
+    """
+    Record the finished contribution and the project's new total
+
+    One short transaction, and the totals are incremented in the UPDATE itself
+    (F expressions), so concurrent contributions to the same project never wait
+    on each other's chain I/O or overwrite each other's totals.
+    """
+    from .models import PaymentPipeline, Project, StakeBatch
+    from .stake_batches import record_batch_staked
+
+    with transaction.atomic():
+        # Only the run that moves the pipeline from staked to completed counts the contribution
+        claimed = PaymentPipeline.objects.filter(pk=pipeline.pk, step='staked').update(
+            step='completed', status='completed', last_error='', updated_at=timezone.now()
+        )
+        if not claimed:
+            return
+
+        batch = StakeBatch.objects.filter(pipeline_id=pipeline.pk).first()
+        if batch is not None:
+            # A batch of card payments staked together - split the tokens between them
+            contributors = record_batch_staked(batch, pipeline)
+        else:
+            contributors = 1
+            contribution = record_contribution(
+                pipeline, pipeline.token_amount, pipeline.contributor_email, pipeline.wallet_address
+            )
+            if contribution is not None:
+                _save(pipeline, contribution_id=contribution.id)
+
+        # Update the project's raised amount
+        Project.objects.filter(id=pipeline.project_id).update(
+            raised_amount=F('raised_amount') + pipeline.usd_amount,
+            number_of_donators=F('number_of_donators') + contributors
+        )
+    pipeline.step, pipeline.status, pipeline.last_error = 'completed', 'completed', ''
+
+
+def _result(pipeline):
+    native_token = "BNB" if pipeline.blockchain == 'BSC' else "ETH"
+    return {
+        "success": True,
+        "message": (
+            f"Address {pipeline.wallet_address} staked {pipeline.native_amount} {native_token} to project id "
+            f"{pipeline.project_id} on {pipeline.blockchain}, tx hash: {pipeline.stake_tx_hash}"
+        )
+    }
+
+
+def run_pipeline(pipeline):
+    """
+    Run a pipeline from its last confirmed step to completion
+
+    Returns:
+        dict: execute_stake_flow-style result
+    """
+    from .models import PaymentPipeline
+
+    # Only one runner at a time - created or failed pipelines are claimed with a conditional update
+    claimed = PaymentPipeline.objects.filter(pk=pipeline.pk, status__in=['created', 'failed']).update(
+        status='running', attempts=F('attempts') + 1, updated_at=timezone.now()
+    )
+    pipeline.refresh_from_db()
+    if pipeline.status == 'completed':
+        return _result(pipeline)
+    if not claimed:
+        return {"success": True, "status": "processing", "message": f"Payment pipeline {pipeline.pk} is already running"}
+
+    try:
+        # Steps an earlier run broadcast are confirmed before anything new is sent
+        _confirm_sent(pipeline)
+
+        # Send what's left back-to-back with consecutive nonces, then confirm it; the
+        # swap is confirmed first so the received amount is known before it's staked
+        for step in _remaining_steps(pipeline):
+            print(f"Payment pipeline {pipeline.pk}: sending {step} on {pipeline.blockchain}")
+            _send_step(pipeline, step)
+            if step == 'swap':
+                _confirm_sent(pipeline)
+        _confirm_sent(pipeline)
+
+        _complete(pipeline)
+        return _result(pipeline)
+    except Exception as e:
+        print(f"Payment pipeline {pipeline.pk} stopped after step '{pipeline.step}' on {pipeline.blockchain}: {e}")
+        _save(pipeline, status='failed', last_error=str(e))
+        return {
+            "success": False,
+            "message": f"Payment stopped after step '{pipeline.step}' on {pipeline.blockchain}: {e}"
+        }
+
+
+def resume_pipelines(limit=50):
+    """
+    Resume failed pipelines, and running ones whose worker stopped
+
+    Returns:
+        int: Number of pipelines that completed
+    """
+    from .models import PaymentPipeline
+    from .payment_processor import PaymentProcessor
+
+    now = timezone.now()
+    abandoned = now - datetime.timedelta(seconds=getattr(settings, 'PAYMENT_PROCESSING_TIMEOUT', 900))
+    PaymentPipeline.objects.filter(status='running', updated_at__lt=abandoned).update(
+        status='failed', last_error='Worker stopped while running'
+    )
+
+    retry_after = now - datetime.timedelta(seconds=getattr(settings, 'PAYMENT_PIPELINE_RETRY_DELAY', 60))
+    resumable = PaymentPipeline.objects.filter(
+        Q(status='failed', updated_at__lt=retry_after) | Q(status='created', created_at__lt=retry_after),
+        attempts__lt=getattr(settings, 'PAYMENT_PIPELINE_MAX_ATTEMPTS', 5)
+    ).order_by('updated_at')[:limit]
+
+    completed = 0
+    for pipeline in resumable:
+        result = run_pipeline(pipeline)
+        if pipeline.idempotency_key_id and pipeline.status in ('completed', 'failed'):
+            PaymentProcessor.finish_payment(pipeline.idempotency_key, result)
+        completed += bool(result.get('success') and pipeline.status == 'completed')
+    return completed
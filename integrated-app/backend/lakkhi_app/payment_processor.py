@@ -7,6 +7,8 @@ from django.conf import settings
 from decimal import Decimal
 
 from .custom_wallet import WalletManager
+from .payment_pipeline import run_pipeline
+from .stake_batches import add_to_batch, aggregation_enabled, is_pool_payment, pool_wallet
 
 
 class PaymentProcessor:
@@ -74,8 +76,12 @@ class PaymentProcessor:
             mercuryo_widget_id = getattr(settings, 'MERCURYO_WIDGET_ID', 'your-mercuryo-widget-id')
             mercuryo_secret_key = getattr(settings, 'MERCURYO_SECRET_KEY', 'your-mercuryo-secret-key')
             
-            # Create or get wallet for the contributor exactly as RareFnd does
-            wallet = WalletManager.get_or_create_wallet(contribution.email)
+            if aggregation_enabled():
+                # Buy into the chain's pool wallet - the payment is staked with others in a batch
+                wallet = pool_wallet(blockchain)
+            else:
+                # Create or get wallet for the contributor exactly as RareFnd does
+                wallet = WalletManager.get_or_create_wallet(contribution.email)
             
             # Generate signature exactly as RareFnd does - using SHA512 of address+secret
             signature = sha512(
@@ -168,20 +174,29 @@ class PaymentProcessor:
                 from .models import Project
                 try:
                     project = Project.objects.get(id=project_id)
-                    blockchain = project.chain or 'BSC'  # Default to BSC if not specified
+                    blockchain = project.blockchain_chain or 'BSC'  # Default to BSC if not specified
                 except Project.DoesNotExist:
                     blockchain = 'BSC'  # Default if project not found
                 
+                # Repeated deliveries of the same payment get the stored result
+                # instead of a second contribution and swap
+                key, stored_result = PaymentProcessor.claim_payment('mercuryo', merchant_transaction_id)
+                if stored_result is not None:
+                    return stored_result
+                
                 # Execute the staking flow with blockchain parameter
-                return PaymentProcessor.execute_stake_flow(
+                result = PaymentProcessor.execute_stake_flow(
                     native_amount=native_amount,
                     wallet_address=wallet_address,
                     project_id=project_id,
                     contributor_email=contributor_email,
                     usd_amount=usd_amount,
                     incentive_id=incentive_id,
-                    blockchain=blockchain
+                    blockchain=blockchain,
+                    idempotency_key=key
                 )
+                PaymentProcessor.finish_payment(key, result)
+                return result
             
             # Return status for non-completed payments
             return {"success": True, "status": data["status"]}
@@ -191,188 +206,114 @@ class PaymentProcessor:
             return {"success": False, "message": f"Error processing Mercuryo callback: {str(e)}"}
 
     @staticmethod
-    def execute_stake_flow(native_amount, wallet_address, project_id, contributor_email, usd_amount, incentive_id=None, blockchain='BSC'):
+    def claim_payment(provider, transaction_id):
+        """
+        Claim a provider payment for processing, once
+        
+        The idempotency row is locked (SELECT ... FOR UPDATE) only while it is
+        checked and marked processing, so concurrent duplicates queue on the
+        lock rather than the whole stake flow, and then see the claim.
+        
+        Returns:
+            tuple: (key, None) if the caller should process the payment, or
+            (key, result) with the stored or in-progress result if not
+        """
+        from django.db import transaction
+        from .models import PaymentIdempotencyKey
+        
+        # get_or_create retries the lookup if a concurrent insert wins the unique constraint
+        key, _ = PaymentIdempotencyKey.objects.get_or_create(provider=provider, transaction_id=transaction_id)
+        
+        with transaction.atomic():
+            key = PaymentIdempotencyKey.objects.select_for_update().get(pk=key.pk)
+            
+            stale_after = datetime.timedelta(seconds=getattr(settings, 'PAYMENT_PROCESSING_TIMEOUT', 900))
+            in_progress = key.status == 'processing' and key.attempts > 0 and timezone.now() - key.updated_at < stale_after
+            if key.status == 'completed':
+                return key, key.result
+            if in_progress:
+                return key, {"success": True, "status": "processing", "message": f"Payment {transaction_id} is already being processed"}
+            
+            # New, failed or abandoned - this caller processes it
+            key.status = 'processing'
+            key.attempts += 1
+            key.save(update_fields=['status', 'attempts', 'updated_at'])
+        return key, None
+    
+    @staticmethod
+    def finish_payment(key, result):
+        """Record the outcome of a claimed payment for repeated callbacks to return"""
+        import json
+        from .models import PaymentIdempotencyKey
+        
+        PaymentIdempotencyKey.objects.filter(pk=key.pk).update(
+            status='completed' if result.get('success') else 'failed',
+            result=json.loads(json.dumps(result, default=str)),
+            updated_at=timezone.now()
+        )
+
+    @staticmethod
+    def execute_stake_flow(native_amount, wallet_address, project_id, contributor_email, usd_amount, incentive_id=None, blockchain='BSC', idempotency_key=None):
         """
         Execute the staking flow after receiving native tokens from Mercuryo
         Supports multiple blockchains (BSC, Ethereum, Base)
         Uses the appropriate DEX router based on the blockchain
+        
+        The swap -> approve -> stake steps run as a persisted pipeline (payment_pipeline.py).
+        Pass the payment's idempotency key so a retried payment resumes its existing
+        pipeline from the last confirmed step instead of starting over.
         """
-        from django.db import transaction
-        from .models import Project, Contribution, Incentive
+        from .models import Project, PaymentPipeline
         
         try:
-            with transaction.atomic():
+            pipeline = None
+            if idempotency_key is not None:
+                pipeline = PaymentPipeline.objects.filter(idempotency_key=idempotency_key).first()
+            
+            if pipeline is None:
                 # Get project by ID
                 project = Project.objects.get(id=project_id)
                 
-                # Get incentive if specified
-                selected_incentive = None
-                if incentive_id:
-                    try:
-                        selected_incentive = Incentive.objects.get(id=incentive_id)
-                    except Incentive.DoesNotExist:
-                        pass  # Continue without incentive
+                # Payments bought into the pool wallet are staked in batches
+                if is_pool_payment(wallet_address, blockchain):
+                    return add_to_batch(project, contributor_email, native_amount, usd_amount, blockchain)
                 
-                # Create the contribution record
-                contribution = Contribution.objects.create(
-                    project=project,
-                    email=contributor_email,
+                # The contribution itself is recorded once the pipeline has staked the tokens
+                pipeline = PaymentPipeline.objects.create(
+                    idempotency_key=idempotency_key,
+                    project_id=project.id,
                     wallet_address=wallet_address,
-                    amount_usd=usd_amount,
-                    incentive_id=incentive_id,
-                    status='processing'
-                )
-                
-                # Determine native token name based on blockchain
-                native_token = "BNB"
-                if blockchain == "Ethereum" or blockchain == "Base":
-                    native_token = "ETH"
-                
-                # STEP 1: Swap native token to the project's token using blockchain-specific DEX
-                print(f"Swapping {native_amount} {native_token} to token {project.token_address} on {blockchain}")
-                swap_result = WalletManager.swap_bnb_to_token(
-                    wallet_identifier=wallet_address,
-                    bnb_amount=float(native_amount),
-                    token_address=project.token_address,
-                    blockchain=blockchain
+                    blockchain=blockchain,
+                    native_amount=Decimal(str(native_amount)),
+                    usd_amount=Decimal(str(usd_amount)),
+                    contributor_email=contributor_email or '',
+                    # With a ContributionRouter deployed the swap and stake happen in one transaction,
+                    # for targets that credit the donor rather than the router
+                    router=WalletManager.can_route_to(project.contract_address, blockchain)
                 )
-                
-                if not swap_result['success']:
-                    print(f"Swap failed on {blockchain}: {swap_result.get('errors')}")
-                    contribution.status = 'failed'
-                    contribution.save()
-                    return {
-                        "success": False,
-                        "message": f"Could not swap {native_token} to token on {blockchain}: {swap_result.get('errors')}"
-                    }
-                
-                # Update contribution with token amount and transaction hash
-                token_amount = swap_result['result']['toAmount']
-                contribution.amount_token = token_amount
-                contribution.transaction_hash = swap_result['result']['transactionHash']
-                contribution.save()
-                
-                # STEP 2: Approve the project's smart contract to spend tokens
-                print(f"Approving contract {project.contract_address} to spend tokens on {blockchain}")
-                approval_result = WalletManager.approve_token_spending(
-                    wallet_identifier=wallet_address,
-                    spender_address=project.contract_address,
-                    token_address=project.token_address,
-                    amount=token_amount,
-                    blockchain=blockchain
-                )
-                
-                if not approval_result['success']:
-                    print(f"Approval failed on {blockchain}: {approval_result.get('errors')}")
-                    contribution.status = 'failed'
-                    contribution.save()
-                    return {
-                        "success": False,
-                        "message": f"Could not approve token spending on {blockchain}: {approval_result.get('errors')}"
-                    }
-                
-                # STEP 3: Stake tokens on the project's smart contract
-                print(f"Staking tokens on contract {project.contract_address} on {blockchain}")
-                staking_result = WalletManager.stake_tokens(
-                    wallet_identifier=wallet_address,
-                    contract_address=project.contract_address,
-                    token_address=project.token_address,
-                    amount=token_amount,
-                    blockchain=blockchain
-                )
-                
-                if not staking_result['success']:
-                    print(f"Staking failed on {blockchain}: {staking_result.get('errors')}")
-                    contribution.status = 'failed'
-                    contribution.save()
-                    return {
-                        "success": False,
-                        "message": f"Could not stake tokens on {blockchain}: {staking_result.get('errors')}"
-                    }
-                
-                # Update contribution with final status
-                contribution.status = 'completed'
-                contribution.save()
-                
-                # Update the project's raised amount
-                project.raised_amount += contribution.amount_usd
-                project.number_of_donators += 1
-                project.save()
-                
-                return {
-                    "success": True,
-                    "message": f"Address {wallet_address} staked {native_amount} {native_token} to project id {project_id} on {blockchain}, tx hash: {staking_result['result']['transactionHash']}"
-                }
+            
+            return run_pipeline(pipeline)
                 
         except Exception as e:
             print(f"Error executing stake flow on {blockchain}: {e}")
             return {"success": False, "message": f"Error executing stake flow on {blockchain}: {str(e)}"}
 
     @staticmethod
-    def get_token_amount_for_usd(usd_amount, token_address):
+    def get_token_amount_for_usd(usd_amount, token_address, blockchain='BSC'):
         """
         Calculate the token amount for a given USD amount
+
+        Priced by the price oracle, so this never waits on an external price
+        API once the token's price is cached.
+
+        Returns:
+            Decimal or None: None if no price is available for the token yet -
+            callers must not record a payment then, but ask the payer to retry
+            once the oracle's background fetch has priced the token
         """
-        # Import required modules
-        import requests
-        from web3 import Web3
-        
-        try:
-            # Get token info from contract
-            from .web3_helper_functions import get_token_info
-            token_info = get_token_info(token_address)
-            
-            if not token_info['success']:
-                # Fallback to default conversion if token info cannot be retrieved
-                conversion_rate = Decimal('100')
-                print(f"Warning: Using fallback conversion rate for {token_address}")
-            else:
-                # Try to get price from CoinGecko
-                symbol = token_info['symbol'].lower()
-                try:
-                    # This is production code - get actual token price from an API
-                    response = requests.get(
-                        f"https://api.coingecko.com/api/v3/simple/price?ids={symbol}&vs_currencies=usd",
-                        timeout=5
-                    )
-                    data = response.json()
-                    
-                    if data and symbol in data and 'usd' in data[symbol]:
-                        token_price = Decimal(str(data[symbol]['usd']))
-                        if token_price > 0:
-                            # Convert USD amount to token amount based on price
-                            conversion_rate = Decimal('1') / token_price
-                        else:
-                            # Fallback if price is zero
-                            conversion_rate = Decimal('100')
-                    else:
-                        # Second attempt with contract address
-                        response = requests.get(
-                            f"https://api.coingecko.com/api/v3/simple/token_price/ethereum?contract_addresses={token_address}&vs_currencies=usd",
-                            timeout=5
-                        )
-                        data = response.json()
-                        
-                        if data and token_address.lower() in data and 'usd' in data[token_address.lower()]:
-                            token_price = Decimal(str(data[token_address.lower()]['usd']))
-                            if token_price > 0:
-                                conversion_rate = Decimal('1') / token_price
-                            else:
-                                conversion_rate = Decimal('100')
-                        else:
-                            # Fallback to default if price API fails
-                            conversion_rate = Decimal('100')
-                except Exception as e:
-                    print(f"Error getting token price: {e}")
-                    conversion_rate = Decimal('100')
-            
-            # Calculate token amount
-            token_amount = Decimal(usd_amount) * conversion_rate
-            print(f"Converting ${usd_amount} to {token_amount} tokens (rate: {conversion_rate})")
-            
-            return token_amount
-            
-        except Exception as e:
-            print(f"Error in token conversion: {e}")
-            # Ultimate fallback
-            return Decimal(usd_amount) * Decimal('100') 
\ No newline at end of file
+        from .price_oracle import get_token_amount_for_usd
+
+        token_amount = get_token_amount_for_usd(usd_amount, token_address, blockchain)
+        if token_amount is None:
+            print(f"Warning: No USD price for {token_address} on {blockchain}")
+        return token_amount
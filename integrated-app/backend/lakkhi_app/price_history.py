@@ -0,0 +1,354 @@
+"""
+Historical token USD prices.
+
+TokenPrice only holds the latest price, so nothing could be valued at the
+time it happened. Prices fetched by the price oracle are now also appended
+as TokenPriceSample rows, at most once per PRICE_HISTORY_SAMPLE_INTERVAL
+per token and process. The scheduler's price_rollups job (or `manage.py
+rollup_prices`) downsamples the samples into 1m buckets, 1m into 1h and 1h
+into 1d (TokenPriceRollup), then drops each tier once it is older than its
+PRICE_HISTORY_RETENTION.
+
+prices_at() is a vectorized as-of join: for every (token, timestamp) pair
+it gives the last price observed at or before that time, or NaN if none
+was seen within max_staleness. Each token's series is read once, finest
+tier first with coarser tiers filling in only before it, and matched to
+all of its timestamps with numpy.searchsorted. Converting thousands of
+contributions to USD takes a few queries per token, not one per row.
+"""
+import datetime
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .cache_utils import LRUCache, MISSING
+
+# Bucket width of each rollup resolution, in seconds
+RESOLUTIONS = {
+    '1m': 60,
+    '1h': 3600,
+    '1d': 86400,
+}
+
+# Each resolution is rolled up from the tier before it
+TIERS = ('raw', '1m', '1h', '1d')
+
+DEFAULT_RETENTION = {
+    'raw': 2 * 86400,
+    '1m': 14 * 86400,
+    '1h': 400 * 86400,
+    '1d': None,  # Kept forever
+}
+
+# (chain, token) -> True while a recent sample exists, to throttle record_price()
+_recently_recorded = LRUCache(maxsize=4096)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _retention(tier):
+    return _setting('PRICE_HISTORY_RETENTION', DEFAULT_RETENTION).get(tier, DEFAULT_RETENTION[tier])
+
+
+def _from_epoch(seconds):
+    return datetime.datetime.fromtimestamp(float(seconds), tz=datetime.timezone.utc)
+
+
+def _to_epoch(timestamps):
+    """Epoch seconds (float64 array) from datetimes, numpy datetime64 or numbers"""
+    values = np.asarray(timestamps)
+    if values.dtype.kind == 'M':
+        return values.astype('datetime64[ns]').astype(np.int64) / 1e9
+    if values.dtype.kind == 'O':
+        return np.fromiter(
+            (value.timestamp() if hasattr(value, 'timestamp') else float(value) for value in values),
+            dtype=np.float64,
+            count=len(values)
+        )
+    return values.astype(np.float64)
+
+
+def record_price(blockchain, token_address, price, timestamp=None, force=False):
+    """
+    Append a price sample
+
+    Samples for a token closer together than PRICE_HISTORY_SAMPLE_INTERVAL
+    are dropped unless force is set.
+
+    Returns:
+        TokenPriceSample or None: The stored sample, None if it was throttled
+    """
+    from .models import TokenPriceSample
+
+    key = (blockchain, token_address.lower())
+    if not force and _recently_recorded.get(key) is not MISSING:
+        return None
+    _recently_recorded.set(key, True, ttl=_setting('PRICE_HISTORY_SAMPLE_INTERVAL', 60))
+
+    return TokenPriceSample.objects.create(
+        blockchain=blockchain,
+        token_address=token_address.lower(),
+        timestamp=timestamp or timezone.now(),
+        price=float(price)
+    )
+
+
+def _source_rows(tier, blockchain, token, since):
+    """
+    Rows of the tier a rollup is built from, in time order, as
+    (position, open, high, low, close, close_at, samples) arrays
+    """
+    from .models import TokenPriceRollup, TokenPriceSample
+
+    if tier == 'raw':
+        rows = TokenPriceSample.objects.filter(blockchain=blockchain, token_address=token)
+        if since is not None:
+            rows = rows.filter(timestamp__gte=since)
+        rows = list(rows.order_by('timestamp').values_list('timestamp', 'price'))
+        if not rows:
+            return None
+        positions = _to_epoch([row[0] for row in rows])
+        prices = np.array([row[1] for row in rows], dtype=np.float64)
+        return positions, prices, prices, prices, prices, positions, np.ones(len(rows), dtype=np.int64)
+
+    rows = TokenPriceRollup.objects.filter(blockchain=blockchain, token_address=token, resolution=tier)
+    if since is not None:
+        rows = rows.filter(bucket_start__gte=since)
+    rows = list(rows.order_by('bucket_start').values_list(
+        'bucket_start', 'open', 'high', 'low', 'close', 'close_at', 'samples'
+    ))
+    if not rows:
+        return None
+    columns = list(zip(*rows))
+    return (
+        _to_epoch(columns[0]),
+        np.array(columns[1], dtype=np.float64),
+        np.array(columns[2], dtype=np.float64),
+        np.array(columns[3], dtype=np.float64),
+        np.array(columns[4], dtype=np.float64),
+        _to_epoch(columns[5]),
+        np.array(columns[6], dtype=np.int64),
+    )
+
+
+def _rollup_token(resolution, blockchain, token):
+    """Build (or rebuild) a token's buckets from its newest existing one on"""
+    from .models import TokenPriceRollup
+
+    # The newest bucket may have been partial, so it's computed again
+    since = TokenPriceRollup.objects.filter(
+        blockchain=blockchain, token_address=token, resolution=resolution
+    ).order_by('-bucket_start').values_list('bucket_start', flat=True).first()
+
+    source = TIERS[TIERS.index(resolution) - 1]
+    rows = _source_rows(source, blockchain, token, since)
+    if rows is None:
+        return 0
+    positions, opens, highs, lows, closes, close_ats, samples = rows
+
+    width = RESOLUTIONS[resolution]
+    buckets = (positions // width).astype(np.int64)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    rollups = [
+        TokenPriceRollup(
+            blockchain=blockchain,
+            token_address=token,
+            resolution=resolution,
+            bucket_start=_from_epoch(bucket * width),
+            open=open_,
+            high=high,
+            low=low,
+            close=close,
+            close_at=_from_epoch(close_at),
+            samples=count
+        )
+        for bucket, open_, high, low, close, close_at, count in zip(
+            buckets[starts].tolist(),
+            opens[starts].tolist(),
+            np.maximum.reduceat(highs, starts).tolist(),
+            np.minimum.reduceat(lows, starts).tolist(),
+            closes[ends].tolist(),
+            close_ats[ends].tolist(),
+            np.add.reduceat(samples, starts).tolist(),
+        )
+    ]
+    TokenPriceRollup.objects.bulk_create(
+        rollups,
+        update_conflicts=True,
+        unique_fields=['blockchain', 'token_address', 'resolution', 'bucket_start'],
+        update_fields=['open', 'high', 'low', 'close', 'close_at', 'samples']
+    )
+    return len(rollups)
+
+
+def _tracked_tokens(tier):
+    from .models import TokenPriceRollup, TokenPriceSample
+
+    if tier == 'raw':
+        rows = TokenPriceSample.objects.all()
+    else:
+        rows = TokenPriceRollup.objects.filter(resolution=tier)
+    return list(rows.values_list('blockchain', 'token_address').distinct())
+
+
+def prune():
+    """Delete samples and rollups older than their tier's retention"""
+    from .models import TokenPriceRollup, TokenPriceSample
+
+    now = timezone.now()
+    deleted = {}
+    for tier in TIERS:
+        retention = _retention(tier)
+        if retention is None:
+            continue
+        cutoff = now - datetime.timedelta(seconds=retention)
+        if tier == 'raw':
+            deleted[tier], _ = TokenPriceSample.objects.filter(timestamp__lt=cutoff).delete()
+        else:
+            deleted[tier], _ = TokenPriceRollup.objects.filter(resolution=tier, bucket_start__lt=cutoff).delete()
+    return deleted
+
+
+def rollup_prices():
+    """
+    Bring every resolution's rollups up to date, then prune expired rows
+
+    Returns:
+        dict: Buckets written per resolution and rows deleted per tier
+    """
+    written = {}
+    for resolution in RESOLUTIONS:
+        source = TIERS[TIERS.index(resolution) - 1]
+        written[resolution] = sum(
+            _rollup_token(resolution, blockchain, token)
+            for blockchain, token in _tracked_tokens(source)
+        )
+    return {'written': written, 'deleted': prune()}
+
+
+def load_series(blockchain, token_address, start, end):
+    """
+    A token's price observations in [start, end] as (epoch seconds, prices) arrays
+
+    Raw samples are used where they exist; each coarser tier only fills the
+    time before the earliest observation of the finer ones. Rollups are
+    placed at their close_at, so no price is seen before it was observed.
+    """
+    from .models import TokenPriceRollup, TokenPriceSample
+
+    token = token_address.lower()
+    start, end = _from_epoch(start), _from_epoch(end)
+    parts = []
+    until = None
+    for tier in TIERS:
+        if tier == 'raw':
+            rows = TokenPriceSample.objects.filter(
+                blockchain=blockchain, token_address=token, timestamp__gte=start, timestamp__lte=end
+            ).order_by('timestamp').values_list('timestamp', 'price')
+        else:
+            rows = TokenPriceRollup.objects.filter(
+                blockchain=blockchain, token_address=token, resolution=tier, close_at__gte=start
+            )
+            rows = rows.filter(close_at__lt=until) if until is not None else rows.filter(close_at__lte=end)
+            rows = rows.order_by('close_at').values_list('close_at', 'close')
+        rows = list(rows)
+        if rows:
+            parts.insert(0, rows)
+            until = rows[0][0]
+            if until <= start:
+                break
+
+    rows = [row for part in parts for row in part]
+    if not rows:
+        return np.empty(0, dtype=np.float64), np.empty(0, dtype=np.float64)
+    return _to_epoch([row[0] for row in rows]), np.array([row[1] for row in rows], dtype=np.float64)
+
+
+def prices_at(blockchains, token_addresses, timestamps, max_staleness=None):
+    """
+    As-of join of token USD prices onto timestamps
+
+    Args:
+        blockchains: One chain name, or one per timestamp
+        token_addresses: One token address, or one per timestamp
+        timestamps: Datetimes, numpy datetime64 values or epoch seconds
+        max_staleness: Seconds a price stays usable after it was observed
+            (PRICE_HISTORY_MAX_STALENESS)
+
+    Returns:
+        numpy.ndarray: float64 price per timestamp, NaN where none is known
+    """
+    epochs = _to_epoch(timestamps)
+    count = len(epochs)
+    if max_staleness is None:
+        max_staleness = _setting('PRICE_HISTORY_MAX_STALENESS', 2 * 86400)
+
+    chains = np.full(count, blockchains, dtype=object) if isinstance(blockchains, str) else np.asarray(blockchains, dtype=object)
+    if isinstance(token_addresses, str):
+        tokens = np.full(count, token_addresses.lower(), dtype=object)
+    else:
+        tokens = np.array([(token or '').lower() for token in token_addresses], dtype=object)
+
+    prices = np.full(count, np.nan)
+    keys = np.array([f"{chain}:{token}" for chain, token in zip(chains, tokens)], dtype=object)
+    for key in np.unique(keys):
+        blockchain, token = key.split(':', 1)
+        if not token:
+            continue
+        mask = keys == key
+        wanted = epochs[mask]
+        series_times, series_prices = load_series(blockchain, token, wanted.min() - max_staleness, wanted.max())
+        if not len(series_times):
+            continue
+
+        index = np.searchsorted(series_times, wanted, side='right') - 1
+        found = index >= 0
+        index = np.clip(index, 0, None)
+        found &= wanted - series_times[index] <= max_staleness
+        prices[mask] = np.where(found, series_prices[index], np.nan)
+    return prices
+
+
+def to_usd(amounts, blockchains, token_addresses, timestamps, max_staleness=None):
+    """Token amounts valued at their as-of prices - NaN where no price is known"""
+    return np.asarray(amounts, dtype=np.float64) * prices_at(blockchains, token_addresses, timestamps, max_staleness)
+
+
+def contribution_usd_values(contributions, max_staleness=None):
+    """
+    USD value of each contribution at the time it was made
+
+    Contributions recorded in USD keep their amount; token contributions
+    (e.g. deposits found by the event indexer) are valued with their
+    campaign token's price as of created_at.
+
+    Args:
+        contributions: Contribution queryset
+
+    Returns:
+        numpy.ndarray: float64 USD value per contribution, in queryset order
+    """
+    rows = list(contributions.values_list(
+        'amount', 'currency', 'created_at', 'campaign__blockchain', 'campaign__token_address'
+    ))
+    if not rows:
+        return np.empty(0, dtype=np.float64)
+
+    amounts, currencies, created, chains, tokens = zip(*rows)
+    values = np.array([float(amount) for amount in amounts], dtype=np.float64)
+    in_tokens = np.array([currency != 'USD' for currency in currencies])
+    if in_tokens.any():
+        selected = np.flatnonzero(in_tokens).tolist()
+        values[in_tokens] = to_usd(
+            values[in_tokens],
+            [chains[index] or 'BSC' for index in selected],
+            [tokens[index] for index in selected],
+            [created[index] for index in selected],
+            max_staleness
+        )
+    return values
@@ -0,0 +1,385 @@
+"""
+Token USD price oracle.
+
+Prices come from pluggable sources tried in order (PRICE_ORACLE_SOURCES):
+
+- DexReserveSource: spot price from the reserve mirror's pairs with the
+  chain's stablecoins, directly or through the wrapped native token
+- CoinGeckoSource: CoinGecko's token_price endpoint, by contract address
+- StaticPriceSource: fixed prices from settings, for tests and local setups
+
+Each (chain, token) price is cached for its TTL (PRICE_ORACLE_TTL, or a
+per-token PRICE_ORACLE_TOKEN_TTLS entry). After that it is still served
+for up to PRICE_ORACLE_STALE_TTL seconds while a background worker fetches
+a fresh one (stale-while-revalidate), so a request only ever waits for a
+source on a token's very first lookup - and then at most
+PRICE_ORACLE_MAX_WAIT seconds. Concurrent lookups of the same token share
+one fetch. Fetched prices are also kept as history (price_history.py).
+
+With the scheduler running, its token_prices job refreshes every known
+token once per interval cluster-wide and other processes pick those
+prices up from the history instead of calling the sources themselves.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+from .cache_utils import LRUCache, MISSING
+from .price_history import record_price
+
+DEFAULT_SOURCES = [
+    'lakkhi_app.price_oracle.DexReserveSource',
+    'lakkhi_app.price_oracle.CoinGeckoSource',
+]
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class StaticPriceSource:
+    """Fixed USD prices from settings.PRICE_ORACLE_STATIC_PRICES ({chain: {address: price}})"""
+
+    name = 'static'
+
+    def fetch(self, token_address, blockchain):
+        prices = {
+            address.lower(): price
+            for address, price in _setting('PRICE_ORACLE_STATIC_PRICES', {}).get(blockchain, {}).items()
+        }
+        price = prices.get(token_address.lower())
+        return Decimal(str(price)) if price is not None else None
+
+
+class CoinGeckoSource:
+    """USD price by contract address from CoinGecko's token_price endpoint"""
+
+    name = 'coingecko'
+
+    PLATFORMS = {
+        'Ethereum': 'ethereum',
+        'BSC': 'binance-smart-chain',
+        'Base': 'base',
+    }
+
+    def fetch(self, token_address, blockchain):
+        platform = self.PLATFORMS.get(blockchain)
+        if platform is None:
+            return None
+
+        headers = {}
+        if _setting('COINGECKO_API_KEY', ''):
+            headers['x-cg-demo-api-key'] = settings.COINGECKO_API_KEY
+        response = requests.get(
+            f"{_setting('COINGECKO_API_URL', 'https://api.coingecko.com/api/v3')}/simple/token_price/{platform}",
+            params={'contract_addresses': token_address.lower(), 'vs_currencies': 'usd'},
+            headers=headers,
+            timeout=_setting('PRICE_ORACLE_HTTP_TIMEOUT', 5)
+        )
+        response.raise_for_status()
+        price = response.json().get(token_address.lower(), {}).get('usd')
+        return Decimal(str(price)) if price else None
+
+
+class DexReserveSource:
+    """
+    Spot USD price from mirrored DEX reserves
+
+    Uses the token's deepest pair with one of the chain's stablecoins
+    (PRICE_ORACLE_STABLECOINS, counted as $1), or failing that its pair with
+    the wrapped native token priced the same way. Pairs holding less than
+    PRICE_ORACLE_MIN_LIQUIDITY_USD on the priced side are ignored - their
+    price is too easy to move.
+    """
+
+    name = 'dex'
+
+    def _stablecoins(self, blockchain):
+        stablecoins = _setting('PRICE_ORACLE_STABLECOINS', None)
+        if stablecoins is None:
+            stablecoins = _setting('ROUTE_BASE_TOKENS', {})
+        return [address.lower() for address in stablecoins.get(blockchain, [])]
+
+    def _decimals(self, token_addresses, blockchain):
+        from .token_metadata_cache import get_cached_tokens_info
+
+        infos = get_cached_tokens_info(token_addresses, blockchain)
+        return {
+            address.lower(): info['decimals']
+            for address, info in infos.items() if info.get('success')
+        }
+
+    def _stable_price(self, mirror, token, stablecoins, decimals):
+        """(price, stablecoin liquidity in USD) of the token's deepest stablecoin pair, or None"""
+        best = None
+        for stablecoin in stablecoins:
+            reserves = mirror.reserves(token, stablecoin)
+            if not reserves or not reserves[0] or token not in decimals or stablecoin not in decimals:
+                continue
+            token_reserve = Decimal(reserves[0]) / Decimal(10) ** decimals[token]
+            stable_reserve = Decimal(reserves[1]) / Decimal(10) ** decimals[stablecoin]
+            if best is None or stable_reserve > best[1]:
+                best = (stable_reserve / token_reserve, stable_reserve)
+        return best
+
+    def fetch(self, token_address, blockchain):
+        from .reserve_mirror import get_mirror
+
+        token = token_address.lower()
+        stablecoins = self._stablecoins(blockchain)
+        if token in stablecoins:
+            return Decimal(1)
+
+        mirror = get_mirror(blockchain)
+        mirror.ensure_poller()
+        if not mirror.is_tracked(token):
+            mirror.track_tokens([token])
+        if not mirror.is_fresh():
+            mirror.sync()
+            if not mirror.is_fresh():
+                return None
+
+        native = mirror.wrapped_native()
+        decimals = self._decimals([token, native] + stablecoins, blockchain)
+        min_liquidity = Decimal(str(_setting('PRICE_ORACLE_MIN_LIQUIDITY_USD', 1000)))
+
+        direct = self._stable_price(mirror, token, stablecoins, decimals)
+        if direct and direct[1] >= min_liquidity:
+            return direct[0]
+
+        # No usable stablecoin pair - price through the wrapped native token
+        native_price = self._stable_price(mirror, native, stablecoins, decimals)
+        reserves = mirror.reserves(token, native)
+        if not native_price or not reserves or not reserves[0] or token not in decimals:
+            return None
+        native_reserve = Decimal(reserves[1]) / Decimal(10) ** decimals[native]
+        if native_reserve * native_price[0] < min_liquidity:
+            return None
+        token_reserve = Decimal(reserves[0]) / Decimal(10) ** decimals[token]
+        return native_reserve / token_reserve * native_price[0]
+
+
+_prices = LRUCache(maxsize=_setting('PRICE_ORACLE_CACHE_SIZE', 2048))
+
+# (chain, token) -> threading.Event for prices being fetched
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+# Keys no source could price, retried after PRICE_ORACLE_RETRY_DELAY
+_unpriced = LRUCache(maxsize=_setting('PRICE_ORACLE_CACHE_SIZE', 2048))
+
+_executor = None
+_sources = None
+_setup_lock = threading.Lock()
+
+_counters = {'fresh_hits': 0, 'stale_hits': 0, 'misses': 0, 'history_hits': 0, 'coalesced': 0, 'refreshes': 0, 'timeouts': 0}
+_source_errors = {}
+
+
+def get_sources():
+    """Instances of the configured PRICE_ORACLE_SOURCES, in lookup order"""
+    global _sources
+    if _sources is None:
+        with _setup_lock:
+            if _sources is None:
+                _sources = [import_string(path)() for path in _setting('PRICE_ORACLE_SOURCES', DEFAULT_SOURCES)]
+    return _sources
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _setup_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_setting('PRICE_ORACLE_WORKERS', 4),
+                    thread_name_prefix='price-oracle'
+                )
+    return _executor
+
+
+def _key(token_address, blockchain):
+    return (blockchain, token_address.lower())
+
+
+def _ttl(key):
+    overrides = {address.lower(): ttl for address, ttl in _setting('PRICE_ORACLE_TOKEN_TTLS', {}).items()}
+    return overrides.get(key[1], _setting('PRICE_ORACLE_TTL', 60))
+
+
+def _store(key, entry):
+    _prices.set(key, entry, ttl=_ttl(key) + _setting('PRICE_ORACLE_STALE_TTL', 600))
+    _unpriced.delete(key)
+
+
+def _from_history(key):
+    """The newest recorded sample, if it is still within the TTL"""
+    from .models import TokenPriceSample
+
+    sample = TokenPriceSample.objects.filter(
+        blockchain=key[0], token_address=key[1]
+    ).order_by('-timestamp').values_list('timestamp', 'price').first()
+    if sample is None or time.time() - sample[0].timestamp() >= _ttl(key):
+        return None
+    return {'price': Decimal(str(sample[1])), 'source': 'history', 'fetched_at': sample[0].timestamp()}
+
+
+def _fetch(key, use_history=True):
+    """
+    Ask each source in turn and cache the first price found
+
+    A price the scheduler's token_prices job recorded within the TTL is
+    used first, so with the scheduler running only its leader calls sources.
+    """
+    blockchain, token = key
+    if use_history:
+        try:
+            entry = _from_history(key)
+        except Exception as e:
+            print(f"Error reading {token} price history on {blockchain}: {e}")
+            entry = None
+        if entry is not None:
+            _counters['history_hits'] += 1
+            _store(key, entry)
+            return entry
+
+    for source in get_sources():
+        try:
+            price = source.fetch(token, blockchain)
+        except Exception as e:
+            _source_errors[source.name] = _source_errors.get(source.name, 0) + 1
+            print(f"Error getting {token} price on {blockchain} from {source.name}: {e}")
+            continue
+        if price and price > 0:
+            entry = {'price': price, 'source': source.name, 'fetched_at': time.time()}
+            _store(key, entry)
+            try:
+                # Scheduled refreshes always record, so other processes find them in the history
+                record_price(blockchain, token, price, force=not use_history)
+            except Exception as e:
+                print(f"Error recording {token} price history on {blockchain}: {e}")
+            return entry
+
+    _unpriced.set(key, True, ttl=_setting('PRICE_ORACLE_RETRY_DELAY', 30))
+    return None
+
+
+def _refresh(key):
+    """Start fetching a price in the background unless that's already happening - returns its Event"""
+    with _in_flight_lock:
+        done = _in_flight.get(key)
+        if done is not None:
+            _counters['coalesced'] += 1
+            return done
+        done = _in_flight[key] = threading.Event()
+        _counters['refreshes'] += 1
+
+    def run():
+        try:
+            _fetch(key)
+        except Exception as e:
+            print(f"Error refreshing {key[1]} price on {key[0]}: {e}")
+        finally:
+            close_old_connections()
+            with _in_flight_lock:
+                _in_flight.pop(key, None)
+            done.set()
+
+    _get_executor().submit(run)
+    return done
+
+
+def get_price(token_address, blockchain='BSC', max_wait=None):
+    """
+    USD price of a token
+
+    A cached price is returned straight away, and refreshed in the background
+    once it is past its TTL. A token with no cached price waits for the
+    first fetch, up to max_wait (PRICE_ORACLE_MAX_WAIT) seconds.
+
+    Args:
+        token_address: ERC20/BEP20 token address
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+        max_wait: Seconds to wait on a cold cache
+
+    Returns:
+        dict or None: {'price', 'source', 'age', 'stale'}, or None if no
+        source has a price for the token (yet)
+    """
+    key = _key(token_address, blockchain)
+    entry = _prices.get(key)
+
+    if entry is MISSING:
+        _counters['misses'] += 1
+        if _unpriced.get(key) is not MISSING:
+            return None
+        done = _refresh(key)
+        if max_wait is None:
+            max_wait = _setting('PRICE_ORACLE_MAX_WAIT', 2)
+        if not done.wait(max_wait):
+            _counters['timeouts'] += 1
+            return None
+        entry = _prices.get(key)
+        if entry is MISSING:
+            return None
+        age = time.time() - entry['fetched_at']
+        return dict(entry, age=age, stale=False)
+
+    age = time.time() - entry['fetched_at']
+    stale = age >= _ttl(key)
+    if stale:
+        _counters['stale_hits'] += 1
+        if _unpriced.get(key) is MISSING:
+            _refresh(key)
+    else:
+        _counters['fresh_hits'] += 1
+    return dict(entry, age=age, stale=stale)
+
+
+def get_token_amount_for_usd(usd_amount, token_address, blockchain='BSC'):
+    """
+    Tokens worth usd_amount at the oracle price
+
+    Returns:
+        Decimal or None: None if no price is available
+    """
+    quote = get_price(token_address, blockchain)
+    if quote is None:
+        return None
+    return Decimal(str(usd_amount)) / quote['price']
+
+
+def warm_prices(token_addresses, blockchain='BSC'):
+    """Fetch prices that are missing or past their TTL in the background"""
+    for token_address in token_addresses:
+        key = _key(token_address, blockchain)
+        entry = _prices.get(key)
+        if entry is MISSING or time.time() - entry['fetched_at'] >= _ttl(key):
+            _refresh(key)
+
+
+def refresh_prices(token_addresses, blockchain='BSC'):
+    """
+    Fetch fresh prices from the sources now, bypassing the cache and history
+
+    Returns:
+        int: Number of tokens priced
+    """
+    return sum(_fetch(_key(token_address, blockchain), use_history=False) is not None for token_address in token_addresses)
+
+
+def oracle_stats():
+    """Cache and source counters, for monitoring"""
+    stats = _prices.stats()
+    stats.update(_counters)
+    stats['in_flight'] = len(_in_flight)
+    stats['unpriced'] = len(_unpriced)
+    stats['sources'] = [source.name for source in get_sources()]
+    stats['source_errors'] = dict(_source_errors)
+    return stats
@@ -0,0 +1,397 @@
+"""
+In-memory mirror of DEX pair reserves for RPC-free swap quotes.
+
+For every project token paired with the chain's wrapped native token
+(WRAPPED_NATIVE_TOKEN) or one of the ROUTE_BASE_TOKENS stablecoins, and
+for the pairs between those base tokens, reserves are seeded with
+getReserves() and then kept current from the pairs' Sync events, read
+with one eth_getLogs per block. Quotes are computed locally with the
+constant-product formula and the DEX fee (0.25% PancakeSwap, 0.3%
+Uniswap V2); route_finder searches this graph for multi-hop paths.
+
+If the mirror falls behind, quote_amount_out() returns None and the
+caller should fall back to a live (cached) getAmountsOut call. The same
+happens for a token that isn't mirrored yet, or when the gap since the
+last poll is too large to cover with logs; in those cases the reserves
+are reseeded.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from eth_abi import decode
+from web3 import Web3
+
+from .contract_cache import register_abi
+from .gas_oracle import get_gas_suggestions
+from .multicall import batch_read
+from .web3_provider import get_web3
+
+ROUTER_FACTORY_ABI = [{
+    "inputs": [],
+    "name": "factory",
+    "outputs": [{"internalType": "address", "name": "", "type": "address"}],
+    "stateMutability": "view",
+    "type": "function"
+}]
+
+PAIR_FACTORY_ABI = [{
+    "inputs": [
+        {"internalType": "address", "name": "tokenA", "type": "address"},
+        {"internalType": "address", "name": "tokenB", "type": "address"}
+    ],
+    "name": "getPair",
+    "outputs": [{"internalType": "address", "name": "pair", "type": "address"}],
+    "stateMutability": "view",
+    "type": "function"
+}]
+
+PAIR_ABI = [
+    {
+        "inputs": [],
+        "name": "getReserves",
+        "outputs": [
+            {"internalType": "uint112", "name": "_reserve0", "type": "uint112"},
+            {"internalType": "uint112", "name": "_reserve1", "type": "uint112"},
+            {"internalType": "uint32", "name": "_blockTimestampLast", "type": "uint32"}
+        ],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "token0",
+        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "token1",
+        "outputs": [{"internalType": "address", "name": "", "type": "address"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+
+register_abi('router_factory', ROUTER_FACTORY_ABI)
+register_abi('pair_factory', PAIR_FACTORY_ABI)
+register_abi('pair', PAIR_ABI)
+
+SYNC_TOPIC = Web3.to_hex(Web3.keccak(text='Sync(uint112,uint112)'))
+
+# (numerator, denominator) applied to the input amount - PancakeSwap V2 charges 0.25%, Uniswap V2 0.3%
+SWAP_FEES = {
+    'BSC': (9975, 10000),
+    'Ethereum': (997, 1000),
+    'Base': (997, 1000),
+}
+
+ZERO_ADDRESS = '0x0000000000000000000000000000000000000000'
+
+
+def _poll_interval(blockchain):
+    return getattr(settings, 'GAS_ORACLE_POLL_INTERVALS', {}).get(blockchain, 3)
+
+
+def get_amount_out(amount_in, reserve_in, reserve_out, blockchain='BSC'):
+    """Constant-product output for amount_in, same integer math as the router's getAmountOut"""
+    if amount_in <= 0 or reserve_in <= 0 or reserve_out <= 0:
+        return 0
+    fee_numerator, fee_denominator = SWAP_FEES.get(blockchain, SWAP_FEES['Ethereum'])
+    amount_in_with_fee = amount_in * fee_numerator
+    return (amount_in_with_fee * reserve_out) // (reserve_in * fee_denominator + amount_in_with_fee)
+
+
+class ChainReserveMirror:
+    """
+    Reserve graph for one chain
+
+    Tracks the pairs between the chain's route base tokens (wrapped native,
+    stablecoins) and between each project token and every base token.
+    """
+
+    def __init__(self, blockchain):
+        self.blockchain = blockchain
+        self.factory_address = None
+        self.pairs = {}  # pair address (lowercase) -> {'token0', 'token1', 'reserve0', 'reserve1'}
+        self.pair_index = {}  # frozenset({token a, token b}) -> pair address, None if no pair exists
+        self.tracked_tokens = set()  # Tokens whose pairs with every base token have been looked up
+        self.last_block = None
+        self.updated_at = 0
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._thread = None
+        self._tracking = set()  # Tokens being looked up in the background
+        self.sync_events = 0
+        self.reseed_count = 0
+        self.error_count = 0
+
+    def wrapped_native(self):
+        from .custom_wallet import WRAPPED_NATIVE_TOKEN
+        return WRAPPED_NATIVE_TOKEN.get(self.blockchain, WRAPPED_NATIVE_TOKEN['BSC']).lower()
+
+    def base_tokens(self):
+        """Wrapped native token first, then the chain's other routing tokens (lowercase)"""
+        bases = [self.wrapped_native()]
+        for token in getattr(settings, 'ROUTE_BASE_TOKENS', {}).get(self.blockchain, []):
+            if token.lower() not in bases:
+                bases.append(token.lower())
+        return bases
+
+    def _factory(self):
+        if self.factory_address is None:
+            from .custom_wallet import ROUTER_ADDRESSES
+            from .contract_cache import get_contract
+            router_address = ROUTER_ADDRESSES.get(self.blockchain, ROUTER_ADDRESSES['BSC'])
+            router = get_contract(router_address, 'router_factory', self.blockchain)
+            self.factory_address = router.functions.factory().call()
+        return self.factory_address
+
+    def track_tokens(self, token_addresses):
+        """Look up and seed the pairs between new tokens and every base token"""
+        bases = self.base_tokens()
+        tokens = {address.lower() for address in token_addresses if address}
+        if not self.tracked_tokens:
+            tokens |= set(bases)  # Base-to-base pairs connect the multi-hop routes
+        tokens -= self.tracked_tokens
+        if not tokens:
+            return
+
+        pair_keys = []
+        for token in tokens:
+            for base in bases:
+                key = frozenset((token, base))
+                if len(key) == 2 and key not in self.pair_index and key not in pair_keys:
+                    pair_keys.append(key)
+
+        factory = self._factory()
+        pair_addresses = batch_read([
+            (factory, 'pair_factory', 'getPair', [Web3.to_checksum_address(address) for address in sorted(key)])
+            for key in pair_keys
+        ], self.blockchain)
+
+        new_pairs = []
+        failed = set()
+        for key, pair_address in zip(pair_keys, pair_addresses):
+            if pair_address is None:
+                failed |= key  # Lookup failed - retried on the next track_tokens()
+            elif pair_address == ZERO_ADDRESS:
+                self.pair_index[key] = None
+            else:
+                new_pairs.append(pair_address.lower())
+                self.pair_index[key] = pair_address.lower()
+
+        self._seed(new_pairs)
+        self.tracked_tokens |= tokens - failed
+
+    def track_in_background(self, token_address):
+        """track_tokens() for one token on a short-lived thread, at most once at a time"""
+        token = token_address.lower()
+        with self._lock:
+            if token in self._tracking:
+                return
+            self._tracking.add(token)
+
+        def track():
+            try:
+                self.track_tokens([token])
+            except Exception as e:
+                print(f"Error tracking {token} in reserve mirror for {self.blockchain}: {e}")
+            finally:
+                with self._lock:
+                    self._tracking.discard(token)
+
+        threading.Thread(target=track, daemon=True).start()
+
+    def _seed(self, pair_addresses):
+        """Read token0/token1 (first time only) and reserves for pairs with batched calls"""
+        if not pair_addresses:
+            return
+        calls = []
+        for pair in pair_addresses:
+            if pair not in self.pairs:
+                calls.append((pair, 'pair', 'token0', []))
+                calls.append((pair, 'pair', 'token1', []))
+            calls.append((pair, 'pair', 'getReserves', []))
+        reads = iter(batch_read(calls, self.blockchain))
+
+        with self._lock:
+            for pair in pair_addresses:
+                state = self.pairs.get(pair)
+                if state is None:
+                    token0, token1 = next(reads), next(reads)
+                    reserves = next(reads)
+                    if token0 is None or token1 is None or reserves is None:
+                        continue
+                    self.pairs[pair] = {
+                        'token0': token0.lower(),
+                        'token1': token1.lower(),
+                        'reserve0': reserves[0],
+                        'reserve1': reserves[1],
+                    }
+                else:
+                    reserves = next(reads)
+                    if reserves is not None:
+                        state['reserve0'], state['reserve1'] = reserves[0], reserves[1]
+
+    def reseed(self):
+        """Re-read every tracked pair's reserves from the chain"""
+        self._seed(list(self.pairs))
+        self.reseed_count += 1
+
+    def _apply_sync_logs(self, logs):
+        # Sync carries the full reserves, so the last event per pair wins
+        logs = sorted(logs, key=lambda log: (log['blockNumber'], log['logIndex']))
+        with self._lock:
+            for log in logs:
+                state = self.pairs.get(log['address'].lower())
+                if state is None:
+                    continue
+                state['reserve0'], state['reserve1'] = decode(['uint112', 'uint112'], bytes(log['data']))
+                self.sync_events += 1
+
+    def sync(self):
+        """Bring reserves up to the latest block from Sync events (or a reseed after a long gap)"""
+        if not self._sync_lock.acquire(blocking=False):
+            return
+        try:
+            block_number = get_gas_suggestions(self.blockchain)['block_number']
+            if self.last_block is None or block_number - self.last_block > getattr(settings, 'RESERVE_MIRROR_MAX_LOG_RANGE', 500):
+                self.reseed()
+            elif block_number > self.last_block and self.pairs:
+                logs = get_web3(self.blockchain).eth.get_logs({
+                    'fromBlock': self.last_block + 1,
+                    'toBlock': block_number,
+                    'address': [Web3.to_checksum_address(pair) for pair in self.pairs],
+                    'topics': [SYNC_TOPIC],
+                })
+                self._apply_sync_logs(logs)
+            self.last_block = block_number
+            self.updated_at = time.monotonic()
+        except Exception as e:
+            self.error_count += 1
+            print(f"Error syncing reserve mirror for {self.blockchain}: {e}")
+        finally:
+            self._sync_lock.release()
+
+    def _track_known_tokens(self):
+        from .models import Project, Campaign
+
+        tokens = set(Project.objects.filter(blockchain_chain=self.blockchain).values_list('token_address', flat=True))
+        tokens |= set(Campaign.objects.filter(blockchain=self.blockchain).values_list('token_address', flat=True))
+        if self.blockchain == 'BSC':
+            tokens.add(settings.TOKEN_ADDRESS)
+        self.track_tokens([token for token in tokens if token and token.startswith('0x')])
+
+    def _poll(self):
+        try:
+            self._track_known_tokens()
+        except Exception as e:
+            print(f"Error seeding reserve mirror for {self.blockchain}: {e}")
+        finally:
+            close_old_connections()
+        while True:
+            self.sync()
+            time.sleep(_poll_interval(self.blockchain))
+
+    def ensure_poller(self):
+        """Start the background sync thread for this chain if it isn't running"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._poll,
+                    name=f"reserve-mirror-{self.blockchain}",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def is_fresh(self):
+        return self.last_block is not None and time.monotonic() - self.updated_at < _poll_interval(self.blockchain) * 3
+
+    def is_tracked(self, token_address):
+        return token_address.lower() in self.tracked_tokens
+
+    def reserves(self, token_in, token_out):
+        """(reserve in, reserve out) of the pair between two tokens, or None if there is none"""
+        pair = self.pair_index.get(frozenset((token_in.lower(), token_out.lower())))
+        if pair is None:
+            return None
+        with self._lock:
+            state = self.pairs.get(pair)
+            if state is None:
+                return None
+            if state['token0'] == token_in.lower():
+                return state['reserve0'], state['reserve1']
+            return state['reserve1'], state['reserve0']
+
+    def quote_path(self, path, amount_in):
+        """
+        Amounts along a swap path from mirrored reserves, like router.getAmountsOut
+
+        Returns:
+            list or None: None if any hop has no mirrored pair
+        """
+        amounts = [int(amount_in)]
+        for token_in, token_out in zip(path, path[1:]):
+            reserves = self.reserves(token_in, token_out)
+            if reserves is None:
+                return None
+            amounts.append(get_amount_out(amounts[-1], reserves[0], reserves[1], self.blockchain))
+        return amounts
+
+
+_mirrors = {}
+_mirrors_lock = threading.Lock()
+
+
+def get_mirror(blockchain='BSC'):
+    """Get the process-wide reserve mirror for a chain"""
+    mirror = _mirrors.get(blockchain)
+    if mirror is None:
+        with _mirrors_lock:
+            mirror = _mirrors.setdefault(blockchain, ChainReserveMirror(blockchain))
+    return mirror
+
+
+def quote_amount_out(token_address, amount_in, blockchain='BSC'):
+    """
+    Tokens received for amount_in wei of the native token over the direct pair,
+    computed from mirrored reserves
+
+    Returns:
+        int or None: None if the token isn't mirrored yet or the mirror is stale -
+        the caller should fall back to getAmountsOut
+    """
+    mirror = get_mirror(blockchain)
+    mirror.ensure_poller()
+
+    if not mirror.is_tracked(token_address):
+        # Start mirroring this token in the background for the next quote
+        mirror.track_in_background(token_address)
+        return None
+    if not mirror.is_fresh():
+        return None
+
+    amounts = mirror.quote_path([mirror.wrapped_native(), token_address], amount_in)
+    return amounts[-1] if amounts else None
+
+
+def mirror_stats():
+    """Tracked pairs, sync counters and freshness per chain, for monitoring"""
+    return {
+        blockchain: {
+            'pairs': len(mirror.pairs),
+            'tokens': len(mirror.tracked_tokens),
+            'last_block': mirror.last_block,
+            'fresh': mirror.is_fresh(),
+            'sync_events': mirror.sync_events,
+            'reseed_count': mirror.reseed_count,
+            'error_count': mirror.error_count,
+            'poller_alive': mirror._thread is not None and mirror._thread.is_alive(),
+        }
+        for blockchain, mirror in _mirrors.items()
+    }
@@ -0,0 +1,134 @@
+"""
+Multi-hop swap route finder.
+
+Project tokens often have thin (or no) direct pairs with the wrapped
+native token but deep pairs with a stablecoin. For a native -> token swap
+the finder compares the direct path with every 2- and 3-hop path through
+the chain's ROUTE_BASE_TOKENS and picks the one with the largest output:
+
+    [W, T], [W, B, T], [W, B1, B2, T]
+
+The search is bounded (at most 1 + n + n*(n-1) paths for n base tokens)
+and priced from the reserve mirror without any RPC. While the mirror
+isn't ready for a token, all candidate paths are priced with one batched
+getAmountsOut round trip instead.
+
+Chosen routes are memoized per (chain, token, amount bucket, block), so
+get_swap_rates() and the swap that follows it use the same path.
+"""
+from django.conf import settings
+from web3 import Web3
+
+from .cache_utils import LRUCache, MISSING
+from .gas_oracle import get_gas_suggestions
+from .reserve_mirror import get_mirror
+from .swap_quote_cache import bucket_amount, get_amounts_out_many
+
+_routes = LRUCache(maxsize=getattr(settings, 'ROUTE_CACHE_SIZE', 2048))
+
+MAX_HOPS = 3
+
+
+def _ttl(blockchain):
+    # Routes are keyed by block, so they only need to outlive one block
+    return getattr(settings, 'GAS_ORACLE_POLL_INTERVALS', {}).get(blockchain, 3) * 2
+
+
+def candidate_paths(token_address, blockchain='BSC'):
+    """Every native -> token path of up to MAX_HOPS hops through the chain's base tokens (lowercase)"""
+    mirror = get_mirror(blockchain)
+    bases = mirror.base_tokens()
+    native, token = bases[0], token_address.lower()
+    intermediates = [base for base in bases[1:] if base != token]
+
+    paths = [[native, token]]
+    for base in intermediates:
+        paths.append([native, base, token])
+    if MAX_HOPS >= 3:
+        for first in intermediates:
+            for second in intermediates:
+                if first != second:
+                    paths.append([native, first, second, token])
+    return paths
+
+
+def _best(paths, quotes):
+    best = None
+    for path, amounts in zip(paths, quotes):
+        if amounts and amounts[-1] > 0 and (best is None or amounts[-1] > best[1][-1]):
+            best = (path, amounts)
+    return best
+
+
+def find_best_route(token_address, amount_in, router_address, router_abi, blockchain='BSC'):
+    """
+    Best path for swapping amount_in wei of the native token into a token
+
+    Args:
+        token_address: Token to buy
+        amount_in: Native token amount in wei
+        router_address: DEX router address (used when the mirror can't price the paths)
+        router_abi: Registered abi id of the router
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+
+    Returns:
+        dict: 'path' (checksummed addresses), 'amounts', 'amount_out', 'hops'
+        and 'source' ('mirror' or 'router')
+
+    Raises:
+        ValueError: If no candidate path has liquidity
+    """
+    amount_in = int(amount_in)
+    bucket = bucket_amount(amount_in)
+    block_number = get_gas_suggestions(blockchain)['block_number']
+    key = (blockchain, token_address.lower(), bucket, block_number)
+
+    route = _routes.get(key)
+    if route is MISSING:
+        route = _search(token_address, bucket, router_address, router_abi, blockchain)
+        _routes.set(key, route, ttl=_ttl(blockchain))
+
+    if route['amounts'][0] == amount_in:
+        return dict(route)
+
+    # Reprice the memoized path for the exact amount (cheap from the mirror)
+    mirror = get_mirror(blockchain)
+    amounts = mirror.quote_path(route['path'], amount_in) if route['source'] == 'mirror' else None
+    if amounts is None:
+        ratio = amount_in / route['amounts'][0]
+        amounts = [amount_in] + [int(amount * ratio) for amount in route['amounts'][1:]]
+    return dict(route, amounts=amounts, amount_out=amounts[-1])
+
+
+def _search(token_address, amount_in, router_address, router_abi, blockchain):
+    paths = candidate_paths(token_address, blockchain)
+    mirror = get_mirror(blockchain)
+    mirror.ensure_poller()
+
+    source = 'mirror'
+    best = None
+    if mirror.is_tracked(token_address) and mirror.is_fresh():
+        best = _best(paths, [mirror.quote_path(path, amount_in) for path in paths])
+    else:
+        # Mirror the token's pairs for next time
+        mirror.track_in_background(token_address)
+
+    if best is None:
+        source = 'router'
+        best = _best(paths, get_amounts_out_many(router_address, router_abi, amount_in, paths, blockchain))
+    if best is None:
+        raise ValueError(f"No swap route with liquidity to {token_address} on {blockchain}")
+
+    path, amounts = best
+    return {
+        'path': [Web3.to_checksum_address(address) for address in path],
+        'amounts': amounts,
+        'amount_out': amounts[-1],
+        'hops': len(path) - 1,
+        'source': source,
+    }
+
+
+def route_stats():
+    """Route memo hit rate, for monitoring"""
+    return _routes.stats()
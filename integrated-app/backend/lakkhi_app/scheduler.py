@@ -0,0 +1,266 @@
+"""
+Leader-elected periodic job scheduler.
+
+Background refresh loops used to run in every process that started them,
+so N gunicorn workers on M nodes polled prices N x M times and raced on
+the same rows. Now every process may run a scheduler thread (or
+`manage.py run_scheduler`), but only the holder of the SchedulerLease row
+runs jobs. The lease is taken with a conditional UPDATE, renewed every
+tick and taken over by another process once it has been unrenewed for
+SCHEDULER_LEASE_SECONDS.
+
+Jobs are configured in SCHEDULER_JOBS as {name: {'func', 'interval',
+'timeout', 'jitter'}}. Each job's ScheduledJob row holds its next run
+time; a run is claimed by moving next_run_at forward with a conditional
+UPDATE, so even two processes that both believe they lead (during a
+handover) run each interval once. Next runs are spread with random
+jitter so jobs with equal intervals don't fire together.
+
+Jobs run on a small thread pool. A run past its timeout is recorded as
+timed out and the job is not started again until the stuck call returns
+(threads can't be killed). Run counts, durations and outcomes are kept on
+the ScheduledJob rows - see scheduler_stats().
+"""
+import datetime
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+LEASE_NAME = 'scheduler'
+
+# Identifies this process as a lease holder
+NODE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_jobs():
+    """Configured jobs with defaults filled in: {name: {'func', 'interval', 'timeout', 'jitter'}}"""
+    jobs = {}
+    for name, job in _setting('SCHEDULER_JOBS', {}).items():
+        interval = job['interval']
+        jobs[name] = {
+            'func': job['func'],
+            'interval': interval,
+            'timeout': job.get('timeout', interval),
+            'jitter': job.get('jitter', interval * _setting('SCHEDULER_JITTER', 0.1)),
+        }
+    return jobs
+
+
+def _next_run(job, now):
+    return now + datetime.timedelta(seconds=job['interval'] + random.uniform(0, job['jitter']))
+
+
+def acquire_leadership(node_id=NODE_ID):
+    """
+    Take or renew the scheduler lease
+
+    Returns:
+        bool: Whether this process leads until the lease's new expiry
+    """
+    from .models import SchedulerLease
+
+    now = timezone.now()
+    expires_at = now + datetime.timedelta(seconds=_setting('SCHEDULER_LEASE_SECONDS', 30))
+    try:
+        SchedulerLease.objects.get_or_create(name=LEASE_NAME, defaults={'expires_at': now})
+    except IntegrityError:
+        pass  # Created by another process at the same time
+
+    renewed = SchedulerLease.objects.filter(name=LEASE_NAME, holder=node_id).update(expires_at=expires_at)
+    if renewed:
+        return True
+    taken = SchedulerLease.objects.filter(name=LEASE_NAME, expires_at__lte=now).update(
+        holder=node_id, expires_at=expires_at, acquired_at=now
+    )
+    if taken:
+        print(f"Scheduler leadership acquired by {node_id}")
+    return bool(taken)
+
+
+def release_leadership(node_id=NODE_ID):
+    """Give the lease up so another process can take over straight away"""
+    from .models import SchedulerLease
+
+    SchedulerLease.objects.filter(name=LEASE_NAME, holder=node_id).update(holder='', expires_at=timezone.now())
+
+
+def _claim_run(name, job):
+    """Move a due job's next run forward - True if this process gets to run it"""
+    from .models import ScheduledJob
+
+    now = timezone.now()
+    try:
+        ScheduledJob.objects.get_or_create(name=name, defaults={'next_run_at': now})
+    except IntegrityError:
+        pass
+    return bool(ScheduledJob.objects.filter(name=name, next_run_at__lte=now).update(
+        next_run_at=_next_run(job, now), last_started_at=now, last_run_by=NODE_ID
+    ))
+
+
+def _record(name, status, duration, error=''):
+    from .models import ScheduledJob
+
+    updates = {
+        'last_status': status,
+        'last_error': error,
+        'last_duration': duration,
+        'last_finished_at': timezone.now(),
+    }
+    if status == 'timeout':
+        updates['timeout_count'] = F('timeout_count') + 1
+    else:
+        updates['run_count'] = F('run_count') + 1
+        updates['total_duration'] = F('total_duration') + duration
+        if status == 'failed':
+            updates['failure_count'] = F('failure_count') + 1
+    ScheduledJob.objects.filter(name=name).update(**updates)
+
+
+def _run_job(name, job):
+    """Call one job - runs on the scheduler's thread pool"""
+    started = time.monotonic()
+    try:
+        import_string(job['func'])()
+    except Exception as e:
+        print(f"Scheduled job {name} failed: {e}")
+        return 'failed', time.monotonic() - started, str(e)
+    finally:
+        close_old_connections()
+    return 'ok', time.monotonic() - started, ''
+
+
+class Scheduler:
+    """One process's scheduler loop - runs the jobs that are due while it leads"""
+
+    def __init__(self, workers=None):
+        self.jobs = get_jobs()
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or _setting('SCHEDULER_WORKERS', 4),
+            thread_name_prefix='scheduled-job'
+        )
+        self.running = {}  # name -> (future, monotonic start, timed out)
+        self.is_leader = False
+
+    def _collect(self):
+        """Record finished runs and flag runs past their timeout"""
+        for name, (future, started, timed_out) in list(self.running.items()):
+            if future.done():
+                del self.running[name]
+                try:
+                    status, duration, error = future.result()
+                except Exception as e:
+                    status, duration, error = 'failed', time.monotonic() - started, str(e)
+                if timed_out:
+                    print(f"Scheduled job {name} returned {status} after {duration:.1f}s, past its timeout")
+                    continue
+                _record(name, status, duration, error)
+            elif not timed_out and time.monotonic() - started > self.jobs[name]['timeout']:
+                self.running[name] = (future, started, True)
+                print(f"Scheduled job {name} timed out after {self.jobs[name]['timeout']}s")
+                _record(name, 'timeout', time.monotonic() - started, f"Still running after {self.jobs[name]['timeout']}s")
+
+    def tick(self):
+        """
+        Renew leadership and start every due job
+
+        Returns:
+            int: Number of jobs started
+        """
+        self._collect()
+        self.is_leader = acquire_leadership()
+        if not self.is_leader:
+            return 0
+
+        started = 0
+        for name, job in self.jobs.items():
+            # A job still running here (even past its timeout) is not started again
+            if name in self.running or not _claim_run(name, job):
+                continue
+            self.running[name] = (self.executor.submit(_run_job, name, job), time.monotonic(), False)
+            started += 1
+        return started
+
+    def wait(self, timeout=None):
+        """Wait for the runs started so far to finish (or time out) and record them"""
+        deadline = time.monotonic() + (timeout or max([job['timeout'] for job in self.jobs.values()] or [0]) + 1)
+        while self.running and time.monotonic() < deadline:
+            time.sleep(0.1)
+            self._collect()
+        self._collect()
+
+    def run(self):
+        """Tick every SCHEDULER_TICK seconds until interrupted"""
+        try:
+            while True:
+                try:
+                    self.tick()
+                except Exception as e:
+                    print(f"Error in scheduler tick: {e}")
+                finally:
+                    close_old_connections()
+                time.sleep(_setting('SCHEDULER_TICK', 1))
+        finally:
+            self.executor.shutdown(wait=False)
+
+
+def ensure_scheduler():
+    """Start the in-process scheduler thread if it isn't already running"""
+    global _scheduler
+    if _scheduler is not None and _scheduler.is_alive():
+        return
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = threading.Thread(target=Scheduler().run, name='scheduler', daemon=True)
+            _scheduler.start()
+
+
+def run_now(name):
+    """Make a job due immediately - the leader starts it on its next tick"""
+    from .models import ScheduledJob
+
+    return ScheduledJob.objects.filter(name=name).update(next_run_at=timezone.now())
+
+
+def scheduler_stats():
+    """Current leader and per-job run metrics, for monitoring"""
+    from .models import ScheduledJob, SchedulerLease
+
+    now = timezone.now()
+    lease = SchedulerLease.objects.filter(name=LEASE_NAME).first()
+    jobs = {}
+    for row in ScheduledJob.objects.order_by('name'):
+        jobs[row.name] = {
+            'next_run_in': (row.next_run_at - now).total_seconds(),
+            'last_status': row.last_status,
+            'last_error': row.last_error,
+            'last_duration': row.last_duration,
+            'last_finished_at': row.last_finished_at,
+            'last_run_by': row.last_run_by,
+            'runs': row.run_count,
+            'failures': row.failure_count,
+            'timeouts': row.timeout_count,
+            'average_duration': row.total_duration / row.run_count if row.run_count else None,
+        }
+    return {
+        'leader': lease.holder if lease and lease.expires_at > now else None,
+        'this_process': NODE_ID,
+        'jobs': jobs,
+    }
@@ -61,9 +61,13 @@ class CampaignSerializer(serializers.ModelSerializer):
             'id', 'owner', 'contract_owner', 'title', 'description', 'story', 'image', 'video_url', 
             'fund_amount', 'currency', 'token_address', 'token_name', 'token_symbol',
             'start_date', 'end_date', 'contract_address', 'status', 'created_at', 
-            'updated_at', 'milestones', 'releases', 'updates', 'is_contract_owner'
+            'updated_at', 'milestones', 'releases', 'updates', 'is_contract_owner',
+            'raised_total', 'contributor_count', 'last_contribution_at'
+        ]
+        read_only_fields = [
+            'owner', 'contract_address', 'created_at', 'updated_at',
+            'raised_total', 'contributor_count', 'last_contribution_at'
         ]
-        read_only_fields = ['owner', 'contract_address', 'created_at', 'updated_at']
     
     def validate(self, data):
         # For existing campaigns, don't allow changing token address, fund amount, or blockchain
@@ -0,0 +1,176 @@
+"""
+Batched staking of card contributions.
+
+Without aggregation every card payment pays for its own swap, approve and
+stake. With PAYMENT_AGGREGATION_ENABLED, Mercuryo checkouts buy into one
+pool wallet per chain instead of the donor's own wallet, and completed
+payments are added to an open StakeBatch for their project. A batch is
+sealed once it reaches PAYMENT_AGGREGATION_THRESHOLD_USD or has been open
+for PAYMENT_AGGREGATION_WINDOW seconds - windows are checked by the
+scheduler's stake_batches job (or `manage.py flush_stake_batches`) - and is
+then swapped and staked from the pool wallet by a single payment pipeline. On-chain writes scale
+with projects x windows rather than with donors.
+
+The staking contract credits the pool wallet; each donor's share of the
+tokens the swap actually delivered is recorded on their StakeAllocation and
+Contribution, pro rata to the native amount they paid. The pool wallet is a
+CustodialWallet, so every worker can sign for it.
+
+The pool wallet pays the batch's gas, so keep it topped up with a little
+native coin beyond what the donors send.
+"""
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .custom_wallet import WalletManager, token_unit
+from .payment_pipeline import record_contribution, run_pipeline
+
+
+def aggregation_enabled():
+    return getattr(settings, 'PAYMENT_AGGREGATION_ENABLED', False)
+
+
+def pool_wallet(blockchain='BSC'):
+    """The custodial wallet card payments on a chain are bought into"""
+    return WalletManager.get_or_create_wallet(f"stake-pool-{blockchain.lower()}@lakkhi")
+
+
+def is_pool_payment(wallet_address, blockchain='BSC'):
+    """True if a payment was delivered to the chain's pool wallet"""
+    return (
+        aggregation_enabled()
+        and bool(wallet_address)
+        and wallet_address.lower() == pool_wallet(blockchain)['address'].lower()
+    )
+
+
+def _seal(batch):
+    """Close a batch to new contributions and create the pipeline that stakes it"""
+    from .models import PaymentPipeline, Project, StakeBatch
+
+    project = Project.objects.get(id=batch.project_id)
+    pipeline = PaymentPipeline.objects.create(
+        project_id=batch.project_id,
+        wallet_address=pool_wallet(batch.blockchain)['address'],
+        blockchain=batch.blockchain,
+        native_amount=batch.total_native,
+        usd_amount=batch.total_usd,
+        router=WalletManager.can_route_to(project.contract_address, batch.blockchain)
+    )
+    StakeBatch.objects.filter(pk=batch.pk).update(status='sealed', sealed_at=timezone.now(), pipeline=pipeline)
+    return pipeline
+
+
+def add_to_batch(project, contributor_email, native_amount, usd_amount, blockchain='BSC'):
+    """
+    Record a completed card payment and add it to its project's open batch
+
+    The batch is staked right away if this payment takes it over the threshold,
+    otherwise when its window closes (flush_due_batches).
+
+    Returns:
+        dict: execute_stake_flow-style result
+    """
+    from .models import Project, StakeAllocation, StakeBatch
+
+    native_amount = Decimal(str(native_amount))
+    usd_amount = Decimal(str(usd_amount))
+    pipeline = None
+
+    with transaction.atomic():
+        # Locking the project serializes batch updates for it - briefly, no chain I/O happens here
+        Project.objects.select_for_update().filter(id=project.id).first()
+        batch = StakeBatch.objects.filter(project_id=project.id, blockchain=blockchain, status='open').first()
+        if batch is None:
+            batch = StakeBatch.objects.create(project_id=project.id, blockchain=blockchain)
+
+        allocation = StakeAllocation.objects.create(
+            batch=batch, contributor_email=contributor_email or '', native_amount=native_amount, usd_amount=usd_amount
+        )
+        StakeBatch.objects.filter(pk=batch.pk).update(
+            total_native=F('total_native') + native_amount,
+            total_usd=F('total_usd') + usd_amount,
+            contribution_count=F('contribution_count') + 1
+        )
+        batch.refresh_from_db()
+
+        if batch.total_usd >= Decimal(str(getattr(settings, 'PAYMENT_AGGREGATION_THRESHOLD_USD', 500))):
+            pipeline = _seal(batch)
+
+    if pipeline is not None:
+        # A failed run is resumed by `manage.py resume_payments` like any other pipeline
+        run_pipeline(pipeline)
+
+    return {
+        "success": True,
+        "status": "batched",
+        "message": f"Payment of {usd_amount} USD (allocation {allocation.id}) added to stake batch #{batch.pk} for project id {project.id} on {blockchain}"
+    }
+
+
+def flush_due_batches():
+    """
+    Seal and stake every open batch whose window has closed
+
+    Returns:
+        int: Number of batches sealed
+    """
+    from .models import Project, StakeBatch
+
+    window = datetime.timedelta(seconds=getattr(settings, 'PAYMENT_AGGREGATION_WINDOW', 900))
+    due = StakeBatch.objects.filter(status='open', opened_at__lt=timezone.now() - window)
+
+    pipelines = []
+    for batch in due:
+        with transaction.atomic():
+            Project.objects.select_for_update().filter(id=batch.project_id).first()
+            # Re-check under the lock - the threshold may have sealed it meanwhile
+            batch = StakeBatch.objects.filter(pk=batch.pk, status='open').first()
+            if batch is not None and batch.contribution_count:
+                pipelines.append(_seal(batch))
+
+    for pipeline in pipelines:
+        run_pipeline(pipeline)
+    return len(pipelines)
+
+
+def record_batch_staked(batch, pipeline):
+    """
+    Split a staked batch's tokens between its payments and record their contributions
+
+    The split is of the raw amount the swap delivered (pipeline.stake_amount),
+    pro rata to native amount paid; rounding dust goes to the last payment so
+    the shares add up to what was staked. Called by the pipeline inside its
+    completion transaction.
+
+    Returns:
+        int: Number of payments in the batch
+    """
+    from .models import Project, StakeAllocation, StakeBatch
+
+    project = Project.objects.get(id=batch.project_id)
+    unit = Decimal(token_unit(project.token_address, batch.blockchain))
+    received = int(pipeline.stake_amount or 0)
+
+    allocations = list(StakeAllocation.objects.filter(batch=batch).order_by('id'))
+    allocated = 0
+    for index, allocation in enumerate(allocations):
+        if index == len(allocations) - 1:
+            share = received - allocated
+        else:
+            share = int(received * allocation.native_amount / batch.total_native) if batch.total_native else 0
+        allocated += share
+
+        token_amount = Decimal(share) / unit
+        contribution = record_contribution(pipeline, token_amount, allocation.contributor_email, pipeline.wallet_address)
+        StakeAllocation.objects.filter(pk=allocation.pk).update(
+            token_amount=token_amount,
+            contribution=contribution
+        )
+    StakeBatch.objects.filter(pk=batch.pk).update(status='completed')
+    return len(allocations)
@@ -0,0 +1,188 @@
+"""
+Block-keyed cache for DEX router getAmountsOut quotes.
+
+A quote can only change when a new block lands, so quotes are cached per
+(chain, router, path, amount bucket, block number). The block number comes
+from the gas oracle, which already refreshes once per block, so reading
+it costs no RPC call. Entries from older blocks are never looked up again.
+
+Amounts are bucketed to QUOTE_AMOUNT_SIGNIFICANT_DIGITS significant digits.
+The bucket's amount is quoted once and scaled to the requested amount,
+so checkouts for nearly equal amounts share a quote. Concurrent misses
+for the same key are coalesced: one thread calls the router and the
+others wait for its result.
+"""
+import threading
+from decimal import Decimal
+
+from django.conf import settings
+
+from .cache_utils import LRUCache, MISSING
+from .contract_cache import get_contract
+from .gas_oracle import get_gas_suggestions
+from .multicall import batch_rpc_read
+
+_quotes = LRUCache(maxsize=getattr(settings, 'SWAP_QUOTE_CACHE_SIZE', 4096))
+
+# key -> _InFlight for quotes currently being fetched
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+_coalesced = 0
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+def bucket_amount(amount_in):
+    """Round an amount down to the configured number of significant digits"""
+    digits = getattr(settings, 'QUOTE_AMOUNT_SIGNIFICANT_DIGITS', 4)
+    amount_in = int(amount_in)
+    if amount_in <= 0:
+        return amount_in
+    scale = 10 ** max(len(str(amount_in)) - digits, 0)
+    return max(amount_in // scale * scale, 1)
+
+
+def _fetch_quote(router_address, router_abi, bucket, path, blockchain):
+    router = get_contract(router_address, router_abi, blockchain)
+    return router.functions.getAmountsOut(bucket, list(path)).call()
+
+
+def _ttl(blockchain):
+    # A little longer than one block; later blocks use new keys anyway
+    return getattr(settings, 'GAS_ORACLE_POLL_INTERVALS', {}).get(blockchain, 3) * 2
+
+
+def _coalesced_fetch(key, fetch):
+    """Run fetch() once per key, sharing the result with concurrent callers"""
+    global _coalesced
+
+    with _in_flight_lock:
+        pending = _in_flight.get(key)
+        leader = pending is None
+        if leader:
+            pending = _InFlight()
+            _in_flight[key] = pending
+        else:
+            _coalesced += 1
+
+    if not leader:
+        if not pending.done.wait(getattr(settings, 'WEB3_REQUEST_TIMEOUT', 15)):
+            raise TimeoutError(f"Timed out waiting for shared quote {key}")
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    try:
+        pending.result = fetch()
+        return pending.result
+    except Exception as e:
+        pending.error = e
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+        pending.done.set()
+
+
+def _quote_key(router_address, path, bucket, block_number, blockchain):
+    return (
+        blockchain,
+        router_address.lower(),
+        tuple(address.lower() for address in path),
+        bucket,
+        block_number,
+    )
+
+
+def _scale(amounts, bucket, amount_in):
+    """Scale a bucket's quote to the requested amount"""
+    if bucket == amount_in:
+        return list(amounts)
+    ratio = Decimal(int(amount_in)) / Decimal(bucket)
+    return [int(amount_in)] + [int(Decimal(amount) * ratio) for amount in amounts[1:]]
+
+
+def get_amounts_out(router_address, router_abi, amount_in, path, blockchain='BSC'):
+    """
+    Cached equivalent of router.functions.getAmountsOut(amount_in, path).call()
+
+    Args:
+        router_address: DEX router address
+        router_abi: Registered abi id (or ABI list) of the router
+        amount_in: Input amount in wei
+        path: Token address path, e.g. [wrapped_native, token]
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+
+    Returns:
+        list: Amounts along the path, scaled to amount_in
+    """
+    bucket = bucket_amount(amount_in)
+    if bucket <= 0:
+        return _fetch_quote(router_address, router_abi, amount_in, path, blockchain)
+
+    block_number = get_gas_suggestions(blockchain)['block_number']
+    key = _quote_key(router_address, path, bucket, block_number, blockchain)
+
+    def fetch_and_store():
+        quote = _fetch_quote(router_address, router_abi, bucket, path, blockchain)
+        # Stored before waiting callers are released, so late arrivals hit the cache
+        _quotes.set(key, quote, ttl=_ttl(blockchain))
+        return quote
+
+    amounts = _quotes.get(key)
+    if amounts is MISSING:
+        amounts = _coalesced_fetch(key, fetch_and_store)
+
+    return _scale(amounts, bucket, amount_in)
+
+
+def get_amounts_out_many(router_address, router_abi, amount_in, paths, blockchain='BSC'):
+    """
+    Cached getAmountsOut for several candidate paths, with every cache miss
+    fetched in a single JSON-RPC batch
+
+    Args:
+        router_address: DEX router address
+        router_abi: Registered abi id (or ABI list) of the router
+        amount_in: Input amount in wei
+        paths: List of token address paths
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+
+    Returns:
+        list: Amounts for each path (scaled to amount_in), None where the
+        router rejected the path (e.g. a missing pair)
+    """
+    bucket = bucket_amount(amount_in)
+    if bucket <= 0:
+        return [None] * len(paths)
+
+    block_number = get_gas_suggestions(blockchain)['block_number']
+    keys = [_quote_key(router_address, path, bucket, block_number, blockchain) for path in paths]
+
+    results = [_quotes.get(key) for key in keys]
+    misses = [index for index, amounts in enumerate(results) if amounts is MISSING]
+    if misses:
+        fetched = batch_rpc_read([
+            (router_address, router_abi, 'getAmountsOut', [bucket, list(paths[index])])
+            for index in misses
+        ], blockchain)
+        for index, amounts in zip(misses, fetched):
+            results[index] = amounts
+            if amounts is not None:
+                _quotes.set(keys[index], amounts, ttl=_ttl(blockchain))
+
+    return [_scale(amounts, bucket, amount_in) if amounts else None for amounts in results]
+
+
+def quote_cache_stats():
+    """Hit rate and coalescing counters, for monitoring"""
+    stats = _quotes.stats()
+    stats['coalesced'] = _coalesced
+    stats['in_flight'] = len(_in_flight)
+    return stats
@@ -0,0 +1,106 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from web3 import Web3
+
+from lakkhi_app import custom_wallet, web3_helper_functions
+from lakkhi_app.custom_wallet import WalletManager
+
+FACTORY = '0x' + '11' * 20
+IMPLEMENTATION = '0x' + '22' * 20
+CLONE = '0x' + '33' * 20
+ROUTER = '0x' + '44' * 20
+TOKEN = '0x' + '55' * 20
+WALLET = '0x' + '66' * 20
+
+CLONE_CODE = bytes.fromhex('363d3d373d3d3d363d73' + '22' * 20 + '5af43d82803e903d91602b57fd5bf3')
+
+
+@override_settings(CAMPAIGN_CLONE_FACTORY_ADDRESSES={'BSC': FACTORY}, CONTRIBUTION_ROUTER_ADDRESSES={'BSC': ROUTER})
+class FactoryCloneTests(SimpleTestCase):
+    def setUp(self):
+        web3_helper_functions._factory_clones.clear()
+        self.addCleanup(web3_helper_functions._factory_clones.clear)
+        self.web3 = mock.Mock()
+        for target, value in (('get_web3', self.web3), ('get_clone_implementation', IMPLEMENTATION)):
+            patcher = mock.patch.object(web3_helper_functions, target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_clone_of_the_implementation_is_routed(self):
+        self.web3.eth.get_code.return_value = CLONE_CODE
+
+        self.assertTrue(WalletManager.can_route_to(CLONE, 'BSC'))
+        self.assertTrue(web3_helper_functions.is_factory_clone(CLONE.upper().replace('0X', '0x')))
+        self.web3.eth.get_code.assert_called_once()
+
+    def test_full_contracts_get_a_direct_deposit(self):
+        self.web3.eth.get_code.return_value = bytes.fromhex('6080604052') + b'\x00' * 100
+        self.assertFalse(WalletManager.can_route_to(CLONE, 'BSC'))
+
+    def test_clone_of_another_implementation_is_not_routed(self):
+        self.web3.eth.get_code.return_value = CLONE_CODE.replace(b'\x22' * 20, b'\x99' * 20)
+        self.assertFalse(web3_helper_functions.is_factory_clone(CLONE))
+
+    def test_undeployed_contract_is_checked_again(self):
+        self.web3.eth.get_code.side_effect = [b'', CLONE_CODE]
+        self.assertFalse(web3_helper_functions.is_factory_clone(CLONE))
+        self.assertTrue(web3_helper_functions.is_factory_clone(CLONE))
+
+    @override_settings(CONTRIBUTION_ROUTER_ADDRESSES={})
+    def test_no_router_deployed(self):
+        self.web3.eth.get_code.return_value = CLONE_CODE
+        self.assertFalse(WalletManager.can_route_to(CLONE, 'BSC'))
+
+    @override_settings(CAMPAIGN_CLONE_FACTORY_ADDRESSES={})
+    def test_no_factory_deployed(self):
+        self.assertFalse(web3_helper_functions.is_factory_clone(CLONE))
+        self.web3.eth.get_code.assert_not_called()
+
+
+@override_settings(CONTRIBUTION_ROUTER_ADDRESSES={'BSC': ROUTER})
+class DepositForSelectorTests(SimpleTestCase):
+    def test_router_deposits_on_the_wallets_behalf(self):
+        router = mock.Mock()
+        permit = {'deadline': 1, 'v': 27, 'r': b'\x01' * 32, 's': b'\x02' * 32}
+        with mock.patch.object(WalletManager, 'can_route_to', return_value=True), \
+                mock.patch.object(custom_wallet, 'get_contract', return_value=router), \
+                mock.patch.object(custom_wallet, 'sign_permit', return_value=permit), \
+                mock.patch.object(custom_wallet, 'allocate_nonce', return_value=0), \
+                mock.patch.object(custom_wallet, 'send_transaction', return_value=b'\x01'):
+            WalletManager.send_deposit_with_permit(WALLET, 'key', CLONE, TOKEN, 100, 'BSC', gas_price=1)
+
+        args = router.functions.depositWithPermit.call_args[0]
+        self.assertEqual(args[2], Web3.keccak(text='stakeFor(address,uint256)')[:4])
+
+
+class PredictAddressTests(SimpleTestCase):
+    # CampaignCloneFactory._clone's init code: EIP-1167 creation header, runtime prefix,
+    # implementation, runtime suffix
+    INIT_CODE = bytes.fromhex(
+        '3d602d80600a3d3981f3' + '363d3d373d3d3d363d73' + '22' * 20 + '5af43d82803e903d91602b57fd5bf3'
+    )
+
+    def test_create2_address_of_the_factorys_proxy(self):
+        salt = b'\x01' * 32
+        creator_salt = Web3.keccak(bytes(12) + bytes.fromhex(WALLET[2:]) + salt)
+        digest = Web3.keccak(b'\xff' + bytes.fromhex(FACTORY[2:]) + creator_salt + Web3.keccak(self.INIT_CODE))
+
+        self.assertEqual(
+            web3_helper_functions.predict_clone_address(FACTORY, IMPLEMENTATION, WALLET, salt),
+            Web3.to_checksum_address(digest[12:])
+        )
+
+    def test_creator_is_part_of_the_salt(self):
+        salt = b'\x01' * 32
+        self.assertNotEqual(
+            web3_helper_functions.predict_clone_address(FACTORY, IMPLEMENTATION, WALLET, salt),
+            web3_helper_functions.predict_clone_address(FACTORY, IMPLEMENTATION, CLONE, salt)
+        )
+
+    def test_create_address_from_deployer_and_nonce(self):
+        deployer = '0x6ac7ea33f8831ea9dcc53393aaa88b25a785dbf0'
+        self.assertEqual(web3_helper_functions.predict_contract_address(deployer, 0),
+                         Web3.to_checksum_address('0xcd234a471b72ba2f1ccf0a70fcaba648a5eecd8d'))
+        self.assertEqual(web3_helper_functions.predict_contract_address(deployer, 1),
+                         Web3.to_checksum_address('0x343c43a37d37dff08ae8c4a11544c718abb4fcf8'))
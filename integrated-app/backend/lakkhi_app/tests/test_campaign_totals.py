@@ -0,0 +1,83 @@
+from decimal import Decimal
+
+from django.test import TestCase
+
+from lakkhi_app import campaign_totals
+from lakkhi_app.models import Campaign, Contribution, User
+
+WALLET = '0x' + 'aB' * 20
+
+
+def _user(username):
+    return User.objects.create_user(email=f'{username}@example.com', username=username, bio='', password='x')
+
+
+class CampaignTotalsTestCase(TestCase):
+    def setUp(self):
+        self.donor = _user('donor')
+        self.campaign = Campaign.objects.create(owner=_user('owner'), title='C', description='d', fund_amount=1000)
+
+    def _contribute(self, amount, **fields):
+        return Contribution.objects.create(campaign=self.campaign, amount=Decimal(amount), **fields)
+
+    def _totals(self):
+        self.campaign.refresh_from_db()
+        return self.campaign.raised_total, self.campaign.contributor_count
+
+
+class ContributionTotalsTests(CampaignTotalsTestCase):
+    def test_returning_contributors_are_counted_once(self):
+        self._contribute('10', user=self.donor)
+        self._contribute('5', user=self.donor)
+        self._contribute('1', wallet_address=WALLET)
+        self._contribute('2', wallet_address=WALLET.lower())
+
+        self.assertEqual(self._totals(), (Decimal('18'), 2))
+
+    def test_deleting_a_contribution_uncounts_it(self):
+        first = self._contribute('10', user=self.donor)
+        second = self._contribute('5', user=self.donor)
+
+        second.delete()
+        self.assertEqual(self._totals(), (Decimal('10'), 1))
+        first.delete()
+        self.assertEqual(self._totals(), (Decimal('0'), 0))
+        self.assertIsNone(self.campaign.last_contribution_at)
+
+    def test_queryset_delete_uncounts_each_contribution(self):
+        self._contribute('10', user=self.donor)
+        self._contribute('5', user=self.donor)
+        self._contribute('1', wallet_address=WALLET)
+
+        Contribution.objects.filter(user=self.donor).delete()
+        self.assertEqual(self._totals(), (Decimal('1'), 1))
+
+    def test_deleting_a_user_uncounts_their_contributions(self):
+        self._contribute('10', user=self.donor)
+        self._contribute('5', user=self.donor)
+        self._contribute('2', user=_user('other'))
+
+        self.donor.delete()
+        self.assertEqual(self._totals(), (Decimal('2'), 1))
+        self.assertEqual(campaign_totals.reconcile([self.campaign.pk]), 0)
+
+
+class ReconcileTests(CampaignTotalsTestCase):
+    def test_drifted_totals_are_rebuilt(self):
+        self._contribute('10', user=self.donor)
+        self._contribute('3', wallet_address=WALLET)
+        self._contribute('2')
+        Campaign.objects.filter(pk=self.campaign.pk).update(raised_total=0, contributor_count=0)
+
+        self.assertEqual(campaign_totals.reconcile([self.campaign.pk]), 1)
+        self.assertEqual(self._totals(), (Decimal('15'), 3))
+
+    def test_correct_totals_are_left_alone(self):
+        self._contribute('10', user=self.donor)
+        self.assertEqual(campaign_totals.reconcile(), 0)
+
+    def test_only_the_given_campaigns_are_rebuilt(self):
+        other = Campaign.objects.create(owner=self.donor, title='O', description='d', fund_amount=1, raised_total=99)
+        self.assertEqual(campaign_totals.reconcile([self.campaign.pk]), 0)
+        other.refresh_from_db()
+        self.assertEqual(other.raised_total, Decimal('99'))
@@ -0,0 +1,52 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from web3 import Web3
+
+from lakkhi_app import contract_cache
+
+ADDRESS = '0x' + 'ab' * 20
+
+BALANCE_ABI = [
+    {"inputs": [{"name": "account", "type": "address"}], "name": "balanceOf",
+     "outputs": [{"name": "", "type": "uint256"}], "stateMutability": "view", "type": "function"},
+]
+
+
+class ContractCacheTests(SimpleTestCase):
+    def setUp(self):
+        contract_cache._factories.clear()
+        contract_cache._instances.clear()
+        self.w3 = Web3()
+        patcher = mock.patch.object(contract_cache, 'get_web3', side_effect=lambda blockchain: self.w3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        contract_cache.register_abi('test_balance', BALANCE_ABI)
+
+    def test_instances_are_shared_across_address_case(self):
+        contract = contract_cache.get_contract(ADDRESS, 'test_balance', 'BSC')
+
+        self.assertIs(contract_cache.get_contract(ADDRESS.upper().replace('0X', '0x'), 'test_balance', 'BSC'), contract)
+        self.assertEqual(contract.address, Web3.to_checksum_address(ADDRESS))
+        self.assertIsNot(contract_cache.get_contract(ADDRESS, 'test_balance', 'Base'), contract)
+
+    def test_registered_list_and_literal_copy_share_a_factory(self):
+        registered = contract_cache.get_contract_factory(BALANCE_ABI)
+        self.assertIs(contract_cache.get_contract_factory('test_balance'), registered)
+
+        # A literal with the same content is keyed by its fingerprint
+        literal = [dict(entry) for entry in BALANCE_ABI]
+        first = contract_cache.get_contract_factory(literal)
+        self.assertIs(contract_cache.get_contract_factory([dict(entry) for entry in BALANCE_ABI]), first)
+
+    def test_unknown_abi_id_raises(self):
+        with self.assertRaises(ValueError):
+            contract_cache.get_contract(ADDRESS, 'not_registered')
+
+    def test_provider_reset_rebuilds_cached_contracts(self):
+        contract = contract_cache.get_contract(ADDRESS, 'test_balance')
+        self.w3 = Web3()
+
+        rebuilt = contract_cache.get_contract(ADDRESS, 'test_balance')
+        self.assertIsNot(rebuilt, contract)
+        self.assertIs(rebuilt.w3, self.w3)
@@ -0,0 +1,33 @@
+from django.test import SimpleTestCase
+from eth_abi import encode
+
+from lakkhi_app.custom_wallet import TRANSFER_TOPIC, transferred_amount
+
+TOKEN = '0x' + '11' * 20
+OTHER_TOKEN = '0x' + '22' * 20
+WALLET = '0x' + 'Ab' * 20
+PAIR = '0x' + '33' * 20
+
+
+def _transfer(token, sender, recipient, amount):
+    return {
+        'address': token,
+        'topics': [TRANSFER_TOPIC, encode(['address'], [sender]), '0x' + encode(['address'], [recipient]).hex()],
+        'data': '0x' + encode(['uint256'], [amount]).hex(),
+    }
+
+
+class TransferredAmountTests(SimpleTestCase):
+    def test_sums_transfers_of_the_token_to_the_recipient(self):
+        receipt = {'logs': [
+            _transfer(TOKEN, PAIR, WALLET, 990),
+            _transfer(TOKEN, PAIR, WALLET.lower(), 5),
+            _transfer(TOKEN, WALLET, PAIR, 1000),
+            _transfer(OTHER_TOKEN, PAIR, WALLET, 7),
+            # A Sync-style log from the pair, not a transfer
+            {'address': PAIR, 'topics': ['0x' + '44' * 32], 'data': '0x'},
+        ]}
+        self.assertEqual(transferred_amount(receipt, TOKEN.upper().replace('0X', '0x'), WALLET), 995)
+
+    def test_nothing_received(self):
+        self.assertEqual(transferred_amount({'logs': []}, TOKEN, WALLET), 0)
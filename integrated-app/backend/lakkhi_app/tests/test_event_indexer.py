@@ -0,0 +1,120 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from eth_abi import encode
+from requests.exceptions import ConnectionError
+from web3 import Web3
+
+from lakkhi_app import event_indexer
+from lakkhi_app.models import Campaign, Contribution, IndexerCheckpoint, User
+
+CONTRACT = '0x' + '11' * 20
+DONOR = '0x' + 'ab' * 20
+TX_HASH = '0x' + 'cd' * 32
+DEPOSIT_TOPIC = Web3.to_hex(Web3.keccak(text='DepositReceived(address,uint256)'))
+
+
+def _deposit_log(amount, tx_hash=TX_HASH, log_index=0, block_number=100):
+    return {
+        'address': CONTRACT,
+        'topics': [bytes.fromhex(DEPOSIT_TOPIC[2:]), encode(['address'], [DONOR])],
+        'data': encode(['uint256'], [amount]),
+        'transactionHash': bytes.fromhex(tx_hash[2:]),
+        'logIndex': log_index,
+        'blockNumber': block_number,
+    }
+
+
+class DecodeLogTests(SimpleTestCase):
+    def test_deposit(self):
+        event_name, args = event_indexer.decode_log(_deposit_log(5 * 10 ** 18))
+        self.assertEqual(event_name, 'DepositReceived')
+        self.assertEqual(args, {'from': Web3.to_checksum_address(DONOR), 'amount': 5 * 10 ** 18})
+
+    def test_unknown_events_are_skipped(self):
+        self.assertEqual(event_indexer.decode_log({'topics': [b'\x01' * 32], 'data': b''}), (None, None))
+        self.assertEqual(event_indexer.decode_log({'topics': [], 'data': b''}), (None, None))
+
+
+class RangeErrorTests(SimpleTestCase):
+    def test_limit_errors(self):
+        self.assertTrue(event_indexer.is_range_error(ValueError({'code': -32005, 'message': 'query timeout'})))
+        self.assertTrue(event_indexer.is_range_error(
+            ValueError({'code': -32000, 'message': 'exceed maximum block range: 5000'})
+        ))
+        self.assertTrue(event_indexer.is_range_error(
+            ValueError({'code': -32602, 'message': 'Log response size exceeded.'})
+        ))
+
+    def test_other_errors(self):
+        self.assertFalse(event_indexer.is_range_error(ValueError({'code': -32000, 'message': 'header not found'})))
+        self.assertFalse(event_indexer.is_range_error(ConnectionError('Max retries exceeded with url: /')))
+
+
+class CampaignTestCase(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user(email='owner@example.com', username='owner', bio='', password='x')
+        self.campaign = Campaign.objects.create(
+            owner=owner, title='C', description='d', fund_amount=100, token_symbol='LKI', contract_address=CONTRACT
+        )
+        self.campaigns = {CONTRACT: self.campaign}
+        patcher = mock.patch.object(event_indexer, 'get_cached_tokens_info', return_value={})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class StoreLogsTests(CampaignTestCase):
+    def test_deposit_claims_the_row_written_for_its_transaction(self):
+        Contribution.objects.create(campaign=self.campaign, amount=Decimal('5'), currency='LKI', transaction_hash=TX_HASH)
+
+        stored = event_indexer.store_logs('BSC', [_deposit_log(5 * 10 ** 18)], self.campaigns)
+
+        self.assertEqual(stored, 1)
+        contribution = Contribution.objects.get()
+        self.assertEqual((contribution.log_index, contribution.block_number, contribution.indexed), (0, 100, False))
+
+    def test_direct_deposits_are_stored_once(self):
+        logs = [_deposit_log(2 * 10 ** 18), _deposit_log(3 * 10 ** 18, log_index=1)]
+        event_indexer.store_logs('BSC', logs, self.campaigns)
+        event_indexer.store_logs('BSC', logs, self.campaigns)
+
+        self.assertEqual(Contribution.objects.filter(indexed=True).count(), 2)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.raised_total, Decimal('5'))
+
+
+class IndexChainTests(CampaignTestCase):
+    def setUp(self):
+        super().setUp()
+        web3 = mock.Mock()
+        web3.eth.block_number = 1000 + event_indexer._confirmations('BSC')
+        web3.eth.get_block.return_value = {'hash': b'\x01' * 32}
+        for target, kwargs in (
+            ('get_web3', {'return_value': web3}),
+            ('_known_campaigns', {'return_value': self.campaigns}),
+            ('store_logs', {'return_value': 0}),
+        ):
+            patcher = mock.patch.object(event_indexer, target, **kwargs)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @mock.patch.object(event_indexer, 'fetch_logs')
+    def test_range_is_halved_when_the_node_refuses_it(self, fetch_logs):
+        fetch_logs.side_effect = [ValueError({'code': -32005, 'message': 'query returned more than 10000 results'}), [], []]
+
+        with self.settings(EVENT_INDEXER_MAX_BLOCK_RANGE=1000):
+            event_indexer.index_chain('BSC', from_block=1)
+
+        ranges = [call.args[2:] for call in fetch_logs.call_args_list]
+        self.assertEqual(ranges, [(1, 1000), (1, 500), (501, 1000)])
+        self.assertEqual(IndexerCheckpoint.objects.get(blockchain='BSC').block_number, 1000)
+
+    @mock.patch.object(event_indexer, 'fetch_logs')
+    def test_other_errors_are_raised_straight_away(self, fetch_logs):
+        fetch_logs.side_effect = ValueError({'code': -32000, 'message': 'header not found'})
+
+        with self.assertRaises(ValueError):
+            event_indexer.index_chain('BSC', from_block=1)
+        fetch_logs.assert_called_once()
+        self.assertFalse(IndexerCheckpoint.objects.exists())
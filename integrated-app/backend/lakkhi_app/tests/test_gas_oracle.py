@@ -0,0 +1,136 @@
+import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from lakkhi_app import gas_oracle
+from lakkhi_app.models import GasSuggestion
+
+GWEI = 10 ** 9
+
+FEE_HISTORY = {
+    'baseFeePerGas': [hex(9 * GWEI), hex(10 * GWEI)],
+    'reward': [
+        [hex(1 * GWEI), hex(2 * GWEI), hex(3 * GWEI)],
+        [hex(1 * GWEI), hex(4 * GWEI), hex(5 * GWEI)],
+        [hex(2 * GWEI), hex(2 * GWEI), hex(9 * GWEI)],
+    ],
+}
+
+
+class ChainGasOracleTests(SimpleTestCase):
+    def _oracle(self, responses):
+        oracle = gas_oracle.ChainGasOracle('Ethereum')
+        patcher = mock.patch.object(gas_oracle, 'batch_request', side_effect=responses)
+        self.batch_request = patcher.start()
+        self.addCleanup(patcher.stop)
+        return oracle
+
+    def test_one_batch_per_refresh(self):
+        oracle = self._oracle([['0x10', hex(12 * GWEI), FEE_HISTORY]])
+        snapshot = oracle.snapshot(poll=False)
+
+        self.assertEqual(self.batch_request.call_count, 1)
+        methods = [method for method, params in self.batch_request.call_args[0][0]]
+        self.assertEqual(methods, ['eth_blockNumber', 'eth_gasPrice', 'eth_feeHistory'])
+        self.assertEqual((snapshot['block_number'], snapshot['gas_price']), (16, 12 * GWEI))
+
+    def test_eip1559_fees_from_fee_history(self):
+        snapshot = self._oracle([['0x10', hex(12 * GWEI), FEE_HISTORY]]).snapshot(poll=False)
+
+        self.assertEqual(snapshot['base_fee'], 10 * GWEI)
+        self.assertEqual(snapshot['eip1559']['standard'], {
+            'max_priority_fee_per_gas': 2 * GWEI,
+            'max_fee_per_gas': 22 * GWEI,
+        })
+        self.assertEqual(snapshot['eip1559']['fast']['max_priority_fee_per_gas'], 5 * GWEI)
+
+    def test_legacy_chain_has_no_eip1559_fees(self):
+        snapshot = self._oracle([['0x10', hex(3 * GWEI), {'baseFeePerGas': ['0x0'], 'reward': []}]]).snapshot(poll=False)
+        self.assertIsNone(snapshot['eip1559'])
+
+    def test_fresh_value_is_served_from_memory(self):
+        oracle = self._oracle([['0x10', hex(3 * GWEI), None]])
+        oracle.snapshot(poll=False)
+        oracle.snapshot(poll=False)
+        self.assertEqual(self.batch_request.call_count, 1)
+
+    def test_failed_refresh_raises_when_cold(self):
+        oracle = self._oracle([['0x10', None, None]])
+        with self.assertRaises(ValueError):
+            oracle.snapshot(poll=False)
+        self.assertEqual(oracle.error_count, 1)
+
+
+class FeeParamsTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(gas_oracle, 'get_published', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _snapshot(self, eip1559):
+        oracle = mock.Mock()
+        oracle.snapshot.return_value = {'gas_price': 10 * GWEI, 'eip1559': eip1559}
+        return mock.patch.object(gas_oracle, 'get_oracle', return_value=oracle)
+
+    def test_legacy_gas_price(self):
+        with self._snapshot(None):
+            self.assertEqual(gas_oracle.get_fee_params('BSC', multiplier=0.9), {'gasPrice': 9 * GWEI})
+
+    def test_eip1559_fields(self):
+        fees = {'max_fee_per_gas': 30 * GWEI, 'max_priority_fee_per_gas': 2 * GWEI}
+        with self._snapshot({'slow': fees, 'standard': fees, 'fast': fees}):
+            self.assertEqual(gas_oracle.get_fee_params('Ethereum', speed='fast'), {
+                'maxFeePerGas': 30 * GWEI,
+                'maxPriorityFeePerGas': 2 * GWEI,
+            })
+
+
+@override_settings(GAS_ORACLE_SHARED_TTL=15, GAS_ORACLE_READ_TTL=1, GAS_ORACLE_POLL_INTERVALS={'BSC': 3})
+class PublishedSuggestionsTests(TestCase):
+    def setUp(self):
+        gas_oracle._published.clear()
+        self.addCleanup(gas_oracle._published.clear)
+        self.oracle = mock.Mock()
+        self.oracle.snapshot.return_value = {'block_number': 16, 'gas_price': 3 * GWEI, 'eip1559': None}
+        patcher = mock.patch.object(gas_oracle, 'get_oracle', return_value=self.oracle)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_published_suggestions_are_read_without_polling(self):
+        gas_oracle.publish_gas_suggestions()
+        self.oracle.snapshot.assert_called_once_with(poll=False)
+
+        self.assertEqual(gas_oracle.get_gas_price('BSC'), 3 * GWEI)
+        self.assertEqual(self.oracle.snapshot.call_count, 1)
+
+    def test_missing_suggestions_fall_back_to_the_local_oracle(self):
+        self.assertEqual(gas_oracle.get_gas_suggestions('BSC')['block_number'], 16)
+        self.oracle.snapshot.assert_called_once_with()
+
+    def test_suggestions_are_shared_through_the_database(self):
+        gas_oracle.publish_gas_suggestions()
+        # Another process has nothing in memory but reads the same row
+        gas_oracle._published.clear()
+        self.assertEqual(GasSuggestion.objects.get(blockchain='BSC').suggestions['gas_price'], 3 * GWEI)
+        self.assertEqual(gas_oracle.get_published('BSC')['block_number'], 16)
+
+    def test_reads_are_memoised_per_process(self):
+        gas_oracle.publish_gas_suggestions()
+        gas_oracle.get_published('BSC')
+        with self.assertNumQueries(0):
+            gas_oracle.get_published('BSC')
+
+    def test_stale_suggestions_are_not_used(self):
+        GasSuggestion.objects.create(blockchain='BSC', suggestions={'gas_price': 1},
+                                     published_at=timezone.now() - datetime.timedelta(seconds=20))
+        self.assertIsNone(gas_oracle.get_published('BSC'))
+        self.assertEqual(gas_oracle.get_gas_price('BSC'), 3 * GWEI)
+
+    def test_local_poller_stops_once_suggestions_are_published(self):
+        gas_oracle.publish_gas_suggestions()
+        oracle = gas_oracle.ChainGasOracle('BSC')
+        with mock.patch.object(oracle, 'refresh') as refresh:
+            oracle._poll()
+        refresh.assert_not_called()
@@ -0,0 +1,93 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from eth_abi import encode
+
+from lakkhi_app import multicall, web3_provider
+
+TARGET = '0x' + '11' * 20
+OTHER = '0x' + '22' * 20
+
+STATUS_ABI = [
+    {"inputs": [], "name": "targetAmount", "outputs": [{"name": "", "type": "uint256"}],
+     "stateMutability": "view", "type": "function"},
+    {"inputs": [], "name": "beneficiary", "outputs": [{"name": "", "type": "address"}],
+     "stateMutability": "view", "type": "function"},
+]
+
+
+def _hex(types, values):
+    return '0x' + encode(types, values).hex()
+
+
+class DecodeResultTests(SimpleTestCase):
+    def test_single_value_is_unwrapped(self):
+        self.assertEqual(multicall._decode_result(['uint256'], encode(['uint256'], [42])), 42)
+
+    def test_addresses_are_checksummed(self):
+        value = multicall._decode_result(['address'], _hex(['address'], [OTHER]))
+        self.assertEqual(value, '0x2222222222222222222222222222222222222222')
+
+    def test_multiple_values_are_a_tuple(self):
+        data = encode(['uint256', 'bool'], [7, True])
+        self.assertEqual(multicall._decode_result(['uint256', 'bool'], data), (7, True))
+
+    def test_empty_return_data_is_none(self):
+        self.assertIsNone(multicall._decode_result(['uint256'], b''))
+
+
+class BatchReadTests(SimpleTestCase):
+    def test_falls_back_to_batch_rpc_when_multicall_fails(self):
+        calls = [(TARGET, STATUS_ABI, 'targetAmount', []), (OTHER, STATUS_ABI, 'beneficiary', [])]
+        with mock.patch.object(multicall, '_read_via_multicall', side_effect=ValueError('no multicall')), \
+                mock.patch.object(multicall, 'batch_request', return_value=[
+                    _hex(['uint256'], [100]), _hex(['address'], [TARGET])
+                ]) as batch_request:
+            results = multicall.batch_read(calls)
+
+        self.assertEqual(results, [100, '0x1111111111111111111111111111111111111111'])
+        method, (params, block) = batch_request.call_args[0][0][0]
+        self.assertEqual((method, block), ('eth_call', 'latest'))
+
+    def test_failed_calls_are_none(self):
+        calls = [(TARGET, STATUS_ABI, 'targetAmount', []), (OTHER, STATUS_ABI, 'targetAmount', [])]
+        with mock.patch.object(multicall, '_read_via_multicall', side_effect=ValueError('no multicall')), \
+                mock.patch.object(multicall, 'batch_request', return_value=[None, _hex(['uint256'], [5])]):
+            self.assertEqual(multicall.batch_read(calls), [None, 5])
+
+    def test_reads_are_chunked(self):
+        calls = [(TARGET, STATUS_ABI, 'targetAmount', [])] * 5
+        with mock.patch.object(multicall, '_read_via_multicall', side_effect=lambda chain, chunk: [1] * len(chunk)) as read:
+            self.assertEqual(multicall.batch_read(calls, chunk_size=2), [1] * 5)
+        self.assertEqual([len(call.args[1]) for call in read.call_args_list], [2, 2, 1])
+
+    def test_multicall_read_groups_by_contract(self):
+        with mock.patch.object(multicall, 'batch_read', return_value=[1, TARGET, 2, OTHER]):
+            results = multicall.multicall_read([TARGET, OTHER], ['targetAmount', 'beneficiary'], STATUS_ABI)
+        self.assertEqual(results, {
+            TARGET: {'targetAmount': 1, 'beneficiary': TARGET},
+            OTHER: {'targetAmount': 2, 'beneficiary': OTHER},
+        })
+
+
+class BatchRequestTests(SimpleTestCase):
+    def _post(self, payload):
+        response = mock.Mock()
+        response.json.return_value = payload
+        session = mock.Mock()
+        session.post.return_value = response
+        return mock.patch.object(web3_provider, 'get_session', return_value=session)
+
+    def test_results_are_matched_by_id(self):
+        calls = [('eth_blockNumber', []), ('eth_chainId', []), ('eth_gasPrice', [])]
+        with self._post([
+            {'jsonrpc': '2.0', 'id': 2, 'result': '0x3'},
+            {'jsonrpc': '2.0', 'id': 0, 'result': '0x1'},
+            {'jsonrpc': '2.0', 'id': 1, 'error': {'code': -32000, 'message': 'boom'}},
+        ]):
+            self.assertEqual(web3_provider.batch_request(calls), ['0x1', None, '0x3'])
+
+    def test_rejected_batch_raises(self):
+        with self._post({'jsonrpc': '2.0', 'id': None, 'error': {'message': 'batch not supported'}}):
+            with self.assertRaises(ValueError):
+                web3_provider.batch_request([('eth_blockNumber', [])])
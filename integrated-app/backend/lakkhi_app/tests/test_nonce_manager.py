@@ -0,0 +1,80 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from lakkhi_app import nonce_manager
+
+ADDRESS = '0x' + 'Ab' * 20
+
+
+class AllocateNonceTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.web3 = mock.Mock()
+        self.web3.eth.get_transaction_count.return_value = 7
+        patcher = mock.patch.object(nonce_manager, 'get_web3', return_value=self.web3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_consecutive_nonces_without_asking_the_node_again(self):
+        nonces = [nonce_manager.allocate_nonce(ADDRESS, 'BSC') for _ in range(3)]
+
+        self.assertEqual(nonces, [7, 8, 9])
+        self.web3.eth.get_transaction_count.assert_called_once_with(ADDRESS, 'pending')
+
+    def test_addresses_are_case_insensitive_and_chains_separate(self):
+        nonce_manager.allocate_nonce(ADDRESS, 'BSC')
+        self.assertEqual(nonce_manager.allocate_nonce(ADDRESS.lower(), 'BSC'), 8)
+        self.assertEqual(nonce_manager.allocate_nonce(ADDRESS, 'Base'), 7)
+
+    def test_reset_resyncs_from_the_node(self):
+        nonce_manager.allocate_nonce(ADDRESS, 'BSC')
+        nonce_manager.reset_nonce(ADDRESS, 'BSC')
+        self.web3.eth.get_transaction_count.return_value = 12
+        self.assertEqual(nonce_manager.allocate_nonce(ADDRESS, 'BSC'), 12)
+
+    def test_rejected_nonce_is_resigned_with_a_fresh_one(self):
+        self.web3.eth.send_raw_transaction.side_effect = [ValueError('nonce too low'), b'\x01']
+        tx = {'nonce': nonce_manager.allocate_nonce(ADDRESS, 'BSC')}
+        self.web3.eth.get_transaction_count.return_value = 9
+
+        self.assertEqual(nonce_manager.send_transaction(tx, 'key', ADDRESS, 'BSC'), b'\x01')
+        self.assertEqual(tx['nonce'], 9)
+        self.assertEqual(self.web3.eth.account.sign_transaction.call_count, 2)
+
+    def test_other_send_errors_raise_and_free_the_nonce(self):
+        self.web3.eth.send_raw_transaction.side_effect = ValueError('insufficient funds')
+        tx = {'nonce': nonce_manager.allocate_nonce(ADDRESS, 'BSC')}
+
+        with self.assertRaises(ValueError):
+            nonce_manager.send_transaction(tx, 'key', ADDRESS, 'BSC')
+        self.assertEqual(nonce_manager.allocate_nonce(ADDRESS, 'BSC'), 7)
+
+    def test_signing_errors_free_the_nonce(self):
+        self.web3.eth.account.sign_transaction.side_effect = ValueError('bad key')
+        tx = {'nonce': nonce_manager.allocate_nonce(ADDRESS, 'BSC')}
+
+        with self.assertRaises(ValueError):
+            nonce_manager.send_transaction(tx, 'key', ADDRESS, 'BSC')
+        self.assertIsNone(cache.get(nonce_manager._cache_key(ADDRESS, 'BSC')))
+
+
+class AddressLockTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(NONCE_LOCK_TIMEOUT=10, WEB3_REQUEST_TIMEOUT=15)
+    def test_lock_outlives_an_rpc_timeout(self):
+        self.assertEqual(nonce_manager._lock_timeout(), 30)
+
+    def test_expired_lock_taken_by_another_worker_is_not_released(self):
+        with nonce_manager._address_lock('nonce:BSC:addr'):
+            # Our lock expired mid-RPC and another worker took it
+            cache.set('nonce:BSC:addr:lock', 'other-worker')
+        self.assertEqual(cache.get('nonce:BSC:addr:lock'), 'other-worker')
+
+    def test_own_lock_is_released(self):
+        with nonce_manager._address_lock('nonce:BSC:addr'):
+            self.assertIsNotNone(cache.get('nonce:BSC:addr:lock'))
+        self.assertIsNone(cache.get('nonce:BSC:addr:lock'))
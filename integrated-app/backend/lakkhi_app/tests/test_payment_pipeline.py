@@ -0,0 +1,143 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase
+from eth_abi import encode
+
+from lakkhi_app import payment_pipeline
+from lakkhi_app.custom_wallet import TRANSFER_TOPIC
+from lakkhi_app.models import Campaign, Contribution, PaymentPipeline, Project, User
+
+TOKEN = '0x' + '11' * 20
+CONTRACT = '0x' + '22' * 20
+WALLET = '0x' + '33' * 20
+PAIR = '0x' + '44' * 20
+
+
+def _receipt(recipient=WALLET, amount=0, status=1):
+    logs = []
+    if amount:
+        logs.append({
+            'address': TOKEN,
+            'topics': [TRANSFER_TOPIC, encode(['address'], [PAIR]), encode(['address'], [recipient])],
+            'data': encode(['uint256'], [amount]),
+        })
+    return {'status': status, 'logs': logs}
+
+
+def _sent(tx_hash, **result):
+    return {'success': True, 'result': {'transactionHash': tx_hash, **result}}
+
+
+class PipelineTestCase(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(
+            title='P', description='d', wallet_address=WALLET, token_address=TOKEN, contract_address=CONTRACT
+        )
+        self.receipts = {}
+        web3 = mock.Mock()
+        web3.eth.wait_for_transaction_receipt.side_effect = lambda tx_hash, timeout: self.receipts[tx_hash]
+        for target, value in (('get_web3', web3), ('token_unit', 10 ** 18)):
+            patcher = mock.patch.object(payment_pipeline, target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        patcher = mock.patch.object(payment_pipeline, 'WalletManager')
+        self.wallet_manager = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _pipeline(self, **fields):
+        return PaymentPipeline.objects.create(
+            project_id=self.project.id, wallet_address=WALLET, native_amount=Decimal('0.1'),
+            usd_amount=Decimal('50'), **fields
+        )
+
+
+class ReceivedAmountTests(PipelineTestCase):
+    def test_swap_output_is_staked_in_full(self):
+        # Quoted 1000, minimum 990, and the swap actually delivered 997
+        self.wallet_manager.swap_bnb_to_token.return_value = _sent('0xswap', toAmount=1000 / 10 ** 18, minAmountOut=990)
+        self.wallet_manager.approve_token_spending.return_value = _sent('0xapprove')
+        self.wallet_manager.stake_tokens.return_value = _sent('0xstake')
+        self.receipts = {'0xswap': _receipt(amount=997), '0xapprove': _receipt(), '0xstake': _receipt()}
+
+        pipeline = self._pipeline()
+        self.assertTrue(payment_pipeline.run_pipeline(pipeline)['success'])
+
+        self.assertEqual(self.wallet_manager.approve_token_spending.call_args.kwargs['amount'], 997)
+        self.assertEqual(self.wallet_manager.stake_tokens.call_args.kwargs['amount'], 997)
+        pipeline.refresh_from_db()
+        self.assertEqual((pipeline.stake_amount, pipeline.token_amount), ('997', Decimal('997') / 10 ** 18))
+
+    def test_router_records_what_was_deposited(self):
+        self.wallet_manager.swap_and_stake.return_value = _sent('0xrouted', toAmount=1000 / 10 ** 18, minAmountOut=990)
+        self.receipts = {'0xrouted': _receipt(recipient=CONTRACT, amount=995)}
+
+        pipeline = self._pipeline(router=True)
+        payment_pipeline.run_pipeline(pipeline)
+
+        pipeline.refresh_from_db()
+        self.assertEqual((pipeline.step, pipeline.stake_amount), ('completed', '995'))
+
+
+class ContributionRecordTests(PipelineTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user(email='owner@example.com', username='owner', bio='', password='x')
+        self.payer = User.objects.create_user(email='payer@example.com', username='payer', bio='', password='x')
+        self.campaign = Campaign.objects.create(owner=owner, title='C', description='d', fund_amount=1000,
+                                                contract_address=CONTRACT.upper().replace('0X', '0x'),
+                                                token_symbol='LAK')
+        self.wallet_manager.swap_bnb_to_token.return_value = _sent('0xswap', toAmount=1000)
+        self.wallet_manager.approve_token_spending.return_value = _sent('0xapprove')
+        self.wallet_manager.stake_tokens.return_value = _sent('0xstake')
+
+    def test_completed_payment_is_recorded_on_the_campaign(self):
+        self.receipts = {'0xswap': _receipt(amount=997 * 10 ** 18), '0xapprove': _receipt(), '0xstake': _receipt()}
+
+        pipeline = self._pipeline(contributor_email='Payer@example.com')
+        self.assertTrue(payment_pipeline.run_pipeline(pipeline)['success'])
+
+        contribution = Contribution.objects.get()
+        self.assertEqual((contribution.campaign, contribution.user, contribution.amount, contribution.currency),
+                         (self.campaign, self.payer, Decimal('997'), 'LAK'))
+        self.assertEqual((contribution.transaction_hash, contribution.wallet_address), ('0xstake', WALLET))
+        pipeline.refresh_from_db()
+        self.assertEqual((pipeline.status, pipeline.contribution_id), ('completed', contribution.id))
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.raised_total, Decimal('997'))
+
+    def test_failed_payment_records_nothing(self):
+        self.receipts = {'0xswap': _receipt(status=0)}
+
+        pipeline = self._pipeline(contributor_email='payer@example.com')
+        self.assertFalse(payment_pipeline.run_pipeline(pipeline)['success'])
+
+        pipeline.refresh_from_db()
+        self.assertEqual((pipeline.status, pipeline.step), ('failed', 'pending'))
+        self.assertIn('reverted', pipeline.last_error)
+        self.assertFalse(Contribution.objects.exists())
+
+
+class CompletionTests(PipelineTestCase):
+    def test_project_totals_are_incremented(self):
+        Project.objects.filter(id=self.project.id).update(raised_amount=100, number_of_donators=2)
+        for _ in range(2):
+            payment_pipeline._complete(self._pipeline(step='staked', status='running'))
+
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.raised_amount, self.project.number_of_donators), (200, 4))
+
+    def test_a_pipeline_is_counted_once(self):
+        pipeline = self._pipeline(step='staked', status='running')
+        payment_pipeline._complete(pipeline)
+        payment_pipeline._complete(self._pipeline_copy(pipeline))
+
+        self.project.refresh_from_db()
+        self.assertEqual((self.project.raised_amount, self.project.number_of_donators), (50, 1))
+
+    def _pipeline_copy(self, pipeline):
+        # Another runner's stale view of the same row
+        copy = PaymentPipeline.objects.get(pk=pipeline.pk)
+        copy.step = 'staked'
+        return copy
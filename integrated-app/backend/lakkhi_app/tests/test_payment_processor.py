@@ -0,0 +1,84 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from lakkhi_app.models import PaymentIdempotencyKey, Project
+from lakkhi_app.payment_processor import PaymentProcessor
+
+TRANSACTION_ID = '25-{project_id}-0-xLjQwit1fvEzkpo'
+
+
+class ClaimPaymentTests(TestCase):
+    def test_first_claim_processes_the_payment(self):
+        key, result = PaymentProcessor.claim_payment('mercuryo', 'tx-1')
+        self.assertIsNone(result)
+        self.assertEqual((key.status, key.attempts), ('processing', 1))
+
+    def test_payment_in_progress_is_not_claimed_again(self):
+        PaymentProcessor.claim_payment('mercuryo', 'tx-1')
+        key, result = PaymentProcessor.claim_payment('mercuryo', 'tx-1')
+        self.assertEqual(result['status'], 'processing')
+        self.assertEqual(key.attempts, 1)
+
+    def test_completed_payment_returns_the_stored_result(self):
+        key, _ = PaymentProcessor.claim_payment('mercuryo', 'tx-1')
+        PaymentProcessor.finish_payment(key, {'success': True, 'stake_tx_hash': '0xabc'})
+
+        _, result = PaymentProcessor.claim_payment('mercuryo', 'tx-1')
+        self.assertEqual(result, {'success': True, 'stake_tx_hash': '0xabc'})
+
+    def test_failed_payment_is_claimed_again(self):
+        key, _ = PaymentProcessor.claim_payment('mercuryo', 'tx-1')
+        PaymentProcessor.finish_payment(key, {'success': False, 'message': 'swap reverted'})
+
+        key, result = PaymentProcessor.claim_payment('mercuryo', 'tx-1')
+        self.assertIsNone(result)
+        self.assertEqual(key.attempts, 2)
+
+    @override_settings(PAYMENT_PROCESSING_TIMEOUT=60)
+    def test_abandoned_claim_is_taken_over(self):
+        PaymentProcessor.claim_payment('mercuryo', 'tx-1')
+        PaymentIdempotencyKey.objects.update(updated_at=timezone.now() - datetime.timedelta(minutes=5))
+
+        _, result = PaymentProcessor.claim_payment('mercuryo', 'tx-1')
+        self.assertIsNone(result)
+
+
+class MercuryoCallbackTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(title='P', description='d', wallet_address='0x1', token_address='0x2',
+                                              blockchain_chain='Base')
+
+    def _callback(self, status='completed'):
+        return {'data': {
+            'status': status,
+            'merchant_transaction_id': TRANSACTION_ID.format(project_id=self.project.id),
+            'amount': '0.1',
+            'tx': {'address': '0x' + '11' * 20},
+            'user': {'email': 'payer@example.com'},
+        }}
+
+    def test_payment_is_staked_on_the_project_chain_once(self):
+        with mock.patch.object(PaymentProcessor, 'execute_stake_flow',
+                               return_value={'success': True}) as execute_stake_flow:
+            first = PaymentProcessor.handle_mercuryo_callback(self._callback())
+            second = PaymentProcessor.handle_mercuryo_callback(self._callback())
+
+        execute_stake_flow.assert_called_once()
+        self.assertEqual(execute_stake_flow.call_args.kwargs['blockchain'], 'Base')
+        self.assertEqual(first, second)
+
+    def test_pending_payment_is_not_processed(self):
+        with mock.patch.object(PaymentProcessor, 'execute_stake_flow') as execute_stake_flow:
+            result = PaymentProcessor.handle_mercuryo_callback(self._callback(status='pending'))
+
+        execute_stake_flow.assert_not_called()
+        self.assertEqual(result, {'success': True, 'status': 'pending'})
+
+
+class TokenAmountTests(TestCase):
+    def test_unpriced_token_has_no_amount(self):
+        with mock.patch('lakkhi_app.price_oracle.get_token_amount_for_usd', return_value=None):
+            self.assertIsNone(PaymentProcessor.get_token_amount_for_usd(10, '0x2', 'Base'))
@@ -0,0 +1,80 @@
+import datetime
+import math
+
+from django.test import TestCase
+from django.utils import timezone
+
+from lakkhi_app import price_history
+from lakkhi_app.models import TokenPriceRollup, TokenPriceSample
+
+TOKEN = '0x' + 'aa' * 20
+OTHER = '0x' + 'bb' * 20
+T0 = datetime.datetime(2026, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def _at(seconds):
+    return T0 + datetime.timedelta(seconds=seconds)
+
+
+def _sample(seconds, price, token=TOKEN):
+    TokenPriceSample.objects.create(blockchain='BSC', token_address=token, timestamp=_at(seconds), price=price)
+
+
+class PricesAtTests(TestCase):
+    def setUp(self):
+        _sample(0, 1.0)
+        _sample(100, 2.0)
+        _sample(200, 3.0)
+
+    def _prices(self, seconds, token=TOKEN, max_staleness=1000):
+        return list(price_history.prices_at('BSC', token, [_at(second) for second in seconds], max_staleness))
+
+    def test_last_price_at_or_before_each_timestamp(self):
+        self.assertEqual(self._prices([0, 50, 100, 199, 500]), [1.0, 1.0, 2.0, 2.0, 3.0])
+
+    def test_no_price_before_the_first_observation(self):
+        self.assertTrue(math.isnan(self._prices([-1])[0]))
+
+    def test_price_older_than_max_staleness_is_nan(self):
+        prices = self._prices([250, 400], max_staleness=100)
+        self.assertEqual(prices[0], 3.0)
+        self.assertTrue(math.isnan(prices[1]))
+
+    def test_each_timestamp_uses_its_own_token(self):
+        _sample(50, 10.0, token=OTHER)
+        prices = price_history.prices_at('BSC', [TOKEN, OTHER.upper().replace('0X', '0x'), None],
+                                         [_at(60), _at(60), _at(60)], max_staleness=1000)
+        self.assertEqual(list(prices[:2]), [1.0, 10.0])
+        self.assertTrue(math.isnan(prices[2]))
+
+    def test_rollups_fill_in_before_the_raw_samples(self):
+        TokenPriceRollup.objects.create(
+            blockchain='BSC', token_address=TOKEN, resolution='1h', bucket_start=_at(-3600),
+            open=0.4, high=0.6, low=0.3, close=0.5, close_at=_at(-3000), samples=10
+        )
+        self.assertEqual(self._prices([-3001, -2000, 0], max_staleness=5000)[1:], [0.5, 1.0])
+        self.assertTrue(math.isnan(self._prices([-3001], max_staleness=5000)[0]))
+
+
+class RollupTests(TestCase):
+    def test_samples_are_rolled_up_into_minute_buckets(self):
+        # Recent enough to survive pruning, aligned to a minute bucket
+        start = timezone.now().replace(second=0, microsecond=0) - datetime.timedelta(minutes=10)
+        for seconds, price in ((0, 1.0), (20, 3.0), (40, 2.0), (70, 5.0)):
+            TokenPriceSample.objects.create(blockchain='BSC', token_address=TOKEN, price=price,
+                                            timestamp=start + datetime.timedelta(seconds=seconds))
+
+        price_history.rollup_prices()
+
+        buckets = list(TokenPriceRollup.objects.filter(resolution='1m').order_by('bucket_start').values_list(
+            'open', 'high', 'low', 'close', 'close_at', 'samples'
+        ))
+        self.assertEqual(buckets, [
+            (1.0, 3.0, 1.0, 2.0, start + datetime.timedelta(seconds=40), 3),
+            (5.0, 5.0, 5.0, 5.0, start + datetime.timedelta(seconds=70), 1),
+        ])
+        self.assertEqual(sum(TokenPriceRollup.objects.filter(resolution='1d').values_list('samples', flat=True)), 4)
+
+    def test_expired_samples_are_pruned(self):
+        _sample(0, 1.0)
+        self.assertEqual(price_history.prune()['raw'], 1)
@@ -0,0 +1,90 @@
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from lakkhi_app import price_history, price_oracle
+from lakkhi_app.models import TokenPriceSample
+
+TOKEN = '0x' + 'aB' * 20
+
+
+class _InlineExecutor:
+    def submit(self, fn):
+        fn()
+
+
+def _source(name, price=None, error=None):
+    source = mock.Mock()
+    source.name = name
+    source.fetch.side_effect = error or (lambda token, blockchain: price)
+    return source
+
+
+@override_settings(PRICE_ORACLE_TTL=60, PRICE_ORACLE_STALE_TTL=600, PRICE_ORACLE_RETRY_DELAY=30)
+class GetPriceTests(TestCase):
+    def setUp(self):
+        for lru in (price_oracle._prices, price_oracle._unpriced, price_history._recently_recorded):
+            lru.clear()
+            self.addCleanup(lru.clear)
+        patcher = mock.patch.object(price_oracle, '_get_executor', return_value=_InlineExecutor())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _sources(self, *sources):
+        return mock.patch.object(price_oracle, 'get_sources', return_value=list(sources))
+
+    def test_first_lookup_fetches_then_cache_serves(self):
+        source = _source('static', Decimal('2'))
+        with self._sources(source):
+            first = price_oracle.get_price(TOKEN)
+            second = price_oracle.get_price(TOKEN.lower())
+
+        self.assertEqual((first['price'], first['source'], first['stale']), (Decimal('2'), 'static', False))
+        self.assertEqual(second['price'], Decimal('2'))
+        source.fetch.assert_called_once_with(TOKEN.lower(), 'BSC')
+        self.assertTrue(TokenPriceSample.objects.filter(token_address=TOKEN.lower()).exists())
+
+    def test_failing_source_falls_through_to_the_next(self):
+        with self._sources(_source('dex', error=ValueError('no pair')), _source('coingecko', Decimal('3'))):
+            quote = price_oracle.get_price(TOKEN)
+        self.assertEqual((quote['price'], quote['source']), (Decimal('3'), 'coingecko'))
+
+    def test_stale_price_is_served_while_it_refreshes(self):
+        key = price_oracle._key(TOKEN, 'BSC')
+        price_oracle._prices.set(key, {'price': Decimal('1'), 'source': 'dex', 'fetched_at': time.time() - 120})
+
+        with self._sources(_source('dex', Decimal('5'))):
+            quote = price_oracle.get_price(TOKEN)
+
+        self.assertEqual((quote['price'], quote['stale']), (Decimal('1'), True))
+        self.assertEqual(price_oracle._prices.get(key)['price'], Decimal('5'))
+
+    def test_unpriced_token_is_not_retried_until_the_retry_delay(self):
+        source = _source('dex', None)
+        with self._sources(source):
+            self.assertIsNone(price_oracle.get_price(TOKEN))
+            self.assertIsNone(price_oracle.get_price(TOKEN))
+        source.fetch.assert_called_once()
+
+    def test_recent_history_sample_is_used_instead_of_sources(self):
+        price_oracle.record_price('BSC', TOKEN.lower(), Decimal('4'), force=True)
+        source = _source('dex', Decimal('9'))
+        with self._sources(source):
+            quote = price_oracle.get_price(TOKEN)
+
+        self.assertEqual((quote['price'], quote['source']), (Decimal('4'), 'history'))
+        source.fetch.assert_not_called()
+
+    def test_token_amount_for_usd(self):
+        with self._sources(_source('static', Decimal('0.5'))):
+            self.assertEqual(price_oracle.get_token_amount_for_usd(10, TOKEN), Decimal('20'))
+
+
+class StaticPriceSourceTests(TestCase):
+    @override_settings(PRICE_ORACLE_STATIC_PRICES={'BSC': {TOKEN: 1.25}})
+    def test_price_by_address_in_any_case(self):
+        source = price_oracle.StaticPriceSource()
+        self.assertEqual(source.fetch(TOKEN.lower(), 'BSC'), Decimal('1.25'))
+        self.assertIsNone(source.fetch(TOKEN, 'Base'))
@@ -0,0 +1,111 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from eth_abi import encode
+
+from lakkhi_app import reserve_mirror
+from lakkhi_app.custom_wallet import WRAPPED_NATIVE_TOKEN
+
+WRAPPED = WRAPPED_NATIVE_TOKEN['BSC'].lower()
+TOKEN = '0x' + '33' * 20
+STABLE = '0x' + '44' * 20
+PAIR = '0x' + '55' * 20
+STABLE_PAIR = '0x' + '66' * 20
+
+
+def _mirror():
+    mirror = reserve_mirror.ChainReserveMirror('BSC')
+    mirror.pairs = {
+        # token0 is the project token, so the wrapped -> token hop reads the reserves reversed
+        PAIR: {'token0': TOKEN, 'token1': WRAPPED, 'reserve0': 2000000, 'reserve1': 1000000},
+    }
+    mirror.pair_index = {frozenset((WRAPPED, TOKEN)): PAIR, frozenset((WRAPPED, STABLE)): None}
+    mirror.tracked_tokens = {WRAPPED, TOKEN}
+    return mirror
+
+
+class AmountOutTests(SimpleTestCase):
+    def test_matches_the_routers_integer_math(self):
+        # PancakeSwap: 0.25% fee
+        self.assertEqual(reserve_mirror.get_amount_out(1000, 10 ** 6, 10 ** 6, 'BSC'), 996)
+        # Uniswap V2: 0.3% fee
+        self.assertEqual(reserve_mirror.get_amount_out(1000, 10 ** 6, 10 ** 6, 'Ethereum'), 996)
+        self.assertEqual(reserve_mirror.get_amount_out(10 ** 5, 10 ** 6, 10 ** 6, 'BSC'), 90702)
+        self.assertEqual(reserve_mirror.get_amount_out(10 ** 5, 10 ** 6, 10 ** 6, 'Ethereum'), 90661)
+
+    def test_empty_pool_gives_nothing(self):
+        self.assertEqual(reserve_mirror.get_amount_out(1000, 0, 10 ** 6), 0)
+
+
+class QuotePathTests(SimpleTestCase):
+    def test_reserves_follow_token_order(self):
+        mirror = _mirror()
+        self.assertEqual(mirror.reserves(WRAPPED, TOKEN), (1000000, 2000000))
+        self.assertEqual(mirror.quote_path([WRAPPED, TOKEN], 1000), [1000, 1993])
+
+    def test_missing_hop_cannot_be_priced(self):
+        self.assertIsNone(_mirror().quote_path([WRAPPED, STABLE, TOKEN], 1000))
+
+    def test_sync_events_apply_in_chain_order(self):
+        mirror = _mirror()
+        mirror._apply_sync_logs([
+            {'address': PAIR, 'blockNumber': 11, 'logIndex': 0, 'data': encode(['uint112', 'uint112'], [7, 8])},
+            {'address': PAIR, 'blockNumber': 10, 'logIndex': 3, 'data': encode(['uint112', 'uint112'], [5, 6])},
+            {'address': STABLE_PAIR, 'blockNumber': 11, 'logIndex': 1, 'data': encode(['uint112', 'uint112'], [1, 1])},
+        ])
+        self.assertEqual((mirror.pairs[PAIR]['reserve0'], mirror.pairs[PAIR]['reserve1']), (7, 8))
+        self.assertEqual(mirror.sync_events, 2)
+
+
+class TrackTokensTests(SimpleTestCase):
+    def test_pairs_are_looked_up_and_seeded_in_batches(self):
+        mirror = reserve_mirror.ChainReserveMirror('BSC')
+        mirror.factory_address = '0x' + '77' * 20
+        reads = [
+            # getPair for the one candidate pair
+            [reserve_mirror.Web3.to_checksum_address(PAIR)],
+            # token0, token1, getReserves of the new pair
+            [reserve_mirror.Web3.to_checksum_address(TOKEN), reserve_mirror.Web3.to_checksum_address(WRAPPED), (20, 10, 0)],
+        ]
+        with self.settings(ROUTE_BASE_TOKENS={}), \
+                mock.patch.object(reserve_mirror, 'batch_read', side_effect=reads) as batch_read:
+            mirror.track_tokens([TOKEN])
+
+        self.assertEqual(batch_read.call_count, 2)
+        self.assertTrue(mirror.is_tracked(TOKEN.upper().replace('0X', '0x')))
+        self.assertEqual(mirror.reserves(WRAPPED, TOKEN), (10, 20))
+
+    def test_failed_lookups_are_retried(self):
+        mirror = reserve_mirror.ChainReserveMirror('BSC')
+        mirror.factory_address = '0x' + '77' * 20
+        with self.settings(ROUTE_BASE_TOKENS={}), mock.patch.object(reserve_mirror, 'batch_read', return_value=[None]):
+            mirror.track_tokens([TOKEN])
+        self.assertFalse(mirror.is_tracked(TOKEN))
+
+
+class SyncTests(SimpleTestCase):
+    def _sync(self, mirror, block_number):
+        with mock.patch.object(reserve_mirror, 'get_gas_suggestions', return_value={'block_number': block_number}), \
+                mock.patch.object(mirror, 'reseed') as reseed, \
+                mock.patch.object(reserve_mirror, 'get_web3') as get_web3:
+            get_web3.return_value.eth.get_logs.return_value = []
+            mirror.sync()
+        return reseed, get_web3.return_value.eth.get_logs
+
+    def test_small_gap_is_covered_with_logs(self):
+        mirror = _mirror()
+        mirror.last_block = 100
+        reseed, get_logs = self._sync(mirror, 103)
+
+        reseed.assert_not_called()
+        self.assertEqual((get_logs.call_args[0][0]['fromBlock'], get_logs.call_args[0][0]['toBlock']), (101, 103))
+        self.assertTrue(mirror.is_fresh())
+
+    def test_large_gap_reseeds(self):
+        mirror = _mirror()
+        mirror.last_block = 100
+        reseed, get_logs = self._sync(mirror, 100000)
+
+        reseed.assert_called_once()
+        get_logs.assert_not_called()
+        self.assertEqual(mirror.last_block, 100000)
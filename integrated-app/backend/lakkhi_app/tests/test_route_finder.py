@@ -0,0 +1,91 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+from web3 import Web3
+
+from lakkhi_app import route_finder
+
+WRAPPED = '0x' + '22' * 20
+TOKEN = '0x' + '33' * 20
+USDT = '0x' + '44' * 20
+BUSD = '0x' + '55' * 20
+ROUTER = '0x' + '11' * 20
+
+
+class RouteFinderTestCase(SimpleTestCase):
+    def setUp(self):
+        route_finder._routes.clear()
+        self.mirror = mock.Mock()
+        self.mirror.base_tokens.return_value = [WRAPPED, USDT, BUSD]
+        for target, value in (('get_mirror', self.mirror), ('get_gas_suggestions', {'block_number': 100})):
+            patcher = mock.patch.object(route_finder, target, return_value=value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class CandidatePathsTests(RouteFinderTestCase):
+    def test_direct_two_and_three_hop_paths(self):
+        self.assertEqual(route_finder.candidate_paths(TOKEN.upper().replace('0X', '0x')), [
+            [WRAPPED, TOKEN],
+            [WRAPPED, USDT, TOKEN],
+            [WRAPPED, BUSD, TOKEN],
+            [WRAPPED, USDT, BUSD, TOKEN],
+            [WRAPPED, BUSD, USDT, TOKEN],
+        ])
+
+    def test_base_token_is_not_its_own_intermediate(self):
+        self.assertEqual(route_finder.candidate_paths(USDT), [[WRAPPED, USDT], [WRAPPED, BUSD, USDT]])
+
+
+class BestTests(SimpleTestCase):
+    def test_largest_output_wins(self):
+        paths = [['a'], ['b'], ['c'], ['d']]
+        best = route_finder._best(paths, [[10, 5], None, [10, 3, 7], [10, 0]])
+        self.assertEqual(best, (['c'], [10, 3, 7]))
+
+    def test_no_liquidity(self):
+        self.assertIsNone(route_finder._best([['a'], ['b']], [None, [10, 0]]))
+
+
+class FindBestRouteTests(RouteFinderTestCase):
+    def test_mirror_prices_every_path_without_rpc(self):
+        self.mirror.is_tracked.return_value = True
+        self.mirror.is_fresh.return_value = True
+        quotes = {
+            (WRAPPED, TOKEN): [1000, 50],
+            (WRAPPED, USDT, TOKEN): [1000, 300, 80],
+        }
+        self.mirror.quote_path.side_effect = lambda path, amount_in: quotes.get(tuple(path))
+
+        with mock.patch.object(route_finder, 'get_amounts_out_many') as router_quotes:
+            route = route_finder.find_best_route(TOKEN, 1000, ROUTER, 'abi')
+
+        router_quotes.assert_not_called()
+        self.assertEqual(route['path'], [Web3.to_checksum_address(address) for address in (WRAPPED, USDT, TOKEN)])
+        self.assertEqual((route['amount_out'], route['hops'], route['source']), (80, 2, 'mirror'))
+
+    def test_router_prices_paths_while_the_mirror_catches_up(self):
+        self.mirror.is_tracked.return_value = False
+        router_quotes = [[1000, 50], None, None, None, [1000, 9, 9, 60]]
+
+        with mock.patch.object(route_finder, 'get_amounts_out_many', return_value=router_quotes) as many:
+            route = route_finder.find_best_route(TOKEN, 1000, ROUTER, 'abi')
+            route_finder.find_best_route(TOKEN, 1000, ROUTER, 'abi')
+
+        many.assert_called_once()
+        self.mirror.track_in_background.assert_called_once_with(TOKEN)
+        self.assertEqual((route['amount_out'], route['hops'], route['source']), (60, 3, 'router'))
+
+    def test_memoized_route_is_scaled_to_nearby_amounts(self):
+        self.mirror.is_tracked.return_value = False
+        with mock.patch.object(route_finder, 'get_amounts_out_many', return_value=[[10000, 500], None, None, None, None]):
+            route_finder.find_best_route(TOKEN, 10000, ROUTER, 'abi')
+            route = route_finder.find_best_route(TOKEN, 10002, ROUTER, 'abi')
+
+        self.assertEqual(route['amounts'], [10002, 500])
+
+    def test_no_liquidity_raises(self):
+        self.mirror.is_tracked.return_value = False
+        with mock.patch.object(route_finder, 'get_amounts_out_many', return_value=[None] * 5):
+            with self.assertRaises(ValueError):
+                route_finder.find_best_route(TOKEN, 1000, ROUTER, 'abi')
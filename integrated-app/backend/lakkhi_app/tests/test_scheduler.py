@@ -0,0 +1,54 @@
+import datetime
+
+from django.conf import settings
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from lakkhi_app import scheduler
+from lakkhi_app.models import ScheduledJob, SchedulerLease
+
+JOB = {'func': 'lakkhi_app.jobs.warm_caches', 'interval': 60, 'timeout': 30, 'jitter': 0}
+
+
+class LeadershipTests(TestCase):
+    def test_one_holder_at_a_time(self):
+        self.assertTrue(scheduler.acquire_leadership('node-a'))
+        self.assertFalse(scheduler.acquire_leadership('node-b'))
+        # The holder renews its own lease
+        self.assertTrue(scheduler.acquire_leadership('node-a'))
+
+    def test_expired_lease_is_taken_over(self):
+        scheduler.acquire_leadership('node-a')
+        SchedulerLease.objects.update(expires_at=timezone.now() - datetime.timedelta(seconds=1))
+
+        self.assertTrue(scheduler.acquire_leadership('node-b'))
+        self.assertEqual(SchedulerLease.objects.get().holder, 'node-b')
+        self.assertFalse(scheduler.acquire_leadership('node-a'))
+
+    def test_released_lease_is_free(self):
+        scheduler.acquire_leadership('node-a')
+        scheduler.release_leadership('node-a')
+        self.assertTrue(scheduler.acquire_leadership('node-b'))
+
+
+class ClaimRunTests(TestCase):
+    def test_each_interval_is_claimed_once(self):
+        self.assertTrue(scheduler._claim_run('cache_warming', JOB))
+        self.assertFalse(scheduler._claim_run('cache_warming', JOB))
+
+        job = ScheduledJob.objects.get(name='cache_warming')
+        self.assertEqual(job.last_run_by, scheduler.NODE_ID)
+        self.assertGreater(job.next_run_at, timezone.now() + datetime.timedelta(seconds=59))
+
+    def test_due_job_is_claimed_again(self):
+        scheduler._claim_run('cache_warming', JOB)
+        scheduler.run_now('cache_warming')
+        self.assertTrue(scheduler._claim_run('cache_warming', JOB))
+
+
+class ConfiguredJobsTests(SimpleTestCase):
+    def test_every_job_imports(self):
+        for name, job in settings.SCHEDULER_JOBS.items():
+            with self.subTest(name):
+                self.assertTrue(callable(import_string(job['func'])))
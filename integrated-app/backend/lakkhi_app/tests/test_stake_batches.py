@@ -0,0 +1,105 @@
+import datetime
+from decimal import Decimal
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from lakkhi_app import jobs, stake_batches
+from lakkhi_app.custom_wallet import WalletManager
+from lakkhi_app.models import (
+    Campaign, Contribution, CustodialWallet, PaymentPipeline, Project, StakeAllocation, StakeBatch, User
+)
+
+TOKEN = '0x' + '11' * 20
+CONTRACT = '0x' + '22' * 20
+
+
+@override_settings(PAYMENT_AGGREGATION_ENABLED=True, PAYMENT_AGGREGATION_THRESHOLD_USD=100,
+                   WALLET_ENCRYPTION_KEY='test-key', WALLET_KEYSTORE_ITERATIONS=2)
+class StakeBatchTestCase(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(title='P', description='d', wallet_address='0x1', token_address=TOKEN,
+                                              contract_address=CONTRACT)
+        for target, value in ((stake_batches, 'run_pipeline'), (WalletManager, 'can_route_to')):
+            patcher = mock.patch.object(target, value, return_value=False)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class AddToBatchTests(StakeBatchTestCase):
+    def test_payments_are_allocated_without_contributions(self):
+        result = stake_batches.add_to_batch(self.project, 'payer@example.com', '0.1', '40')
+
+        self.assertEqual(result['status'], 'batched')
+        allocation = StakeAllocation.objects.get()
+        self.assertEqual((allocation.contributor_email, allocation.contribution), ('payer@example.com', None))
+        self.assertFalse(Contribution.objects.exists())
+
+    def test_batch_is_sealed_at_the_threshold(self):
+        stake_batches.add_to_batch(self.project, 'one@example.com', '0.1', '40')
+        stake_batches.add_to_batch(self.project, 'two@example.com', '0.2', '80')
+
+        batch = StakeBatch.objects.get()
+        self.assertEqual((batch.status, batch.contribution_count, batch.total_native), ('sealed', 2, Decimal('0.3')))
+        self.assertEqual(batch.pipeline.native_amount, Decimal('0.3'))
+        stake_batches.run_pipeline.assert_called_once_with(batch.pipeline)
+
+    def test_pool_wallet_is_persisted(self):
+        wallet = stake_batches.pool_wallet('BSC')
+        self.assertTrue(CustodialWallet.objects.filter(address=wallet['address']).exists())
+        self.assertTrue(stake_batches.is_pool_payment(wallet['address'].lower(), 'BSC'))
+
+
+@override_settings(PAYMENT_AGGREGATION_WINDOW=900)
+class FlushDueBatchesTests(StakeBatchTestCase):
+    def test_scheduler_job_seals_batches_past_their_window(self):
+        stake_batches.add_to_batch(self.project, 'one@example.com', '0.1', '40')
+        StakeBatch.objects.update(opened_at=timezone.now() - datetime.timedelta(seconds=901))
+
+        jobs.flush_stake_batches()
+
+        batch = StakeBatch.objects.get()
+        self.assertEqual(batch.status, 'sealed')
+        stake_batches.run_pipeline.assert_called_once_with(batch.pipeline)
+
+    def test_open_batches_inside_their_window_wait(self):
+        stake_batches.add_to_batch(self.project, 'one@example.com', '0.1', '40')
+        self.assertEqual(stake_batches.flush_due_batches(), 0)
+        self.assertEqual(StakeBatch.objects.get().status, 'open')
+
+
+class RecordBatchStakedTests(StakeBatchTestCase):
+    def setUp(self):
+        super().setUp()
+        owner = User.objects.create_user(email='owner@example.com', username='owner', bio='', password='x')
+        self.campaign = Campaign.objects.create(owner=owner, title='C', description='d', fund_amount=1000,
+                                                contract_address=CONTRACT, token_symbol='LAK')
+        # A token with 3 decimals keeps the raw amounts exact in SQLite
+        patcher = mock.patch.object(stake_batches, 'token_unit', return_value=1000)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_received_tokens_are_split_pro_rata(self):
+        for email, native in (('one@example.com', '0.1'), ('two@example.com', '0.1'), ('three@example.com', '0.2')):
+            stake_batches.add_to_batch(self.project, email, native, '20')
+        batch = StakeBatch.objects.get()
+        # The quote was 10 tokens, but the swap delivered 9.999
+        pipeline = PaymentPipeline.objects.create(
+            project_id=self.project.id, wallet_address='0x' + '33' * 20, native_amount=batch.total_native,
+            usd_amount=batch.total_usd, token_amount=Decimal('10'), stake_amount='9999', stake_tx_hash='0xstake'
+        )
+
+        self.assertEqual(stake_batches.record_batch_staked(batch, pipeline), 3)
+
+        allocations = list(StakeAllocation.objects.order_by('id'))
+        # Rounding dust goes to the last payment, so the shares add up to what was staked
+        self.assertEqual([allocation.token_amount for allocation in allocations],
+                         [Decimal('2.499'), Decimal('2.499'), Decimal('5.001')])
+        self.assertEqual([allocation.contribution.amount for allocation in allocations],
+                         [Decimal('2.499'), Decimal('2.499'), Decimal('5.001')])
+
+        contribution = allocations[0].contribution
+        self.assertEqual((contribution.campaign, contribution.transaction_hash, contribution.wallet_address),
+                         (self.campaign, '0xstake', '0x' + '33' * 20))
+        self.assertEqual(StakeBatch.objects.get().status, 'completed')
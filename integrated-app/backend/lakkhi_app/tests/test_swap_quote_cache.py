@@ -0,0 +1,102 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from lakkhi_app import swap_quote_cache
+
+ROUTER = '0x' + '11' * 20
+WRAPPED = '0x' + '22' * 20
+TOKEN = '0x' + '33' * 20
+STABLE = '0x' + '44' * 20
+
+
+class BucketAmountTests(SimpleTestCase):
+    def test_rounds_down_to_significant_digits(self):
+        self.assertEqual(swap_quote_cache.bucket_amount(123456789), 123400000)
+        self.assertEqual(swap_quote_cache.bucket_amount(1234), 1234)
+        self.assertEqual(swap_quote_cache.bucket_amount(0), 0)
+
+    @override_settings(QUOTE_AMOUNT_SIGNIFICANT_DIGITS=2)
+    def test_digits_are_configurable(self):
+        self.assertEqual(swap_quote_cache.bucket_amount(98765), 98000)
+
+
+class QuoteCacheTestCase(SimpleTestCase):
+    def setUp(self):
+        swap_quote_cache._quotes.clear()
+        self.block_number = 100
+        patcher = mock.patch.object(
+            swap_quote_cache, 'get_gas_suggestions', side_effect=lambda blockchain: {'block_number': self.block_number}
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+class GetAmountsOutTests(QuoteCacheTestCase):
+    @mock.patch.object(swap_quote_cache, '_fetch_quote', return_value=[10000, 500])
+    def test_nearby_amounts_share_the_bucket_quote(self, fetch):
+        self.assertEqual(swap_quote_cache.get_amounts_out(ROUTER, 'abi', 10000, [WRAPPED, TOKEN]), [10000, 500])
+        self.assertEqual(swap_quote_cache.get_amounts_out(ROUTER, 'abi', 10004, [WRAPPED, TOKEN]), [10004, 500])
+
+        fetch.assert_called_once_with(ROUTER, 'abi', 10000, [WRAPPED, TOKEN], 'BSC')
+
+    @mock.patch.object(swap_quote_cache, '_fetch_quote', return_value=[10000, 500])
+    def test_a_new_block_is_quoted_again(self, fetch):
+        swap_quote_cache.get_amounts_out(ROUTER, 'abi', 10000, [WRAPPED, TOKEN])
+        self.block_number = 101
+        swap_quote_cache.get_amounts_out(ROUTER, 'abi', 10000, [WRAPPED, TOKEN])
+
+        self.assertEqual(fetch.call_count, 2)
+
+    def test_concurrent_misses_are_coalesced(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_fetch(*args):
+            started.set()
+            release.wait(5)
+            return [10000, 500]
+
+        results = []
+        with mock.patch.object(swap_quote_cache, '_fetch_quote', side_effect=slow_fetch) as fetch:
+            leader = threading.Thread(target=lambda: results.append(
+                swap_quote_cache.get_amounts_out(ROUTER, 'abi', 10000, [WRAPPED, TOKEN])
+            ))
+            leader.start()
+            started.wait(5)
+            key = swap_quote_cache._quote_key(ROUTER, [WRAPPED, TOKEN], 10000, 100, 'BSC')
+            follower = threading.Thread(target=lambda: results.append(
+                swap_quote_cache._coalesced_fetch(key, lambda: self.fail('fetched twice'))
+            ))
+            coalesced = swap_quote_cache._coalesced
+            follower.start()
+            # Let the leader finish only once the follower is waiting on it
+            deadline = time.monotonic() + 5
+            while swap_quote_cache._coalesced == coalesced and time.monotonic() < deadline:
+                time.sleep(0.01)
+            release.set()
+            leader.join(5)
+            follower.join(5)
+
+        fetch.assert_called_once()
+        self.assertEqual(results, [[10000, 500], [10000, 500]])
+
+
+class GetAmountsOutManyTests(QuoteCacheTestCase):
+    def test_misses_are_fetched_in_one_batch(self):
+        paths = [[WRAPPED, TOKEN], [WRAPPED, STABLE, TOKEN]]
+        swap_quote_cache._quotes.set(swap_quote_cache._quote_key(ROUTER, paths[0], 10000, 100, 'BSC'), [10000, 400])
+
+        with mock.patch.object(swap_quote_cache, 'batch_rpc_read', return_value=[[10000, 20, 450]]) as read:
+            quotes = swap_quote_cache.get_amounts_out_many(ROUTER, 'abi', 10000, paths)
+
+        self.assertEqual(quotes, [[10000, 400], [10000, 20, 450]])
+        self.assertEqual(read.call_args[0][0], [(ROUTER, 'abi', 'getAmountsOut', [10000, paths[1]])])
+
+    def test_rejected_paths_are_none_and_not_cached(self):
+        paths = [[WRAPPED, TOKEN]]
+        with mock.patch.object(swap_quote_cache, 'batch_rpc_read', return_value=[None]) as read:
+            self.assertEqual(swap_quote_cache.get_amounts_out_many(ROUTER, 'abi', 10000, paths), [None])
+            swap_quote_cache.get_amounts_out_many(ROUTER, 'abi', 10000, paths)
+        self.assertEqual(read.call_count, 2)
@@ -0,0 +1,75 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from eth_account import Account
+from eth_keys import keys
+
+from lakkhi_app import custom_wallet, token_allowance
+from lakkhi_app.custom_wallet import WalletManager
+
+TOKEN = '0x' + '11' * 20
+SPENDER = '0x' + '22' * 20
+CONTRACT = '0x' + '33' * 20
+DOMAIN = b'\x44' * 32
+
+
+class AllowanceTests(SimpleTestCase):
+    def test_allowance_covers(self):
+        with mock.patch.object(token_allowance, 'batch_rpc_read', side_effect=[[100], [99], [None]]):
+            self.assertTrue(token_allowance.allowance_covers(TOKEN, SPENDER, CONTRACT, 100))
+            self.assertFalse(token_allowance.allowance_covers(TOKEN, SPENDER, CONTRACT, 100))
+            self.assertFalse(token_allowance.allowance_covers(TOKEN, SPENDER, CONTRACT, 100))
+
+
+class SignPermitTests(SimpleTestCase):
+    def setUp(self):
+        token_allowance._permit_domains.clear()
+        self.addCleanup(token_allowance._permit_domains.clear)
+        self.account = Account.create()
+
+    def _sign(self, reads):
+        with mock.patch.object(token_allowance, 'batch_rpc_read', side_effect=reads) as read:
+            permit = token_allowance.sign_permit(
+                TOKEN, self.account.address, self.account.key.hex(), SPENDER, 500, deadline=1000
+            )
+        return permit, read
+
+    def test_signature_is_the_owners(self):
+        permit, _ = self._sign([[0, 3, DOMAIN, token_allowance.PERMIT_TYPEHASH]])
+
+        digest = token_allowance._permit_digest(DOMAIN, self.account.address, SPENDER, 500, 3, 1000)
+        signature = keys.Signature(vrs=(permit['v'] - 27, int.from_bytes(permit['r'], 'big'),
+                                        int.from_bytes(permit['s'], 'big')))
+        self.assertEqual(signature.recover_public_key_from_msg_hash(digest).to_checksum_address(), self.account.address)
+
+    def test_tokens_without_permit_are_only_probed_once(self):
+        permit, _ = self._sign([[0, None, None, None]])
+        self.assertIsNone(permit)
+
+        permit, read = self._sign([])
+        self.assertIsNone(permit)
+        read.assert_not_called()
+
+    def test_differently_shaped_permit_is_unsupported(self):
+        permit, _ = self._sign([[0, 3, DOMAIN, b'\x55' * 32]])
+        self.assertIsNone(permit)
+
+
+@override_settings(CONTRIBUTION_ROUTER_ADDRESSES={'BSC': SPENDER})
+class DepositWithPermitTests(SimpleTestCase):
+    def test_contracts_that_credit_the_caller_are_not_routed(self):
+        with mock.patch.object(WalletManager, 'can_route_to', return_value=False), \
+                mock.patch.object(custom_wallet, 'sign_permit') as sign_permit:
+            tx_hash = WalletManager.send_deposit_with_permit(SPENDER, 'key', CONTRACT, TOKEN, 100, 'BSC')
+
+        self.assertIsNone(tx_hash)
+        sign_permit.assert_not_called()
+
+    def test_stake_with_permit_reports_it_unsupported(self):
+        wallet = {'address': SPENDER, 'private_key': 'key'}
+        with mock.patch.object(WalletManager, 'get_wallet_by_address', return_value=wallet), \
+                mock.patch.object(WalletManager, 'can_route_to', return_value=False), \
+                mock.patch.object(custom_wallet, 'get_web3'):
+            result = WalletManager.stake_with_permit(SPENDER, CONTRACT, TOKEN, 100)
+
+        self.assertTrue(result['permitUnsupported'])
@@ -0,0 +1,57 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from lakkhi_app import multicall, web3_helper_functions
+
+TOKEN = '0x' + '11' * 20
+OTHER = '0x' + '22' * 20
+
+
+class GetTokensInfoTests(SimpleTestCase):
+    def test_reads_every_token_in_one_batch(self):
+        with mock.patch.object(web3_helper_functions, 'batch_rpc_read', return_value=[
+            'Token One', 'ONE', 18, 'Token Two', 'TWO', 6
+        ]) as batch_rpc_read:
+            results = web3_helper_functions.get_tokens_info([TOKEN, OTHER, TOKEN], 'Base')
+
+        batch_rpc_read.assert_called_once()
+        calls, blockchain = batch_rpc_read.call_args[0]
+        self.assertEqual(blockchain, 'Base')
+        self.assertEqual([call[2] for call in calls], ['name', 'symbol', 'decimals'] * 2)
+        self.assertEqual(results[TOKEN]['symbol'], 'ONE')
+        self.assertEqual(results[OTHER]['decimals'], 6)
+
+    def test_invalid_addresses_are_not_queried(self):
+        with mock.patch.object(web3_helper_functions, 'batch_rpc_read') as batch_rpc_read:
+            results = web3_helper_functions.get_tokens_info(['', 'not-an-address'])
+
+        batch_rpc_read.assert_not_called()
+        self.assertFalse(results['']['success'])
+        self.assertFalse(results['not-an-address']['success'])
+
+    def test_token_that_does_not_answer_fails_alone(self):
+        with mock.patch.object(web3_helper_functions, 'batch_rpc_read', return_value=[
+            'Token One', 'ONE', 18, None, None, None
+        ]):
+            results = web3_helper_functions.get_tokens_info([TOKEN, OTHER])
+
+        self.assertTrue(results[TOKEN]['success'])
+        self.assertFalse(results[OTHER]['success'])
+
+    def test_failed_batch_fails_every_token(self):
+        with mock.patch.object(web3_helper_functions, 'batch_rpc_read', side_effect=ValueError('node down')):
+            results = web3_helper_functions.get_tokens_info([TOKEN, OTHER])
+
+        self.assertFalse(results[TOKEN]['success'])
+        self.assertIn('node down', results[OTHER]['message'])
+
+
+class BatchRpcReadTests(SimpleTestCase):
+    def test_falls_back_to_individual_calls(self):
+        with mock.patch.object(multicall, '_read_via_batch_rpc', side_effect=ValueError('no batching')), \
+                mock.patch.object(multicall, '_read_individually', return_value=['Token One']) as individually:
+            results = multicall.batch_rpc_read([(TOKEN, 'token', 'name', [])])
+
+        self.assertEqual(results, ['Token One'])
+        individually.assert_called_once()
@@ -0,0 +1,82 @@
+import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from lakkhi_app import token_metadata_cache
+from lakkhi_app.cache_utils import LRUCache, MISSING
+from lakkhi_app.models import TokenMetadata
+
+TOKEN = '0x' + 'aB' * 20
+BAD_TOKEN = '0x' + 'cd' * 20
+
+
+def _info(symbol, decimals=18):
+    return {'success': True, 'address': TOKEN, 'name': symbol.title(), 'symbol': symbol,
+            'decimals': decimals, 'blockchain': 'BSC'}
+
+
+class LRUCacheTests(SimpleTestCase):
+    def test_least_recently_used_is_evicted(self):
+        cache = LRUCache(maxsize=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual((cache.get('a'), cache.get('c')), (1, 3))
+
+    def test_entries_expire_after_their_ttl(self):
+        cache = LRUCache()
+        with mock.patch('lakkhi_app.cache_utils.time.monotonic', return_value=100):
+            cache.set('a', None, ttl=10)
+            self.assertIsNone(cache.get('a'))
+        with mock.patch('lakkhi_app.cache_utils.time.monotonic', return_value=110):
+            self.assertIs(cache.get('a'), MISSING)
+
+    def test_stats(self):
+        cache = LRUCache()
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+        self.assertEqual(cache.stats()['hit_rate'], 0.5)
+
+
+class CachedTokensInfoTests(TestCase):
+    def setUp(self):
+        token_metadata_cache._lru.clear()
+        self.addCleanup(token_metadata_cache._lru.clear)
+
+    def test_rpc_result_is_stored_in_both_tiers(self):
+        with mock.patch.object(token_metadata_cache, 'get_tokens_info', return_value={TOKEN: _info('ONE')}) as rpc:
+            token_metadata_cache.get_cached_token_info(TOKEN)
+            info = token_metadata_cache.get_cached_token_info(TOKEN)
+
+        rpc.assert_called_once()
+        self.assertEqual(info['symbol'], 'ONE')
+        row = TokenMetadata.objects.get(blockchain='BSC', address=TOKEN.lower())
+        self.assertTrue(row.is_valid)
+
+    def test_database_tier_serves_lru_misses(self):
+        TokenMetadata.objects.create(blockchain='BSC', address=TOKEN.lower(), name='One', symbol='ONE', decimals=6)
+        with mock.patch.object(token_metadata_cache, 'get_tokens_info') as rpc:
+            info = token_metadata_cache.get_cached_token_info(TOKEN)
+
+        rpc.assert_not_called()
+        self.assertEqual((info['address'], info['decimals']), (TOKEN, 6))
+
+    def test_invalid_tokens_are_cached_until_they_expire(self):
+        failure = {BAD_TOKEN: {'success': False, 'message': 'not a token'}}
+        with mock.patch.object(token_metadata_cache, 'get_tokens_info', return_value=failure) as rpc:
+            token_metadata_cache.get_cached_token_info(BAD_TOKEN)
+            token_metadata_cache._lru.clear()
+            self.assertFalse(token_metadata_cache.get_cached_token_info(BAD_TOKEN)['success'])
+            self.assertEqual(rpc.call_count, 1)
+
+            TokenMetadata.objects.filter(address=BAD_TOKEN.lower()).update(
+                expires_at=timezone.now() - datetime.timedelta(seconds=1)
+            )
+            token_metadata_cache._lru.clear()
+            token_metadata_cache.get_cached_token_info(BAD_TOKEN)
+            self.assertEqual(rpc.call_count, 2)
@@ -0,0 +1,87 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from lakkhi_app import custom_wallet, tx_outbox
+from lakkhi_app.custom_wallet import WalletManager
+from lakkhi_app.models import CustodialWallet, OutboxTransaction
+
+TARGET = '0x' + '11' * 20
+
+
+@override_settings(OUTBOX_RETRY_BASE_DELAY=2, OUTBOX_RETRY_MAX_DELAY=60)
+class RetryDelayTests(SimpleTestCase):
+    def test_delay_doubles_per_attempt(self):
+        self.assertEqual([tx_outbox.retry_delay(attempts) for attempts in (1, 2, 3, 4)], [2, 4, 8, 16])
+
+    def test_delay_is_capped(self):
+        self.assertEqual(tx_outbox.retry_delay(10), 60)
+
+
+@override_settings(WALLET_ENCRYPTION_KEY='test-key', WALLET_KEYSTORE_ITERATIONS=2)
+class CustodialKeyTests(TestCase):
+    def setUp(self):
+        custom_wallet._unlocked_keys.clear()
+        self.addCleanup(custom_wallet._unlocked_keys.clear)
+
+    def _outbox_tx(self, sender):
+        return OutboxTransaction.objects.create(sender=sender, kind='swap', to_address=TARGET, gas=21000)
+
+    def test_key_is_stored_encrypted(self):
+        public_wallet = WalletManager.create_wallet('payer@example.com')
+
+        self.assertNotIn('private_key', public_wallet)
+        stored = CustodialWallet.objects.get(identifier='payer@example.com')
+        self.assertEqual(stored.address, public_wallet['address'])
+        self.assertIn('crypto', stored.keystore)
+
+    def test_worker_finds_keys_created_by_another_process(self):
+        address = WalletManager.create_wallet('payer@example.com')['address']
+        private_key = WalletManager.get_wallet_by_identifier('payer@example.com')['private_key']
+
+        # A fresh outbox worker has neither the decrypted key nor the web worker's cache
+        custom_wallet._unlocked_keys.clear()
+        cache.clear()
+        self.assertEqual(tx_outbox._private_key(self._outbox_tx(address.lower())), private_key)
+
+    def test_unknown_sender_raises(self):
+        with self.assertRaises(LookupError):
+            tx_outbox._private_key(self._outbox_tx(TARGET))
+
+    def test_get_or_create_returns_the_same_wallet(self):
+        first = WalletManager.get_or_create_wallet('payer@example.com')
+        second = WalletManager.get_or_create_wallet('payer@example.com')
+        self.assertEqual(first['address'], second['address'])
+        self.assertEqual(CustodialWallet.objects.count(), 1)
+
+    def test_wallet_only_in_the_legacy_cache_is_persisted(self):
+        legacy = {'address': '0x' + '22' * 20, 'private_key': '0x' + '01' * 32}
+        with mock.patch.object(custom_wallet, 'cache') as legacy_cache:
+            legacy_cache.get.return_value = legacy
+            wallet = WalletManager.get_wallet_by_identifier('old@example.com')
+
+        legacy_cache.delete.assert_called_once_with('wallet_old@example.com')
+        self.assertEqual(wallet['private_key'], legacy['private_key'])
+        custom_wallet._unlocked_keys.clear()
+        self.assertEqual(WalletManager.get_wallet_by_address(legacy['address'])['private_key'], legacy['private_key'])
+
+    @override_settings(WALLET_ENCRYPTION_KEY=None)
+    def test_unset_encryption_key_falls_back_to_the_secret_key(self):
+        address = WalletManager.create_wallet('payer@example.com')['address']
+        custom_wallet._unlocked_keys.clear()
+        self.assertEqual(WalletManager.get_wallet_by_address(address)['address'], address)
+
+
+class SendTests(TestCase):
+    def test_missing_key_fails_before_a_nonce_is_taken(self):
+        outbox_tx = OutboxTransaction.objects.create(sender=TARGET, kind='swap', to_address=TARGET, gas=21000,
+                                                     status='sending')
+        with mock.patch.object(tx_outbox, 'allocate_nonce') as allocate_nonce, \
+                mock.patch.object(tx_outbox, 'get_gas_price', return_value=1):
+            self.assertFalse(tx_outbox._send(outbox_tx, mock.Mock()))
+
+        allocate_nonce.assert_not_called()
+        outbox_tx.refresh_from_db()
+        self.assertEqual((outbox_tx.status, outbox_tx.attempts), ('queued', 1))
+        self.assertIn('No custodial wallet', outbox_tx.last_error)
@@ -0,0 +1,100 @@
+import datetime
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from lakkhi_app import tx_tracker
+from lakkhi_app.models import PendingTransaction, Project, User
+
+TX_HASH = '0x' + 'ab' * 32
+OTHER_HASH = '0x' + 'cd' * 32
+
+callback_calls = []
+
+
+def record_callback(pending_tx, receipt):
+    callback_calls.append((pending_tx.tx_hash, pending_tx.status, receipt))
+
+
+def _user(username, is_admin=False):
+    user = User.objects.create_user(email=f'{username}@example.com', username=username, bio='', password='x')
+    if is_admin:
+        user.is_admin = True
+        user.save()
+    return user
+
+
+@override_settings(TX_TRACKER_IN_PROCESS=False)
+class TrackTransactionTests(TestCase):
+    def setUp(self):
+        callback_calls.clear()
+        self.user = _user('owner')
+
+    def _track(self, tx_hash=TX_HASH, **kwargs):
+        with mock.patch.object(tx_tracker, 'status_url', return_value='/status/'):
+            return tx_tracker.track_transaction(tx_hash, 'BSC', **kwargs)
+
+    def test_registering_twice_keeps_one_row(self):
+        self._track(bytes.fromhex(TX_HASH[2:]))
+        tracked = self._track()
+        self.assertEqual(tracked['tx_hash'], TX_HASH)
+        self.assertEqual(PendingTransaction.objects.count(), 1)
+
+    def test_status_is_scoped_to_the_requesting_user(self):
+        self._track(requested_by=self.user)
+        stranger = _user('stranger')
+        staff = _user('staff', is_admin=True)
+
+        self.assertEqual(tx_tracker.get_transaction_status(TX_HASH, user=self.user)['status'], 'pending')
+        self.assertIsNone(tx_tracker.get_transaction_status(TX_HASH, user=stranger))
+        self.assertIsNotNone(tx_tracker.get_transaction_status(TX_HASH, user=staff))
+
+    def test_receipts_are_fetched_in_one_batch_and_callbacks_run_once(self):
+        self._track(callback='lakkhi_app.tests.test_tx_tracker.record_callback')
+        self._track(OTHER_HASH)
+        receipt = {'status': '0x1', 'blockNumber': '0x10', 'gasUsed': '0x5208', 'contractAddress': None}
+
+        with mock.patch.object(tx_tracker, 'batch_request', return_value=[receipt, None]) as batch_request:
+            self.assertEqual(tx_tracker.check_pending('BSC'), 1)
+        self.assertEqual(len(batch_request.call_args[0][0]), 2)
+
+        confirmed = PendingTransaction.objects.get(tx_hash=TX_HASH)
+        self.assertEqual((confirmed.status, confirmed.block_number, confirmed.gas_used), ('confirmed', 16, 21000))
+        self.assertEqual(callback_calls, [(TX_HASH, 'confirmed', receipt)])
+
+        # A second poller seeing the same receipt doesn't run the callback again
+        tx_tracker._handle_receipt(confirmed, receipt)
+        self.assertEqual(len(callback_calls), 1)
+
+    def test_reverted_transaction_is_failed(self):
+        self._track()
+        with mock.patch.object(tx_tracker, 'batch_request', return_value=[{'status': '0x0', 'blockNumber': '0x10'}]):
+            tx_tracker.check_pending('BSC')
+        self.assertEqual(PendingTransaction.objects.get().status, 'failed')
+
+    @override_settings(TX_TRACKER_DROP_AFTER=60)
+    def test_unknown_stale_transaction_is_dropped(self):
+        self._track(callback='lakkhi_app.tests.test_tx_tracker.record_callback')
+        PendingTransaction.objects.update(created_at=timezone.now() - datetime.timedelta(minutes=5))
+
+        with mock.patch.object(tx_tracker, 'batch_request', side_effect=[[None], [None]]):
+            tx_tracker.check_pending('BSC')
+
+        self.assertEqual(PendingTransaction.objects.get().status, 'dropped')
+        self.assertEqual(callback_calls, [(TX_HASH, 'dropped', None)])
+
+
+class DeployCallbackTests(TestCase):
+    def test_confirmed_clone_deployment_activates_the_project(self):
+        project = Project.objects.create(title='P', description='d', wallet_address='0x1', token_address='0x2',
+                                         status='deploying')
+        pending_tx = PendingTransaction.objects.create(
+            tx_hash=TX_HASH, kind='deploy', status='confirmed', block_number=7,
+            callback_kwargs={'project_id': project.id, 'contract_address': '0x' + '33' * 20}
+        )
+        tx_tracker.on_contract_deployed(pending_tx, {})
+
+        project.refresh_from_db()
+        self.assertEqual((project.status, project.contract_address, project.block_number),
+                         ('active', '0x' + '33' * 20, 7))
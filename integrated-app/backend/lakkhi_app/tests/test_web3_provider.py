@@ -0,0 +1,35 @@
+from django.test import SimpleTestCase, override_settings
+from web3.middleware import geth_poa_middleware
+
+from lakkhi_app import web3_provider
+
+
+class GetWeb3Tests(SimpleTestCase):
+    def setUp(self):
+        web3_provider.reset_providers()
+        self.addCleanup(web3_provider.reset_providers)
+
+    def test_one_instance_per_chain(self):
+        self.assertIs(web3_provider.get_web3('BSC'), web3_provider.get_web3('BSC'))
+        self.assertIsNot(web3_provider.get_web3('BSC'), web3_provider.get_web3('Ethereum'))
+
+    def test_unknown_chain_falls_back_to_bsc(self):
+        self.assertIs(web3_provider.get_web3('Solana'), web3_provider.get_web3('BSC'))
+
+    @override_settings(WEB3_POOL_MAXSIZE=7)
+    def test_session_is_pooled_and_shared(self):
+        session = web3_provider.get_session('Ethereum')
+        self.assertIs(session, web3_provider.get_session('Ethereum'))
+        self.assertEqual(session.get_adapter('https://rpc.example')._pool_maxsize, 7)
+
+    def test_poa_middleware_only_on_poa_chains(self):
+        self.assertIn(geth_poa_middleware, web3_provider.get_web3('BSC').middleware_onion)
+        self.assertNotIn(geth_poa_middleware, web3_provider.get_web3('Ethereum').middleware_onion)
+
+    @override_settings(BSC_RPC_URL='https://bsc.example/rpc')
+    def test_reset_rebuilds_providers(self):
+        first = web3_provider.get_web3('BSC')
+        web3_provider.reset_providers()
+        second = web3_provider.get_web3('BSC')
+        self.assertIsNot(first, second)
+        self.assertEqual(second.provider.endpoint_uri, 'https://bsc.example/rpc')
@@ -0,0 +1,83 @@
+import datetime
+from unittest import mock
+
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from lakkhi_app import webhook_log
+from lakkhi_app.models import WebhookEvent, WebhookProcessing
+
+
+def _event(body='{"id": "1"}', provider='mercuryo'):
+    return WebhookEvent.objects.create(provider=provider, body=body)
+
+
+@override_settings(WEBHOOK_CONSUMER_IN_PROCESS=False)
+class RecordWebhookTests(TestCase):
+    def test_raw_body_and_selected_headers_are_logged(self):
+        request = RequestFactory().post('/callback/', data=b'not json', content_type='text/plain',
+                                        HTTP_X_SIGNATURE='sig', HTTP_COOKIE='secret=1')
+        event = webhook_log.record_webhook(request, 'mercuryo', session_id='abc')
+
+        event.refresh_from_db()
+        self.assertEqual((event.body, event.session_id), ('not json', 'abc'))
+        self.assertEqual(event.headers['HTTP_X_SIGNATURE'], 'sig')
+        self.assertNotIn('HTTP_COOKIE', event.headers)
+
+    def test_events_are_append_only(self):
+        event = _event()
+        event.body = 'changed'
+        with self.assertRaises(ValueError):
+            event.save()
+
+
+class ProcessEventTests(TestCase):
+    def _handle(self, **kwargs):
+        return mock.patch.object(webhook_log, '_handle', **kwargs)
+
+    def test_successful_event_is_done(self):
+        event = _event()
+        with self._handle(return_value={'success': True, 'amount': 1}):
+            self.assertTrue(webhook_log.process_event(event))
+        self.assertEqual(WebhookProcessing.objects.get(event=event).status, 'done')
+
+    def test_handler_error_fails_the_event(self):
+        event = _event()
+        with self._handle(side_effect=ValueError('bad payload')):
+            self.assertFalse(webhook_log.process_event(event))
+        processing = WebhookProcessing.objects.get(event=event)
+        self.assertEqual((processing.status, processing.error), ('failed', 'bad payload'))
+
+    def test_claimed_event_is_not_processed_twice(self):
+        event = _event()
+        WebhookProcessing.objects.create(event=event)
+        with self._handle() as handle:
+            self.assertIsNone(webhook_log.process_event(event))
+        handle.assert_not_called()
+
+    def test_consume_processes_in_arrival_order(self):
+        first, second = _event('{"n": 1}'), _event('{"n": 2}')
+        handled = []
+        with self._handle(side_effect=lambda event: handled.append(event.pk) or {'success': True}):
+            self.assertEqual(webhook_log.consume(), 2)
+            self.assertEqual(webhook_log.consume(), 0)
+        self.assertEqual(handled, [first.pk, second.pk])
+
+    @override_settings(WEBHOOK_CLAIM_TIMEOUT=60)
+    def test_stale_claims_are_failed(self):
+        event = _event()
+        WebhookProcessing.objects.create(event=event)
+        WebhookProcessing.objects.update(claimed_at=timezone.now() - datetime.timedelta(minutes=5))
+
+        webhook_log.consume()
+        self.assertEqual(WebhookProcessing.objects.get(event=event).status, 'failed')
+
+    def test_replay_reprocesses_failed_events(self):
+        event = _event()
+        with self._handle(side_effect=ValueError('node down')):
+            webhook_log.process_event(event)
+        with self._handle(return_value={'success': True}):
+            counts = webhook_log.replay(timezone.now() - datetime.timedelta(hours=1), failed_only=True)
+
+        self.assertEqual(counts, {'replayed': 1, 'succeeded': 1, 'failed': 0, 'skipped': 0})
+        self.assertEqual(WebhookProcessing.objects.get(event=event).status, 'done')
@@ -0,0 +1,147 @@
+"""
+Allowance checks and EIP-2612 permits, so contributions skip approve
+transactions whenever they can.
+
+Before spending a wallet's tokens the caller picks the cheapest option:
+
+1. allowance() already covers the amount - no approval needed at all
+2. the token implements EIP-2612 and the target credits the depositor
+   passed to stakeFor() - sign a permit off-chain and pass it to
+   ContributionRouter.depositWithPermit(), which deposits in one transaction
+3. otherwise send an approve transaction and deposit directly
+
+allowance(), nonces() and the permit metadata are read in one batched
+RPC round trip. Whether a token supports EIP-2612 is remembered per
+process, so tokens without it are only probed once.
+"""
+from eth_abi import encode
+from eth_keys import keys
+from web3 import Web3
+
+from .cache_utils import LRUCache, MISSING
+from .contract_cache import register_abi
+from .multicall import batch_rpc_read
+from .web3_provider import get_web3
+
+ERC20_PERMIT_ABI = [
+    {
+        "inputs": [
+            {"internalType": "address", "name": "owner", "type": "address"},
+            {"internalType": "address", "name": "spender", "type": "address"}
+        ],
+        "name": "allowance",
+        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [{"internalType": "address", "name": "owner", "type": "address"}],
+        "name": "nonces",
+        "outputs": [{"internalType": "uint256", "name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "DOMAIN_SEPARATOR",
+        "outputs": [{"internalType": "bytes32", "name": "", "type": "bytes32"}],
+        "stateMutability": "view",
+        "type": "function"
+    },
+    {
+        "inputs": [],
+        "name": "PERMIT_TYPEHASH",
+        "outputs": [{"internalType": "bytes32", "name": "", "type": "bytes32"}],
+        "stateMutability": "view",
+        "type": "function"
+    }
+]
+register_abi('erc20_permit', ERC20_PERMIT_ABI)
+
+PERMIT_TYPEHASH = Web3.keccak(
+    text="Permit(address owner,address spender,uint256 value,uint256 nonce,uint256 deadline)"
+)
+
+# How long a signed permit stays valid
+PERMIT_DEADLINE_SECONDS = 1200
+
+# (chain, token) -> DOMAIN_SEPARATOR, or None if the token has no EIP-2612 permit
+_permit_domains = LRUCache(maxsize=1024)
+
+
+def _read(token_address, owner, spender, blockchain, with_permit):
+    calls = [(token_address, 'erc20_permit', 'allowance', [owner, spender])]
+    if with_permit:
+        calls += [
+            (token_address, 'erc20_permit', 'nonces', [owner]),
+            (token_address, 'erc20_permit', 'DOMAIN_SEPARATOR', []),
+            (token_address, 'erc20_permit', 'PERMIT_TYPEHASH', []),
+        ]
+    return batch_rpc_read(calls, blockchain)
+
+
+def get_allowance(token_address, owner, spender, blockchain='BSC'):
+    """Current allowance, or None if the token didn't answer"""
+    return _read(token_address, owner, spender, blockchain, with_permit=False)[0]
+
+
+def allowance_covers(token_address, owner, spender, amount, blockchain='BSC'):
+    """True if spender may already move amount of owner's tokens"""
+    allowance = get_allowance(token_address, owner, spender, blockchain)
+    return allowance is not None and allowance >= amount
+
+
+def _permit_digest(domain_separator, owner, spender, value, nonce, deadline):
+    struct_hash = Web3.keccak(encode(
+        ['bytes32', 'address', 'address', 'uint256', 'uint256', 'uint256'],
+        [PERMIT_TYPEHASH, owner, spender, value, nonce, deadline]
+    ))
+    return Web3.keccak(b'\x19\x01' + bytes(domain_separator) + struct_hash)
+
+
+def sign_permit(token_address, owner, private_key, spender, value, blockchain='BSC', deadline=None):
+    """
+    Sign an EIP-2612 permit letting spender move value of owner's tokens
+
+    The digest uses the token's own DOMAIN_SEPARATOR, so it matches what
+    permit() verifies regardless of the token's name/version strings.
+
+    Returns:
+        dict or None: {'deadline', 'v', 'r', 's'}, or None if the token has
+        no standard EIP-2612 permit
+    """
+    key = (blockchain, token_address.lower())
+    domain_separator = _permit_domains.get(key)
+    if domain_separator is None:
+        return None
+
+    # nonces() must be read fresh - it changes with every permit
+    _, nonce, onchain_domain, typehash = _read(token_address, owner, spender, blockchain, with_permit=True)
+    if domain_separator is MISSING:
+        # Tokens with a differently shaped permit (e.g. DAI) expose another PERMIT_TYPEHASH
+        supported = nonce is not None and onchain_domain is not None and typehash in (None, PERMIT_TYPEHASH)
+        domain_separator = onchain_domain if supported else None
+        _permit_domains.set(key, domain_separator)
+        if domain_separator is None:
+            return None
+    if nonce is None:
+        return None
+
+    if deadline is None:
+        deadline = get_web3(blockchain).eth.get_block('latest')['timestamp'] + PERMIT_DEADLINE_SECONDS
+
+    digest = _permit_digest(
+        domain_separator, Web3.to_checksum_address(owner), Web3.to_checksum_address(spender), value, nonce, deadline
+    )
+    signature = keys.PrivateKey(Web3.to_bytes(hexstr=private_key)).sign_msg_hash(digest)
+    return {
+        'deadline': deadline,
+        'v': signature.v + 27,
+        'r': signature.r.to_bytes(32, 'big'),
+        's': signature.s.to_bytes(32, 'big'),
+    }
+
+
+def permit_support_stats():
+    """Tokens probed for EIP-2612 support, for monitoring"""
+    return _permit_domains.stats()
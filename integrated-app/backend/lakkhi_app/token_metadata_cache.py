@@ -0,0 +1,169 @@
+"""
+Two-tier token metadata cache.
+
+Token name, symbol and decimals never change once a token is deployed, so
+lookups go: in-process LRU -> TokenMetadata table -> batched RPC. Valid
+tokens are cached permanently; invalid addresses are cached for a short
+time (settings.TOKEN_METADATA_NEGATIVE_TTL) so a typo doesn't cause an
+RPC storm but a freshly deployed token is picked up soon after.
+"""
+import datetime
+
+from web3 import Web3
+from django.conf import settings
+from django.utils import timezone
+
+from .cache_utils import LRUCache, MISSING
+from .web3_helper_functions import get_tokens_info
+
+_lru = LRUCache(maxsize=getattr(settings, 'TOKEN_METADATA_LRU_SIZE', 2048))
+
+
+def _negative_ttl():
+    return getattr(settings, 'TOKEN_METADATA_NEGATIVE_TTL', 300)
+
+
+def _cache_key(blockchain, token_address):
+    return (blockchain, token_address.lower())
+
+
+def _row_to_info(row, token_address):
+    """Convert a TokenMetadata row into the get_token_info() result shape"""
+    if not row.is_valid:
+        return {
+            'success': False,
+            'message': row.error_message or 'Error getting token information'
+        }
+    return {
+        'success': True,
+        'address': token_address,
+        'name': row.name,
+        'symbol': row.symbol,
+        'decimals': row.decimals,
+        'blockchain': row.blockchain
+    }
+
+
+def _store(blockchain, token_address, info):
+    """Persist an RPC result to the DB and the LRU"""
+    from .models import TokenMetadata
+
+    address = token_address.lower()
+    if info['success']:
+        defaults = {
+            'name': info['name'],
+            'symbol': info['symbol'],
+            'decimals': info['decimals'],
+            'is_valid': True,
+            'error_message': '',
+            'expires_at': None,
+        }
+        ttl = None
+    else:
+        defaults = {
+            'name': '',
+            'symbol': '',
+            'decimals': None,
+            'is_valid': False,
+            'error_message': info.get('message', '')[:500],
+            'expires_at': timezone.now() + datetime.timedelta(seconds=_negative_ttl()),
+        }
+        ttl = _negative_ttl()
+
+    try:
+        TokenMetadata.objects.update_or_create(
+            blockchain=blockchain,
+            address=address,
+            defaults=defaults
+        )
+    except Exception as e:
+        # The cache is an optimization - a DB hiccup shouldn't fail the lookup
+        print(f"Error storing token metadata for {token_address}: {e}")
+
+    _lru.set(_cache_key(blockchain, token_address), info, ttl=ttl)
+
+
+def get_cached_tokens_info(token_addresses, blockchain='BSC'):
+    """
+    Get token information for many tokens, hitting RPC only for cache misses
+
+    Args:
+        token_addresses: List of ERC20/BEP20 token addresses
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+
+    Returns:
+        dict: {token_address: token info dict} - same shape as get_token_info()
+    """
+    from .models import TokenMetadata
+
+    results = {}
+    db_lookups = []
+
+    # Tier 1: in-process LRU
+    for token_address in token_addresses:
+        if not token_address or not Web3.is_address(token_address):
+            continue  # Let get_tokens_info() produce the validation error
+        cached = _lru.get(_cache_key(blockchain, token_address))
+        if cached is not MISSING:
+            results[token_address] = dict(cached, address=token_address) if cached['success'] else cached
+        else:
+            db_lookups.append(token_address)
+
+    # Tier 2: TokenMetadata table, one query for all LRU misses
+    rpc_lookups = []
+    if db_lookups:
+        rows = {}
+        try:
+            rows = {
+                row.address: row
+                for row in TokenMetadata.objects.filter(
+                    blockchain=blockchain,
+                    address__in=[address.lower() for address in db_lookups]
+                )
+            }
+        except Exception as e:
+            print(f"Error reading token metadata cache: {e}")
+
+        for token_address in db_lookups:
+            row = rows.get(token_address.lower())
+            if row is None or row.is_expired:
+                rpc_lookups.append(token_address)
+                continue
+            info = _row_to_info(row, token_address)
+            results[token_address] = info
+            if row.is_valid:
+                _lru.set(_cache_key(blockchain, token_address), info)
+            else:
+                seconds_left = (row.expires_at - timezone.now()).total_seconds()
+                _lru.set(_cache_key(blockchain, token_address), info, ttl=max(1, seconds_left))
+
+    # Tier 3: batched RPC for anything still missing (plus malformed addresses)
+    remaining = rpc_lookups + [
+        token_address for token_address in token_addresses
+        if not token_address or not Web3.is_address(token_address)
+    ]
+    if remaining:
+        for token_address, info in get_tokens_info(remaining, blockchain).items():
+            results[token_address] = info
+            if token_address and Web3.is_address(token_address):
+                _store(blockchain, token_address, info)
+
+    return results
+
+
+def get_cached_token_info(token_address, blockchain='BSC'):
+    """Cached equivalent of web3_helper_functions.get_token_info()"""
+    return get_cached_tokens_info([token_address], blockchain)[token_address]
+
+
+def invalidate_token_info(token_address, blockchain='BSC'):
+    """Drop a token from both cache tiers"""
+    from .models import TokenMetadata
+
+    _lru.delete(_cache_key(blockchain, token_address))
+    TokenMetadata.objects.filter(blockchain=blockchain, address=token_address.lower()).delete()
+
+
+def cache_stats():
+    """In-process LRU statistics"""
+    return _lru.stats()
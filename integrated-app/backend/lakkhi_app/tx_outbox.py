@@ -0,0 +1,340 @@
+"""
+Durable transaction outbox.
+
+Web requests and admin actions don't sign or broadcast chain writes
+themselves - they enqueue them as OutboxTransaction rows and return. One
+worker process per chain (`manage.py run_outbox --chain BSC`) picks up
+queued rows, fills in the nonce and a current gas price, signs, broadcasts
+and hands the tx hash over to the confirmation tracker. Send throughput
+scales with worker concurrency rather than with the number of web workers.
+
+- Each sender's transactions go out one at a time in the order they were
+  enqueued, so nonces follow enqueue order (swap -> approve -> stake).
+  Different senders are sent concurrently, up to OUTBOX_CONCURRENCY at once
+  and OUTBOX_MAX_SENDS_PER_SECOND per chain.
+- A failed send is retried with exponential backoff. After
+  OUTBOX_MAX_ATTEMPTS it is dead-lettered and its callback runs with no
+  receipt, the same way the tracker reports a dropped transaction.
+- Rows are claimed with a conditional UPDATE, so several workers can share
+  a chain. A row left claimed by a worker that died mid-send may or may not
+  have been broadcast, so it is dead-lettered rather than sent again.
+
+Private keys are never stored in the outbox - the worker looks them up by
+the row's signer: 'custodial' wallets from the encrypted CustodialWallet
+table (via WalletManager), 'admin' from settings.
+"""
+import datetime
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from web3 import Web3
+
+from .gas_oracle import get_gas_price
+from .nonce_manager import allocate_nonce, send_transaction
+from .tx_tracker import track_transaction
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue_transaction(blockchain, sender, to_address, data='0x', value=0, gas=300000, kind='transaction',
+                        signer='custodial', callback='', callback_kwargs=None):
+    """
+    Queue a transaction for an outbox worker to sign and broadcast
+
+    Args:
+        blockchain: The blockchain to send on
+        sender: Address the transaction is sent from
+        to_address: Contract (or account) being called
+        data: Hex-encoded call data
+        value: Native amount in wei
+        gas: Gas limit
+        kind: Short label for what the transaction does (swap, approve, stake, release...)
+        signer: Where the worker finds the sender's key - 'custodial' or 'admin'
+        callback: Dotted path to a callable(tx, receipt), passed on to the confirmation
+            tracker; also called with the dead-lettered OutboxTransaction and no receipt
+        callback_kwargs: JSON-serializable data stored with the tx for the callback
+
+    Returns:
+        OutboxTransaction: The queued row
+    """
+    from .models import OutboxTransaction
+
+    return OutboxTransaction.objects.create(
+        blockchain=blockchain,
+        sender=Web3.to_checksum_address(sender),
+        signer=signer,
+        kind=kind,
+        to_address=Web3.to_checksum_address(to_address),
+        data=data,
+        value=str(int(value)),
+        gas=gas,
+        callback=callback,
+        callback_kwargs=callback_kwargs or {},
+    )
+
+
+def enqueue_call(contract, fn_name, args, sender, blockchain='BSC', value=0, gas=300000, kind='transaction',
+                 signer='custodial', callback='', callback_kwargs=None):
+    """Queue a call to contract.fn_name(*args) - see enqueue_transaction()"""
+    return enqueue_transaction(
+        blockchain, sender, contract.address, contract.encodeABI(fn_name=fn_name, args=args),
+        value=value, gas=gas, kind=kind, signer=signer, callback=callback, callback_kwargs=callback_kwargs
+    )
+
+
+def queued_result(outbox_tx):
+    """WalletManager-style result for a queued transaction"""
+    return {
+        "transactionHash": None,
+        "status": "QUEUED",
+        "outboxId": outbox_tx.id,
+    }
+
+
+def get_outbox_status(outbox_id):
+    """Current outbox state for a queued transaction, or None if there is no such row"""
+    from .models import OutboxTransaction
+
+    try:
+        outbox_tx = OutboxTransaction.objects.get(pk=outbox_id)
+    except OutboxTransaction.DoesNotExist:
+        return None
+
+    return {
+        'id': outbox_tx.id,
+        'blockchain': outbox_tx.blockchain,
+        'kind': outbox_tx.kind,
+        'status': outbox_tx.status,
+        'attempts': outbox_tx.attempts,
+        'last_error': outbox_tx.last_error,
+        'tx_hash': outbox_tx.tx_hash,
+        'created_at': outbox_tx.created_at,
+        'sent_at': outbox_tx.sent_at,
+    }
+
+
+def _private_key(outbox_tx):
+    if outbox_tx.signer == 'admin':
+        return getattr(settings, 'ADMIN_WALLET_PRIVATE_KEY', '') or settings.ADMIN_PRIVATE_KEY
+    if outbox_tx.signer == 'custodial':
+        from .custom_wallet import WalletManager
+
+        wallet = WalletManager.get_wallet_by_address(outbox_tx.sender)
+        if wallet:
+            return wallet['private_key']
+        raise LookupError(f"No custodial wallet for {outbox_tx.sender}")
+    raise ValueError(f"Unknown signer '{outbox_tx.signer}'")
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next attempt, doubling per failed attempt"""
+    base = _setting('OUTBOX_RETRY_BASE_DELAY', 2)
+    return min(base * 2 ** (attempts - 1), _setting('OUTBOX_RETRY_MAX_DELAY', 300))
+
+
+class _RateLimiter:
+    """Spaces calls to acquire() at least 1/rate seconds apart, across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.next_slot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+
+def _dead_letter(outbox_tx, error):
+    from .models import OutboxTransaction
+
+    claimed = OutboxTransaction.objects.filter(pk=outbox_tx.pk, status__in=['queued', 'sending']).update(
+        status='dead', last_error=error
+    )
+    if not claimed or not outbox_tx.callback:
+        return
+    outbox_tx.refresh_from_db()
+    try:
+        import_string(outbox_tx.callback)(outbox_tx, None)
+    except Exception as e:
+        print(f"Error in dead-letter callback for outbox tx {outbox_tx.pk}: {e}")
+
+
+def _fail(outbox_tx, error):
+    """Schedule a retry, or dead-letter the transaction once it is out of attempts"""
+    from .models import OutboxTransaction
+
+    attempts = outbox_tx.attempts + 1
+    if attempts >= _setting('OUTBOX_MAX_ATTEMPTS', 8):
+        OutboxTransaction.objects.filter(pk=outbox_tx.pk).update(attempts=attempts)
+        _dead_letter(outbox_tx, error)
+        return
+    OutboxTransaction.objects.filter(pk=outbox_tx.pk, status='sending').update(
+        status='queued',
+        attempts=attempts,
+        last_error=error,
+        next_attempt_at=timezone.now() + datetime.timedelta(seconds=retry_delay(attempts))
+    )
+
+
+def _send(outbox_tx, rate_limiter):
+    """Sign, broadcast and start tracking one claimed transaction"""
+    from .models import OutboxTransaction
+
+    blockchain = outbox_tx.blockchain
+    try:
+        rate_limiter.acquire()
+        # Everything that can fail is resolved before a nonce is taken, so a
+        # missing key or gas price never leaves a gap in the sender's nonces
+        private_key = _private_key(outbox_tx)
+        tx = {
+            'from': outbox_tx.sender,
+            'to': outbox_tx.to_address,
+            'data': outbox_tx.data,
+            'value': int(outbox_tx.value),
+            'gas': outbox_tx.gas,
+            # Priced at send time, so a retried transaction isn't stuck with a stale price
+            'gasPrice': get_gas_price(blockchain),
+            'chainId': settings.CHAIN_IDS.get(blockchain, 56),
+        }
+        tx['nonce'] = allocate_nonce(outbox_tx.sender, blockchain)
+        tx_hash = send_transaction(tx, private_key, outbox_tx.sender, blockchain)
+    except Exception as e:
+        print(f"Error sending outbox tx {outbox_tx.pk} ({outbox_tx.kind}) on {blockchain}: {e}")
+        _fail(outbox_tx, str(e))
+        close_old_connections()
+        return False
+
+    tracked = track_transaction(
+        tx_hash,
+        blockchain,
+        kind=outbox_tx.kind,
+        callback=outbox_tx.callback,
+        callback_kwargs=outbox_tx.callback_kwargs
+    )
+    OutboxTransaction.objects.filter(pk=outbox_tx.pk).update(
+        status='sent',
+        tx_hash=tracked['tx_hash'],
+        nonce=tx['nonce'],
+        attempts=outbox_tx.attempts + 1,
+        sent_at=timezone.now()
+    )
+    close_old_connections()
+    return True
+
+
+def _expire_stale_claims(blockchain):
+    """Dead-letter rows claimed by a worker that never finished sending them"""
+    from .models import OutboxTransaction
+
+    cutoff = timezone.now() - datetime.timedelta(seconds=_setting('OUTBOX_CLAIM_TIMEOUT', 120))
+    for outbox_tx in OutboxTransaction.objects.filter(blockchain=blockchain, status='sending', claimed_at__lt=cutoff):
+        _dead_letter(outbox_tx, "Worker stopped while sending - check the sender's transactions before requeueing")
+
+
+def _ready(blockchain):
+    """
+    The oldest unsent transaction of each sender, if it is due
+
+    A sender with a transaction being sent, or an earlier one waiting for its
+    retry, has nothing ready - that keeps each sender's nonces in order.
+    """
+    from .models import OutboxTransaction
+
+    now = timezone.now()
+    heads = {}
+    unsent = OutboxTransaction.objects.filter(
+        blockchain=blockchain, status__in=['queued', 'sending']
+    ).order_by('id')
+    for outbox_tx in unsent:
+        heads.setdefault(outbox_tx.sender, outbox_tx)
+    return [
+        outbox_tx for outbox_tx in heads.values()
+        if outbox_tx.status == 'queued' and outbox_tx.next_attempt_at <= now
+    ]
+
+
+def _claim(outbox_tx):
+    from .models import OutboxTransaction
+
+    now = timezone.now()
+    claimed = OutboxTransaction.objects.filter(
+        pk=outbox_tx.pk, status='queued', next_attempt_at__lte=now
+    ).update(status='sending', claimed_at=now)
+    return bool(claimed)
+
+
+def _outbox_rate(blockchain):
+    return _setting('OUTBOX_MAX_SENDS_PER_SECOND', {}).get(blockchain, 10)
+
+
+def process_outbox(blockchain='BSC', executor=None, rate_limiter=None):
+    """
+    Send every transaction that is ready on a chain
+
+    Returns:
+        int: Number of transactions broadcast
+    """
+    _expire_stale_claims(blockchain)
+    ready = [outbox_tx for outbox_tx in _ready(blockchain) if _claim(outbox_tx)]
+    if not ready:
+        return 0
+
+    rate_limiter = rate_limiter or _RateLimiter(_outbox_rate(blockchain))
+    if executor is None:
+        return sum(_send(outbox_tx, rate_limiter) for outbox_tx in ready)
+    return sum(executor.map(lambda outbox_tx: _send(outbox_tx, rate_limiter), ready))
+
+
+def run_worker(blockchain='BSC', concurrency=None, once=False, on_sent=None):
+    """Send queued transactions on a chain until interrupted"""
+    concurrency = concurrency or _setting('OUTBOX_CONCURRENCY', 4)
+    rate_limiter = _RateLimiter(_outbox_rate(blockchain))
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix=f"outbox-{blockchain}") as executor:
+        while True:
+            try:
+                sent = process_outbox(blockchain, executor, rate_limiter)
+                if sent and on_sent:
+                    on_sent(sent)
+            except Exception as e:
+                print(f"Error processing outbox on {blockchain}: {e}")
+                sent = 0
+            finally:
+                close_old_connections()
+
+            if once:
+                return
+            if not sent:
+                time.sleep(_setting('OUTBOX_POLL_INTERVAL', 1))
+
+
+def requeue(outbox_ids):
+    """Put dead-lettered transactions back in the queue with a fresh set of attempts"""
+    from .models import OutboxTransaction
+
+    return OutboxTransaction.objects.filter(pk__in=outbox_ids, status='dead').update(
+        status='queued', attempts=0, next_attempt_at=timezone.now(), claimed_at=None
+    )
+
+
+def outbox_stats():
+    """Row counts per chain and status, for monitoring"""
+    from django.db.models import Count
+    from .models import OutboxTransaction
+
+    stats = {}
+    rows = OutboxTransaction.objects.exclude(status='sent').values('blockchain', 'status').annotate(count=Count('id'))
+    for row in rows:
+        stats.setdefault(row['blockchain'], {})[row['status']] = row['count']
+    return stats
@@ -0,0 +1,269 @@
+"""
+Background transaction confirmation tracker.
+
+Instead of blocking an HTTP request in wait_for_transaction_receipt(),
+callers broadcast a transaction, register it with track_transaction() and
+return the tx hash plus a status URL straight away. One poller per chain
+fetches receipts for all pending transactions in a JSON-RPC batch every
+block, records the outcome on the PendingTransaction row and runs the
+transaction's confirmation callback.
+
+Pollers run as daemon threads inside the web process by default, or in a
+dedicated process via `manage.py track_transactions`. Rows are claimed
+with a conditional UPDATE, so several pollers can safely run at once.
+"""
+import datetime
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .web3_provider import get_web3, batch_request
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+def _to_int(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return int(value, 16)
+    return int(value)
+
+
+def poll_interval(blockchain):
+    return getattr(settings, 'GAS_ORACLE_POLL_INTERVALS', {}).get(blockchain, 3)
+
+
+def status_url(tx_hash):
+    """Relative URL clients can poll for a transaction's confirmation status"""
+    return reverse('transaction_status', args=[tx_hash])
+
+
+def track_transaction(tx_hash, blockchain='BSC', kind='transaction', callback='', callback_kwargs=None,
+                      requested_by=None):
+    """
+    Register a broadcast transaction for background confirmation
+
+    Args:
+        tx_hash: Transaction hash (hex string or bytes)
+        blockchain: The blockchain the transaction was sent on
+        kind: Short label for what the transaction does (deploy, stake, release...)
+        callback: Dotted path to a callable(pending_tx, receipt) run once the tx is mined
+        callback_kwargs: JSON-serializable data stored with the tx for the callback
+        requested_by: User allowed to read the status through the API (staff always can)
+
+    Returns:
+        dict: tx_hash, status and status_url for the API response
+    """
+    from .models import PendingTransaction
+
+    if not isinstance(tx_hash, str):
+        tx_hash = tx_hash.hex()
+    if not tx_hash.startswith('0x'):
+        tx_hash = f"0x{tx_hash}"
+
+    PendingTransaction.objects.get_or_create(
+        tx_hash=tx_hash,
+        defaults={
+            'blockchain': blockchain,
+            'kind': kind,
+            'callback': callback,
+            'callback_kwargs': callback_kwargs or {},
+            'requested_by': requested_by,
+        }
+    )
+
+    if getattr(settings, 'TX_TRACKER_IN_PROCESS', True):
+        ensure_poller(blockchain)
+
+    return {
+        'tx_hash': tx_hash,
+        'status': 'pending',
+        'status_url': status_url(tx_hash),
+    }
+
+
+def get_transaction_status(tx_hash, user=None):
+    """
+    Current tracker state for a transaction, or None if it isn't tracked
+
+    With a user, only transactions that user requested are found (any for staff).
+    """
+    from .models import PendingTransaction
+
+    pending = PendingTransaction.objects.filter(tx_hash=tx_hash)
+    if user is not None and not user.is_staff:
+        pending = pending.filter(requested_by=user)
+    pending_tx = pending.first()
+    if pending_tx is None:
+        return None
+
+    return {
+        'tx_hash': pending_tx.tx_hash,
+        'blockchain': pending_tx.blockchain,
+        'kind': pending_tx.kind,
+        'status': pending_tx.status,
+        'block_number': pending_tx.block_number,
+        'gas_used': pending_tx.gas_used,
+        'contract_address': pending_tx.contract_address,
+        'created_at': pending_tx.created_at,
+        'confirmed_at': pending_tx.confirmed_at,
+    }
+
+
+def _run_callback(pending_tx, receipt):
+    """Invoke the transaction's callback (receipt is None for dropped txs), recording any error"""
+    if not pending_tx.callback:
+        return
+    try:
+        import_string(pending_tx.callback)(pending_tx, receipt)
+    except Exception as e:
+        print(f"Error in confirmation callback for {pending_tx.tx_hash}: {e}")
+        type(pending_tx).objects.filter(pk=pending_tx.pk).update(callback_error=str(e))
+
+
+def _handle_receipt(pending_tx, receipt):
+    """Record a receipt; only the poller that wins the conditional update runs the callback"""
+    from .models import PendingTransaction
+
+    status = 'confirmed' if _to_int(receipt.get('status')) == 1 else 'failed'
+    claimed = PendingTransaction.objects.filter(pk=pending_tx.pk, status='pending').update(
+        status=status,
+        block_number=_to_int(receipt.get('blockNumber')),
+        gas_used=_to_int(receipt.get('gasUsed')),
+        contract_address=receipt.get('contractAddress'),
+        confirmed_at=timezone.now()
+    )
+    if claimed:
+        pending_tx.refresh_from_db()
+        _run_callback(pending_tx, receipt)
+
+
+def check_pending(blockchain='BSC'):
+    """
+    Check receipts for every pending transaction on a chain in batched requests
+
+    Returns:
+        int: Number of transactions that left the pending state
+    """
+    from .models import PendingTransaction
+
+    batch_size = getattr(settings, 'TX_TRACKER_BATCH_SIZE', 100)
+    drop_after = datetime.timedelta(seconds=getattr(settings, 'TX_TRACKER_DROP_AFTER', 1800))
+    pending = list(
+        PendingTransaction.objects.filter(blockchain=blockchain, status='pending').order_by('created_at')
+    )
+
+    resolved = 0
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        try:
+            receipts = batch_request(
+                [('eth_getTransactionReceipt', [pending_tx.tx_hash]) for pending_tx in chunk],
+                blockchain
+            )
+        except Exception as e:
+            # Node doesn't support batching - fall back to individual lookups
+            print(f"Receipt batch failed on {blockchain}, using single calls: {e}")
+            w3 = get_web3(blockchain)
+            receipts = []
+            for pending_tx in chunk:
+                try:
+                    receipts.append(dict(w3.eth.get_transaction_receipt(pending_tx.tx_hash)))
+                except Exception:
+                    receipts.append(None)
+
+        stale = []
+        for pending_tx, receipt in zip(chunk, receipts):
+            if receipt:
+                _handle_receipt(pending_tx, receipt)
+                resolved += 1
+            elif timezone.now() - pending_tx.created_at > drop_after:
+                stale.append(pending_tx)
+
+        # Long-pending transactions the node no longer knows about were dropped
+        if stale:
+            try:
+                transactions = batch_request(
+                    [('eth_getTransactionByHash', [pending_tx.tx_hash]) for pending_tx in stale],
+                    blockchain
+                )
+            except Exception as e:
+                print(f"Error checking stale transactions on {blockchain}: {e}")
+                transactions = [True] * len(stale)
+            for pending_tx, transaction in zip(stale, transactions):
+                if transaction is None:
+                    claimed = PendingTransaction.objects.filter(pk=pending_tx.pk, status='pending').update(status='dropped')
+                    if claimed:
+                        pending_tx.refresh_from_db()
+                        _run_callback(pending_tx, None)
+                    resolved += 1
+
+    return resolved
+
+
+def _poll(blockchain):
+    while True:
+        try:
+            check_pending(blockchain)
+        except Exception as e:
+            print(f"Error polling transactions on {blockchain}: {e}")
+        finally:
+            close_old_connections()
+        time.sleep(poll_interval(blockchain))
+
+
+def ensure_poller(blockchain='BSC'):
+    """Start the receipt poller thread for a chain if it isn't already running"""
+    thread = _pollers.get(blockchain)
+    if thread is not None and thread.is_alive():
+        return
+    with _pollers_lock:
+        thread = _pollers.get(blockchain)
+        if thread is None or not thread.is_alive():
+            thread = threading.Thread(target=_poll, args=(blockchain,), name=f"tx-tracker-{blockchain}", daemon=True)
+            _pollers[blockchain] = thread
+            thread.start()
+
+
+# Confirmation callbacks
+
+def on_contract_deployed(pending_tx, receipt):
+    """Activate a project once its staking contract deployment is mined"""
+    from .models import Project
+
+    project_id = pending_tx.callback_kwargs.get('project_id')
+    # Factory clones are created by a call, so the receipt has no contractAddress;
+    # their CREATE2 address was predicted when the deployment was sent
+    contract_address = pending_tx.contract_address or pending_tx.callback_kwargs.get('contract_address')
+    if pending_tx.status != 'confirmed' or not contract_address:
+        Project.objects.filter(id=project_id).update(status='draft')
+        return
+
+    Project.objects.filter(id=project_id).update(
+        status='active',
+        contract_address=contract_address,
+        block_number=pending_tx.block_number
+    )
+
+
+def on_release_processed(pending_tx, receipt):
+    """Mark a release as released (or back to approved on failure or dead-lettering) once mined"""
+    from .models import Release
+
+    release_id = pending_tx.callback_kwargs.get('release_id')
+    if pending_tx.status == 'confirmed':
+        Release.objects.filter(id=release_id).update(
+            status='RELEASED',
+            release_date=timezone.now(),
+            # Releases sent through the outbox have no tx hash until they are broadcast
+            transaction_hash=pending_tx.tx_hash
+        )
+    else:
+        Release.objects.filter(id=release_id).update(status='APPROVED')
@@ -37,6 +37,13 @@ urlpatterns = [
     # Token social links endpoint
     path('api/token/socials/', views.token_socials, name='token_socials'),
     
+    # Transaction confirmation status endpoint
+    path('api/tx/<str:tx_hash>/status/', views.transaction_status, name='transaction_status'),
+    path('api/outbox/<int:outbox_id>/status/', views.outbox_status, name='outbox_status'),
+    
+    # Blockchain cache metrics (admin only)
+    path('api/metrics/cache/', views.cache_metrics, name='cache_metrics'),
+    
     # Include router URLs
     path('api/', include(router.urls)),
     path('api/', include(campaign_router.urls)),
@@ -14,7 +14,11 @@ from .models import Project, TokenPrice, Campaign, Contribution, Milestone, Rele
 from .web3_helper_functions import (
     get_token_info,
 )
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from .token_metadata_cache import get_cached_tokens_info
+from .tx_tracker import track_transaction, get_transaction_status, status_url
+from .webhook_log import record_webhook
+from .scheduler import ensure_scheduler
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from django.core.cache import cache
 from threading import Thread
 import time
@@ -119,7 +123,9 @@ def projects_details_by_id(request, id):
         # Get token info if available
         token_info = None
         if project.token_address:
-            token_validation = validate_token_address(project.token_address)
+            token_validation = validate_token_addresses(
+                [project.token_address], project.blockchain_chain or 'BSC'
+            )[project.token_address]
             if token_validation["success"]:
                 token_info = token_validation["token_info"]
         
@@ -225,29 +231,47 @@ def create_campaign(request):
 
 def validate_token_address(token_address):
     """Validate a token address"""
+    return validate_token_addresses([token_address])[token_address]
+
+
+def validate_token_addresses(token_addresses, blockchain='BSC'):
+    """Validate many token addresses with a single batched RPC round trip"""
     try:
-        token_info = get_token_info(token_address)
+        tokens_info = get_cached_tokens_info(token_addresses, blockchain)
         return {
-                    "success": True,
-            "token_info": token_info
+            token_address: {
+                "success": token_info["success"],
+                "token_info": token_info
+            }
+            for token_address, token_info in tokens_info.items()
         }
-        except Exception as e:
+    except Exception as e:
         return {
-            "success": False,
-            "message": str(e)
+            token_address: {
+                "success": False,
+                "message": str(e)
+            }
+            for token_address in token_addresses
         }
 
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def token_validate(request):
-    """Validate a token address"""
+    """Validate a token address, or a list of them via `token_addresses`"""
     try:
         data = json.loads(request.body)
+        blockchain = data.get('blockchain', 'BSC')
+        token_addresses = data.get('token_addresses')
+        if token_addresses:
+            return Response({
+                "success": True,
+                "results": validate_token_addresses(token_addresses, blockchain)
+            })
         token_address = data.get('token_address')
-        return Response(validate_token_address(token_address))
+        return Response(validate_token_addresses([token_address], blockchain)[token_address])
     except Exception as e:
-                return Response(
+        return Response(
             {"success": False, "message": str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
@@ -274,7 +298,7 @@ def get_token_price(token_address=None):
     """Get token price from cache or update cache"""
     try:
         if not token_address:
-            token_address = settings.LAKKHI_TOKEN_ADDRESS
+            token_address = settings.TOKEN_ADDRESS
             
         # Try to get from cache first
         cache_key = f"token_price_{token_address}"
@@ -295,33 +319,9 @@ def get_token_price(token_address=None):
         return None
 
 
-def background_token_cache_updater():
-    """Background thread to update token price cache"""
-    while True:
-        try:
-            # Update price in DB
-            price = web3_helper_functions.get_token_price()
-            if price:
-                TokenPrice.objects.update_or_create(
-                    id=1,
-                    defaults={'price': price}
-                )
-                
-                # Update cache
-                cache_key = f"token_price_{settings.LAKKHI_TOKEN_ADDRESS}"
-                cache.set(cache_key, price, 300)
-                
-        except Exception as e:
-            print(f"Error updating token price: {e}")
-            
-        # Sleep for 5 minutes
-        time.sleep(300)
-
-
 def start_background_thread():
-    """Start the background token price updater thread"""
-    thread = Thread(target=background_token_cache_updater, daemon=True)
-    thread.start()
+    """Start the periodic job scheduler - jobs only run in the process holding its lease"""
+    ensure_scheduler()
 
 
 @api_view(["PUT"])
@@ -391,27 +391,49 @@ def publish_project_with_signature(request, project_id):
                 "message": "Wallet key is required"
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        # Deploy the contract with the creator's wallet key
+        # Deploy the contract with the creator's wallet key, without blocking on the receipt
         from .web3_helper_functions import deploy_staking_contract
+        blockchain = project.blockchain_chain or 'BSC'
         contract_result = deploy_staking_contract(
             project.title,
             project.fund_amount,
             project.wallet_address,
             project.token_address,
-            wallet_key=wallet_key
+            wallet_key=wallet_key,
+            blockchain=blockchain,
+            wait_for_receipt=False,
+            # One CREATE2 salt per project, so a retried publish can't create a second clone
+            salt=Web3.keccak(text=f"lakkhi-project:{project.id}")
         )
         
         if contract_result.get('success', False):
-            # Update project status and save contract address
-            project.status = 'active'
-            project.contract_address = contract_result.get('contract_address')
+            # The tracker activates the project once the deployment is mined
+            tracked = track_transaction(
+                contract_result['tx_hash'],
+                blockchain,
+                kind='deploy',
+                callback='lakkhi_app.tx_tracker.on_contract_deployed',
+                callback_kwargs={
+                    'project_id': project.id,
+                    # Factory clones have no receipt contractAddress - use the CREATE2 address
+                    'contract_address': contract_result.get('contract_address'),
+                },
+                requested_by=request.user if request.user.is_authenticated else None
+            )
+            
+            project.status = 'deploying'
+            project.transaction_hash = tracked['tx_hash']
             project.save()
             
             return Response({
                 "success": True,
-                "message": "Project published successfully",
+                "message": "Project deployment submitted",
+                "tx_hash": tracked['tx_hash'],
+                "status": tracked['status'],
+                "status_url": tracked['status_url'],
+                # Predicted from the CREATE2 salt or deployer nonce - final once status is confirmed
                 "contract_address": contract_result.get('contract_address')
-            })
+            }, status=status.HTTP_202_ACCEPTED)
         else:
             return Response({
                 "success": False,
@@ -425,6 +447,71 @@ def publish_project_with_signature(request, project_id):
         )
 
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def transaction_status(request, tx_hash):
+    """Confirmation status of a transaction the user registered with the tracker (any, for staff)"""
+    tx_status = get_transaction_status(tx_hash, user=request.user)
+    if tx_status is None:
+        return Response({
+            "success": False,
+            "message": "Transaction not found"
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    return Response({"success": True, **tx_status})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def outbox_status(request, outbox_id):
+    """Send status of a transaction queued in the outbox (admin only: it exposes sender and errors)"""
+    from .tx_outbox import get_outbox_status
+    
+    queued_status = get_outbox_status(outbox_id)
+    if queued_status is None:
+        return Response({
+            "success": False,
+            "message": "Queued transaction not found"
+        }, status=status.HTTP_404_NOT_FOUND)
+    
+    # Once broadcast, the tracker reports the confirmation status
+    if queued_status['tx_hash']:
+        queued_status['status_url'] = status_url(queued_status['tx_hash'])
+    return Response({"success": True, **queued_status})
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_metrics(request):
+    """Hit rates and sizes of the in-process blockchain caches (per worker)"""
+    from .gas_oracle import oracle_stats
+    from .token_metadata_cache import cache_stats as token_metadata_stats
+    from .contract_cache import contract_cache_stats
+    from .swap_quote_cache import quote_cache_stats
+    from .reserve_mirror import mirror_stats
+    from .route_finder import route_stats
+    from .token_allowance import permit_support_stats
+    from .tx_outbox import outbox_stats
+    from .webhook_log import webhook_stats
+    from .price_oracle import oracle_stats as price_oracle_stats
+    from .scheduler import scheduler_stats
+    
+    return Response({
+        "success": True,
+        "gas_oracle": oracle_stats(),
+        "token_metadata": token_metadata_stats(),
+        "contracts": contract_cache_stats(),
+        "swap_quotes": quote_cache_stats(),
+        "reserve_mirror": mirror_stats(),
+        "routes": route_stats(),
+        "permit_support": permit_support_stats(),
+        "outbox": outbox_stats(),
+        "webhooks": webhook_stats(),
+        "price_oracle": price_oracle_stats(),
+        "scheduler": scheduler_stats(),
+    })
+
+
 @csrf_exempt
 def payment_process(request):
     """
@@ -473,8 +560,16 @@ def payment_process(request):
         # Get token amount equivalent
         token_amount = PaymentProcessor.get_token_amount_for_usd(
             amount_decimal, 
-            project.token_address
+            project.token_address,
+            project.blockchain_chain
         )
+        if token_amount is None:
+            # Nothing is recorded - the price oracle fetches the price in the background
+            return JsonResponse({
+                "success": False,
+                "message": "Token price is temporarily unavailable, please retry in a moment",
+                "retry": True
+            }, status=503)
         
         # Create contribution record
         contribution = Contribution.objects.create(
@@ -523,12 +618,9 @@ def payment_callback(request, session_id):
         return JsonResponse({"success": False, "message": "Only POST method is allowed"})
     
     try:
-        # Get callback data from request
-        data = json.loads(request.body)
-        
-        # Process the Mercuryo callback
-        result = PaymentProcessor.handle_mercuryo_callback(data)
-        return JsonResponse(result)
+        # Log the raw callback and acknowledge it - consumers run the payment flow
+        event = record_webhook(request, 'mercuryo', session_id=session_id)
+        return JsonResponse({"success": True, "received": event.id})
     except Exception as e:
         return JsonResponse({
             "success": False,
@@ -629,12 +721,9 @@ def mercuryo_callback(request):
         return JsonResponse({"success": False, "message": "Only POST method is allowed"})
     
     try:
-        # Get callback data from request
-        data = json.loads(request.body)
-        
-        # Process the Mercuryo callback
-        result = PaymentProcessor.handle_mercuryo_callback(data)
-        return JsonResponse(result)
+        # Log the raw callback and acknowledge it - consumers run the payment flow
+        event = record_webhook(request, 'mercuryo')
+        return JsonResponse({"success": True, "received": event.id})
     except Exception as e:
         print(f"Error processing Mercuryo callback: {e}")
     return JsonResponse({
@@ -778,12 +867,9 @@ class CampaignViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_403_FORBIDDEN
             )
         
-        # Get contributions
-        contributions = Contribution.objects.filter(campaign=campaign)
-        
-        # Calculate analytics
-        total_raised = sum(c.amount for c in contributions)
-        total_donors = contributions.values('user').distinct().count()
+        # Calculate analytics from the campaign's maintained totals
+        total_raised = campaign.raised_total
+        total_donors = campaign.contributor_count
         
         # Get contribution trend (by day)
         contribution_trend = []
@@ -981,13 +1067,22 @@ def contract_config(request):
             }
         }
 
-        return Response({
+        config = {
             "success": True,
             "abi": abi,
-            "bytecode": bytecode,
             "blockchain": blockchain,
             "network": network_info.get(blockchain, network_info['BSC'])
-        })
+        }
+        
+        factory_address = web3_helper_functions.get_campaign_factory(blockchain)
+        if factory_address:
+            # Campaigns are EIP-1167 clones created through the factory - no bytecode to ship
+            config["factory_address"] = factory_address
+            config["factory_abi"] = web3_helper_functions.CAMPAIGN_FACTORY_ABI
+        else:
+            config["bytecode"] = bytecode
+        
+        return Response(config)
     except Exception as e:
         return Response({
             "success": False,
@@ -3,7 +3,14 @@ import os
 from web3 import Web3
 from django.conf import settings
 import time
-from web3.middleware import geth_poa_middleware
+import rlp
+from eth_abi import encode
+from .web3_provider import get_web3
+from .multicall import multicall_read, batch_rpc_read
+from .gas_oracle import get_gas_price
+from .nonce_manager import allocate_nonce, send_transaction
+from .contract_cache import register_abi, get_contract
+from .token_allowance import allowance_covers
 
 # Connect to BSC network (using BSC's public endpoint)
 BSC_RPC_URL = settings.BSC_RPC_URL
@@ -11,22 +18,8 @@ BSC_RPC_URL = settings.BSC_RPC_URL
 
 # Function to get the appropriate Web3 provider based on blockchain
 def get_web3_provider(blockchain='BSC'):
-    """Get web3 provider for the specified blockchain"""
-    if blockchain == 'Ethereum':
-        rpc_url = settings.ETHEREUM_RPC_URL
-        w3 = Web3(Web3.HTTPProvider(rpc_url))
-    elif blockchain == 'Base':
-        rpc_url = settings.BASE_RPC_URL
-        w3 = Web3(Web3.HTTPProvider(rpc_url))
-        # Base is a Layer 2 that uses the PoA consensus, so we need to inject the middleware
-        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
-    else:  # Default to BSC
-        rpc_url = settings.BSC_RPC_URL
-        w3 = Web3(Web3.HTTPProvider(rpc_url))
-        # BSC uses PoA consensus, so we need to inject the middleware
-        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
-        
-    return w3
+    """Get the shared (pooled) web3 provider for the specified blockchain"""
+    return get_web3(blockchain)
 
 # Default Web3 instance for backward compatibility
 w3 = get_web3_provider('BSC')
@@ -104,6 +97,10 @@ except:
         }
     ]
 
+# Parse the shared ABIs once - contracts are then looked up by abi id
+register_abi('token', TOKEN_ABI)
+register_abi('staking', STAKING_ABI)
+
 # Staking contract bytecode - for direct deployment
 try:
     with open(os.path.join(settings.BASE_DIR, 'static/staking_bytecode.txt')) as bytecode_file:
@@ -114,6 +111,28 @@ except:
     STAKING_BYTECODE = None
     print("ERROR: Missing staking contract bytecode file at static/staking_bytecode.txt")
 
+# Clone factory ABI - campaigns are deployed as EIP-1167 clones where a factory exists
+try:
+    with open(os.path.join(settings.BASE_DIR, 'static/campaign_factory_abi.json')) as factory_json:
+        CAMPAIGN_FACTORY_ABI = json.load(factory_json)
+except:
+    CAMPAIGN_FACTORY_ABI = []
+    print("ERROR: Missing campaign factory ABI file at static/campaign_factory_abi.json")
+register_abi('campaign_factory', CAMPAIGN_FACTORY_ABI)
+
+# EIP-1167 minimal proxy creation code around the implementation address
+EIP1167_PREFIX = bytes.fromhex('3d602d80600a3d3981f3363d3d373d3d3d363d73')
+EIP1167_SUFFIX = bytes.fromhex('5af43d82803e903d91602b57fd5bf3')
+
+# The 10-byte creation header in front of the clone's runtime code
+EIP1167_INIT_HEADER_LENGTH = 10
+
+# (chain, factory address) -> implementation address; fixed when the factory is deployed
+_clone_implementations = {}
+
+# (chain, contract address) -> whether the contract is a clone of the factory's implementation
+_factory_clones = {}
+
 def estimate_gas_costs(operation_type, token_address=None, blockchain='BSC'):
     """
     Estimate gas costs for different token operations
@@ -130,13 +149,14 @@ def estimate_gas_costs(operation_type, token_address=None, blockchain='BSC'):
         # Get the Web3 provider for the specified blockchain
         w3 = get_web3_provider(blockchain)
         
-        # Current gas price in wei
-        gas_price = w3.eth.gas_price
+        # Current gas price in wei (published cluster-wide by the scheduler's gas oracle job)
+        gas_price = get_gas_price(blockchain)
         gas_price_gwei = w3.from_wei(gas_price, 'gwei')
         
         # Estimated gas amounts for different operations
         gas_estimates = {
             'deploy_contract': 3000000,  # Deploy staking contract
+            'deploy_clone': 250000,      # Deploy staking contract as a factory clone
             'approve': 60000,            # Approve token spending
             'stake': 150000,             # Stake tokens
             'transfer': 65000,           # Transfer tokens
@@ -149,7 +169,7 @@ def estimate_gas_costs(operation_type, token_address=None, blockchain='BSC'):
         # For token operations, adjust based on token's complexity
         if token_address and operation_type in ['approve', 'stake', 'transfer']:
             # Get token contract to check for complexity
-            token_contract = w3.eth.contract(address=token_address, abi=TOKEN_ABI)
+            token_contract = get_contract(token_address, 'token', blockchain)
             
             # Try to check for token complexity by seeing if it has certain features
             is_complex = False
@@ -195,7 +215,7 @@ def estimate_gas_costs(operation_type, token_address=None, blockchain='BSC'):
             'message': str(e)
         }
 
-def deploy_staking_contract(project_name, project_target, project_owner, token_address=None, wallet_key=None, blockchain='BSC'):
+def deploy_staking_contract(project_name, project_target, project_owner, token_address=None, wallet_key=None, blockchain='BSC', wait_for_receipt=True, salt=None):
     """
     Deploy a new staking contract for a project directly
     
@@ -206,6 +226,11 @@ def deploy_staking_contract(project_name, project_target, project_owner, token_a
         token_address: Optional custom token address to use (defaults to settings.TOKEN_ADDRESS)
         wallet_key: The private key of the wallet that will pay for deployment (should be the creator's wallet)
         blockchain: The blockchain to deploy on (Ethereum, BSC, Base)
+        wait_for_receipt: If False, return as soon as the transaction is broadcast with
+            status 'pending' and the predicted contract address - the caller should
+            register the tx hash with tx_tracker.track_transaction()
+        salt: 32-byte CREATE2 salt for factory clones (random if not given); reusing the
+            same salt for the same owner can never deploy two contracts
         
     Returns:
         dict: Result containing success status and contract details or instructions
@@ -242,7 +267,7 @@ def deploy_staking_contract(project_name, project_target, project_owner, token_a
             print(f"Using custom token {token_info['symbol']} ({token_address})")
         
         # Get the current gas price and estimate gas for optimization
-        current_gas_price = w3.eth.gas_price
+        current_gas_price = get_gas_price(blockchain)
         
         # For deploying contracts, we can use a slightly below-average gas price
         # because deployment is not time-sensitive. This can save 10-20% on gas fees.
@@ -250,45 +275,88 @@ def deploy_staking_contract(project_name, project_target, project_owner, token_a
         optimized_gas_price = int(current_gas_price * 0.9)  # 90% of current gas price
         
         # Get the nonce for the transaction - using the project owner's address since they're paying
-        nonce = w3.eth.get_transaction_count(owner_address)
-        
-        # Estimate gas cost
-        gas_estimate = estimate_gas_costs('deploy_contract', token_address, blockchain)
-        print(f"Estimated deployment cost: {gas_estimate.get('cost_usd', 'Unknown')} USD")
-        
-        # Create and deploy the contract directly
-        contract = w3.eth.contract(bytecode=STAKING_BYTECODE, abi=STAKING_ABI)
+        nonce = allocate_nonce(owner_address, blockchain)
         
         # Get the correct chain ID for the transaction
         chain_id = settings.CHAIN_IDS.get(blockchain, 56)  # Default to BSC
         
-        # Build deployment transaction
-        tx = contract.constructor(
-            project_name,
-            token_address,
-            owner_address,
-            target_wei
-        ).build_transaction({
-            'from': owner_address,  # Project owner deploys the contract
-            'gas': gas_estimate.get('gas_amount', 3000000),  # Use estimated gas
-            'gasPrice': optimized_gas_price,  # Use optimized gas price for cost savings
-            'nonce': nonce,
-            'chainId': chain_id  # Use the correct chain ID
-        })
+        factory_address = get_campaign_factory(blockchain)
+        if factory_address:
+            # Clone the shared implementation through the factory - a 45-byte proxy
+            # instead of the full bytecode, at an address fixed by the owner and salt
+            if salt is None:
+                salt = os.urandom(32)
+            gas_estimate = estimate_gas_costs('deploy_clone', token_address, blockchain)
+            print(f"Estimated deployment cost: {gas_estimate.get('cost_usd', 'Unknown')} USD")
+            
+            factory = get_contract(factory_address, 'campaign_factory', blockchain)
+            tx = factory.functions.createCampaign(
+                salt,
+                project_name,
+                token_address,
+                owner_address,
+                target_wei
+            ).build_transaction({
+                'from': owner_address,
+                'gas': gas_estimate.get('gas_amount', 250000),
+                'gasPrice': optimized_gas_price,
+                'nonce': nonce,
+                'chainId': chain_id
+            })
+            predicted_address = predict_clone_address(
+                factory_address, get_clone_implementation(factory_address, blockchain), owner_address, salt
+            )
+        else:
+            # Estimate gas cost
+            gas_estimate = estimate_gas_costs('deploy_contract', token_address, blockchain)
+            print(f"Estimated deployment cost: {gas_estimate.get('cost_usd', 'Unknown')} USD")
+            
+            # Create and deploy the contract directly
+            contract = w3.eth.contract(bytecode=STAKING_BYTECODE, abi=STAKING_ABI)
+            
+            # Build deployment transaction
+            tx = contract.constructor(
+                project_name,
+                token_address,
+                owner_address,
+                target_wei
+            ).build_transaction({
+                'from': owner_address,  # Project owner deploys the contract
+                'gas': gas_estimate.get('gas_amount', 3000000),  # Use estimated gas
+                'gasPrice': optimized_gas_price,  # Use optimized gas price for cost savings
+                'nonce': nonce,
+                'chainId': chain_id  # Use the correct chain ID
+            })
+        
+        # Sign with the provided wallet key and send (the nonce is resynced if the node rejects it)
+        tx_hash = send_transaction(tx, wallet_key, owner_address, blockchain)
+        print(f"Transaction sent: {tx_hash.hex()}")
         
-        # Sign the transaction with the provided wallet key
-        signed_tx = w3.eth.account.sign_transaction(tx, wallet_key)
+        if not factory_address:
+            # The contract address is fixed by the deployer address and the nonce it was sent with
+            predicted_address = predict_contract_address(owner_address, tx['nonce'])
         
-        # Send the transaction
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction)
-        print(f"Transaction sent: {tx_hash.hex()}")
+        if not wait_for_receipt:
+            return {
+                'success': True,
+                'status': 'pending',
+                'contract_address': predicted_address,
+                'contract_abi': STAKING_ABI,
+                'owner_address': owner_address,
+                'tx_hash': tx_hash.hex(),
+                'blockchain': blockchain,
+                'message': f'Staking contract deployment submitted on {blockchain} blockchain'
+            }
         
         # Wait for transaction receipt
         receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
         print(f"Transaction confirmed in block: {receipt['blockNumber']}")
         
-        # Get contract address from receipt
+        # Get contract address from receipt - factory clones are created by a call, so
+        # their address is the predicted CREATE2 one
         contract_address = receipt.contractAddress
+        if factory_address and receipt.status == 1:
+            contract_address = predicted_address
         if not contract_address:
             return {
                 'success': False,
@@ -310,53 +378,125 @@ def deploy_staking_contract(project_name, project_target, project_owner, token_a
         print(f"Error deploying staking contract: {e}")
         return {'success': False, 'message': str(e)}
 
+def predict_contract_address(deployer_address, nonce):
+    """Address a CREATE deployment from deployer_address at the given nonce will get"""
+    encoded = rlp.encode([bytes.fromhex(deployer_address[2:]), nonce])
+    return Web3.to_checksum_address(Web3.keccak(encoded)[12:])
+
+def get_campaign_factory(blockchain='BSC'):
+    """CampaignCloneFactory address for a chain, or None if none is deployed"""
+    return getattr(settings, 'CAMPAIGN_CLONE_FACTORY_ADDRESSES', {}).get(blockchain) or None
+
+def get_clone_implementation(factory_address, blockchain='BSC'):
+    """Implementation behind a factory's clones, read once per process"""
+    key = (blockchain, factory_address.lower())
+    if key not in _clone_implementations:
+        factory = get_contract(factory_address, 'campaign_factory', blockchain)
+        _clone_implementations[key] = factory.functions.implementation().call()
+    return _clone_implementations[key]
+
+def is_factory_clone(contract_address, blockchain='BSC'):
+    """
+    True if a contract is an EIP-1167 clone of the chain's CampaignCloneFactory implementation
+    Clones have CloneableStaking.stakeFor; contracts deployed from staking_bytecode.txt don't
+    """
+    factory_address = get_campaign_factory(blockchain)
+    if not factory_address or not contract_address:
+        return False
+    key = (blockchain, contract_address.lower())
+    if key not in _factory_clones:
+        implementation = get_clone_implementation(factory_address, blockchain)
+        runtime_code = (
+            EIP1167_PREFIX[EIP1167_INIT_HEADER_LENGTH:] + bytes.fromhex(implementation[2:]) + EIP1167_SUFFIX
+        )
+        code = bytes(get_web3(blockchain).eth.get_code(Web3.to_checksum_address(contract_address)))
+        if not code:
+            # Not deployed yet - check again next time
+            return False
+        _factory_clones[key] = code == runtime_code
+    return _factory_clones[key]
+
+def predict_clone_address(factory_address, implementation, creator, salt):
+    """CREATE2 address CampaignCloneFactory.createCampaign(salt, ...) from creator will deploy to"""
+    creator_salt = Web3.keccak(encode(['address', 'bytes32'], [Web3.to_checksum_address(creator), salt]))
+    init_code_hash = Web3.keccak(EIP1167_PREFIX + bytes.fromhex(implementation[2:]) + EIP1167_SUFFIX)
+    digest = Web3.keccak(b'\xff' + bytes.fromhex(factory_address[2:]) + creator_salt + init_code_hash)
+    return Web3.to_checksum_address(digest[12:])
+
 def get_staking_contract(contract_address, blockchain='BSC'):
     """Get a staking contract instance"""
     try:
-        # Get the Web3 provider for the specified blockchain
-        w3 = get_web3_provider(blockchain)
-        
-        # Create contract instance
-        contract = w3.eth.contract(address=contract_address, abi=STAKING_ABI)
-        return contract
+        # Cached instance - the ABI is only parsed once per chain
+        return get_contract(contract_address, 'staking', blockchain)
     except Exception as e:
         print(f"Error getting staking contract: {e}")
         return None
 
-def get_staking_contract_status(contract_address, blockchain='BSC'):
-    """Get status of a staking contract"""
+# View functions read for every staking contract status lookup
+STAKING_STATUS_FUNCTIONS = ['targetAmount', 'currentAmount', 'beneficiary', 'isCompleted']
+
+def get_staking_contract_statuses(contract_addresses, blockchain='BSC'):
+    """
+    Get the status of many staking contracts in one batched read
+
+    Args:
+        contract_addresses: List of staking contract addresses
+        blockchain: The blockchain the contracts are deployed on (Ethereum, BSC, Base)
+
+    Returns:
+        dict: {contract_address: status dict} - same shape as get_staking_contract_status()
+    """
+    statuses = {}
+    valid_addresses = []
+    for address in contract_addresses:
+        if address and Web3.is_address(address):
+            valid_addresses.append(address)
+        else:
+            statuses[address] = {'success': False, 'message': 'Invalid contract address'}
+
+    if not valid_addresses:
+        return statuses
+
     try:
-        # Get the Web3 provider for the specified blockchain
         w3 = get_web3_provider(blockchain)
         
-        contract = get_staking_contract(contract_address, blockchain)
-        if not contract:
-            return {'success': False, 'message': 'Invalid contract address'}
-        
-        # Get target and current amounts from the contract
-        target_amount = contract.functions.targetAmount().call()
-        current_amount = contract.functions.currentAmount().call()
-        beneficiary = contract.functions.beneficiary().call()
-        is_completed = contract.functions.isCompleted().call()
+        # One multicall for every (contract, function) pair instead of 4 calls per contract
+        reads = multicall_read(valid_addresses, STAKING_STATUS_FUNCTIONS, 'staking', blockchain)
+    except Exception as e:
+        print(f"Error getting staking contract statuses: {e}")
+        for address in valid_addresses:
+            statuses[address] = {'success': False, 'message': str(e)}
+        return statuses
+
+    for address in valid_addresses:
+        values = reads[address]
+        if any(values[fn_name] is None for fn_name in STAKING_STATUS_FUNCTIONS):
+            statuses[address] = {'success': False, 'message': 'Failed to read staking contract state'}
+            continue
+
+        target_amount = values['targetAmount']
+        current_amount = values['currentAmount']
         
         # Calculate percentage
         percentage = 0
         if target_amount > 0:
             percentage = min(100, (current_amount * 100) // target_amount)
         
-        return {
+        statuses[address] = {
             'success': True,
             'target': w3.from_wei(target_amount, 'ether'),
             'current': w3.from_wei(current_amount, 'ether'),
-            'beneficiary': beneficiary,
-            'is_completed': is_completed,
+            'beneficiary': values['beneficiary'],
+            'is_completed': values['isCompleted'],
             'percentage': percentage
         }
-    except Exception as e:
-        print(f"Error getting staking contract status: {e}")
-        return {'success': False, 'message': str(e)}
+    return statuses
 
-def stake_tokens(contract_address, amount, contributor_wallet_info):
+def get_staking_contract_status(contract_address, blockchain='BSC'):
+    """Get status of a staking contract"""
+    return get_staking_contract_statuses([contract_address], blockchain)[contract_address]
+
+def stake_tokens(contract_address, amount, contributor_wallet_info, wait_for_receipt=True):
     """
     Stake tokens to a contract
     
@@ -364,6 +504,8 @@ def stake_tokens(contract_address, amount, contributor_wallet_info):
         contract_address: Address of the staking contract
         amount: Amount to stake in ether
         contributor_wallet_info: Dict with email or private_key and address
+        wait_for_receipt: If False, return as soon as the stake transaction is broadcast
+            with status 'pending' - the caller should register it with track_transaction()
     
     Returns:
         dict: Result of the staking operation
@@ -395,7 +537,7 @@ def stake_tokens(contract_address, amount, contributor_wallet_info):
             return {'success': False, 'message': 'No way to access contributor wallet'}
         
         # Create token contract to approve spending
-        token_contract = w3.eth.contract(address=TOKEN_ADDRESS, abi=TOKEN_ABI)
+        token_contract = get_contract(TOKEN_ADDRESS, 'token', 'BSC')
         
         # Check token balance
         token_balance = token_contract.functions.balanceOf(contributor_address).call()
@@ -406,7 +548,7 @@ def stake_tokens(contract_address, amount, contributor_wallet_info):
             }
             
         # Get gas price estimates
-        current_gas_price = w3.eth.gas_price
+        current_gas_price = get_gas_price('BSC')
         
         # For user transactions, optimize gas price to keep costs low
         # For most ERC20 operations, we can use a slightly lower gas price
@@ -423,49 +565,75 @@ def stake_tokens(contract_address, amount, contributor_wallet_info):
         
         print(f"Estimated staking costs: Approve {approve_gas.get('cost_usd', 0)} USD + Stake {stake_gas.get('cost_usd', 0)} USD = {total_cost_usd} USD")
         
-        # First, approve the staking contract to spend tokens
-        nonce = w3.eth.get_transaction_count(contributor_address)
-        approve_tx = token_contract.functions.approve(
-            contract_address, 
-            amount_wei
-        ).build_transaction({
-            'from': contributor_address,
-            'gas': approve_gas.get('gas_amount', 100000),  # Use estimated gas amount
-            'gasPrice': optimized_gas_price,  # Use optimized gas price
-            'nonce': nonce,
-        })
-        
-        # Sign and send approval transaction
-        signed_approve_tx = w3.eth.account.sign_transaction(approve_tx, private_key)
-        approve_tx_hash = w3.eth.send_raw_transaction(signed_approve_tx.rawTransaction)
-        
-        # Wait for approval to be mined
-        approve_receipt = w3.eth.wait_for_transaction_receipt(approve_tx_hash)
-        if approve_receipt.status != 1:
-            return {'success': False, 'message': 'Token approval failed'}
-        
-        # Now stake tokens
-        nonce = w3.eth.get_transaction_count(contributor_address)
-        stake_tx = contract.functions.stake(amount_wei).build_transaction({
-            'from': contributor_address,
-            'gas': stake_gas.get('gas_amount', 200000),  # Use estimated gas amount
-            'gasPrice': optimized_gas_price,  # Use optimized gas price
-            'nonce': nonce,
-        })
+        # Cheapest way to let the contract pull the tokens: an existing allowance needs no
+        # transaction; an EIP-2612 permit deposits through the contribution router in one
+        # transaction when the contract credits the contributor (factory clones with
+        # stakeFor); otherwise a separate approve is sent before a direct stake
+        approve_tx_hash = None
+        stake_tx_hash = None
+        if not allowance_covers(TOKEN_ADDRESS, contributor_address, contract_address, amount_wei, 'BSC'):
+            from .custom_wallet import WalletManager
+            stake_tx_hash = WalletManager.send_deposit_with_permit(
+                contributor_address, private_key, contract_address, TOKEN_ADDRESS, amount_wei, 'BSC',
+                gas_price=optimized_gas_price
+            )
+            
+            if stake_tx_hash is None:
+                # Approve and stake are signed with consecutive local nonces and broadcast
+                # back-to-back, so both can be mined in the same block. Gas limits are set
+                # explicitly because estimating stake() would revert before approve() is mined.
+                approve_tx = token_contract.functions.approve(
+                    contract_address, 
+                    amount_wei
+                ).build_transaction({
+                    'from': contributor_address,
+                    'gas': approve_gas.get('gas_amount', 100000),  # Use estimated gas amount
+                    'gasPrice': optimized_gas_price,  # Use optimized gas price
+                    'nonce': allocate_nonce(contributor_address, 'BSC'),
+                })
+                
+                # Sign and send approval transaction
+                approve_tx_hash = send_transaction(approve_tx, private_key, contributor_address, 'BSC')
+        
+        if stake_tx_hash is None:
+            # Now stake tokens without waiting for the approval
+            stake_tx = contract.functions.stake(amount_wei).build_transaction({
+                'from': contributor_address,
+                'gas': stake_gas.get('gas_amount', 200000),  # Use estimated gas amount
+                'gasPrice': optimized_gas_price,  # Use optimized gas price
+                'nonce': allocate_nonce(contributor_address, 'BSC'),
+            })
+            
+            # Sign and send stake transaction
+            stake_tx_hash = send_transaction(stake_tx, private_key, contributor_address, 'BSC')
         
-        # Sign and send stake transaction
-        signed_stake_tx = w3.eth.account.sign_transaction(stake_tx, private_key)
-        stake_tx_hash = w3.eth.send_raw_transaction(signed_stake_tx.rawTransaction)
+        if not wait_for_receipt:
+            return {
+                'success': True,
+                'transaction_hash': stake_tx_hash.hex(),
+                'approve_transaction_hash': approve_tx_hash.hex() if approve_tx_hash else None,
+                'amount': amount,
+                'status': 'pending',
+                'estimated_cost': {
+                    'eth': total_cost_eth,
+                    'usd': total_cost_usd
+                }
+            }
         
-        # Wait for stake to be mined
+        # Wait for stake to be mined - an approval has a lower nonce, so it's mined by now
         stake_receipt = w3.eth.wait_for_transaction_receipt(stake_tx_hash)
+        approve_gas_used = 0
+        if approve_tx_hash:
+            approve_receipt = w3.eth.get_transaction_receipt(approve_tx_hash)
+            if approve_receipt.status != 1:
+                return {'success': False, 'message': 'Token approval failed'}
+            approve_gas_used = approve_receipt.gasUsed
         
         # Calculate actual gas used and costs
-        approve_gas_used = approve_receipt.gasUsed
         stake_gas_used = stake_receipt.gasUsed
         total_gas_used = approve_gas_used + stake_gas_used
         
-        gas_price_used = w3.eth.get_transaction(approve_tx_hash).gasPrice  # Both txs use same gas price
+        gas_price_used = stake_receipt.effectiveGasPrice  # Both txs use same gas price
         total_cost_wei = total_gas_used * gas_price_used
         total_actual_cost_eth = w3.from_wei(total_cost_wei, 'ether')
         total_actual_cost_usd = float(total_actual_cost_eth) * 250  # Placeholder USD conversion
@@ -494,13 +662,15 @@ def stake_tokens(contract_address, amount, contributor_wallet_info):
         print(f"Error staking tokens: {e}")
         return {'success': False, 'message': str(e)}
 
-def release_funds(contract_address, wallet_info):
+def release_funds(contract_address, wallet_info, wait_for_receipt=True):
     """
     Release funds from a staking contract to the beneficiary
     
     Args:
         contract_address: Address of the staking contract
         wallet_info: Dict with private_key and address of the beneficiary
+        wait_for_receipt: If False, return as soon as the release transaction is broadcast
+            with status 'pending' - the caller should register it with track_transaction()
     
     Returns:
         dict: Result of the release operation
@@ -532,17 +702,24 @@ def release_funds(contract_address, wallet_info):
         address = wallet_info['address']
         
         # Build release transaction
-        nonce = w3.eth.get_transaction_count(address)
+        nonce = allocate_nonce(address, 'BSC')
         release_tx = contract.functions.release().build_transaction({
             'from': address,
             'gas': 200000,
-            'gasPrice': w3.eth.gas_price,
+            'gasPrice': get_gas_price('BSC'),
             'nonce': nonce,
         })
         
         # Sign and send release transaction
-        signed_release_tx = w3.eth.account.sign_transaction(release_tx, private_key)
-        release_tx_hash = w3.eth.send_raw_transaction(signed_release_tx.rawTransaction)
+        release_tx_hash = send_transaction(release_tx, private_key, address, 'BSC')
+        
+        if not wait_for_receipt:
+            return {
+                'success': True,
+                'transaction_hash': release_tx_hash.hex(),
+                'amount_released': w3.from_wei(current_amount, 'ether'),
+                'status': 'pending'
+            }
         
         # Wait for release to be mined
         release_receipt = w3.eth.wait_for_transaction_receipt(release_tx_hash)
@@ -557,58 +734,84 @@ def release_funds(contract_address, wallet_info):
         print(f"Error releasing funds: {e}")
         return {'success': False, 'message': str(e)} 
 
-def get_token_info(token_address, blockchain='BSC'):
+# ERC20 metadata functions read for every token lookup
+TOKEN_METADATA_FUNCTIONS = ['name', 'symbol', 'decimals']
+
+def get_tokens_info(token_addresses, blockchain='BSC'):
     """
-    Get token information for a token address from the blockchain
+    Get token information for many token addresses in one JSON-RPC batch
     
     Args:
-        token_address: Address of the ERC20/BEP20 token
+        token_addresses: List of ERC20/BEP20 token addresses
         blockchain: The blockchain to use (Ethereum, BSC, Base)
         
     Returns:
-        dict: Token information including name, symbol, decimals
+        dict: {token_address: token info dict} - same shape as get_token_info()
     """
-    try:
-        # Get the Web3 provider for the specified blockchain
-        w3 = get_web3_provider(blockchain)
-        
+    results = {}
+    calls = []
+    valid_addresses = []
+    for token_address in token_addresses:
         # Basic validation first
         if not token_address:
-            return {
+            results[token_address] = {
                 'success': False,
                 'message': 'Token address is required'
             }
-        
-        if not Web3.is_address(token_address):
-            return {
+        elif not Web3.is_address(token_address):
+            results[token_address] = {
                 'success': False,
                 'message': 'Invalid token address format'
             }
-        
-        # Create token contract instance
-        token_contract = w3.eth.contract(address=token_address, abi=TOKEN_ABI)
-        
-        # Get token details
-        try:
-            name = token_contract.functions.name().call()
-            symbol = token_contract.functions.symbol().call()
-            decimals = token_contract.functions.decimals().call()
-            
-            return {
-                'success': True,
-                'address': token_address,
-                'name': name,
-                'symbol': symbol,
-                'decimals': decimals,
-                'blockchain': blockchain
-            }
-        except Exception as e:
-            return {
+        elif token_address not in valid_addresses:
+            valid_addresses.append(token_address)
+            calls.extend(
+                (token_address, 'token', fn_name, [])
+                for fn_name in TOKEN_METADATA_FUNCTIONS
+            )
+
+    if not valid_addresses:
+        return results
+
+    try:
+        # name(), symbol() and decimals() for every token in a single round trip
+        values = iter(batch_rpc_read(calls, blockchain))
+    except Exception as e:
+        for token_address in valid_addresses:
+            results[token_address] = {
                 'success': False,
                 'message': f"Error getting token information: {str(e)}"
             }
-    except Exception as e:
-        return {
-            'success': False,
-            'message': f"Error getting token information: {str(e)}"
-        } 
\ No newline at end of file
+        return results
+
+    for token_address in valid_addresses:
+        name, symbol, decimals = (next(values) for _ in TOKEN_METADATA_FUNCTIONS)
+        if name is None or symbol is None or decimals is None:
+            results[token_address] = {
+                'success': False,
+                'message': 'Error getting token information: contract did not respond to name/symbol/decimals'
+            }
+            continue
+
+        results[token_address] = {
+            'success': True,
+            'address': token_address,
+            'name': name,
+            'symbol': symbol,
+            'decimals': decimals,
+            'blockchain': blockchain
+        }
+    return results
+
+def get_token_info(token_address, blockchain='BSC'):
+    """
+    Get token information for a token address from the blockchain
+    
+    Args:
+        token_address: Address of the ERC20/BEP20 token
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+        
+    Returns:
+        dict: Token information including name, symbol, decimals
+    """
+    return get_tokens_info([token_address], blockchain)[token_address]
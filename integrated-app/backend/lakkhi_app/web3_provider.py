@@ -0,0 +1,154 @@
+"""
+Process-wide Web3 provider registry.
+
+Keeps one long-lived Web3 instance per chain, each backed by a keep-alive
+requests.Session with its own connection pool, so RPC calls reuse open
+TLS connections instead of reconnecting on every request.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from web3 import Web3
+from web3.middleware import geth_poa_middleware
+from django.conf import settings
+
+# Chains that use PoA consensus and need the extraData middleware
+POA_CHAINS = {'BSC', 'Base'}
+
+# Registry state - guarded by _registry_lock
+_providers = {}
+_sessions = {}
+_registry_lock = threading.Lock()
+
+
+def get_rpc_url(blockchain='BSC'):
+    """Get the RPC URL for the specified blockchain (defaults to BSC)"""
+    rpc_urls = {
+        'BSC': settings.BSC_RPC_URL,
+        'Ethereum': settings.ETHEREUM_RPC_URL,
+        'Base': settings.BASE_RPC_URL,
+    }
+    return rpc_urls.get(blockchain, rpc_urls['BSC'])
+
+
+def _build_session():
+    """Create a keep-alive session with a bounded connection pool"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=getattr(settings, 'WEB3_POOL_CONNECTIONS', 4),
+        pool_maxsize=getattr(settings, 'WEB3_POOL_MAXSIZE', 20),
+        pool_block=False,  # Open an extra connection rather than stall a request
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def _request_timeout():
+    """(connect, read) timeout tuple passed to every RPC request"""
+    return (
+        getattr(settings, 'WEB3_CONNECT_TIMEOUT', 5),
+        getattr(settings, 'WEB3_REQUEST_TIMEOUT', 15),
+    )
+
+
+def _build_provider(blockchain):
+    """Create the Web3 instance for a chain using its pooled session"""
+    session = _build_session()
+    w3 = Web3(Web3.HTTPProvider(
+        get_rpc_url(blockchain),
+        request_kwargs={'timeout': _request_timeout()},
+        session=session,
+    ))
+
+    # BSC and Base use PoA consensus, so we need to inject the middleware (once)
+    if blockchain in POA_CHAINS:
+        w3.middleware_onion.inject(geth_poa_middleware, layer=0)
+
+    return w3, session
+
+
+def get_web3(blockchain='BSC'):
+    """
+    Get the shared Web3 instance for the specified blockchain
+
+    Instances are created lazily on first use and then reused for the
+    lifetime of the process. Unknown chains fall back to BSC.
+    """
+    if blockchain not in ('BSC', 'Ethereum', 'Base'):
+        blockchain = 'BSC'
+
+    w3 = _providers.get(blockchain)
+    if w3 is not None:
+        return w3
+
+    with _registry_lock:
+        # Another thread may have created it while we waited for the lock
+        if blockchain not in _providers:
+            w3, session = _build_provider(blockchain)
+            _sessions[blockchain] = session
+            _providers[blockchain] = w3
+        return _providers[blockchain]
+
+
+def get_session(blockchain='BSC'):
+    """Get the pooled HTTP session used by a chain's provider"""
+    get_web3(blockchain)
+    return _sessions.get(blockchain, _sessions.get('BSC'))
+
+
+def reset_providers():
+    """Close all pooled sessions and drop cached providers (e.g. after a fork or RPC URL change)"""
+    with _registry_lock:
+        for session in _sessions.values():
+            try:
+                session.close()
+            except Exception as e:
+                print(f"Error closing RPC session: {e}")
+        _sessions.clear()
+        _providers.clear()
+
+
+def batch_request(calls, blockchain='BSC'):
+    """
+    Send several JSON-RPC calls to a chain in a single HTTP request
+
+    Args:
+        calls: List of (method, params) tuples, e.g. ('eth_call', [{...}, 'latest'])
+        blockchain: The blockchain to use (Ethereum, BSC, Base)
+
+    Returns:
+        list: One entry per call, in the same order. Each entry is the call's
+        result, or None if the node returned an error for that call.
+
+    Raises:
+        requests.RequestException / ValueError if the node rejects the batch as a whole
+    """
+    if not calls:
+        return []
+
+    payload = [
+        {'jsonrpc': '2.0', 'id': index, 'method': method, 'params': params}
+        for index, (method, params) in enumerate(calls)
+    ]
+
+    response = get_session(blockchain).post(
+        get_rpc_url(blockchain),
+        json=payload,
+        timeout=_request_timeout(),
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    # Nodes that don't support batching answer with a single error object
+    if not isinstance(data, list):
+        raise ValueError(f"RPC node rejected batch request: {data.get('error', data)}")
+
+    # Responses may come back in any order, so match them up by id
+    results = [None] * len(calls)
+    for item in data:
+        index = item.get('id')
+        if isinstance(index, int) and 0 <= index < len(calls) and 'error' not in item:
+            results[index] = item.get('result')
+    return results
@@ -0,0 +1,244 @@
+"""
+Asynchronous payment webhook ingestion.
+
+Payment provider callbacks used to run the whole swap -> approve -> stake
+flow inside the provider's HTTP request, which held it open for minutes
+and made the provider time out and retry. Now the callback views only
+append the raw request to the WebhookEvent log and acknowledge it; a pool
+of consumers parses and processes logged events in the background.
+
+A consumer claims an event by creating its WebhookProcessing row - the
+one-to-one key means exactly one consumer wins, however many are running.
+Events are processed in arrival order. Failed events are not retried
+automatically (a retried stake flow could swap twice) - replay them with
+`manage.py replay_webhooks` once the cause is fixed.
+
+Consumers run as daemon threads inside the web process by default, or in
+a dedicated process via `manage.py consume_webhooks`.
+"""
+import datetime
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections
+from django.utils import timezone
+
+_consumer = None
+_consumer_lock = threading.Lock()
+
+# Request headers worth keeping with a logged event
+LOGGED_HEADERS = ('CONTENT_TYPE', 'HTTP_USER_AGENT', 'HTTP_X_SIGNATURE', 'HTTP_X_FORWARDED_FOR')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def record_webhook(request, provider, session_id=''):
+    """
+    Append a provider callback to the webhook log
+
+    Only the raw body and a few headers are stored - nothing is parsed here,
+    so recording never fails on a malformed payload.
+
+    Returns:
+        WebhookEvent: The logged event
+    """
+    from .models import WebhookEvent
+
+    event = WebhookEvent.objects.create(
+        provider=provider,
+        session_id=session_id or '',
+        body=request.body.decode('utf-8', errors='replace'),
+        headers={name: request.META[name] for name in LOGGED_HEADERS if name in request.META},
+        remote_addr=request.META.get('REMOTE_ADDR', '') or '',
+    )
+
+    if _setting('WEBHOOK_CONSUMER_IN_PROCESS', True):
+        ensure_consumer()
+
+    return event
+
+
+def _handle(event):
+    """Parse and process one event - returns the processor's result dict"""
+    from .payment_processor import PaymentProcessor
+
+    if event.provider == 'mercuryo':
+        return PaymentProcessor.handle_mercuryo_callback(json.loads(event.body))
+    raise ValueError(f"No handler for {event.provider} webhooks")
+
+
+def _claim(event):
+    from .models import WebhookProcessing
+
+    try:
+        return WebhookProcessing.objects.create(event=event)
+    except IntegrityError:
+        return None  # Another consumer got it first
+
+
+def process_event(event):
+    """
+    Claim and process one logged event
+
+    Returns:
+        bool or None: Whether processing succeeded, or None if another consumer claimed it
+    """
+    from .models import WebhookProcessing
+
+    processing = _claim(event)
+    if processing is None:
+        return None
+
+    try:
+        result = _handle(event)
+    except Exception as e:
+        print(f"Error processing {event.provider} webhook #{event.pk}: {e}")
+        status, result, error = 'failed', {}, str(e)
+    else:
+        ok = bool(result.get('success'))
+        status = 'done' if ok else 'failed'
+        error = '' if ok else str(result.get('message', ''))
+
+    WebhookProcessing.objects.filter(pk=processing.pk).update(
+        status=status,
+        result=json.loads(json.dumps(result, default=str)),
+        error=error,
+        finished_at=timezone.now()
+    )
+    return status == 'done'
+
+
+def _expire_stale_claims():
+    """Fail events whose consumer stopped mid-processing, so they show up for replay"""
+    from .models import WebhookProcessing
+
+    cutoff = timezone.now() - datetime.timedelta(seconds=_setting('WEBHOOK_CLAIM_TIMEOUT', 900))
+    return WebhookProcessing.objects.filter(status='processing', claimed_at__lt=cutoff).update(
+        status='failed',
+        error="Consumer stopped while processing - replay once the payment's on-chain state is checked",
+        finished_at=timezone.now()
+    )
+
+
+def pending_events(limit):
+    """Oldest logged events no consumer has claimed yet"""
+    from .models import WebhookEvent
+
+    return list(WebhookEvent.objects.filter(processing__isnull=True).order_by('id')[:limit])
+
+
+def consume(executor=None, batch_size=None):
+    """
+    Process the oldest unclaimed events
+
+    Returns:
+        int: Number of events this call processed
+    """
+    _expire_stale_claims()
+    batch_size = batch_size or _setting('WEBHOOK_CONSUMER_BATCH_SIZE', 20)
+    events = pending_events(batch_size)
+    if not events:
+        return 0
+
+    def _process(event):
+        try:
+            return process_event(event)
+        finally:
+            close_old_connections()
+
+    outcomes = executor.map(_process, events) if executor else map(_process, events)
+    return sum(1 for outcome in outcomes if outcome is not None)
+
+
+def run_consumers(workers=None, once=False, on_processed=None):
+    """Process logged events with a pool of consumer threads until interrupted"""
+    workers = workers or _setting('WEBHOOK_CONSUMERS', 4)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='webhook-consumer') as executor:
+        while True:
+            try:
+                processed = consume(executor, batch_size=workers * 5)
+                if processed and on_processed:
+                    on_processed(processed)
+            except Exception as e:
+                print(f"Error consuming webhooks: {e}")
+                processed = 0
+            finally:
+                close_old_connections()
+
+            if once:
+                return
+            if not processed:
+                time.sleep(_setting('WEBHOOK_POLL_INTERVAL', 1))
+
+
+def ensure_consumer():
+    """Start the in-process consumer pool if it isn't already running"""
+    global _consumer
+    if _consumer is not None and _consumer.is_alive():
+        return
+    with _consumer_lock:
+        if _consumer is None or not _consumer.is_alive():
+            _consumer = threading.Thread(target=run_consumers, name='webhook-consumers', daemon=True)
+            _consumer.start()
+
+
+def replay(since, until=None, provider=None, failed_only=False):
+    """
+    Reprocess logged events received in [since, until)
+
+    Each event's previous outcome is discarded and it is processed again in
+    this thread, in arrival order. An event a consumer is processing right
+    now is skipped.
+
+    Returns:
+        dict: Counts of events replayed, succeeded, failed and skipped
+    """
+    from .models import WebhookEvent, WebhookProcessing
+
+    events = WebhookEvent.objects.filter(received_at__gte=since).order_by('id')
+    if until is not None:
+        events = events.filter(received_at__lt=until)
+    if provider:
+        events = events.filter(provider=provider)
+    if failed_only:
+        events = events.filter(processing__status='failed')
+
+    counts = {'replayed': 0, 'succeeded': 0, 'failed': 0, 'skipped': 0}
+    for event in list(events):
+        WebhookProcessing.objects.filter(event=event).exclude(status='processing').delete()
+        outcome = process_event(event)
+        if outcome is None:
+            counts['skipped'] += 1
+            continue
+        counts['replayed'] += 1
+        counts['succeeded' if outcome else 'failed'] += 1
+    return counts
+
+
+def webhook_stats():
+    """Backlog and outcome counts for monitoring - a growing backlog means consumers can't keep up"""
+    from django.db.models import Count, Min
+    from .models import WebhookEvent, WebhookProcessing
+
+    backlog = WebhookEvent.objects.filter(processing__isnull=True).aggregate(
+        count=Count('id'), oldest=Min('received_at')
+    )
+    outcomes = dict(WebhookProcessing.objects.values_list('status').annotate(count=Count('id')))
+    recent = WebhookProcessing.objects.filter(
+        finished_at__gte=timezone.now() - datetime.timedelta(minutes=1)
+    ).count()
+    return {
+        'backlog': backlog['count'],
+        'oldest_pending_seconds': (
+            (timezone.now() - backlog['oldest']).total_seconds() if backlog['oldest'] else 0
+        ),
+        'processing': outcomes.get('processing', 0),
+        'done': outcomes.get('done', 0),
+        'failed': outcomes.get('failed', 0),
+        'processed_last_minute': recent,
+    }